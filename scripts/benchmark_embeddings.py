@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Embedding backend benchmark
+
+Embeds our corpus and a set of labelled questions with each backend and
+reports, so every host can pick its EMBEDDING_BACKEND:
+- load time and peak resident memory of the process (for ollama the model
+  lives in the Ollama server, so this only covers the client);
+- ingestion throughput in chunks per second (batches of --batch-size);
+- single-question latency p50/p95, the cost a user's question pays;
+- retrieval recall@k / MRR@k of exact cosine search over the corpus.
+
+Each backend runs in its own interpreter so memory figures don't mix.
+Backends are given as BACKEND:MODEL (model name, or ONNX path for onnx).
+Questions use the format of benchmark_retrieval.py; the corpus is a scraper
+dump (WikiScraper.save_to_json).
+
+Usage:
+    python scripts/benchmark_embeddings.py --queries data/retrieval_queries.jsonl --pages data/wiki_pages.json
+    python scripts/benchmark_embeddings.py --queries q.jsonl --pages pages.json \\
+        --backends sentence-transformers:all-MiniLM-L6-v2 ollama:nomic-embed-text onnx:./data/embedding_onnx
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "src"))
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from benchmark_retrieval import first_hit, load_queries, summarize  # noqa: E402
+
+DEFAULT_BACKENDS = [
+    "sentence-transformers:all-MiniLM-L6-v2",
+    "ollama:nomic-embed-text",
+    "onnx:./data/embedding_onnx",
+]
+
+
+def parse_spec(spec: str) -> Tuple[str, str]:
+    """Split BACKEND:MODEL (the model may itself contain colons, e.g. Ollama tags)"""
+    backend, _, model = spec.partition(":")
+    return backend, model
+
+
+def load_corpus(pages_path: str) -> List[Dict[str, Any]]:
+    """Chunk a scraper dump exactly as ingestion does"""
+    from src.modes.self_hosted.scraping.wiki_scraper import ContentProcessor
+
+    with open(pages_path, encoding="utf-8") as f:
+        return ContentProcessor().process_scraped_pages(json.load(f))
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(backend: Any, chunks: List[Dict[str, Any]], queries: List[Dict[str, Any]], args: Any) -> Dict[str, Any]:
+    """Load, ingestion throughput, query latency and recall of one backend"""
+    import numpy as np
+
+    started = time.perf_counter()
+    backend.load()
+    backend.encode(["warm up"])
+    load_s = time.perf_counter() - started
+
+    texts = [chunk["content"] for chunk in chunks]
+    started = time.perf_counter()
+    matrix = np.concatenate(
+        [backend.encode(texts[start : start + args.batch_size]) for start in range(0, len(texts), args.batch_size)]
+    )
+    ingest_s = time.perf_counter() - started
+
+    ranks, latencies_ms = [], []
+    for entry in queries:
+        started = time.perf_counter()
+        vector = backend.encode([entry["query"]])[0]
+        latencies_ms.append((time.perf_counter() - started) * 1000)
+        top = np.argsort(-(matrix @ vector))[: args.k]
+        ranks.append(first_hit([chunks[index] for index in top], entry["relevant"], args.k))
+
+    return {
+        **summarize(ranks, latencies_ms),
+        "model_id": backend.model_id,
+        "dimensions": int(matrix.shape[1]),
+        "load_s": load_s,
+        "chunks_per_s": len(texts) / ingest_s if ingest_s else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_worker(args: argparse.Namespace) -> None:
+    """Benchmark one backend in this process and print its results as JSON"""
+    from src.modes.self_hosted.data.embeddings import create_embedding_backend
+
+    backend_name, model = parse_spec(args.worker)
+    kwargs = {"base_url": args.ollama_url} if backend_name == "ollama" else {}
+    backend = create_embedding_backend(backend_name, model, **kwargs)
+    result = measure(backend, load_corpus(args.pages), load_queries(args.queries), args)
+    print(json.dumps(result))
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Benchmark every backend, each in a fresh interpreter"""
+    results: Dict[str, Any] = {"k": args.k, "backends": {}}
+    for spec in args.backends:
+        command = [
+            sys.executable,
+            __file__,
+            "--worker",
+            spec,
+            "--queries",
+            args.queries,
+            "--pages",
+            args.pages,
+            "-k",
+            str(args.k),
+            "--batch-size",
+            str(args.batch_size),
+            "--ollama-url",
+            args.ollama_url,
+        ]
+        print(f"Benchmarking {spec}...")
+        process = subprocess.run(command, cwd=REPO_ROOT, env=dict(os.environ), capture_output=True, text=True)
+        if process.returncode != 0:
+            lines = process.stderr.strip().splitlines()
+            results["backends"][spec] = {"error": lines[-1] if lines else f"exit code {process.returncode}"}
+            continue
+        results["backends"][spec] = json.loads(process.stdout.strip().splitlines()[-1])
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", required=True, help="Labelled questions (JSON lines)")
+    parser.add_argument("--pages", required=True, help="Scraper dump to embed")
+    parser.add_argument("--backends", nargs="+", default=DEFAULT_BACKENDS, help="BACKEND:MODEL specs to compare")
+    parser.add_argument("-k", type=int, default=3, help="Chunks that reach the prompt")
+    parser.add_argument("--batch-size", type=int, default=32, help="Chunks per ingestion encode")
+    parser.add_argument("--ollama-url", default="http://localhost:11434", help="Ollama server for ollama backends")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    results = run(args)
+    print(f"\nk={results['k']}")
+    print(
+        f"{'backend':<45} {'dims':>5} {'load s':>7} {'chunks/s':>9} {'p50 ms':>7} {'p95 ms':>7} "
+        f"{'RSS MB':>7} {'recall':>7} {'MRR':>6}"
+    )
+    for spec, r in results["backends"].items():
+        if "error" in r:
+            print(f"{spec:<45} failed: {r['error']}")
+            continue
+        print(
+            f"{spec:<45} {r['dimensions']:>5} {r['load_s']:>7.1f} {r['chunks_per_s']:>9.1f} {r['p50_ms']:>7.1f} "
+            f"{r['p95_ms']:>7.1f} {r['peak_rss_mb']:>7.0f} {r['recall_at_k']:>7.3f} {r['mrr_at_k']:>6.3f}"
+        )
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Quantized vector index benchmark
+
+Builds a QuantizedIndex per variant from the same chunk embeddings and
+reports the memory/recall trade-off of each:
+- bytes per vector and resident code megabytes (projected for --project
+  vectors, e.g. a full 768-dimension crawl on a 16 GB box);
+- neighbour recall@k: overlap of the top k with exact float32 search, for
+  --sample stored chunks used as queries (each excluding itself);
+- labelled recall@k / MRR@k for questions (--queries, benchmark_retrieval.py
+  format) when the corpus comes from --pages;
+- build time and search latency p50/p95.
+
+Variants are KIND[:RESCORE], e.g. "int8:0" (no re-scoring) or "pq:100" (the
+best 100 PQ hits re-scored on the full vectors).
+
+Embeddings come from the persistent embedding cache, so after the first run
+this is an I/O job: with --pages the dump is chunked and embedded through the
+cache, otherwise every vector already in the cache of the configured
+embedding backend is used.
+
+Usage:
+    python scripts/benchmark_quantization.py
+    python scripts/benchmark_quantization.py --pages data/wiki_pages.json --queries data/retrieval_queries.jsonl
+    python scripts/benchmark_quantization.py --variants float16 int8 pq:0 pq:50 pq:200 --pq-subvectors 96
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "src"))
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from benchmark_retrieval import first_hit, load_queries, percentile, summarize  # noqa: E402
+
+DEFAULT_VARIANTS = ["float32", "float16", "int8:0", "int8", "pq:0", "pq"]
+
+
+def parse_variant(spec: str, default_rescore: int) -> Tuple[str, int]:
+    """KIND[:RESCORE] to (kind, rescore candidates)"""
+    kind, _, rescore = spec.partition(":")
+    return kind, int(rescore) if rescore else default_rescore
+
+
+def load_vectors(args: argparse.Namespace) -> Tuple[np.ndarray, List[Dict[str, Any]], Any]:
+    """Chunk embeddings (and metadata) from the corpus or the embedding cache"""
+    from src.core.config import get_config
+    from src.modes.self_hosted.data.embedding_cache import EmbeddingCache
+    from src.modes.self_hosted.data.embeddings import get_embedding_backend
+
+    config = get_config()
+    backend = get_embedding_backend()
+    cache = EmbeddingCache(args.cache_dir or config.embedding_cache_path, backend.model_id)
+    if args.pages is None:
+        if not len(cache):
+            raise SystemExit(f"Embedding cache {cache.path} is empty: ingest first or pass --pages")
+        vectors = np.array(np.memmap(cache.vectors_path, dtype=np.float32, mode="r").reshape(len(cache), -1))
+        return vectors, [{} for _ in range(len(vectors))], backend
+
+    from benchmark_embeddings import load_corpus
+
+    chunks = load_corpus(args.pages)
+    texts = [chunk["content"] for chunk in chunks]
+    started = time.perf_counter()
+    vectors = np.concatenate([cache.encode(texts[i : i + 256], backend.encode) for i in range(0, len(texts), 256)])
+    print(f"Embedded {len(texts)} chunks in {time.perf_counter() - started:.1f}s (cached: {len(cache)})")
+    return vectors, [chunk["metadata"] for chunk in chunks], backend
+
+
+def build_index(
+    kind: str, rescore: int, vectors: np.ndarray, metadatas: List[Dict[str, Any]], workdir: str, args: Any
+) -> Any:
+    """QuantizedIndex over the vectors in a new directory under workdir; row numbers are the ids"""
+    from src.modes.self_hosted.data.quantized_index import QuantizedIndex
+
+    index = QuantizedIndex(
+        tempfile.mkdtemp(dir=workdir),
+        "benchmark",
+        kind=kind,
+        pq_subvectors=args.pq_subvectors,
+        rescore_candidates=rescore,
+    )
+    for start in range(0, len(vectors), 4096):
+        rows = range(start, min(len(vectors), start + 4096))
+        index.upsert(
+            [str(row) for row in rows],
+            vectors[start : rows.stop],
+            [str(row) for row in rows],
+            [{**metadatas[row], "row": row} for row in rows],
+        )
+    return index
+
+
+def measure(
+    index: Any,
+    vectors: np.ndarray,
+    sample: np.ndarray,
+    exact: np.ndarray,
+    labelled: List[Dict[str, Any]],
+    k: int,
+) -> Dict[str, Any]:
+    """Neighbour recall, labelled recall and latency of one index"""
+    overlaps, latencies_ms = [], []
+    for query_row, truth in zip(sample, exact):
+        started = time.perf_counter()
+        docs = index.search(vectors[query_row], k + 1)
+        latencies_ms.append((time.perf_counter() - started) * 1000)
+        found = [doc["metadata"]["row"] for doc in docs if doc["metadata"]["row"] != query_row][:k]
+        overlaps.append(len(set(found) & set(truth.tolist())) / k)
+
+    result: Dict[str, Any] = {
+        "neighbour_recall_at_k": float(np.mean(overlaps)),
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+    }
+    if labelled:
+        ranks = [first_hit(index.search(entry["vector"], k), entry["relevant"], k) for entry in labelled]
+        labelled_summary = summarize(ranks, [])
+        result["recall_at_k"] = labelled_summary["recall_at_k"]
+        result["mrr_at_k"] = labelled_summary["mrr_at_k"]
+    return result
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Build and measure every variant"""
+    vectors, metadatas, backend = load_vectors(args)
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(vectors), size=min(args.sample, len(vectors)), replace=False)
+    # Exact neighbours of the sampled chunks, excluding themselves
+    similarities = vectors[sample] @ vectors.T
+    similarities[np.arange(len(sample)), sample] = -np.inf
+    exact = np.argsort(-similarities, axis=1)[:, : args.k]
+
+    labelled: List[Dict[str, Any]] = []
+    if args.queries and args.pages:
+        labelled = load_queries(args.queries)
+        for entry, vector in zip(labelled, backend.encode([entry["query"] for entry in labelled])):
+            entry["vector"] = vector
+
+    results: Dict[str, Any] = {"vectors": len(vectors), "dim": int(vectors.shape[1]), "k": args.k, "variants": {}}
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for spec in args.variants:
+            kind, rescore = parse_variant(spec, args.rescore)
+            started = time.perf_counter()
+            index = build_index(kind, rescore, vectors, metadatas, workdir, args)
+            build_s = time.perf_counter() - started
+            report = index.describe()
+            results["variants"][spec] = {
+                **measure(index, vectors, sample, exact, labelled, args.k),
+                "bytes_per_vector": report["bytes_per_vector"],
+                "code_mb": report["code_bytes"] / 1e6,
+                "projected_mb": report["bytes_per_vector"] * args.project / 1e6,
+                "rescore_candidates": rescore if kind != "float32" else 0,
+                "build_s": build_s,
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", help="Scraper dump to embed (through the cache) instead of the cached vectors")
+    parser.add_argument("--queries", help="Labelled questions (JSON lines), used with --pages")
+    parser.add_argument("--cache-dir", help="Embedding cache root (default EMBEDDING_CACHE_PATH)")
+    parser.add_argument("--variants", nargs="+", default=DEFAULT_VARIANTS, help="KIND[:RESCORE] variants")
+    parser.add_argument("--rescore", type=int, default=50, help="Default re-scored candidates")
+    parser.add_argument("--pq-subvectors", type=int, default=48, help="Bytes per vector for pq")
+    parser.add_argument("-k", type=int, default=6, help="Chunks retrieved per question")
+    parser.add_argument("--sample", type=int, default=200, help="Stored chunks used as neighbour queries")
+    parser.add_argument("--project", type=int, default=1_000_000, help="Vector count for the projected memory")
+    parser.add_argument("--workdir", help="Where to build the temporary indexes")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(f"\n{results['vectors']} vectors x {results['dim']} dims, k={results['k']}")
+    print(
+        f"{'variant':<12} {'B/vector':>9} {'codes MB':>9} {'MB @ ' + format(args.project, ','):>16} "
+        f"{'nbr recall':>10} {'recall':>7} {'MRR':>6} {'p50 ms':>7} {'p95 ms':>7} {'build s':>8}"
+    )
+    for spec, r in results["variants"].items():
+        labelled: Optional[str] = f"{r['recall_at_k']:>7.3f} {r['mrr_at_k']:>6.3f}" if "recall_at_k" in r else None
+        print(
+            f"{spec:<12} {r['bytes_per_vector']:>9} {r['code_mb']:>9.1f} {r['projected_mb']:>16.0f} "
+            f"{r['neighbour_recall_at_k']:>10.3f} {labelled or format('-', '>14')} "
+            f"{r['p50_ms']:>7.1f} {r['p95_ms']:>7.1f} {r['build_s']:>8.1f}"
+        )
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
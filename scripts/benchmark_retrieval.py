@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Retrieval quality and latency benchmark
+
+Runs a set of labelled questions against the knowledge base and reports, for
+plain vector search, (with --rerank) vector search plus cross-encoder
+reranking and (with --page-candidates) two-stage page -> chunk search:
+- hit rate / recall@k: share of questions with a relevant chunk in the top k;
+- MRR@k: mean reciprocal rank of the first relevant chunk;
+- latency p50/p95 of the search and the milliseconds reranking adds;
+- pages per answer: distinct pages among the top k chunks (lower = more coherent context).
+
+Questions are JSON lines naming the pages (source URL or title, as stored in
+the chunk metadata) that answer them:
+
+    {"query": "How do I craft a bed?", "relevant": ["Bed"]}
+    {"query": "Where do I find diamonds?", "relevant": ["https://minecraft.wiki/w/Diamond"]}
+
+By default the configured vector DB (CHROMA_DB_PATH / CHROMA_DB_HOST) is used;
+--pages builds a temporary one from a scraper dump (WikiScraper.save_to_json).
+
+Usage:
+    python scripts/benchmark_retrieval.py --queries data/retrieval_queries.jsonl
+    python scripts/benchmark_retrieval.py --queries data/retrieval_queries.jsonl --pages data/wiki_pages.json
+    python scripts/benchmark_retrieval.py --queries data/retrieval_queries.jsonl --rerank --budget-ms 250
+    python scripts/benchmark_retrieval.py --queries data/retrieval_queries.jsonl --pages data/wiki_pages.json \
+        --page-candidates 8
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+
+def load_queries(path: str) -> List[Dict[str, Any]]:
+    """Read labelled questions (JSON lines with query and relevant)"""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                queries.append({"query": entry["query"], "relevant": {r.lower() for r in entry["relevant"]}})
+    return queries
+
+
+def is_relevant(doc: Dict[str, Any], relevant: set) -> bool:
+    """Whether a chunk belongs to one of the pages labelled relevant"""
+    metadata = doc.get("metadata") or {}
+    return any(str(metadata.get(key, "")).lower() in relevant for key in ("source", "title"))
+
+
+def first_hit(docs: List[Dict[str, Any]], relevant: set, k: int) -> Optional[int]:
+    """1-based rank of the first relevant chunk within the top k, None if there is none"""
+    for rank, doc in enumerate(docs[:k], start=1):
+        if is_relevant(doc, relevant):
+            return rank
+    return None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile (0 for no values)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def summarize(
+    ranks: List[Optional[int]], latencies_ms: List[float], pages: Optional[List[int]] = None
+) -> Dict[str, float]:
+    """Quality and latency of one retrieval variant"""
+    summary = {
+        "recall_at_k": sum(rank is not None for rank in ranks) / len(ranks),
+        "mrr_at_k": statistics.fmean(1 / rank if rank else 0.0 for rank in ranks),
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+    }
+    if pages:
+        summary["pages_per_answer"] = statistics.fmean(pages)
+    return summary
+
+
+def distinct_pages(docs: List[Dict[str, Any]], k: int) -> int:
+    """Number of different pages the top k chunks come from"""
+    return len({(doc.get("metadata") or {}).get("source") for doc in docs[:k]})
+
+
+def build_vector_db(pages_path: Optional[str], workdir: str, page_candidates: int = 0) -> Any:
+    """Open the configured vector DB, or build a temporary one from a scraper dump"""
+    from src.core.config import get_config
+    from src.modes.self_hosted.data.embeddings import get_embedding_backend
+    from src.modes.self_hosted.data.vector_db import MinecraftVectorDB
+
+    config = get_config()
+    # Page-level search needs the quantized index; float32 keeps results comparable with ChromaDB
+    quantization = config.vector_quantization or ("float32" if page_candidates else "")
+    options = {
+        "embedder": get_embedding_backend(),
+        "quantization": quantization,
+        "pq_subvectors": config.vector_pq_subvectors,
+        "rescore_candidates": config.vector_rescore_candidates,
+        "page_candidates": page_candidates,
+        "shards": config.vector_shards,
+    }
+    if pages_path is None:
+        return MinecraftVectorDB(
+            config.chroma_db_path,
+            chroma_host=config.chroma_db_host or None,
+            snapshots=config.vector_snapshots,
+            snapshot_poll_seconds=0,
+            **options,
+        )
+
+    from src.modes.self_hosted.scraping.wiki_scraper import ContentProcessor
+
+    with open(pages_path, encoding="utf-8") as f:
+        chunks = ContentProcessor().process_scraped_pages(json.load(f))
+    # Chunk embeddings come from the persistent cache after the first run
+    db = MinecraftVectorDB(
+        persist_directory=workdir, embedding_cache_dir=config.embedding_cache_path or None, **options
+    )
+    started = time.perf_counter()
+    for start in range(0, len(chunks), 256):
+        batch = chunks[start : start + 256]
+        db.add_texts([chunk["content"] for chunk in batch], metadatas=[chunk["metadata"] for chunk in batch])
+    print(f"Indexed {len(chunks)} chunks in {time.perf_counter() - started:.1f}s")
+    return db
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run every question through each retrieval variant"""
+    queries = load_queries(args.queries)
+    with tempfile.TemporaryDirectory() as workdir:
+        db = build_vector_db(args.pages, workdir, args.page_candidates)
+
+        reranker = None
+        if args.rerank:
+            from src.modes.self_hosted.rag.rerank import CrossEncoderReranker
+
+            reranker = CrossEncoderReranker(model_name=args.rerank_model, budget_ms=args.budget_ms)
+            reranker.warm_up()
+
+        fetch = max(args.k, args.candidates) if reranker else args.k
+        vector_ranks, vector_ms, vector_pages = [], [], []
+        rerank_ranks, rerank_ms, fallbacks = [], [], 0
+        page_ranks, page_ms, page_pages = [], [], []
+        for entry in queries:
+            started = time.perf_counter()
+            docs = db.search(entry["query"], n_results=fetch, page_candidates=0)
+            vector_ms.append((time.perf_counter() - started) * 1000)
+            vector_ranks.append(first_hit(docs, entry["relevant"], args.k))
+            vector_pages.append(distinct_pages(docs, args.k))
+            if args.page_candidates:
+                started = time.perf_counter()
+                paged = db.search(entry["query"], n_results=args.k, page_candidates=args.page_candidates)
+                page_ms.append((time.perf_counter() - started) * 1000)
+                page_ranks.append(first_hit(paged, entry["relevant"], args.k))
+                page_pages.append(distinct_pages(paged, args.k))
+            if reranker is not None:
+                started = time.perf_counter()
+                reranked, report = reranker.rerank(entry["query"], docs, args.k)
+                rerank_ms.append((time.perf_counter() - started) * 1000)
+                rerank_ranks.append(first_hit(reranked, entry["relevant"], args.k))
+                fallbacks += not report["reranked"]
+
+    results: Dict[str, Any] = {
+        "queries": len(queries),
+        "k": args.k,
+        "vector": summarize(vector_ranks, vector_ms, vector_pages),
+    }
+    if args.page_candidates:
+        results["pages"] = {**summarize(page_ranks, page_ms, page_pages), "page_candidates": args.page_candidates}
+    if reranker is not None:
+        results["rerank"] = {
+            **summarize(rerank_ranks, rerank_ms),
+            "candidates": fetch,
+            "budget_ms": args.budget_ms,
+            "fallbacks": fallbacks,
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", required=True, help="Labelled questions (JSON lines)")
+    parser.add_argument("--pages", help="Scraper dump to index into a temporary DB instead of the configured one")
+    parser.add_argument("-k", type=int, default=3, help="Chunks that reach the prompt")
+    parser.add_argument("--rerank", action="store_true", help="Also measure cross-encoder reranking")
+    parser.add_argument("--rerank-model", default="cross-encoder/ms-marco-MiniLM-L-6-v2", help="Cross-encoder")
+    parser.add_argument("--candidates", type=int, default=20, help="Vector hits rescored by the reranker")
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="Reranking latency budget")
+    parser.add_argument(
+        "--page-candidates", type=int, default=0, help="Also measure two-stage search within this many pages"
+    )
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(f"\n{results['queries']} questions, k={results['k']}")
+    print(f"{'variant':<10} {'recall@k':>9} {'MRR@k':>7} {'p50 ms':>8} {'p95 ms':>8} {'pages/answer':>13}")
+    for variant in ("vector", "rerank", "pages"):
+        if variant in results:
+            r = results[variant]
+            pages = f"{r['pages_per_answer']:>13.2f}" if "pages_per_answer" in r else f"{'-':>13}"
+            print(
+                f"{variant:<10} {r['recall_at_k']:>9.3f} {r['mrr_at_k']:>7.3f} {r['p50_ms']:>8.1f} "
+                f"{r['p95_ms']:>8.1f} {pages}"
+            )
+    if "rerank" in results:
+        print(
+            f"Reranking adds {results['rerank']['p50_ms']:.1f}ms p50 / {results['rerank']['p95_ms']:.1f}ms p95, "
+            f"{results['rerank']['fallbacks']} fallbacks to vector order"
+        )
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
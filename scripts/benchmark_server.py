@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Server throughput benchmark
+
+Starts the production server launcher (src/shared/server.py) with an
+increasing number of preforked workers and measures requests per second
+against a CPU-bound endpoint, showing how throughput scales with cores.
+
+The endpoint burns a fixed amount of CPU per request (stand-in for JSON
+parsing, safety filtering and prompt assembly) so a single worker saturates
+one core.
+
+Usage:
+    python scripts/benchmark_server.py                   # 1, 2, 4 ... cpu_count workers
+    python scripts/benchmark_server.py --workers 1 2 4 --duration 10
+"""
+
+import argparse
+import hashlib
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "src"))
+sys.path.insert(0, str(SCRIPT_DIR))
+
+
+def build_app(work_iterations: int):
+    """FastAPI app with a CPU-bound endpoint"""
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.get("/work")
+    def work() -> dict:
+        digest = hashlib.pbkdf2_hmac("sha256", b"creeper", b"salt", work_iterations)
+        return {"digest": digest.hex()[:8]}
+
+    @app.get("/ping")
+    def ping() -> dict:
+        return {"ok": True}
+
+    return app
+
+
+app = build_app(int(os.getenv("BENCH_WORK_ITERATIONS", "2000")))
+
+
+def run_server(workers: int, port: int) -> None:
+    """Serve this module's app with the production launcher"""
+    from src.shared.server import serve
+
+    serve("benchmark_server:app", host="127.0.0.1", port=port, workers=workers, log_level="warning")
+
+
+def _client(url: str, duration: float, threads: int, results: "multiprocessing.Queue") -> None:
+    """One load-generating process with several keep-alive threads"""
+    count = [0] * threads
+    stop_at = time.time() + duration
+
+    def loop(slot: int) -> None:
+        session = requests.Session()
+        while time.time() < stop_at:
+            try:
+                if session.get(url, timeout=10).status_code == 200:
+                    count[slot] += 1
+            except requests.RequestException:
+                pass
+
+    pool = [threading.Thread(target=loop, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(sum(count))
+
+
+def wait_until_ready(port: int, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/ping", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+
+def measure(workers: int, port: int, duration: float, clients: int, threads: int) -> float:
+    """Requests per second served by `workers` worker processes"""
+    server = subprocess.Popen(
+        [sys.executable, __file__, "--serve", str(workers), "--port", str(port)],
+        cwd=REPO_ROOT,
+    )
+    try:
+        wait_until_ready(port)
+        results: multiprocessing.Queue = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=_client, args=(f"http://127.0.0.1:{port}/work", duration, threads, results))
+            for _ in range(clients)
+        ]
+        for proc in procs:
+            proc.start()
+        total = sum(results.get() for _ in procs)
+        for proc in procs:
+            proc.join()
+        return total / duration
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="*", help="Worker counts to compare")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of load per run")
+    parser.add_argument("--clients", type=int, default=0, help="Client processes (default: cpu count)")
+    parser.add_argument("--threads", type=int, default=8, help="Threads per client process")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        run_server(args.serve, args.port)
+        return
+
+    cpus = os.cpu_count() or 1
+    counts = args.workers or sorted({1, *[n for n in (2, 4, 8, 16) if n <= cpus], cpus})
+    clients = args.clients or max(2, cpus)
+
+    print(f"CPU cores: {cpus}, client processes: {clients} x {args.threads} threads, {args.duration:.0f}s per run")
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in counts:
+        rate = measure(workers, args.port, args.duration, clients, args.threads)
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>10.1f} {rate / baseline:>7.2f}x")
+        time.sleep(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Sharded vector index benchmark
+
+Builds a ShardedIndex per shard count from the same vectors and reports how
+search throughput scales with the shards scored in parallel:
+- QPS and latency p50/p95 for one client issuing questions back to back
+  (every question fans out to all shards);
+- QPS with --clients concurrent clients;
+- speedup over one shard and efficiency (speedup / shards): near 1.0 means
+  linear scaling, until the shards outnumber the cores;
+- overlap of the top k with the one-shard results (1.0: merging changes nothing);
+- build time, as shards are also ingested in parallel.
+
+Vectors are synthetic clustered unit vectors (--random, the default), or the
+chunk embeddings of --pages / the embedding cache as in
+benchmark_quantization.py.
+
+Usage:
+    python scripts/benchmark_shards.py
+    python scripts/benchmark_shards.py --random 1000000 --dim 768 --shards 1 2 4 8 16 32 --kind int8
+    python scripts/benchmark_shards.py --random 0 --pages data/wiki_pages.json --clients 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "src"))
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from benchmark_retrieval import percentile  # noqa: E402
+
+
+def random_vectors(rows: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors around a few hundred centres, like embeddings of related chunks"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(max(1, rows // 500), dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, len(centres), rows)] + 0.3 * rng.normal(size=(rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_index(shards: int, vectors: np.ndarray, workdir: str, args: argparse.Namespace) -> Any:
+    """ShardedIndex over the vectors; every 8 consecutive rows form one page"""
+    from src.modes.self_hosted.data.sharded_index import ShardedIndex
+
+    index = ShardedIndex(
+        tempfile.mkdtemp(dir=workdir),
+        "benchmark",
+        shards=shards,
+        kind=args.kind,
+        pq_subvectors=args.pq_subvectors,
+        rescore_candidates=args.rescore,
+    )
+    for start in range(0, len(vectors), 8192):
+        rows = range(start, min(len(vectors), start + 8192))
+        index.upsert(
+            [str(row) for row in rows],
+            vectors[start : rows.stop],
+            [""] * len(rows),
+            [{"source": f"page-{row // 8}", "row": row} for row in rows],
+        )
+    return index
+
+
+def measure(index: Any, queries: np.ndarray, k: int, clients: int) -> Dict[str, Any]:
+    """Sequential and concurrent throughput of one index, and its top k rows per query"""
+    index.search(queries[0], k)
+    found, latencies_ms = [], []
+    started = time.perf_counter()
+    for query in queries:
+        begin = time.perf_counter()
+        found.append([doc["metadata"]["row"] for doc in index.search(query, k)])
+        latencies_ms.append((time.perf_counter() - begin) * 1000)
+    sequential_s = time.perf_counter() - started
+
+    def client(offset: int) -> None:
+        for query in queries[offset::clients]:
+            index.search(query, k)
+
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    concurrent_s = time.perf_counter() - started
+    return {
+        "qps": len(queries) / sequential_s,
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "concurrent_qps": len(queries) / concurrent_s,
+        "found": found,
+    }
+
+
+def load(args: argparse.Namespace) -> np.ndarray:
+    if args.random:
+        return random_vectors(args.random, args.dim)
+    from benchmark_quantization import load_vectors
+
+    return load_vectors(args)[0]
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Build and measure every shard count"""
+    vectors = load(args)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)]
+    queries = queries + 0.1 * rng.normal(size=queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    results: Dict[str, Any] = {
+        "vectors": len(vectors),
+        "dim": int(vectors.shape[1]),
+        "kind": args.kind,
+        "cpus": os.cpu_count(),
+        "k": args.k,
+        "shards": {},
+    }
+    baseline: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for shards in args.shards:
+            started = time.perf_counter()
+            index = build_index(shards, vectors, workdir, args)
+            build_s = time.perf_counter() - started
+            report = measure(index, queries, args.k, args.clients)
+            index.close()
+            found: List[List[int]] = report.pop("found")
+            baseline = baseline or {**report, "found": found}
+            overlap = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, baseline["found"])])
+            speedup = report["qps"] / baseline["qps"]
+            results["shards"][shards] = {
+                **report,
+                "speedup": speedup,
+                "efficiency": speedup * args.shards[0] / shards,
+                "concurrent_speedup": report["concurrent_qps"] / baseline["concurrent_qps"],
+                "overlap_with_first": float(overlap),
+                "build_s": build_s,
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--random", type=int, default=200_000, help="Synthetic vectors (0: use --pages or the cache)")
+    parser.add_argument("--dim", type=int, default=384, help="Dimensions of the synthetic vectors")
+    parser.add_argument("--pages", help="Scraper dump to embed (through the cache), with --random 0")
+    parser.add_argument("--cache-dir", help="Embedding cache root (default EMBEDDING_CACHE_PATH), with --random 0")
+    parser.add_argument(
+        "--shards", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="Shard counts (the first is the baseline)"
+    )
+    parser.add_argument("--kind", default="float32", help="Codec: float32, float16, int8 or pq")
+    parser.add_argument("--rescore", type=int, default=50, help="Re-scored candidates per shard")
+    parser.add_argument("--pq-subvectors", type=int, default=48, help="Bytes per vector for pq")
+    parser.add_argument("-k", type=int, default=6, help="Chunks retrieved per question")
+    parser.add_argument("--queries", type=int, default=300, help="Questions per measurement")
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent clients for concurrent QPS")
+    parser.add_argument("--workdir", help="Where to build the temporary indexes")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(f"\n{results['vectors']} vectors x {results['dim']} dims ({results['kind']}), {results['cpus']} CPUs")
+    print(
+        f"{'shards':>6} {'QPS':>8} {'speedup':>8} {'effic.':>7} {'p50 ms':>7} {'p95 ms':>7} "
+        f"{'QPS x' + str(args.clients):>8} {'speedup':>8} {'overlap':>8} {'build s':>8}"
+    )
+    for shards, r in results["shards"].items():
+        print(
+            f"{shards:>6} {r['qps']:>8.1f} {r['speedup']:>8.2f} {r['efficiency']:>7.2f} {r['p50_ms']:>7.1f} "
+            f"{r['p95_ms']:>7.1f} {r['concurrent_qps']:>8.1f} {r['concurrent_speedup']:>8.2f} "
+            f"{r['overlap_with_first']:>8.3f} {r['build_s']:>8.1f}"
+        )
+    if max(args.shards) > (results["cpus"] or 1):
+        print(f"Note: shard counts above {results['cpus']} CPUs can't scale further on this host")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Startup and import-time benchmark
+
+Measures, each in a fresh interpreter:
+- import time of the application modules and which heavy optional
+  dependencies (chromadb, sentence-transformers, watchdog, profanity-check)
+  they pull in eagerly;
+- time from process start until /health answers and until /ready reports a
+  final state, with x.ai pointed at an endpoint that never responds so a
+  blocking connection test during startup would show up immediately.
+
+Results can be saved as a baseline and later runs compared against it, failing
+with exit code 1 on regressions (for CI):
+
+Usage:
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --save data/startup_baseline.json
+    python scripts/benchmark_startup.py --baseline data/startup_baseline.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import requests
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parent
+
+MODULES = [
+    "src.shared.safety_filter",
+    "src.modes.external_ai.xai.pipeline",
+    "src.modes.external_ai.bot.api",
+    "src.modes.self_hosted.main",
+]
+APPS = {
+    "external_ai": "src.modes.external_ai.bot.api:app",
+    "self_hosted": "src.modes.self_hosted.main:app",
+}
+HEAVY_MODULES = ["chromadb", "sentence_transformers", "torch", "watchdog", "profanity_check", "sklearn"]
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def _env(**extra: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(REPO_ROOT), str(REPO_ROOT / "src"), env.get("PYTHONPATH", "")])
+    env.update(extra)
+    return env
+
+
+def measure_import(module: str, repeat: int) -> Dict[str, Any]:
+    """Best-of-N import time of a module in a fresh interpreter"""
+    runs = []
+    heavy: List[str] = []
+    for _ in range(repeat):
+        process = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=REPO_ROOT,
+            env=_env(),
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode != 0:
+            return {"seconds": None, "heavy": [], "error": process.stderr.strip().splitlines()[-1]}
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        runs.append(result["seconds"])
+        heavy = result["heavy"]
+    return {"seconds": min(runs), "heavy": heavy}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _poll(url: str, started: float, timeout: float, final: Any) -> Optional[float]:
+    """Seconds since `started` until `final(response)` is true, None on timeout"""
+    while time.perf_counter() < started + timeout:
+        try:
+            response = requests.get(url, timeout=1)
+            if final(response):
+                return time.perf_counter() - started
+        except requests.RequestException:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def measure_startup(app: str, timeout: float) -> Dict[str, Any]:
+    """Seconds from process start until /health answers and /ready settles"""
+    # Accepts connections but never answers: a blocking startup check would hang on it
+    blackhole = socket.socket()
+    blackhole.bind(("127.0.0.1", 0))
+    blackhole.listen(64)
+    port = _free_port()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(
+            XAI_API_KEY="benchmark",
+            XAI_BASE_URL=f"http://127.0.0.1:{blackhole.getsockname()[1]}",
+            OLLAMA_BASE_URL=f"http://127.0.0.1:{blackhole.getsockname()[1]}",
+            JOB_QUEUE_PATH=str(Path(tmp) / "jobs.db"),
+            LOG_FILE=str(Path(tmp) / "bot.log"),
+        )
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+            cwd=REPO_ROOT,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            base = f"http://127.0.0.1:{port}"
+            health = _poll(f"{base}/health", started, timeout, lambda r: r.status_code == 200)
+            ready = _poll(f"{base}/ready", started, timeout, lambda r: r.json().get("status") != "starting")
+            state = requests.get(f"{base}/ready", timeout=1).json() if ready is not None else {}
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+            blackhole.close()
+
+    return {
+        "health_seconds": health,
+        "ready_seconds": ready,
+        "ready_status": state.get("status", "timeout"),
+        "components": {name: c["state"] for name, c in state.get("components", {}).items()},
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Metrics that got slower than baseline * (1 + tolerance)"""
+    regressions = []
+    for section in ("imports", "startup"):
+        for name, current in results[section].items():
+            previous = baseline.get(section, {}).get(name)
+            if not previous:
+                continue
+            for key in ("seconds", "health_seconds", "ready_seconds"):
+                if current.get(key) is None or previous.get(key) is None:
+                    continue
+                if current[key] > previous[key] * (1 + tolerance):
+                    regressions.append(f"{section}.{name}.{key}: {previous[key]:.3f}s -> {current[key]:.3f}s")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Import runs per module (best is reported)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for each server")
+    parser.add_argument("--max-health-seconds", type=float, default=5.0, help="Fail if /health takes longer")
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {"imports": {}, "startup": {}}
+
+    print(f"{'module':<40} {'import':>9}  eager heavy imports")
+    for module in MODULES:
+        result = results["imports"][module] = measure_import(module, args.repeat)
+        if result["seconds"] is None:
+            print(f"{module:<40} {'failed':>9}  {result['error']}")
+        else:
+            print(f"{module:<40} {result['seconds']:>8.3f}s  {', '.join(result['heavy']) or '-'}")
+
+    print(f"\n{'app':<14} {'/health':>9} {'/ready':>9}  status")
+    for name, app in APPS.items():
+        result = results["startup"][name] = measure_startup(app, args.timeout)
+        health = f"{result['health_seconds']:.3f}s" if result["health_seconds"] is not None else "timeout"
+        ready = f"{result['ready_seconds']:.3f}s" if result["ready_seconds"] is not None else "timeout"
+        print(f"{name:<14} {health:>9} {ready:>9}  {result['ready_status']} {result['components']}")
+
+    failures = [
+        f"startup.{name} /health took longer than {args.max_health_seconds}s"
+        for name, result in results["startup"].items()
+        if result["health_seconds"] is None or result["health_seconds"] > args.max_health_seconds
+    ]
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures += compare(results, json.load(f), args.tolerance)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if failures:
+        print("\nRegressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
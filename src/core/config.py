@@ -91,13 +91,56 @@ class Config(BaseSettings):
 
     # Self-hosted configuration
     ollama_base_url: str = Field(default="http://localhost:11434", env="OLLAMA_BASE_URL")
+    ollama_base_urls: str = Field(default="", env="OLLAMA_BASE_URLS")  # Comma-separated; balances across them
+    ollama_sticky_routing: bool = Field(default=True, env="OLLAMA_STICKY_ROUTING")  # Same room -> same endpoint
+    ollama_health_check_interval: float = Field(default=10.0, env="OLLAMA_HEALTH_CHECK_INTERVAL")
     ollama_model: str = Field(default="llama2", env="OLLAMA_MODEL")
+    ollama_fast_model: str = Field(default="", env="OLLAMA_FAST_MODEL")
+    ollama_strong_model: str = Field(default="", env="OLLAMA_STRONG_MODEL")
+    ollama_keep_alive: str = Field(default="5m", env="OLLAMA_KEEP_ALIVE")  # Outside scheduled windows
+    ollama_keep_alive_schedule: str = Field(default="", env="OLLAMA_KEEP_ALIVE_SCHEDULE")
+    ollama_preload: bool = Field(default=True, env="OLLAMA_PRELOAD")  # Load models at startup
+    ollama_profile_path: str = Field(default="data/ollama_profile.json", env="OLLAMA_PROFILE_PATH")  # Tuned options
     chroma_db_path: str = Field(default="./data/chroma_db", env="CHROMA_DB_PATH")
     chroma_db_host: str = Field(default="", env="CHROMA_DB_HOST")
     chroma_db_port: int = Field(default=8000, env="CHROMA_DB_PORT")
     wiki_base_url: str = Field(default="", env="WIKI_BASE_URL")
     scraping_interval_hours: int = Field(default=24, env="SCRAPING_INTERVAL_HOURS")
 
+    # Embedding backend: sentence-transformers, ollama (/api/embed) or onnx (int8 ONNX Runtime)
+    embedding_backend: str = Field(default="sentence-transformers", env="EMBEDDING_BACKEND")
+    embedding_model: str = Field(default="all-MiniLM-L6-v2", env="EMBEDDING_MODEL")  # e.g. nomic-embed-text for ollama
+    embedding_onnx_path: str = Field(default="./data/embedding_onnx", env="EMBEDDING_ONNX_PATH")  # .onnx + tokenizer
+    embedding_cache_path: str = Field(default="./data/embedding_cache", env="EMBEDDING_CACHE_PATH")  # Empty = off
+
+    # Quantized vector index instead of ChromaDB (memory vs recall trade-off)
+    vector_quantization: str = Field(default="", env="VECTOR_QUANTIZATION")  # float32/float16/int8/pq; empty = Chroma
+    vector_pq_subvectors: int = Field(default=48, env="VECTOR_PQ_SUBVECTORS")  # Bytes per vector with pq
+    vector_rescore_candidates: int = Field(default=50, env="VECTOR_RESCORE_CANDIDATES")  # Re-scored on full vectors
+    vector_page_candidates: int = Field(default=0, env="VECTOR_PAGE_CANDIDATES")  # Pages searched first; 0 = off
+    vector_shards: int = Field(default=1, env="VECTOR_SHARDS")  # Quantized index shards searched in parallel
+    vector_snapshots: bool = Field(default=False, env="VECTOR_SNAPSHOTS")  # Serve published read-only snapshots
+    vector_snapshot_poll_seconds: float = Field(default=30.0, env="VECTOR_SNAPSHOT_POLL_SECONDS")  # New version check
+
+    # Query embedding micro-batching (concurrent questions share one encode)
+    embedding_batch_size: int = Field(default=32, env="EMBEDDING_BATCH_SIZE")  # Texts per encode
+    embedding_batch_wait_ms: float = Field(default=5.0, env="EMBEDDING_BATCH_WAIT_MS")  # Wait for more requests
+
+    # RAG prompt assembly
+    rag_top_k: int = Field(default=6, env="RAG_TOP_K")  # Chunks retrieved per question
+    rag_context_tokens: int = Field(default=1200, env="RAG_CONTEXT_TOKENS")  # Max context tokens per prompt
+    rag_answer_tokens: int = Field(default=512, env="RAG_ANSWER_TOKENS")  # Kept free in num_ctx for the answer
+    rag_tokenizer: str = Field(default="", env="RAG_TOKENIZER")  # Hugging Face tokenizer id; empty = estimate
+    rag_compress_tokens: int = Field(default=600, env="RAG_COMPRESS_TOKENS")  # Query-relevant sentences kept; 0 = off
+    rag_rerank: bool = Field(default=False, env="RAG_RERANK")  # Cross-encoder reranking (sentence-transformers)
+    rag_rerank_model: str = Field(default="cross-encoder/ms-marco-MiniLM-L-6-v2", env="RAG_RERANK_MODEL")
+    rag_rerank_candidates: int = Field(default=20, env="RAG_RERANK_CANDIDATES")  # Vector hits rescored
+    rag_rerank_budget_ms: float = Field(default=250.0, env="RAG_RERANK_BUDGET_MS")  # Then keep vector order
+
+    # Model routing configuration
+    routing_max_fast_words: int = Field(default=18, env="ROUTING_MAX_FAST_WORDS")
+    routing_min_confidence: float = Field(default=0.35, env="ROUTING_MIN_CONFIDENCE")
+
     # Logging configuration
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     log_file: str = Field(default="logs/nextcraft.log", env="LOG_FILE")
@@ -111,6 +154,15 @@ class Config(BaseSettings):
     webhook_host: str = Field(default="127.0.0.1", env="WEBHOOK_HOST")  # Default to localhost for security
     shared_secret: Optional[str] = Field(default=None, env="SHARED_SECRET")
 
+    # Server process configuration
+    server_port: int = Field(default=8080, env="SERVER_PORT")  # Port bound inside the container
+    server_workers: int = Field(default=1, env="SERVER_WORKERS")  # 0 = one worker per CPU core
+    server_reload: bool = Field(default=False, env="SERVER_RELOAD")  # Development auto-reload
+    fast_start: bool = Field(default=True, env="FAST_START")  # Serve /health at once, warm up in the background
+
+    # Request handling configuration
+    request_deadline_seconds: float = Field(default=45.0, env="REQUEST_DEADLINE_SECONDS")
+
     class Config:
         extra = "ignore"
 
@@ -0,0 +1,183 @@
+"""
+Adaptive acknowledgement of incoming questions
+
+Instead of always posting a "Thinking..." message, posting the answer and then
+deleting the thinking message (three Talk API calls per answer), the bot waits
+a short grace period first. Answers ready within the grace period are simply
+posted. Slower answers get an acknowledgement that is cheap to resolve: a
+thinking message later edited into the answer, or a reaction on the user's
+message. The reaction stays next to the posted answer (removing it would
+cost a third call); it is only removed when no answer comes (the question is
+cancelled or answering fails).
+"""
+
+import asyncio
+import logging
+from typing import Callable
+
+from src.shared.metrics import get_metrics
+
+from ..core.config import settings
+from .nextcloud_api import THINKING_MESSAGE
+from .outbound import OutboundSender, get_outbound_sender
+
+logger = logging.getLogger(__name__)
+
+# Acknowledgement modes
+ACK_EDIT = "edit"  # thinking message edited into the answer (1-2 calls)
+ACK_REACTION = "reaction"  # reaction on the question, answer posted (1-2 calls)
+ACK_POST = "post"  # thinking message, answer posted, thinking message deleted (3 calls)
+ACK_MODES = (ACK_EDIT, ACK_REACTION, ACK_POST)
+
+THINKING_REACTION = "🤔"
+
+
+class Acknowledgement:
+    """Acknowledges one question and delivers its answer with as few Talk calls as possible"""
+
+    def __init__(
+        self,
+        token: str,
+        reply_to: str | None = None,
+        mode: str | None = None,
+        grace: float | None = None,
+        sender: OutboundSender | None = None,
+        thinking_message_id: int | None = None,
+        reacted: bool = False,
+    ):
+        """
+        Args:
+            token: Conversation token
+            reply_to: ID of the user's message (needed for reactions)
+            mode: One of ACK_MODES (defaults to ACK_MODE)
+            grace: Seconds to wait for the answer before acknowledging (defaults to ACK_GRACE_SECONDS)
+            sender: Outbound queue used for all Talk calls (defaults to the global one)
+            thinking_message_id: Thinking message posted by an earlier attempt at this answer
+            reacted: Whether an earlier attempt already reacted to the question
+        """
+        self.token = token
+        self.reply_to = reply_to
+        self.mode = mode if mode in ACK_MODES else settings.ack_mode
+        self.grace = settings.ack_grace_seconds if grace is None else grace
+        self.thinking_message_id = thinking_message_id
+        self.reacted = reacted
+        # Called once an acknowledgement was sent (e.g. to persist it for a retry)
+        self.on_acknowledged: Callable[[], None] | None = None
+        # Withdrawal queued behind an answer that is still waiting for the rate limit
+        self.cleanup: asyncio.Future | None = None
+        self.api_calls = 0
+        self.sender = sender or get_outbound_sender()
+        self.metrics = get_metrics()
+
+    async def wait_or_acknowledge(self, work: asyncio.Future, timeout: float | None = None) -> None:
+        """
+        Wait up to the grace period for the answer, acknowledging if it isn't ready
+
+        Args:
+            work: Task producing the answer
+            timeout: Optional budget for sending the acknowledgement
+        """
+        if self.acknowledged:
+            return
+        if self.grace > 0:
+            try:
+                await asyncio.wait_for(asyncio.shield(work), timeout=self.grace)
+            except asyncio.TimeoutError:
+                pass
+            except Exception:
+                # The answer is "ready" (as an error); the caller deals with it
+                pass
+            if work.done():
+                self.metrics.increment("ack.skipped")
+                return
+        await self.acknowledge(timeout)
+
+    @property
+    def acknowledged(self) -> bool:
+        return self.thinking_message_id is not None or self.reacted
+
+    async def acknowledge(self, timeout: float | None = None) -> None:
+        """Tell the user an answer is on its way
+
+        Acknowledgements still queued when the timeout passes are dropped; a
+        late answer is better than a late "Thinking...".
+        """
+        try:
+            if self.mode == ACK_REACTION and self.reply_to:
+                self.api_calls += 1
+                self.reacted = await self.sender.react(
+                    self.token, self.reply_to, THINKING_REACTION, timeout, droppable=True
+                )
+                if self.reacted:
+                    self.metrics.increment("ack.reaction")
+                    self._acknowledged()
+                    return
+                logger.warning("Reaction failed, falling back to a thinking message")
+
+            self.api_calls += 1
+            self.thinking_message_id = await self.sender.post(self.token, THINKING_MESSAGE, timeout, droppable=True)
+            self.metrics.increment("ack.thinking_message")
+            if self.thinking_message_id is not None:
+                self._acknowledged()
+        except asyncio.TimeoutError:
+            logger.warning("Acknowledgement not sent in time, skipping it")
+
+    def _acknowledged(self) -> None:
+        if self.on_acknowledged is not None:
+            try:
+                self.on_acknowledged()
+            except Exception as e:
+                logger.error(f"Failed to record acknowledgement: {e}")
+
+    async def deliver(self, answer: str, timeout: float | None = None) -> bool:
+        """
+        Deliver the answer, resolving the acknowledgement
+
+        Args:
+            answer: Final answer text
+            timeout: Optional overall time budget in seconds
+
+        Returns:
+            bool: True if the answer reached the conversation
+
+        Raises:
+            asyncio.TimeoutError: If the answer is still queued when the timeout passes
+                (it stays queued and is delivered once the room's rate limit allows)
+        """
+        try:
+            if self.thinking_message_id is not None and self.mode != ACK_POST:
+                self.api_calls += 1
+                if await self.sender.edit(self.token, self.thinking_message_id, answer, timeout):
+                    self.thinking_message_id = None
+                    return True
+                logger.warning("Editing the thinking message failed, posting the answer instead")
+
+            self.api_calls += 1
+            try:
+                delivered = await self.sender.post(self.token, answer, timeout) is not None
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                # The answer stays queued; queue the clean-up behind it instead of leaving the acknowledgement
+                self.cleanup = asyncio.ensure_future(self._delete_thinking_message())
+                raise
+            await self._delete_thinking_message()
+            return delivered
+        finally:
+            # calls / answers gives the average outbound cost per answer
+            self.metrics.increment("ack.answers")
+            self.metrics.increment("ack.api_calls", self.api_calls)
+
+    async def withdraw(self, timeout: float | None = None) -> None:
+        """Remove the acknowledgement of a question that gets no answer: the reaction or the thinking message"""
+        if self.reacted and self.reply_to:
+            self.reacted = False
+            self.api_calls += 1
+            await self.sender.unreact(self.token, self.reply_to, THINKING_REACTION, timeout)
+        await self._delete_thinking_message(timeout)
+
+    async def _delete_thinking_message(self, timeout: float | None = None) -> None:
+        """Remove the thinking message, if one was posted"""
+        if self.thinking_message_id is None:
+            return
+        message_id, self.thinking_message_id = self.thinking_message_id, None
+        self.api_calls += 1
+        await self.sender.delete(self.token, message_id, timeout)
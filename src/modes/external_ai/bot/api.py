@@ -8,12 +8,24 @@ import logging
 from typing import Any
 
 from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
+from src.shared.deadline import Deadline, DeadlineExceeded
+from src.shared.debounce import MessageBatch, MessageDebouncer
+from src.shared.inflight import GenerationCancelled, InFlightGeneration, get_inflight_registry
+from src.shared.job_queue import Job, JobQueue, JobWorkerPool
+from src.shared.metrics import get_metrics
+from src.shared.readiness import get_readiness
+from src.shared.resilience import circuit_breaker_states
+from src.shared.safety_filter import apply_safety_filter
+from src.shared.safety_filter import warm_up as warm_up_safety_filter
+
 from ..core.config import settings
 from ..xai.pipeline import DirectXAIPipeline
+from .acknowledgement import Acknowledgement
 from .message import clean_message
-from .nextcloud_api import delete_message, send_thinking_message, send_to_nextcloud_fallback
+from .outbound import get_outbound_sender
 from .security import verify_signature
 
 # Configure logging
@@ -33,6 +45,17 @@ app = FastAPI(title="Minecraft Wiki Bot for Nextcloud Talk")
 
 # Initialize components
 xai_pipeline = None
+job_queue: JobQueue | None = None
+worker_pool: JobWorkerPool | None = None
+
+# Queue holding questions waiting to be answered
+ANSWER_QUEUE = "answers"
+
+# Degraded responses sent when a stage runs out of request budget
+STAGE_FALLBACKS = {
+    "generation": "I'm thinking a bit slowly right now! Please ask me again in a moment.",
+    "safety": "Oops, I couldn't double-check my answer in time. Please ask me again!",
+}
 
 
 class NextcloudMessage(BaseModel):
@@ -50,31 +73,80 @@ class NextcloudMessage(BaseModel):
     message_id: int | None = None
 
 
+def init_components(workers: int = 0) -> None:
+    """Initialize the x.ai pipeline, the job queue and optionally answer workers
+
+    Only cheap, local setup happens here; the x.ai connection test and the
+    profanity model load are started as background warm-ups reported by /ready.
+    Must be called from a running event loop.
+
+    Args:
+        workers: Answer workers to run in this process (0 leaves answering to other processes)
+    """
+    global xai_pipeline, job_queue, worker_pool
+    readiness = get_readiness()
+
+    # Optional Ollama hedge provider for hybrid deployments
+    hedge_client = None
+    if settings.hedge_enabled:
+        from src.modes.self_hosted.ollama.pool import create_ollama_client
+
+        logger.info(f"Enabling hedged requests against Ollama at {', '.join(settings.ollama_base_urls)}")
+        hedge_client = create_ollama_client(settings.ollama_base_urls, model=settings.ollama_model, check_model=False)
+
+    # Initialize direct x.ai pipeline
+    logger.info("Initializing direct x.ai pipeline...")
+    xai_pipeline = DirectXAIPipeline(
+        xai_api_key=settings.xai_api_key,  # From XAI_API_KEY in .env
+        xai_url=settings.xai_url,  # x.ai API URL
+        model_name=settings.model_name,  # From MODEL_NAME in .env
+        prompt_template_path=settings.prompt_template_path,
+        # From PROMPT_TEMPLATE_PATH
+        fast_model_name=settings.fast_model_name,  # From FAST_MODEL_NAME in .env
+        strong_model_name=settings.strong_model_name,  # From STRONG_MODEL_NAME in .env
+        routing_max_fast_words=settings.routing_max_fast_words,
+        hedge_client=hedge_client,  # From HEDGE_ENABLED in .env
+        hedge_percentile=settings.hedge_percentile,
+        hedge_min_delay=settings.hedge_min_delay,
+        test_connection=False,  # Warmed up in the background below
+    )
+    readiness.mark_ready("xai_pipeline")
+
+    # Durable queue between webhook ingress and answering
+    if settings.job_queue_enabled:
+        logger.info(f"Using durable job queue at {settings.job_queue_path}")
+        job_queue = JobQueue(
+            settings.job_queue_path,
+            visibility_timeout=settings.job_visibility_timeout_seconds,
+            max_attempts=settings.job_max_attempts,
+        )
+        if workers > 0:
+            worker_pool = JobWorkerPool(job_queue, ANSWER_QUEUE, answer_job, concurrency=workers)
+            worker_pool.start()
+        readiness.mark_ready("job_queue")
+
+    # A failing connection test or missing profanity model degrades the bot but doesn't stop it
+    readiness.start("xai_connection", xai_pipeline.check_connection, required=False)
+    readiness.start("safety_filter", warm_up_safety_filter, required=False)
+
+
 @app.on_event("startup")
 async def startup_event() -> None:
     """Initialize x.ai pipeline on startup
 
 
-    Loads x.ai pipeline with file watching and tests connection.
+    Loads x.ai pipeline with file watching; the connection test runs in the
+    background unless FAST_START=false, in which case startup waits for it.
     Dependencies:
     - Application logs in logs/ directory
     - prompt_template.txt file (mounted via docker volume)
     """
-    global xai_pipeline
-
     logger.info("🚀 Starting Minecraft Wiki Bot...")
 
     try:
-        # Initialize direct x.ai pipeline
-        logger.info("Initializing direct x.ai pipeline...")
-        xai_pipeline = DirectXAIPipeline(
-            xai_api_key=settings.xai_api_key,  # From XAI_API_KEY in .env
-            xai_url=settings.xai_url,  # x.ai API URL
-            model_name=settings.model_name,  # From MODEL_NAME in .env
-            prompt_template_path=settings.prompt_template_path,
-            # From PROMPT_TEMPLATE_PATH
-        )
-
+        init_components(workers=settings.answer_workers)
+        if not settings.fast_start:
+            await get_readiness().wait()
         logger.info("✓ Bot ready!")
 
     except Exception as e:
@@ -86,8 +158,11 @@ async def startup_event() -> None:
 async def shutdown_event() -> None:
     """Cleanup on shutdown
 
-    Stops file watcher and cleans up resources.
+    Lets running answer jobs finish (unfinished ones return to the queue),
+    stops file watcher and cleans up resources.
     """
+    if worker_pool:
+        await worker_pool.stop(grace=settings.request_deadline_seconds)
     if xai_pipeline:
         xai_pipeline.stop_file_watcher()
     logger.info("Bot shutdown complete")
@@ -103,6 +178,13 @@ async def root() -> dict[str, str]:
     }
 
 
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    """Readiness check: 200 once every required component has warmed up, 503 before"""
+    readiness = get_readiness().describe()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+
 @app.get("/health")
 async def health() -> dict[str, Any]:
     """Detailed health check endpoint"""
@@ -137,34 +219,204 @@ async def health_check() -> dict[str, str]:
     return health
 
 
-async def process_and_respond(token: str, query: str, thinking_message_id: int | None) -> None:
+async def process_and_respond(
+    token: str,
+    query: str,
+    deadline: Deadline | None = None,
+    generation: InFlightGeneration | None = None,
+    reply_to: str | None = None,
+    ack: Acknowledgement | None = None,
+    resumable: bool = False,
+) -> None:
     """
-    Process the query and send response, then delete thinking message
+    Process the query and deliver the answer with an adaptive acknowledgement
+
+    Answers ready within the acknowledgement grace period are posted
+    directly; slower ones are acknowledged first (see Acknowledgement). Each
+    stage runs within the remaining request deadline; a stage that runs out
+    of budget is cancelled and replaced by its degraded response. If the
+    generation is superseded (newer question, edited or deleted message) the
+    LLM call is aborted and only the acknowledgement is cleaned up. A
+    resumable answer interrupted by a shutdown keeps its acknowledgement for
+    the attempt that picks it up.
 
     Args:
         token: Conversation token
         query: User query
-        thinking_message_id: ID of thinking message to delete
+        deadline: Request deadline created at webhook receipt
+        generation: In-flight registration used to cancel superseded answers
+        reply_to: ID of the user's message being answered
+        ack: Acknowledgement carried over from an earlier attempt, if any
+        resumable: The answer is redelivered if this process stops (queued job)
     """
-    try:
-        # Generate response
+    deadline = deadline or Deadline(settings.request_deadline_seconds)
+    reserve = settings.delivery_reserve_seconds
+    cancel = generation.cancel_token if generation is not None else None
+    ack = ack or Acknowledgement(token, reply_to=reply_to)
+    work: asyncio.Task | None = None
+
+    async def generate() -> str:
+        # Generation stage (keeps a reserve for safety check and delivery)
         if xai_pipeline is None:
             response = "Bot is not initialized yet."
         else:
-            result = xai_pipeline.answer_question(query)
-            response = str(result["answer"]) if result and "answer" in result else "I couldn't generate a response."
+            try:
+                result = await deadline.run_stage(
+                    "generation",
+                    lambda timeout: asyncio.to_thread(
+                        xai_pipeline.answer_question, query, timeout=timeout, cancel=cancel
+                    ),
+                    reserve=reserve,
+                )
+                response = str(result["answer"]) if result and "answer" in result else "I couldn't generate a response."
+            except DeadlineExceeded:
+                response = STAGE_FALLBACKS["generation"]
+
+        # Safety check stage
+        try:
+            response, _ = await deadline.run_stage(
+                "safety",
+                lambda timeout: asyncio.to_thread(apply_safety_filter, response),
+                reserve=reserve / 2,
+            )
+        except DeadlineExceeded:
+            response = STAGE_FALLBACKS["safety"]
+        return response
 
-        # Send the answer as a new message
-        await send_to_nextcloud_fallback(token, response)
-
-        # Delete the thinking message
-        if thinking_message_id is not None:
-            await delete_message(token, thinking_message_id)
+    try:
+        work = asyncio.create_task(generate())
+        await ack.wait_or_acknowledge(work, deadline.timeout(cap=10, reserve=reserve))
+        if generation is not None:
+            generation.thinking_message_id = ack.thinking_message_id
+        response = await work
+
+        # A superseded answer must never be delivered
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+
+        # Delivery stage: edit the acknowledgement into the answer or post it
+        await deadline.run_stage("delivery", lambda timeout: ack.deliver(response, timeout))
+
+        get_metrics().observe("request.end_to_end.latency", deadline.elapsed())
+
+    except (asyncio.CancelledError, GenerationCancelled):
+        if resumable and (cancel is None or not cancel.is_set()):
+            # Shutting down: the redelivered job edits the saved acknowledgement, so it must stay
+            logger.info("⏹️ Answer interrupted by shutdown, keeping the acknowledgement for the next attempt")
+            if work is not None:
+                work.cancel()
+            raise
+        reason = cancel.reason if cancel is not None else "cancelled"
+        logger.info(f"✂️ Dropping answer ({reason})")
+        if work is not None:
+            work.cancel()
+        await ack.withdraw()
+
+    except DeadlineExceeded as e:
+        logger.error(f"Request deadline exceeded during {e.stage} after {deadline.elapsed():.1f}s")
+        # An answer stuck behind the rate limit stays queued and resolves the acknowledgement itself
+        if e.stage != "delivery":
+            await ack.withdraw()
 
     except Exception as e:
         logger.error(f"Error in process_and_respond: {e}")
         # Send error message
-        await send_to_nextcloud_fallback(token, "Sorry, I had trouble answering that. Try again!")
+        await ack.deliver("Sorry, I had trouble answering that. Try again!")
+        await ack.withdraw()
+
+    finally:
+        if generation is not None:
+            get_inflight_registry().finish(generation)
+
+
+async def start_answer(batch: MessageBatch) -> None:
+    """
+    Start answering a (possibly merged) batch of messages
+
+    With the job queue enabled the batch is persisted and answered by a
+    worker; otherwise it is answered in a background task of this process.
+
+    Args:
+        batch: Debounced messages from one actor in one room
+    """
+    message_key = f"{batch.room}:{batch.last_message_id}" if batch.last_message_id else None
+    if job_queue is not None:
+        payload = {
+            "room": batch.room,
+            "actor": batch.actor,
+            "query": batch.query,
+            "message_id": batch.last_message_id,
+            "first_at": batch.first_at,
+        }
+        # A newer question from the same person supersedes queued and running ones
+        await asyncio.to_thread(
+            job_queue.enqueue,
+            ANSWER_QUEUE,
+            payload,
+            group_key=f"{batch.room}:{batch.actor}",
+            message_key=message_key,
+            dedupe_key=batch.dedupe_key,
+            supersede=True,
+        )
+        return
+
+    # The end-to-end budget starts when the first message of the batch arrived
+    deadline = Deadline(settings.request_deadline_seconds, started_at=batch.first_at)
+    query = batch.query
+    if settings.verbose_logging:
+        logger.info(f"Processing query: {query}")
+
+    # Register the generation, superseding any older question from the same person in this room
+    generation = get_inflight_registry().start(batch.room, batch.actor, batch.last_message_id)
+
+    # Process in background; the acknowledgement is sent from there only if the answer is slow
+    generation.task = asyncio.create_task(
+        process_and_respond(batch.room, query, deadline, generation, reply_to=batch.last_message_id)
+    )
+
+
+async def answer_job(job: Job) -> None:
+    """
+    Answer one queued question (in the ingress process or a separate worker)
+
+    Args:
+        job: Claimed job from the answer queue
+    """
+    payload = job.payload
+    room, message_id = payload["room"], payload.get("message_id")
+    if settings.verbose_logging:
+        logger.info(f"Processing query: {payload['query']}")
+
+    # A redelivered job gets a fresh budget; the first attempt's started with the question
+    deadline = Deadline(
+        settings.request_deadline_seconds, started_at=payload["first_at"] if job.attempts == 1 else None
+    )
+
+    # Cancelling the job (newer question, edited or deleted message) cancels the generation
+    generation = get_inflight_registry().start(room, payload["actor"], message_id, parent=job.cancel_token)
+    generation.task = asyncio.current_task()
+
+    # Reuse an acknowledgement posted by an earlier attempt instead of posting another one
+    ack = Acknowledgement(
+        room,
+        reply_to=message_id,
+        thinking_message_id=job.state.get("thinking_message_id"),
+        reacted=job.state.get("reacted", False),
+    )
+    ack.on_acknowledged = lambda: job_queue.save_state(
+        job, thinking_message_id=ack.thinking_message_id, reacted=ack.reacted
+    )
+    await process_and_respond(
+        room, payload["query"], deadline, generation, reply_to=message_id, ack=ack, resumable=True
+    )
+
+
+# Merges rapid-fire messages per (room, actor) before answering
+debouncer = MessageDebouncer(
+    start_answer,
+    window=settings.debounce_window_seconds,
+    max_wait=settings.debounce_max_wait_seconds,
+)
 
 
 @app.post("/webhook")
@@ -194,6 +446,23 @@ async def webhook_handler(request: Request, background_tasks: BackgroundTasks) -
             logger.debug(f"Received webhook: {data}")
             logger.info("Received webhook from Nextcloud Talk")
 
+        # A deleted or edited message cancels the answer still being generated for it
+        event_type = data.get("type", "Create")
+        if event_type in ("Delete", "Update") and "object" in data and "target" in data:
+            cancelled = get_inflight_registry().cancel_message(
+                data["target"]["id"],
+                str(data["object"].get("id", "")),
+                reason=f"original message {event_type.lower()}d",
+            )
+            if job_queue is not None:
+                message_key = f"{data['target']['id']}:{data['object'].get('id', '')}"
+                cancelled = bool(await asyncio.to_thread(job_queue.cancel_message, message_key)) or cancelled
+            if event_type == "Delete":
+                cancelled = debouncer.discard(data["target"]["id"], str(data["object"].get("id", ""))) or cancelled
+                return {"status": "cancelled" if cancelled else "ignored - delete event"}
+            # An edit is handled as the message it now is; if the original is still
+            # buffered, the debouncer swaps in the edited text instead of adding it
+
         # Parse ActivityPub webhook format from Nextcloud Talk
         if "object" in data and "content" in data["object"]:
             # New ActivityPub format
@@ -203,6 +472,7 @@ async def webhook_handler(request: Request, background_tasks: BackgroundTasks) -
             token = data["target"]["id"]  # Conversation token
             actor_name = data["actor"].get("name", "User")
             actor_id = data["actor"].get("id", "")
+            message_id = str(data["object"].get("id", ""))
         else:
             # Legacy format (fallback)
             if "message" not in data or "token" not in data:
@@ -211,6 +481,7 @@ async def webhook_handler(request: Request, background_tasks: BackgroundTasks) -
             token = data["token"]
             actor_id = data.get("actor_id", "")
             actor_name = data.get("actor_displayname", "User")
+            message_id = str(data.get("message_id", ""))
 
         # Ignore messages from the bot itself to prevent infinite loops
         if actor_id.endswith("Minecraft Bot") or actor_name in [
@@ -226,16 +497,10 @@ async def webhook_handler(request: Request, background_tasks: BackgroundTasks) -
         #     logger.info("Ignoring message (not relevant)")
         #     return {"status": "ignored"}
 
-        # Clean message
+        # Clean message and wait briefly for follow-up messages from the same person
         query = clean_message(message)
-        if settings.verbose_logging:
-            logger.info(f"Processing query: {query}")
-
-        # Send thinking message immediately
-        thinking_message_id = send_thinking_message(token)
-
-        # Process in background
-        asyncio.create_task(process_and_respond(token, query, thinking_message_id))
+        if await debouncer.submit(token, actor_id, query, message_id or None):
+            return {"status": "queued"}
         return {"status": "success"}
 
     except Exception as e:
@@ -253,7 +518,7 @@ async def test_query(query: str) -> dict:
     if xai_pipeline is None:
         result = {"answer": "Bot is not initialized yet."}
     else:
-        result = xai_pipeline.answer_question(query)
+        result = await asyncio.to_thread(xai_pipeline.answer_question, query, timeout=settings.request_deadline_seconds)
         if result and "answer" in result:
             result = result
         else:
@@ -270,6 +535,16 @@ async def get_stats() -> dict:
     # No vector database stats in x.ai-only architecture
     stats["architecture"] = "x.ai direct integration"
 
+    # Routing decisions, per-tier latency, retries and breaker state
+    stats["metrics"] = get_metrics().snapshot()
+    stats["circuit_breakers"] = circuit_breaker_states()
+    stats["debounce_pending"] = debouncer.pending()
+    stats["outbound"] = get_outbound_sender().describe()
+    if xai_pipeline is not None and hasattr(xai_pipeline.hedge_client, "backends"):
+        stats["ollama_pool"] = xai_pipeline.hedge_client.describe()
+    if job_queue is not None:
+        stats["job_queue"] = await asyncio.to_thread(job_queue.stats)
+
     return stats
 
 
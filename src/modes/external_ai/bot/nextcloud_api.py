@@ -2,169 +2,93 @@
 Nextcloud Talk API client for the Minecraft bot
 """
 
-import asyncio
 import logging
+from typing import Any
 
 import requests
 
+from src.shared.resilience import get_circuit_breaker, get_retry_policy, raise_for_transient_status
+
 from ..core.config import settings
 
 logger = logging.getLogger(__name__)
 
+THINKING_MESSAGE = "🤔 Thinking..."
 
-def send_thinking_message(token: str) -> int | None:
-    """
-    Send thinking message and return its ID
 
-    Args:
-        token: Conversation token
-
-    Returns:
-        Optional[int]: Message ID if successful, None otherwise
+def _request_with_retry(
+    method: str,
+    url: str,
+    idempotent: bool = True,
+    budget: float | None = None,
+    attempts: int | None = None,
+    **kwargs: Any,
+) -> requests.Response:
     """
-    base_url = f"{settings.nextcloud_url}/ocs/v2.php/apps/spreed/api/v1/chat/{token}"
-
-    headers = {
-        "OCS-APIRequest": "true",
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "Authorization": f"Bearer {settings.nextcloud_bot_token}",
-    }
-
-    data = {"message": "🤔 Thinking...", "replyTo": 0}
-
-    try:
-        response = requests.post(base_url, headers=headers, json=data, timeout=10)
-        if settings.verbose_logging:
-            logger.info(f"Thinking message POST status: {response.status_code}, " f"text: {response.text[:200]}")
-        if response.status_code == 201:
-            response_data = response.json()
-            message_id = response_data.get("ocs", {}).get("data", {}).get("id")
-            if settings.verbose_logging:
-                logger.info(f"✓ Thinking message sent, ID: {message_id}")
-            return int(message_id) if message_id is not None else None
-        else:
-            logger.error(f"Failed to send thinking message: {response.status_code} - " f"{response.text}")
-            return None
-    except Exception as e:
-        logger.error(f"Error sending thinking message: {e}")
-        return None
-
-
-async def send_to_nextcloud_fallback(token: str, message: str) -> bool:
-    """
-    Fallback: send new message if editing fails
+    Send a Nextcloud request through the shared circuit breaker and retry policy
 
     Args:
-        token: Conversation token
-        message: Message to send
+        method: HTTP method
+        url: Request URL
+        idempotent: Whether timeouts may be retried (a timed-out POST may already have been delivered)
+        budget: Optional overall seconds for all attempts (remaining request deadline)
+        attempts: Override for the number of attempts (1 leaves retrying to the caller)
 
     Returns:
-        bool: True if successful
+        requests.Response: Final response (non-retryable statuses are returned as-is)
     """
-    base_url = f"{settings.nextcloud_url}/ocs/v2.php/apps/spreed/api/v1/chat/{token}"
-
-    headers = {
-        "OCS-APIRequest": "true",
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "Authorization": f"Bearer {settings.nextcloud_bot_token}",
-    }
 
-    data = {"message": message, "replyTo": 0}
-
-    def _send() -> bool:
+    def _send(timeout: float) -> requests.Response:
         try:
-            response = requests.post(base_url, headers=headers, json=data, timeout=10)
-            if response.status_code == 201:
-                if settings.verbose_logging:
-                    logger.info(f"✓ Fallback message sent to conversation {token}")
-                return True
-            else:
-                logger.error(f"Failed to send fallback message: {response.status_code}")
-                return False
-        except Exception as e:
-            logger.error(f"Error sending fallback message: {e}")
-            return False
-
-    return await asyncio.to_thread(_send)
-
-
-async def edit_message(token: str, message_id: int, new_message: str) -> bool:
+            response = requests.request(method, url, timeout=timeout, **kwargs)
+        except requests.exceptions.Timeout as e:
+            if idempotent:
+                raise
+            raise requests.exceptions.RequestException(f"Timed out after {timeout:.0f}s: {e}") from e
+        raise_for_transient_status(response)
+        return response
+
+    return get_retry_policy(max_attempts=attempts).call(
+        _send, breaker=get_circuit_breaker("nextcloud"), budget=budget, attempt_timeout=10
+    )
+
+
+def talk_request(
+    method: str,
+    path: str,
+    payload: dict | None = None,
+    timeout: float | None = None,
+    attempts: int | None = None,
+) -> requests.Response:
     """
-    Edit a message in Nextcloud Talk
+    Send one request to the Talk OCS API as the bot
 
     Args:
-        token: Conversation token
-        message_id: ID of message to edit
-        new_message: New message content
+        method: HTTP method
+        path: Path below /ocs/v2.php/apps/spreed/api/v1/ (e.g. "chat/<token>")
+        payload: Optional JSON body
+        timeout: Optional overall time budget in seconds
+        attempts: Override for the number of attempts
 
     Returns:
-        bool: True if successful
-    """
-    base_url = f"{settings.nextcloud_url}/ocs/v2.php/apps/spreed/api/v1/chat/{token}"
-    edit_url = f"{base_url}/{message_id}"
-
-    headers = {
-        "OCS-APIRequest": "true",
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "Authorization": f"Bearer {settings.nextcloud_bot_token}",
-    }
+        requests.Response: Final response
 
-    data = {"message": new_message}
-
-    def _edit() -> bool:
-        try:
-            response = requests.put(edit_url, headers=headers, json=data, timeout=10)
-            if response.status_code == 200:
-                if settings.verbose_logging:
-                    logger.info(f"✓ Message updated in conversation {token}")
-                return True
-            else:
-                logger.error(f"Failed to edit message: {response.status_code} - {response.text}")
-                return False
-        except Exception as e:
-            logger.error(f"Error editing message: {e}")
-            return False
-
-    return await asyncio.to_thread(_edit)
-
-
-async def delete_message(token: str, message_id: int) -> bool:
+    Raises:
+        TransientError: For throttling (with Retry-After) and server errors once attempts run out
+        CircuitOpenError: While the Nextcloud breaker is open
     """
-    Delete a message in Nextcloud Talk
-
-    Args:
-        token: Conversation token
-        message_id: ID of message to delete
-
-    Returns:
-        bool: True if successful
-    """
-    base_url = f"{settings.nextcloud_url}/ocs/v2.php/apps/spreed/api/v1/chat/{token}"
-    delete_url = f"{base_url}/{message_id}"
-
+    url = f"{settings.nextcloud_url}/ocs/v2.php/apps/spreed/api/v1/{path}"
     headers = {
         "OCS-APIRequest": "true",
+        "Accept": "application/json",
         "Authorization": f"Bearer {settings.nextcloud_bot_token}",
     }
-
-    def _delete() -> bool:
-        try:
-            response = requests.delete(delete_url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                if settings.verbose_logging:
-                    logger.info(f"✓ Message deleted in conversation {token}")
-                return True
-            else:
-                logger.error(f"Failed to delete message: {response.status_code} - " f"{response.text}")
-                return False
-        except Exception as e:
-            logger.error(f"Error deleting message: {e}")
-            return False
-
-    return await asyncio.to_thread(_delete)
+    kwargs: dict[str, Any] = {"headers": headers}
+    if payload is not None:
+        headers["Content-Type"] = "application/json"
+        kwargs["json"] = payload
+    # A timed-out POST may already have been delivered, so only retry it on explicit errors
+    return _request_with_retry(method, url, idempotent=method != "POST", budget=timeout, attempts=attempts, **kwargs)
 
 
 def format_answer_markdown(result: dict) -> str:
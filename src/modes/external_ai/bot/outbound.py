@@ -0,0 +1,376 @@
+"""
+Rate-limit-aware outbound delivery to Nextcloud Talk
+
+Every post, edit, delete and reaction goes through a per-room queue drained by
+a single worker, so messages reach a room in the order they were produced.
+Each room has a token bucket limiting the request rate; a 429 (or 5xx) pauses
+the room for the server's Retry-After (or a jittered back-off) and the request
+is retried instead of being dropped. Pending edits of the same message are
+coalesced so only the latest text is sent. A room's queue is forgotten once it
+is empty and its bucket has refilled.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque
+
+import requests
+
+from src.shared.metrics import get_metrics
+from src.shared.resilience import CircuitOpenError, TransientError, get_retry_policy
+
+from ..core.config import settings
+from .nextcloud_api import talk_request
+
+logger = logging.getLogger(__name__)
+
+# Seconds allowed for a single HTTP attempt
+ATTEMPT_TIMEOUT = 10.0
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill()
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def idle_time(self) -> float:
+        """Seconds until the bucket is full again"""
+        self._refill()
+        if self.rate <= 0:
+            return 0.0
+        return (self.capacity - self.tokens) / self.rate
+
+    def take(self) -> None:
+        """Consume one token"""
+        self._refill()
+        self.tokens -= 1
+
+    def drain(self) -> None:
+        """Empty the bucket (the server told us to slow down)"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class OutboundJob:
+    """One queued Talk API request"""
+
+    def __init__(
+        self,
+        kind: str,
+        method: str,
+        path: str,
+        payload: dict | None,
+        parse: Callable[[requests.Response], Any],
+        failure: Any,
+        message_id: int | None = None,
+        droppable: bool = False,
+    ):
+        self.kind = kind
+        self.method = method
+        self.path = path
+        self.payload = payload
+        self.parse = parse
+        self.failure = failure
+        self.message_id = message_id
+        self.droppable = droppable
+        self.attempts = 0
+        self.in_flight = False
+        self.abandoned = False
+        self.enqueued_at = time.time()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def resolve(self, result: Any) -> None:
+        if not self.future.done():
+            self.future.set_result(result)
+
+
+class RoomQueue:
+    """Ordered outbound queue for one conversation"""
+
+    def __init__(self, token: str, rate: float, burst: float):
+        self.token = token
+        self.jobs: Deque[OutboundJob] = deque()
+        self.bucket = TokenBucket(rate, burst)
+        self.paused_until = 0.0
+        self.worker: asyncio.Task | None = None
+
+
+def _message_id(response: requests.Response) -> int | None:
+    if response.status_code != 201:
+        return None
+    message_id = response.json().get("ocs", {}).get("data", {}).get("id")
+    return int(message_id) if message_id is not None else None
+
+
+def _status_in(*codes: int) -> Callable[[requests.Response], bool]:
+    return lambda response: response.status_code in codes
+
+
+class OutboundSender:
+    """Queues Talk API requests per room and delivers them within the rate limit"""
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: float = 5.0,
+        max_attempts: int = 5,
+        max_retry_after: float = 60.0,
+        request: Callable[..., requests.Response] = talk_request,
+    ):
+        """
+        Args:
+            rate: Requests per second allowed per room
+            burst: Requests a quiet room may send back to back
+            max_attempts: Attempts per request before it is given up
+            max_retry_after: Upper bound for a single Retry-After pause
+            request: Function performing one Talk request (see talk_request)
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_attempts = max(1, max_attempts)
+        self.max_retry_after = max_retry_after
+        self.request = request
+        self.backoff = get_retry_policy()
+        self.metrics = get_metrics()
+        self._rooms: dict[str, RoomQueue] = {}
+
+    # Public API -----------------------------------------------------------
+
+    async def post(self, token: str, message: str, timeout: float | None = None, droppable: bool = False) -> int | None:
+        """
+        Post a message
+
+        Args:
+            token: Conversation token
+            message: Message text
+            timeout: Seconds to wait for delivery (the request stays queued afterwards)
+            droppable: Drop the request if the caller stops waiting before it is sent
+
+        Returns:
+            int | None: ID of the new message, None if it could not be posted
+        """
+        payload = {"message": message, "replyTo": 0}
+        job = OutboundJob("post", "POST", f"chat/{token}", payload, _message_id, None, droppable=droppable)
+        return await self._submit(token, job, timeout)
+
+    async def edit(self, token: str, message_id: int, message: str, timeout: float | None = None) -> bool:
+        """Edit a message, coalescing with a pending edit of the same message"""
+        room = self._room(token)
+        for pending in room.jobs:
+            if pending.kind == "edit" and pending.message_id == message_id and not pending.in_flight:
+                pending.payload = {"message": message}
+                self.metrics.increment("outbound.coalesced")
+                return await self._wait(room, pending, timeout)
+        job = OutboundJob(
+            "edit", "PUT", f"chat/{token}/{message_id}", {"message": message}, _status_in(200, 202), False, message_id
+        )
+        return await self._submit(token, job, timeout)
+
+    async def delete(self, token: str, message_id: int, timeout: float | None = None) -> bool:
+        """Delete a message, dropping edits of it that haven't been sent yet"""
+        room = self._room(token)
+        for pending in list(room.jobs):
+            if pending.kind == "edit" and pending.message_id == message_id and not pending.in_flight:
+                room.jobs.remove(pending)
+                pending.resolve(False)
+                self.metrics.increment("outbound.coalesced")
+        job = OutboundJob(
+            "delete", "DELETE", f"chat/{token}/{message_id}", None, _status_in(200, 202), False, message_id
+        )
+        return await self._submit(token, job, timeout)
+
+    async def react(
+        self, token: str, message_id: int | str, reaction: str, timeout: float | None = None, droppable: bool = False
+    ) -> bool:
+        """React to a message"""
+        payload = {"reaction": reaction}
+        job = OutboundJob(
+            "react",
+            "POST",
+            f"reaction/{token}/{message_id}",
+            payload,
+            _status_in(200, 201),
+            False,
+            message_id,
+            droppable,
+        )
+        return await self._submit(token, job, timeout)
+
+    async def unreact(self, token: str, message_id: int | str, reaction: str, timeout: float | None = None) -> bool:
+        """Remove a reaction, or drop it from the queue if it hasn't been sent yet"""
+        room = self._room(token)
+        payload = {"reaction": reaction}
+        for pending in list(room.jobs):
+            if (
+                pending.kind == "react"
+                and pending.message_id == message_id
+                and pending.payload == payload
+                and not pending.in_flight
+            ):
+                room.jobs.remove(pending)
+                pending.resolve(False)
+                self.metrics.increment("outbound.coalesced")
+                self._publish()
+                return True
+        job = OutboundJob(
+            "unreact", "DELETE", f"reaction/{token}/{message_id}", payload, _status_in(200), False, message_id
+        )
+        return await self._submit(token, job, timeout)
+
+    def describe(self) -> dict[str, Any]:
+        """Queue state for stats endpoints"""
+        now = time.time()
+        return {
+            "queued": sum(len(room.jobs) for room in self._rooms.values()),
+            "paused_rooms": sum(1 for room in self._rooms.values() if room.paused_until > now),
+        }
+
+    # Queue handling ---------------------------------------------------------
+
+    def _room(self, token: str) -> RoomQueue:
+        room = self._rooms.get(token)
+        if room is None:
+            room = self._rooms[token] = RoomQueue(token, self.rate, self.burst)
+        return room
+
+    def _publish(self) -> None:
+        self.metrics.set_gauge("outbound.queued", sum(len(room.jobs) for room in self._rooms.values()))
+
+    async def _submit(self, token: str, job: OutboundJob, timeout: float | None) -> Any:
+        room = self._room(token)
+        room.jobs.append(job)
+        self._publish()
+        if room.worker is None or room.worker.done():
+            room.worker = asyncio.create_task(self._drain(room))
+        return await self._wait(room, job, timeout)
+
+    async def _wait(self, room: RoomQueue, job: OutboundJob, timeout: float | None) -> Any:
+        """
+        Wait for a job's result
+
+        Raises:
+            asyncio.TimeoutError: If the timeout passes first; the job keeps its place in
+                the queue unless it is droppable and hasn't been sent yet
+        """
+        try:
+            return await asyncio.wait_for(asyncio.shield(job.future), timeout=timeout)
+        except asyncio.TimeoutError:
+            if job.droppable:
+                job.abandoned = True
+                if not job.in_flight and job in room.jobs:
+                    room.jobs.remove(job)
+                    job.resolve(job.failure)
+                    self._publish()
+            raise
+
+    async def _drain(self, room: RoomQueue) -> None:
+        """Send a room's jobs in order, then drop the room once its rate limit state no longer matters"""
+        while True:
+            await self._send_jobs(room)
+            # A fresh queue would start with a full bucket, so keep this one until it is full again
+            idle = max(room.bucket.idle_time(), room.paused_until - time.time())
+            if idle <= 0:
+                break
+            await asyncio.sleep(idle)
+        if not room.jobs and self._rooms.get(room.token) is room:
+            del self._rooms[room.token]
+
+    async def _send_jobs(self, room: RoomQueue) -> None:
+        """Send a room's queued jobs in order, honouring its token bucket and any Retry-After pause"""
+        delay = self.backoff.base_delay
+        while room.jobs:
+            wait = max(room.bucket.delay(), room.paused_until - time.time())
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            job = room.jobs[0]
+            room.bucket.take()
+            job.in_flight = True
+            job.attempts += 1
+            try:
+                response = await asyncio.to_thread(
+                    self.request, job.method, job.path, job.payload, timeout=ATTEMPT_TIMEOUT, attempts=1
+                )
+                result = job.parse(response)
+                if result in (None, False):
+                    logger.error(f"Talk {job.kind} in {room.token} failed: {response.status_code}")
+            except (
+                TransientError,
+                CircuitOpenError,
+                requests.exceptions.ConnectionError,
+                # Only idempotent requests time out here; a timed-out POST is reported as a plain error
+                requests.exceptions.Timeout,
+            ) as e:
+                job.in_flight = False
+                if job.attempts < self.max_attempts:
+                    if getattr(e, "throttled", False):
+                        self.metrics.increment("outbound.rate_limited")
+                        room.bucket.drain()
+                    retry_after = getattr(e, "retry_after", None)
+                    if retry_after:
+                        delay = min(self.max_retry_after, retry_after)
+                    else:
+                        delay = self.backoff.next_delay(delay)
+                    room.paused_until = time.time() + delay
+                    self.metrics.increment("outbound.retries")
+                    logger.warning(f"⏸️ Talk {job.kind} in {room.token} retrying in {delay:.1f}s: {e}")
+                    continue
+                logger.error(f"Giving up Talk {job.kind} in {room.token} after {job.attempts} attempts: {e}")
+                result = job.failure
+            except Exception as e:
+                logger.error(f"Error sending Talk {job.kind} in {room.token}: {e}")
+                result = job.failure
+
+            delay = self.backoff.base_delay
+            room.jobs.popleft()
+            self._publish()
+            self._complete(room, job, result)
+
+    def _complete(self, room: RoomQueue, job: OutboundJob, result: Any) -> None:
+        self.metrics.observe(f"outbound.{job.kind}.latency", time.time() - job.enqueued_at)
+        self.metrics.increment("outbound.delivered" if result not in (None, False) else "outbound.dropped")
+        job.resolve(result)
+
+        # An acknowledgement nobody waits for any more must not linger in the chat
+        if job.abandoned and job.kind == "post" and result is not None:
+            cleanup = OutboundJob("delete", "DELETE", f"chat/{room.token}/{result}", None, _status_in(200, 202), False)
+            room.jobs.append(cleanup)
+        if job.abandoned and job.kind == "react" and result:
+            cleanup = OutboundJob("unreact", "DELETE", job.path, job.payload, _status_in(200), False, job.message_id)
+            room.jobs.append(cleanup)
+
+
+# Global instance
+_sender: OutboundSender | None = None
+
+
+def get_outbound_sender() -> OutboundSender:
+    """Get the global outbound sender"""
+    global _sender
+    if _sender is None:
+        _sender = OutboundSender(
+            rate=settings.outbound_rate_per_second,
+            burst=settings.outbound_burst,
+            max_attempts=settings.outbound_max_attempts,
+            max_retry_after=settings.outbound_max_retry_after_seconds,
+        )
+    return _sender
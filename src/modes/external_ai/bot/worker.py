@@ -0,0 +1,59 @@
+"""
+Standalone answer worker for the Minecraft bot
+
+Answers questions from the durable job queue without serving HTTP, so
+workers can be scaled separately from webhook ingress. Run the web process
+with ANSWER_WORKERS=0 and start as many of these as needed, all pointing at
+the same JOB_QUEUE_PATH:
+
+    python -m src.modes.external_ai.bot.worker --concurrency 4
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+
+from ..core.config import settings
+from . import api
+
+logger = logging.getLogger(__name__)
+
+
+async def run_worker(concurrency: int) -> None:
+    """
+    Run answer workers until SIGINT/SIGTERM
+
+    Args:
+        concurrency: Jobs answered at the same time by this process
+    """
+    if not settings.job_queue_enabled:
+        raise RuntimeError("Standalone workers need JOB_QUEUE_ENABLED=true")
+
+    api.init_components(workers=concurrency)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info(f"👷 Answer worker running with {concurrency} slots, queue {settings.job_queue_path}")
+    await stop.wait()
+
+    logger.info("Stopping answer worker...")
+    await api.shutdown_event()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Minecraft Wiki Bot answer worker")
+    parser.add_argument(
+        "--concurrency",
+        "-c",
+        type=int,
+        default=max(1, settings.answer_workers),
+        help="Jobs answered at the same time (default: ANSWER_WORKERS)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, settings.log_level))
+    asyncio.run(run_worker(args.concurrency))
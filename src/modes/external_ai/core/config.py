@@ -68,6 +68,132 @@ class Settings:
         """x.ai model name (from .env or default)"""
         return os.getenv("MODEL_NAME", "grok-4-fast-non-reasoning")
 
+    @property
+    def fast_model_name(self) -> str:
+        """Small, fast model for short factual questions (defaults to MODEL_NAME)"""
+        return os.getenv("FAST_MODEL_NAME", "") or self.model_name
+
+    @property
+    def strong_model_name(self) -> str:
+        """Larger model for long or multi-step questions (defaults to MODEL_NAME)"""
+        return os.getenv("STRONG_MODEL_NAME", "") or self.model_name
+
+    @property
+    def routing_max_fast_words(self) -> int:
+        """Longest question (in words) routed to the fast model"""
+        return int(os.getenv("ROUTING_MAX_FAST_WORDS", "18"))
+
+    @property
+    def hedge_enabled(self) -> bool:
+        """Race Ollama against x.ai when x.ai exceeds its latency budget"""
+        return os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+
+    @property
+    def hedge_percentile(self) -> float:
+        """Percentile of recent x.ai latency used as the hedge budget"""
+        return float(os.getenv("HEDGE_PERCENTILE", "95"))
+
+    @property
+    def hedge_min_delay(self) -> float:
+        """Minimum head start (seconds) given to x.ai before hedging"""
+        return float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "2.0"))
+
+    @property
+    def request_deadline_seconds(self) -> float:
+        """End-to-end budget for answering one webhook (thinking message to delivery)"""
+        return float(os.getenv("REQUEST_DEADLINE_SECONDS", "45"))
+
+    @property
+    def delivery_reserve_seconds(self) -> float:
+        """Budget kept back from generation so the answer can still be delivered"""
+        return float(os.getenv("DELIVERY_RESERVE_SECONDS", "5"))
+
+    @property
+    def debounce_window_seconds(self) -> float:
+        """Quiet period that ends a burst of messages from one person (0 disables merging)"""
+        return float(os.getenv("DEBOUNCE_WINDOW_SECONDS", "1.5"))
+
+    @property
+    def debounce_max_wait_seconds(self) -> float:
+        """Longest a message may be held back while more messages keep arriving"""
+        return float(os.getenv("DEBOUNCE_MAX_WAIT_SECONDS", "6"))
+
+    @property
+    def ack_mode(self) -> str:
+        """How slow answers are acknowledged: edit (thinking message edited), reaction or post"""
+        return os.getenv("ACK_MODE", "edit").lower()
+
+    @property
+    def ack_grace_seconds(self) -> float:
+        """Answers ready within this many seconds are posted without any acknowledgement"""
+        return float(os.getenv("ACK_GRACE_SECONDS", "1.5"))
+
+    @property
+    def outbound_rate_per_second(self) -> float:
+        """Talk requests per second allowed per room"""
+        return float(os.getenv("OUTBOUND_RATE_PER_SECOND", "1.0"))
+
+    @property
+    def outbound_burst(self) -> float:
+        """Talk requests a quiet room may send back to back"""
+        return float(os.getenv("OUTBOUND_BURST", "5"))
+
+    @property
+    def outbound_max_attempts(self) -> int:
+        """Attempts per Talk request before it is given up"""
+        return int(os.getenv("OUTBOUND_MAX_ATTEMPTS", "5"))
+
+    @property
+    def outbound_max_retry_after_seconds(self) -> float:
+        """Upper bound for a single Retry-After pause"""
+        return float(os.getenv("OUTBOUND_MAX_RETRY_AFTER_SECONDS", "60"))
+
+    @property
+    def job_queue_enabled(self) -> bool:
+        """Persist questions in the durable job queue before answering them"""
+        return os.getenv("JOB_QUEUE_ENABLED", "true").lower() == "true"
+
+    @property
+    def job_queue_path(self) -> str:
+        """SQLite file backing the job queue"""
+        return os.getenv("JOB_QUEUE_PATH", "data/jobs.db")
+
+    @property
+    def answer_workers(self) -> int:
+        """Answer workers per process (0 on the ingress process when separate workers run)"""
+        return int(os.getenv("ANSWER_WORKERS", "4"))
+
+    @property
+    def job_visibility_timeout_seconds(self) -> float:
+        """Seconds before a job whose worker stopped heartbeating is handed out again"""
+        return float(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "30"))
+
+    @property
+    def job_max_attempts(self) -> int:
+        """Attempts per job before it is dead-lettered"""
+        return int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+    @property
+    def fast_start(self) -> bool:
+        """Serve requests immediately and warm up components in the background"""
+        return os.getenv("FAST_START", "true").lower() == "true"
+
+    @property
+    def ollama_base_url(self) -> str:
+        """Ollama URL used as the hedge provider"""
+        return self._config.ollama_base_url
+
+    @property
+    def ollama_base_urls(self) -> list[str]:
+        """Ollama URLs used as the hedge provider (several are load balanced)"""
+        urls = self._config.ollama_base_urls
+        return urls.split(",") if urls else [self._config.ollama_base_url]
+
+    @property
+    def ollama_model(self) -> str:
+        """Ollama model used as the hedge provider"""
+        return self._config.ollama_model
+
     @property
     def prompt_template_path(self) -> str:
         """Prompt template path"""
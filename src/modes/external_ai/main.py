@@ -4,14 +4,26 @@ NextCraftTalk External AI Mode
 Integrates NextCraftTalk-EXT code with unified configuration system.
 """
 
+import importlib
 import logging
 
-import uvicorn
-
 from src.core.config import get_config
+from src.shared.server import serve
 from src.shared.utils import setup_logging
 
 
+def preload() -> None:
+    """Load heavy read-only state once in the server master before workers are forked
+
+    This mode keeps no embedding model or vector index (questions go straight
+    to x.ai, without local retrieval); the shared state is the imported application and the profanity
+    model. The x.ai HTTP session is created per worker on startup.
+    """
+    # The profanity model is imported lazily, so load it here for the workers to share
+    importlib.import_module("src.modes.external_ai.bot.api")
+    importlib.import_module("src.shared.safety_filter").warm_up()
+
+
 def run_external_ai() -> None:
     """Run the external AI mode application"""
     config = get_config()
@@ -19,13 +31,15 @@ def run_external_ai() -> None:
 
     logger = logging.getLogger(__name__)
     logger.info("🚀 Starting NextCraftTalk in External AI mode")
-    # Always bind to port 8080 inside the container
+    # Bind to SERVER_PORT (8080) inside the container
     # External port mapping is handled by docker-compose
-    uvicorn.run(
+    serve(
         "src.modes.external_ai.bot.api:app",
         host=config.webhook_host,
-        port=8080,  # Fixed internal port for container
-        reload=True,
+        port=config.server_port,
+        workers=config.server_workers,
+        preload=preload,
+        reload=config.server_reload,
     )
 
 
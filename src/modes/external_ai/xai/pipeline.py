@@ -3,47 +3,68 @@ Direct x.ai Query Pipeline
 Bypasses RAG and queries x.ai directly for Minecraft answers
 """
 
+import importlib.util
+import json
 import logging
 import time
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
 import requests
 
-from ..core.config import settings
+from src.shared.deadline import Deadline
+from src.shared.hedging import ProviderHedger
+from src.shared.inflight import CancelToken, GenerationCancelled
+from src.shared.metrics import get_metrics
+from src.shared.model_router import ModelRouter
+from src.shared.prompting import PromptTemplate
+from src.shared.resilience import (
+    CircuitOpenError,
+    TransientError,
+    get_circuit_breaker,
+    get_retry_policy,
+    raise_for_transient_status,
+)
 
-try:
-    from watchdog.events import FileSystemEventHandler
-    from watchdog.observers import Observer
+from ..core.config import settings
 
-    WATCHDOG_AVAILABLE = True
-except ImportError:
-    WATCHDOG_AVAILABLE = False
+# watchdog itself is imported only when the file watcher starts
+WATCHDOG_AVAILABLE = importlib.util.find_spec("watchdog") is not None
 
 logger = logging.getLogger(__name__)
 
+# Prefixes of the fallback strings generate_response returns instead of raising
+ERROR_RESPONSE_PREFIXES = (
+    "Error",
+    "The AI is taking too long",
+    "An internal error occurred",
+    "The AI is taking a short break",
+)
+
+# Returned immediately while the x.ai circuit breaker is open
+UNAVAILABLE_RESPONSE = "The AI is taking a short break right now. Please try again in a minute!"
+
 if not WATCHDOG_AVAILABLE:
     logger.warning("watchdog not available. Prompt template will not auto-reload.")
 
-if WATCHDOG_AVAILABLE:
-    BaseWatcher = FileSystemEventHandler
-else:
-    BaseWatcher = object
-
 
-class PromptTemplateWatcher(BaseWatcher):
+class PromptTemplateWatcher:
     """File watcher for prompt template changes
 
     Monitors prompt_template.txt for modifications and triggers
     automatic reloading without requiring a container restart.
-    Depends on the 'watchdog' library when available.
+    Implements the event handler interface of the 'watchdog' library
+    (dispatch), so watchdog is not imported until the watcher starts.
     """
 
     def __init__(self, rag_pipeline: "DirectXAIPipeline") -> None:
-        if WATCHDOG_AVAILABLE:
-            super().__init__()
         self.rag_pipeline = rag_pipeline
 
+    def dispatch(self, event: Any) -> None:
+        """Called by the watchdog observer for every file system event"""
+        if event.event_type == "modified":
+            self.on_modified(event)
+
     def on_modified(self, event: Any) -> None:
         """Called when the prompt template file is modified"""
         if WATCHDOG_AVAILABLE and event.src_path.endswith(self.rag_pipeline.prompt_template_path):
@@ -58,6 +79,13 @@ class DirectXAIPipeline:
         xai_url: str = "https://api.x.ai/v1",
         model_name: str = "grok-4-fast-non-reasoning",
         prompt_template_path: str = "prompt_template.txt",
+        fast_model_name: str | None = None,
+        strong_model_name: str | None = None,
+        routing_max_fast_words: int = 18,
+        hedge_client: Any = None,
+        hedge_percentile: float = 95.0,
+        hedge_min_delay: float = 2.0,
+        test_connection: bool = True,
     ):
         """
         Initialize direct x.ai pipeline (no RAG)
@@ -67,21 +95,54 @@ class DirectXAIPipeline:
             xai_url: x.ai API endpoint
             model_name: Model to use (grok-4-fast-non-reasoning)
             prompt_template_path: Path to prompt template file
+            fast_model_name: Optional small model for short factual questions
+            strong_model_name: Optional larger model for multi-step questions
+            routing_max_fast_words: Longest question routed to the fast model
+            hedge_client: Optional secondary provider (e.g. OllamaClient) raced against slow x.ai calls
+            hedge_percentile: Percentile of recent x.ai latency used as the hedge budget
+            hedge_min_delay: Minimum head start given to x.ai before hedging
+            test_connection: Make a test completion now; pass False to call
+                check_connection() later (e.g. in a background warm-up)
         """
         self.xai_api_key = xai_api_key
         self.xai_url = xai_url
         self.model_name = model_name
         self.prompt_template_path = prompt_template_path
 
-        # Load prompt template from external file (see prompt_template.txt)
+        # Shared circuit breaker and retry policy for the x.ai endpoint
+        self.breaker = get_circuit_breaker("xai")
+        self.retry_policy = get_retry_policy()
+
+        # Complexity-based routing (only active when the two tiers differ)
+        self.router = ModelRouter(
+            fast_model=fast_model_name or model_name,
+            strong_model=strong_model_name or model_name,
+            max_fast_words=routing_max_fast_words,
+        )
+
+        # Optional hedging against a second provider
+        self.hedge_client = hedge_client
+        self.hedger: Optional[ProviderHedger] = None
+        if hedge_client is not None:
+            self.hedger = ProviderHedger(
+                primary_name="xai",
+                secondary_name="ollama",
+                percentile=hedge_percentile,
+                min_delay=hedge_min_delay,
+            )
+
+        # Load prompt template from external file (see prompt_template.txt),
+        # split into a cacheable system prefix and the per-question part
         self.prompt_template = self._load_prompt_template()
+        self.prompt = PromptTemplate(self.prompt_template)
 
         # Start file watcher for automatic prompt reloading
         # (requires watchdog dependency)
         self._start_file_watcher()
 
         # Test x.ai connection (depends on x.ai API key)
-        self._test_xai_connection()
+        if test_connection:
+            self.check_connection()
 
     def _load_prompt_template(self) -> str:
         """Load prompt template from file"""
@@ -131,8 +192,12 @@ YOUR JOB:
 ANSWER:
 """
 
-    def _test_xai_connection(self) -> None:
-        """Test if x.ai API is accessible"""
+    def check_connection(self) -> bool:
+        """Test if x.ai API is accessible
+
+        Returns:
+            True if a test completion succeeded
+        """
         try:
             # Test with a simple chat completion request
             headers = {
@@ -154,6 +219,7 @@ ANSWER:
             )
             if response.status_code == 200:
                 logger.info(f"✓ Connected to x.ai API. Using model: {self.model_name}")
+                return True
             else:
                 logger.warning(f"x.ai API connection failed: {response.status_code}")
                 if response.status_code == 401:
@@ -162,6 +228,7 @@ ANSWER:
                     logger.warning("  API request format may be incorrect")
         except Exception as e:
             print(f"⚠ Could not connect to x.ai API: {e}")
+        return False
 
     def _start_file_watcher(self) -> None:
         """Start file watcher for prompt template changes
@@ -175,6 +242,8 @@ ANSWER:
             return
 
         try:
+            from watchdog.observers import Observer
+
             template_path = Path(self.prompt_template_path)
             if not template_path.exists():
                 print(f"⚠ Prompt template file {self.prompt_template_path} does not " f"exist, skipping file watcher")
@@ -200,6 +269,7 @@ ANSWER:
         try:
             old_template = self.prompt_template
             self.prompt_template = self._load_prompt_template()
+            self.prompt = PromptTemplate(self.prompt_template)
             if self.prompt_template != old_template:
                 logger.info("✅ Prompt template reloaded successfully!")
             else:
@@ -215,14 +285,78 @@ ANSWER:
         if hasattr(self, "observer") and self.observer:
             self.observer.stop()
             self.observer.join()
+            self.observer = None
             logger.debug("🛑 Stopped file watcher")
+        if getattr(self, "hedger", None):
+            self.hedger.shutdown()
+            self.hedger = None
 
     def __del__(self) -> None:
         """Cleanup when object is destroyed"""
         self.stop_file_watcher()
 
-    def generate_response(self, prompt: str, temperature: float = 0.3) -> str:
-        """Generate response using x.ai API"""
+    def _read_stream(self, response: requests.Response, cancel: CancelToken) -> str:
+        """Collect a streamed completion, closing the connection as soon as it is cancelled"""
+        parts = []
+        try:
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                cancel.raise_if_cancelled()
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if chunk.get("usage"):
+                    self._record_usage(chunk["usage"])
+                choices = chunk.get("choices") or []
+                if choices:
+                    parts.append(choices[0].get("delta", {}).get("content") or "")
+        finally:
+            response.close()
+        return "".join(parts)
+
+    @staticmethod
+    def _record_usage(usage: dict) -> None:
+        """Record prompt, cached prompt and completion tokens reported by x.ai
+
+        x.ai caches the longest prompt prefix it has seen recently; cached
+        tokens skip prefill and are billed at a discount. xai.prompt_cache_ratio
+        shows how much of the prompt traffic the stable system prefix saves.
+        """
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        metrics = get_metrics()
+        metrics.increment("xai.prompt_tokens", prompt_tokens)
+        metrics.increment("xai.cached_tokens", cached_tokens)
+        metrics.increment("xai.completion_tokens", usage.get("completion_tokens") or 0)
+        counters = metrics.snapshot()["counters"]
+        if counters.get("xai.prompt_tokens"):
+            metrics.set_gauge("xai.prompt_cache_ratio", counters["xai.cached_tokens"] / counters["xai.prompt_tokens"])
+
+    def generate_response(
+        self,
+        prompt: str,
+        temperature: float = 0.3,
+        model: str | None = None,
+        timeout: float = 60.0,
+        cancel: CancelToken | None = None,
+        system: str | None = None,
+    ) -> str:
+        """Generate response using x.ai API
+
+        Retries transient failures within the overall ``timeout`` budget and
+        fails fast while the x.ai circuit breaker is open. When a cancel token
+        is given the completion is streamed so a superseded request can close
+        its HTTP stream instead of running to completion.
+
+        ``system`` is sent as a leading system message; keeping it identical
+        across requests lets x.ai serve it from its prompt cache.
+
+        Raises:
+            GenerationCancelled: If the cancel token fires mid-generation
+        """
+        streaming = cancel is not None
 
         url = f"{self.xai_url}/chat/completions"
         headers = {
@@ -230,23 +364,44 @@ ANSWER:
             "Content-Type": "application/json",
         }
         payload = {
-            "model": self.model_name,
+            "model": model or self.model_name,
             "messages": [{"role": "user", "content": prompt}],
             "temperature": temperature,
             "max_tokens": 1500,  # Increased for more comprehensive responses
-            "stream": False,
+            "stream": streaming,
         }
-
-        try:
+        if system:
+            payload["messages"].insert(0, {"role": "system", "content": system})
+        if streaming:
+            # Usage (including cached prompt tokens) arrives in a final chunk only when asked for
+            payload["stream_options"] = {"include_usage": True}
+
+        def _post(attempt_timeout: float) -> requests.Response:
+            if cancel is not None:
+                cancel.raise_if_cancelled()
             response = requests.post(
                 url,
                 headers=headers,
                 json=payload,
-                timeout=60,
+                timeout=attempt_timeout,
                 allow_redirects=False,  # Security: Prevent SSRF via redirects
+                stream=streaming,
             )
+            raise_for_transient_status(response)
+            return response
+
+        try:
+            response = self.retry_policy.call(_post, breaker=self.breaker, budget=timeout, attempt_timeout=timeout)
             if response.status_code == 200:
+                if cancel is not None:
+                    answer = self._read_stream(response, cancel).strip()
+                    return answer or (
+                        "I found some information but couldn't generate a "
+                        "complete answer. Please try rephrasing your question."
+                    )
                 data = response.json()
+                if data.get("usage"):
+                    self._record_usage(data["usage"])
                 if "choices" in data and len(data["choices"]) > 0:
                     answer = str(data["choices"][0]["message"]["content"]).strip()
                     if answer:
@@ -260,21 +415,76 @@ ANSWER:
                     return "Error: No response generated by x.ai"
             else:
                 return f"Error generating response: {response.status_code} - " f"{response.text}"
+        except GenerationCancelled:
+            logger.info("✂️ x.ai generation cancelled, stream closed")
+            raise
+        except CircuitOpenError:
+            logger.warning("x.ai circuit breaker is open - failing fast")
+            return UNAVAILABLE_RESPONSE
         except requests.exceptions.Timeout:
             return "The AI is taking too long to respond. Please try a simpler " "question or try again later."
+        except TransientError as e:
+            logger.error(f"x.ai API still failing after retries: {e}")
+            return f"Error generating response: {e}"
         except Exception as e:
             logger.error(f"Error connecting to x.ai API: {str(e)}")
             return "An internal error occurred while connecting to x.ai API. Please try again later."
 
-    def answer_question(self, query: str, include_sources: bool = True) -> dict:
+    @staticmethod
+    def is_error_response(answer: Optional[str]) -> bool:
+        """Check whether generate_response returned one of its fallback strings"""
+        return not answer or answer.startswith(ERROR_RESPONSE_PREFIXES)
+
+    def generate_hedged(
+        self,
+        prompt: str,
+        model: str | None = None,
+        timeout: float = 60.0,
+        cancel: CancelToken | None = None,
+        system: str | None = None,
+    ) -> str:
+        """Generate with x.ai, racing the hedge provider if x.ai is slow or failing
+
+        ``system`` goes to Ollama's system field, so the hedge provider keeps
+        the same stable prefix (and KV cache reuse) as x.ai.
+        """
+        if self.hedger is None:
+            return self.generate_response(prompt, model=model, timeout=timeout, cancel=cancel, system=system)
+
+        def primary(provider_cancel: CancelToken) -> Optional[str]:
+            return self.generate_response(prompt, model=model, timeout=timeout, cancel=provider_cancel, system=system)
+
+        def secondary(provider_cancel: CancelToken) -> Optional[str]:
+            return self.hedge_client.generate(prompt=prompt, timeout=timeout, cancel=provider_cancel, system=system)
+
+        result = self.hedger.run(
+            primary, secondary, is_valid=lambda answer: not self.is_error_response(answer), cancel=cancel
+        )
+        if result["hedged"]:
+            logger.info(f"🏁 Hedged request won by {result['provider']} in {result['latency']:.2f}s")
+        return result["answer"] or "An internal error occurred while connecting to x.ai API. Please try again later."
+
+    def answer_question(
+        self, query: str, include_sources: bool = True, timeout: float = 60.0, cancel: CancelToken | None = None
+    ) -> dict:
         """
         Direct x.ai query: bypass RAG and ask x.ai directly
 
+        Args:
+            query: User question
+            include_sources: Unused (no RAG sources in direct mode)
+            timeout: Overall generation budget in seconds, shared by routing escalations
+            cancel: Optional token that aborts the generation when the question is superseded
+
         Returns:
             dict with 'answer', 'sources', 'context_used'
+
+        Raises:
+            GenerationCancelled: If the cancel token fires before an answer is ready
         """
 
         start_time = time.time()
+        deadline = Deadline(timeout, started_at=start_time)
 
         # Direct x.ai query - no RAG retrieval
         if settings.verbose_logging:
@@ -282,17 +492,28 @@ ANSWER:
         else:
             logger.info("🤖 Processing query with x.ai")
 
-        # Build simple prompt for x.ai
-        prompt = f"""You are a helpful Minecraft assistant for kids.
+        # Stable system prefix from the prompt template, then the question (no context in direct mode)
+        prompt_template = self.prompt
+        system = prompt_template.system
+        prompt = prompt_template.render(context="", query=query)
 
-Question: {query}
-
-Please provide a clear, kid-friendly answer about Minecraft. Keep it simple and fun!"""
-
-        # Generate response directly from x.ai
+        # Generate response directly from x.ai, routed by question complexity
         generate_start = time.time()
-        answer = self.generate_response(prompt)
+        if self.router.enabled:
+            routed = self.router.run(
+                query,
+                lambda model: self.generate_hedged(
+                    prompt, model=model, timeout=deadline.timeout(), cancel=cancel, system=system
+                ),
+            )
+            answer = routed["answer"]
+            model_used = routed["model"]
+        else:
+            answer = self.generate_hedged(prompt, timeout=deadline.timeout(), cancel=cancel, system=system)
+            model_used = self.model_name
         generate_time = time.time() - generate_start
+        if cancel is not None:
+            cancel.raise_if_cancelled()
 
         if settings.verbose_logging:
             logger.info(f"⏱️ x.ai response generation took {generate_time:.2f}s")
@@ -303,6 +524,7 @@ Please provide a clear, kid-friendly answer about Minecraft. Keep it simple and
             "answer": answer,
             "sources": [],  # No sources since we're not using RAG
             "context_used": 0,  # No context retrieved
+            "model": model_used,
         }
 
         if settings.verbose_logging:
@@ -0,0 +1,28 @@
+"""
+Knowledge Base Storage Module
+"""
+
+from .embedding_cache import EmbeddingCache
+from .embedding_service import EmbeddingService
+from .embeddings import EmbeddingBackend, create_embedding_backend, get_embedding_backend
+from .page_index import PageIndex
+from .quantized_index import QuantizedIndex
+from .sharded_index import ShardedIndex
+from .snapshots import IndexSnapshot, SnapshotHandle, SnapshotStore, build_snapshot
+from .vector_db import MinecraftVectorDB
+
+__all__ = [
+    "EmbeddingBackend",
+    "EmbeddingCache",
+    "EmbeddingService",
+    "IndexSnapshot",
+    "MinecraftVectorDB",
+    "PageIndex",
+    "QuantizedIndex",
+    "ShardedIndex",
+    "SnapshotHandle",
+    "SnapshotStore",
+    "build_snapshot",
+    "create_embedding_backend",
+    "get_embedding_backend",
+]
@@ -0,0 +1,184 @@
+"""
+Persistent content-addressed embedding cache
+
+Re-ingesting the wiki, switching index types or rebuilding after a crash
+used to recompute every chunk embedding. EmbeddingCache keeps them on disk,
+keyed by (embedding model id, SHA-256 of the whitespace-normalised text), so
+a rebuild only encodes chunks whose text actually changed.
+
+Layout, one directory per model under EMBEDDING_CACHE_PATH:
+- meta.json: model id, dimensions and dtype;
+- keys.bin: 32-byte SHA-256 digests, one per row;
+- vectors.f32: raw float32 rows in the same order, read through np.memmap.
+
+Both files are append-only. Rows are written before their keys, and on open
+both are cut back to the rows that have a key and a complete vector, so a
+crash mid-append loses at most the last batch. One process should write to a
+cache directory at a time.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from ....shared.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+KEY_BYTES = 32
+
+
+def normalize_text(text: str) -> str:
+    """Text as hashed: NFC with runs of whitespace collapsed, so reformatting doesn't miss the cache"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def content_key(text: str) -> bytes:
+    """SHA-256 digest of the normalised text"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """On-disk, memory-mapped vectors of one embedding model, addressed by chunk content"""
+
+    def __init__(self, directory: str, model_id: str):
+        """
+        Args:
+            directory: Cache root; each model gets its own subdirectory
+            model_id: EmbeddingBackend.model_id of the vectors stored
+        """
+        self.model_id = model_id
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model_id).strip("_")[:60]
+        self.path = Path(directory) / f"{slug}-{hashlib.sha1(model_id.encode('utf-8')).hexdigest()[:8]}"
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.keys_path = self.path / "keys.bin"
+        self.vectors_path = self.path / "vectors.f32"
+        self.meta_path = self.path / "meta.json"
+        self.metrics = get_metrics()
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._dim: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._open()
+
+    def _open(self) -> None:
+        """Load the key index and drop a partially written tail"""
+        if not self.meta_path.exists():
+            return
+        meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+        if meta.get("model_id") != self.model_id:
+            raise ValueError(f"Embedding cache {self.path} belongs to {meta.get('model_id')}, not {self.model_id}")
+        self._dim = int(meta["dim"])
+        keys = self.keys_path.read_bytes() if self.keys_path.exists() else b""
+        vector_rows = self.vectors_path.stat().st_size // (self._dim * 4) if self.vectors_path.exists() else 0
+        rows = min(len(keys) // KEY_BYTES, vector_rows)
+        for path, size in ((self.keys_path, rows * KEY_BYTES), (self.vectors_path, rows * self._dim * 4)):
+            if path.exists() and path.stat().st_size != size:
+                logger.warning(f"Truncating incomplete embedding cache file {path} to {size} bytes")
+                os.truncate(path, size)
+        self._index = {keys[i * KEY_BYTES : (i + 1) * KEY_BYTES]: i for i in range(rows)}
+        logger.info(f"💾 Embedding cache {self.path.name}: {rows} vectors")
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _matrix(self) -> Optional[np.memmap]:
+        """Memory map of all stored rows, remapped after appends"""
+        rows = len(self._index)
+        if rows == 0:
+            return None
+        if self._vectors is None or self._vectors.shape[0] != rows:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim))
+        return self._vectors
+
+    def get(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector per text, None where the text hasn't been embedded with this model"""
+        keys = [content_key(text) for text in texts]
+        with self._lock:
+            rows = [self._index.get(key) for key in keys]
+            if all(row is None for row in rows):
+                return [None] * len(rows)
+            matrix = self._matrix()
+            # A row was found, so the cache isn't empty
+            assert matrix is not None
+            return [np.array(matrix[row]) if row is not None else None for row in rows]
+
+    def put(self, texts: List[str], vectors: Any) -> None:
+        """
+        Store vectors for texts (texts already cached are skipped)
+
+        Raises:
+            ValueError: If the vectors' dimensions differ from the cached ones
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+                meta = {"model_id": self.model_id, "dim": self._dim, "dtype": "float32"}
+                self.meta_path.write_text(json.dumps(meta), encoding="utf-8")
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(
+                    f"Expected {self._dim}-dimensional vectors for {self.model_id}, got {vectors.shape[1]}"
+                )
+
+            new_keys: Dict[bytes, np.ndarray] = {}
+            for text, vector in zip(texts, vectors):
+                key = content_key(text)
+                if key not in self._index and key not in new_keys:
+                    new_keys[key] = vector
+            if not new_keys:
+                return
+            # Vectors first: keys without a complete vector behind them are dropped on open
+            with open(self.vectors_path, "ab") as f:
+                np.stack(list(new_keys.values())).tofile(f)
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(new_keys))
+            start = len(self._index)
+            for offset, key in enumerate(new_keys):
+                self._index[key] = start + offset
+
+    def encode(self, texts: List[str], encode: Callable[[List[str]], Any]) -> np.ndarray:
+        """
+        Embed texts, encoding only those missing from the cache
+
+        Args:
+            texts: Texts to embed
+            encode: Backend encode for cache misses
+
+        Returns:
+            float32 array with one row per text
+        """
+        cached = self.get(texts)
+        missing = [index for index, vector in enumerate(cached) if vector is None]
+        self.metrics.increment("embedding_cache.hits", len(texts) - len(missing))
+        self.metrics.increment("embedding_cache.misses", len(missing))
+        if missing:
+            # Each distinct text is encoded once, however often it repeats in the batch
+            keys = {index: content_key(texts[index]) for index in missing}
+            first: Dict[bytes, int] = {}
+            for index, key in keys.items():
+                first.setdefault(key, index)
+            distinct = [texts[index] for index in first.values()]
+            vectors = np.asarray(encode(distinct), dtype=np.float32)
+            self.put(distinct, vectors)
+            rows = dict(zip(first, vectors))
+            for index, key in keys.items():
+                cached[index] = rows[key]
+        return np.stack(cached) if cached else np.zeros((0, self._dim or 0), dtype=np.float32)
+
+    def describe(self) -> Dict[str, Any]:
+        """Size of the cache"""
+        return {
+            "model_id": self.model_id,
+            "vectors": len(self),
+            "dim": self._dim,
+            "bytes": len(self) * ((self._dim or 0) * 4 + KEY_BYTES),
+        }
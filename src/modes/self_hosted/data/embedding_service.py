@@ -0,0 +1,173 @@
+"""
+Micro-batched embedding service
+
+Each concurrent question used to run its own embedding forward pass. On CPU
+a batch of 16 short texts costs little more than a single one, so
+EmbeddingService puts requests from all threads into one queue. A worker
+thread waits up to EMBEDDING_BATCH_WAIT_MS after the first request for more
+(or until EMBEDDING_BATCH_SIZE texts are queued), runs a single encode and
+resolves every caller's future with its own rows.
+
+The worker is the only thread calling the model, so backends that aren't
+thread-safe are fine. Batch sizes, queue wait and encode time are recorded as
+embedding.* metrics.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from ....shared.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    """Texts of one caller waiting to be embedded"""
+
+    __slots__ = ("texts", "future", "enqueued_at")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingService:
+    """Collects embedding requests for a few milliseconds and encodes them in one batch"""
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], Any],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = "embedding",
+    ):
+        """
+        Args:
+            encode: Embeds a list of texts, returning one vector per text
+            max_batch_size: Texts per encode; a batch closes early when reached
+            max_wait_ms: How long the first request of a batch waits for company
+            name: Metric prefix
+        """
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self.metrics = get_metrics()
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        Queue texts for embedding
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Future resolving to a float32 array with one row per text
+        """
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return request.future
+        self._ensure_worker()
+        self._queue.put(request)
+        self.metrics.set_gauge(f"{self.name}.queue_depth", self._queue.qsize())
+        return request.future
+
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        """Embed texts, blocking until their batch has been encoded"""
+        return self.submit(texts).result(timeout=timeout)
+
+    async def embed_async(self, texts: List[str]) -> np.ndarray:
+        """Embed texts without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        """Gather requests arriving within max_wait of the first one, up to max_batch_size texts"""
+        batch = [first]
+        size = len(first.texts)
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _encode(self, batch: List[_Request]) -> None:
+        """Run one encode for a batch and hand each caller its rows"""
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = [text for request in batch for text in request.texts]
+        started = time.perf_counter()
+        for request in batch:
+            self.metrics.observe(f"{self.name}.queue_wait", started - request.enqueued_at)
+        try:
+            vectors = np.asarray(self.encode(texts), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Embedding batch of {len(texts)} texts failed: {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        self.metrics.observe(f"{self.name}.encode.latency", time.perf_counter() - started)
+        self.metrics.increment(f"{self.name}.batches")
+        self.metrics.increment(f"{self.name}.texts", len(texts))
+        self.metrics.set_gauge(f"{self.name}.last_batch_size", len(texts))
+        self.metrics.set_gauge(f"{self.name}.last_batch_requests", len(batch))
+
+        offset = 0
+        for request in batch:
+            request.future.set_result(vectors[offset : offset + len(request.texts)])
+            offset += len(request.texts)
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            self.metrics.set_gauge(f"{self.name}.queue_depth", self._queue.qsize())
+            self._encode(batch)
+
+    def stop(self) -> None:
+        """Finish queued requests and stop the worker"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+    def describe(self) -> Dict[str, Any]:
+        """Batching settings and counters for /stats"""
+        counters = self.metrics.snapshot()["counters"]
+        batches = counters.get(f"{self.name}.batches", 0)
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": batches,
+            "mean_batch_size": counters.get(f"{self.name}.texts", 0) / batches if batches else 0.0,
+            "queue_depth": self._queue.qsize(),
+        }
@@ -0,0 +1,275 @@
+"""
+Embedding backends
+
+The knowledge base can embed text with any of these interchangeable
+backends (EMBEDDING_BACKEND):
+
+- sentence-transformers: the model on torch in this process (default,
+  EMBEDDING_MODEL=all-MiniLM-L6-v2);
+- ollama: Ollama's batch /api/embed endpoint (EMBEDDING_MODEL=nomic-embed-text,
+  ...), which moves embedding work and memory to the Ollama server;
+- onnx: an int8-quantized ONNX export run with ONNX Runtime
+  (EMBEDDING_ONNX_PATH, a directory with the .onnx file and tokenizer.json).
+  This needs no torch, which saves memory and often runs faster on CPUs
+  with VNNI/AVX-512.
+
+All backends return L2-normalised float32 rows, so cosine distances are
+comparable. Vectors from different models are not; MinecraftVectorDB records
+the backend's model_id with its collection and refuses a different one.
+
+To quantize an fp32 ONNX export (e.g. from the model's Hugging Face repo):
+    python -m src.modes.self_hosted.data.embeddings quantize model.onnx model_int8.onnx
+
+scripts/benchmark_embeddings.py compares the backends on this host.
+"""
+
+import argparse
+import importlib.util
+import logging
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_TRANSFORMERS_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+ONNXRUNTIME_AVAILABLE = importlib.util.find_spec("onnxruntime") is not None
+
+BACKENDS = ("sentence-transformers", "ollama", "onnx")
+
+
+def normalize(vectors: Any) -> np.ndarray:
+    """float32 rows scaled to unit length"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+
+class EmbeddingBackend(ABC):
+    """Base class: embeds texts into unit-length float32 vectors"""
+
+    name = "base"
+    # Whether a model loaded before the server forks its workers keeps working in them
+    fork_safe = True
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def model_id(self) -> str:
+        """Identifies the vector space: vectors with different ids must not be mixed"""
+        return f"{self.name}:{self.model}"
+
+    def load(self) -> None:
+        """Load the model now instead of on the first encode"""
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            float32 array with one unit-length row per text
+        """
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        return self.encode(texts)
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """sentence-transformers model on torch (CPU)"""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model: str = "all-MiniLM-L6-v2", batch_size: int = 32, device: str = "cpu"):
+        super().__init__(model)
+        self.batch_size = batch_size
+        self.device = device
+        self._model: Any = None
+
+    def load(self) -> None:
+        if self._model is None:
+            if not SENTENCE_TRANSFORMERS_AVAILABLE:
+                raise RuntimeError("sentence-transformers is not installed")
+            from sentence_transformers import SentenceTransformer
+
+            started = time.perf_counter()
+            self._model = SentenceTransformer(self.model, device=self.device)
+            logger.info(f"🧠 Loaded embedding model {self.model} in {time.perf_counter() - started:.1f}s")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        self.load()
+        vectors = self._model.encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True, show_progress_bar=False
+        )
+        return normalize(vectors)
+
+
+class OllamaEmbeddingBackend(EmbeddingBackend):
+    """Ollama's batch /api/embed endpoint"""
+
+    name = "ollama"
+
+    def __init__(self, model: str = "nomic-embed-text", base_url: str = "http://localhost:11434", timeout: float = 60):
+        super().__init__(model)
+        self.base_url = base_url
+        self.timeout = timeout
+        self._client: Any = None
+
+    def load(self) -> None:
+        if self._client is None:
+            from ..ollama.client import OllamaClient
+
+            self._client = OllamaClient(self.base_url, model=self.model, check_model=False)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        self.load()
+        vectors = self._client.embed(list(texts), timeout=self.timeout)
+        if vectors is None:
+            raise RuntimeError(f"Ollama embedding with {self.model} at {self.base_url} failed")
+        return normalize(vectors)
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """int8-quantized ONNX model run with ONNX Runtime, mean-pooled like sentence-transformers"""
+
+    name = "onnx"
+    # The session starts its intra-op thread pool when created; threads don't survive fork
+    fork_safe = False
+
+    def __init__(self, model_path: str, max_length: int = 256, threads: int = 0):
+        """
+        Args:
+            model_path: .onnx file, or a directory containing one (an int8/quantized file is preferred)
+                and tokenizer.json
+            max_length: Token limit per text
+            threads: ONNX Runtime intra-op threads (0 = ONNX Runtime default)
+        """
+        super().__init__(str(model_path))
+        self.max_length = max_length
+        self.threads = threads
+        self._session: Any = None
+        self._tokenizer: Any = None
+
+    @staticmethod
+    def find_model_file(path: Path) -> Path:
+        """The .onnx file to run: the path itself, or the quantized one in a directory"""
+        if path.is_file():
+            return path
+        candidates = sorted(path.glob("*.onnx")) + sorted(path.glob("onnx/*.onnx"))
+        if not candidates:
+            raise FileNotFoundError(f"No .onnx model in {path}")
+        quantized = [c for c in candidates if any(tag in c.stem for tag in ("int8", "qint8", "quantized"))]
+        return (quantized or candidates)[0]
+
+    def load(self) -> None:
+        if self._session is None:
+            if not ONNXRUNTIME_AVAILABLE:
+                raise RuntimeError("onnxruntime is not installed")
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+
+            model_file = self.find_model_file(Path(self.model))
+            tokenizer_file = next(
+                p
+                for p in (model_file.parent / "tokenizer.json", model_file.parent.parent / "tokenizer.json")
+                if p.exists()
+            )
+            options = ort.SessionOptions()
+            if self.threads:
+                options.intra_op_num_threads = self.threads
+            self._session = ort.InferenceSession(str(model_file), options, providers=["CPUExecutionProvider"])
+            self._tokenizer = Tokenizer.from_file(str(tokenizer_file))
+            self._tokenizer.enable_truncation(max_length=self.max_length)
+            self._tokenizer.enable_padding()
+            logger.info(f"🧠 Loaded ONNX embedding model {model_file}")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        self.load()
+        encodings = self._tokenizer.encode_batch(list(texts))
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        names = {i.name for i in self._session.get_inputs()}
+        output = self._session.run(None, {k: v for k, v in inputs.items() if k in names})[0]
+        if output.ndim == 3:
+            # Mean pooling over real (non-padding) tokens
+            weights = mask[:, :, None].astype(np.float32)
+            output = (output * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        return normalize(output)
+
+
+def quantize_onnx_model(source: str, target: str) -> None:
+    """Write a dynamically int8-quantized copy of an fp32 ONNX model"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+
+
+def create_embedding_backend(backend: str, model: str = "", **kwargs: Any) -> EmbeddingBackend:
+    """
+    Build an embedding backend
+
+    Args:
+        backend: "sentence-transformers", "ollama" or "onnx"
+        model: Model name (sentence-transformers/Ollama) or ONNX model path
+        **kwargs: Backend options (base_url for Ollama, threads/max_length for ONNX, ...)
+
+    Raises:
+        ValueError: For an unknown backend
+    """
+    if backend == "sentence-transformers":
+        return SentenceTransformerBackend(model or "all-MiniLM-L6-v2", **kwargs)
+    if backend == "ollama":
+        return OllamaEmbeddingBackend(model or "nomic-embed-text", **kwargs)
+    if backend == "onnx":
+        return OnnxEmbeddingBackend(model, **kwargs)
+    raise ValueError(f"Unknown embedding backend {backend!r} (expected one of {', '.join(BACKENDS)})")
+
+
+# Global instance
+_embedding_backend: Optional[EmbeddingBackend] = None
+
+
+def get_embedding_backend() -> EmbeddingBackend:
+    """Get the global embedding backend chosen by EMBEDDING_BACKEND"""
+    global _embedding_backend
+    if _embedding_backend is None:
+        from ....core.config import get_config
+
+        config = get_config()
+        kwargs: dict = {}
+        model = config.embedding_model
+        if config.embedding_backend == "ollama":
+            kwargs["base_url"] = config.ollama_base_url
+        elif config.embedding_backend == "onnx":
+            model = config.embedding_onnx_path
+        _embedding_backend = create_embedding_backend(config.embedding_backend, model, **kwargs)
+    return _embedding_backend
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Embedding backend utilities")
+    commands = parser.add_subparsers(dest="command", required=True)
+    quantize = commands.add_parser("quantize", help="Quantize an fp32 ONNX embedding model to int8")
+    quantize.add_argument("source", help="fp32 .onnx file")
+    quantize.add_argument("target", help="int8 .onnx file to write")
+    args = parser.parse_args()
+
+    if args.command == "quantize":
+        quantize_onnx_model(args.source, args.target)
+        print(f"Wrote {args.target}; copy tokenizer.json next to it and set EMBEDDING_ONNX_PATH")
+
+
+if __name__ == "__main__":
+    main()
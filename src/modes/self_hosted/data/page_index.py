@@ -0,0 +1,189 @@
+"""
+Page-level index for two-stage retrieval
+
+Scoring every chunk for every question grows with the corpus. PageIndex
+keeps one vector per wiki page, built from the `source`, `title` and
+`chunk_id` metadata ContentProcessor attaches to every chunk: the page title
+plus the start of its first chunk (a summary of the page). A question is
+first matched against the pages, and only the chunks of the best
+VECTOR_PAGE_CANDIDATES pages are scored, so search cost follows the number
+of pages rather than the number of chunks. Context then also comes from a
+few coherent pages instead of fragments of many.
+
+Chunks without a `source` (e.g. knowledge added through the API) are kept
+apart and always searched. A chunk_id that a page already holds starts a
+re-ingest of that page: its earlier rows are dropped and its summary is
+rebuilt from the new content.
+
+Snapshots (snapshots.py) save the page level with the chunks and load it with
+the page vectors memory-mapped, so nothing is re-embedded on a swap.
+"""
+
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Characters of the first chunk that summarise a page
+SUMMARY_CHARS = 600
+
+
+def page_summary(title: str, first_chunk: str) -> str:
+    """Text embedded for a page: its title and the start of its first chunk"""
+    return f"{title}\n{first_chunk[:SUMMARY_CHARS]}".strip()
+
+
+class PageIndex:
+    """One vector per page, with the chunk rows of each page"""
+
+    def __init__(self, encode: Callable[[List[str]], Any]):
+        """
+        Args:
+            encode: Embeds page summaries (unit-length rows)
+        """
+        self.encode = encode
+        self._lock = threading.Lock()
+        self.sources: List[str] = []
+        self._page_of_source: Dict[str, int] = {}
+        self._rows: List[List[int]] = []
+        # chunk_ids registered for each page since it was last (re-)ingested
+        self._chunk_ids: List[Set[Any]] = []
+        # chunk_id of the chunk each page summary was built from (the lowest seen wins)
+        self._summary_chunk: List[float] = []
+        self._unpaged: List[int] = []
+        self._vectors: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def add(self, rows: Sequence[int], metadatas: Sequence[Dict[str, Any]], document: Callable[[int], str]) -> None:
+        """
+        Register stored chunks with their pages, (re-)embedding summaries that changed
+
+        Args:
+            rows: Row of each chunk in the chunk index
+            metadatas: Chunk metadata (source, title, chunk_id)
+            document: Text of the chunk in a row (only read for summary chunks)
+        """
+        summaries: Dict[int, str] = {}
+        with self._lock:
+            for row, metadata in zip(rows, metadatas):
+                source = (metadata or {}).get("source")
+                if not source:
+                    self._unpaged.append(row)
+                    continue
+                page = self._page_of_source.get(source)
+                if page is None:
+                    page = self._page_of_source[source] = len(self.sources)
+                    self.sources.append(source)
+                    self._rows.append([])
+                    self._chunk_ids.append(set())
+                    self._summary_chunk.append(np.inf)
+                chunk_id = metadata.get("chunk_id")
+                if chunk_id is not None:
+                    if chunk_id in self._chunk_ids[page]:
+                        # The page is being re-ingested: forget the rows of its old content
+                        self._rows[page] = []
+                        self._chunk_ids[page] = set()
+                        self._summary_chunk[page] = np.inf
+                    self._chunk_ids[page].add(chunk_id)
+                self._rows[page].append(row)
+                rank = chunk_id if isinstance(chunk_id, (int, float)) else 0
+                if rank <= self._summary_chunk[page]:
+                    self._summary_chunk[page] = rank
+                    summaries[page] = page_summary(str(metadata.get("title") or source), document(row))
+        if not summaries:
+            return
+
+        # Encode outside the lock so searches aren't held up by ingestion
+        pages = list(summaries)
+        vectors = np.asarray(self.encode([summaries[page] for page in pages]), dtype=np.float32)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            if len(self._vectors) < len(self.sources):
+                grown = np.zeros((max(2 * len(self._vectors), len(self.sources)), vectors.shape[1]), dtype=np.float32)
+                grown[: len(self._vectors)] = self._vectors
+                self._vectors = grown
+            self._vectors[pages] = vectors
+
+    def search(self, query: Any, n_pages: int) -> List[int]:
+        """Best-matching pages for a unit-length query vector"""
+        with self._lock:
+            vectors = self._vectors
+            # Pages registered by an add() still encoding their summary aren't searchable yet
+            pages = len(self.sources)
+        if vectors is None:
+            return []
+        pages = min(pages, len(vectors))
+        if not pages:
+            return []
+        scores = vectors[:pages] @ np.asarray(query, dtype=np.float32).reshape(-1)
+        n_pages = min(n_pages, pages)
+        top = np.argpartition(-scores, n_pages - 1)[:n_pages]
+        return top[np.argsort(-scores[top])].tolist()
+
+    def rows(self, pages: Sequence[int]) -> np.ndarray:
+        """Chunk rows of the given pages plus every chunk without a page"""
+        with self._lock:
+            selected = [row for page in pages for row in self._rows[page]] + self._unpaged
+        return np.unique(np.asarray(selected, dtype=np.int64))
+
+    def save(self, directory: str) -> None:
+        """Write pages.json and the page vectors (pages.f32) to a directory"""
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            pages = len(self.sources)
+            vectors = np.zeros((0, 0), dtype=np.float32) if self._vectors is None else self._vectors[:pages]
+            state = {
+                "sources": self.sources,
+                "rows": self._rows,
+                "chunk_ids": [sorted(ids, key=str) for ids in self._chunk_ids],
+                "summary_chunks": self._summary_chunk,
+                "unpaged": self._unpaged,
+                "dim": int(vectors.shape[1]),
+            }
+            (path / "pages.json").write_text(json.dumps(state), encoding="utf-8")
+            np.ascontiguousarray(vectors).tofile(path / "pages.f32")
+
+    @classmethod
+    def load(cls, directory: str, encode: Callable[[List[str]], Any]) -> "PageIndex":
+        """
+        Page index saved by save(), with the page vectors memory-mapped
+
+        Args:
+            directory: Directory written by save()
+            encode: Embeds page summaries of chunks added later
+        """
+        path = Path(directory)
+        state = json.loads((path / "pages.json").read_text(encoding="utf-8"))
+        pages = cls(encode)
+        pages.sources = state["sources"]
+        pages._page_of_source = {source: page for page, source in enumerate(pages.sources)}
+        pages._rows = state["rows"]
+        pages._chunk_ids = [set(ids) for ids in state.get("chunk_ids") or [[] for _ in pages.sources]]
+        pages._summary_chunk = state["summary_chunks"]
+        pages._unpaged = state["unpaged"]
+        if pages.sources:
+            # Copy-on-write: later additions stay in memory, the file is never modified
+            pages._vectors = np.memmap(
+                path / "pages.f32", dtype=np.float32, mode="c", shape=(len(pages.sources), state["dim"])
+            )
+        return pages
+
+    def describe(self) -> Dict[str, Any]:
+        """Size of the page level"""
+        with self._lock:
+            chunks = sum(len(rows) for rows in self._rows)
+            return {
+                "pages": len(self.sources),
+                "paged_chunks": chunks,
+                "unpaged_chunks": len(self._unpaged),
+                "mean_chunks_per_page": chunks / len(self.sources) if self.sources else 0.0,
+            }
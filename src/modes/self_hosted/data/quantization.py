@@ -0,0 +1,212 @@
+"""
+Vector codecs for the quantized knowledge index
+
+Each codec turns unit-length float32 embeddings into compact codes and
+scores codes against a query (inner product = cosine similarity):
+
+- float32: no compression, 4 bytes per dimension;
+- float16: 2 bytes per dimension, practically lossless for normalised vectors;
+- int8: per-dimension symmetric scalar quantization, 1 byte per dimension;
+- pq: product quantization, one byte per subvector (768 dims / 48
+  subvectors = 48 bytes, 64x smaller than float32). Queries are scored
+  with per-subvector lookup tables; the index re-scores the best candidates
+  on the full vectors to win back most of the lost recall.
+
+int8 and pq are trained on the stored vectors (scales / k-means centroids).
+"""
+
+from typing import Dict, Type
+
+import numpy as np
+
+# Rows scored per block, bounding the temporaries created while scoring
+SCORE_BLOCK_ROWS = 65536
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    Lloyd's k-means
+
+    Args:
+        vectors: (n, d) float32 training vectors
+        k: Number of centroids (at most n)
+        iterations: Assignment/update rounds
+        seed: Random seed for the initial centroids
+
+    Returns:
+        (k, d) float32 centroids
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    squared = (vectors**2).sum(axis=1, keepdims=True)
+    for _ in range(iterations):
+        distances = squared - 2 * vectors @ centroids.T + (centroids**2).sum(axis=1)
+        assignment = distances.argmin(axis=1)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters with random training vectors
+        centroids[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()))]
+    return centroids.astype(np.float32)
+
+
+class VectorCodec:
+    """Base codec: float32 rows stored as they are"""
+
+    kind = "float32"
+    code_dtype: type = np.float32
+    # Vectors needed before train() gives useful parameters
+    min_train_rows = 0
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    @property
+    def code_width(self) -> int:
+        """Code elements per vector"""
+        return self.dim
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.code_width * np.dtype(self.code_dtype).itemsize
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Fit the codec's parameters to (a sample of) the stored vectors"""
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, dim) float32 vectors to (n, code_width) codes"""
+        return np.asarray(vectors, dtype=np.float32)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate inner products of a block of codes with a unit-length query"""
+        return codes @ query
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Trained parameters, saved next to the codes"""
+        return {}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        """Restore parameters saved by state()"""
+
+
+class Float16Codec(VectorCodec):
+    kind = "float16"
+    code_dtype = np.float16
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float16)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # numpy has no fast float16 matmul; widen the block instead
+        return codes.astype(np.float32) @ query
+
+
+class Int8Codec(VectorCodec):
+    kind = "int8"
+    code_dtype = np.int8
+    min_train_rows = 256
+
+    def __init__(self, dim: int):
+        super().__init__(dim)
+        self.scale = np.full(dim, 1 / 127, dtype=np.float32)
+
+    def train(self, vectors: np.ndarray) -> None:
+        # The 99.9th percentile rather than the max: rare outliers are clipped instead of costing resolution
+        limit = np.quantile(np.abs(vectors), 0.999, axis=0)
+        self.scale = (np.maximum(limit, 1e-6) / 127).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(np.asarray(vectors, dtype=np.float32) / self.scale), -127, 127).astype(np.int8)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # (codes * scale) @ query == codes @ (scale * query)
+        return codes.astype(np.float32) @ (self.scale * query)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"scale": self.scale}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.scale = state["scale"].astype(np.float32)
+
+
+class PQCodec(VectorCodec):
+    kind = "pq"
+    code_dtype = np.uint8
+    min_train_rows = 4096
+    # Vectors sampled for k-means
+    max_train_rows = 50000
+
+    def __init__(self, dim: int, subvectors: int = 48):
+        super().__init__(dim)
+        # Subvectors must split the dimensions evenly: use the largest divisor not above the request
+        self.subvectors = max(m for m in range(1, min(subvectors, dim) + 1) if dim % m == 0)
+        self.sub_dim = dim // self.subvectors
+        self.centroids = np.zeros((self.subvectors, 256, self.sub_dim), dtype=np.float32)
+
+    @property
+    def code_width(self) -> int:
+        return self.subvectors
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, dim) to (subvectors, n, sub_dim)"""
+        return np.asarray(vectors, dtype=np.float32).reshape(len(vectors), self.subvectors, self.sub_dim).swapaxes(0, 1)
+
+    def train(self, vectors: np.ndarray) -> None:
+        if len(vectors) > self.max_train_rows:
+            rng = np.random.default_rng(0)
+            vectors = vectors[np.sort(rng.choice(len(vectors), size=self.max_train_rows, replace=False))]
+        k = min(256, len(vectors))
+        self.centroids = np.zeros((self.subvectors, 256, self.sub_dim), dtype=np.float32)
+        for m, part in enumerate(self._split(vectors)):
+            self.centroids[m, :k] = kmeans(np.ascontiguousarray(part), k, seed=m)
+        if k < 256:
+            # Unused code points repeat the first centroid so they are never closer than a real one
+            self.centroids[:, k:] = self.centroids[:, :1]
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(vectors), self.subvectors), dtype=np.uint8)
+        for m, part in enumerate(self._split(vectors)):
+            centroids = self.centroids[m]
+            distances = -2 * part @ centroids.T + (centroids**2).sum(axis=1)
+            codes[:, m] = distances.argmin(axis=1)
+        return codes
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # One lookup table per subvector: inner product of the query part with each centroid
+        tables = np.einsum("mkd,md->mk", self.centroids, query.reshape(self.subvectors, self.sub_dim))
+        return tables[np.arange(self.subvectors), codes].sum(axis=1)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"centroids": self.centroids}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.centroids = state["centroids"].astype(np.float32)
+
+
+CODECS: Dict[str, Type[VectorCodec]] = {
+    "float32": VectorCodec,
+    "float16": Float16Codec,
+    "int8": Int8Codec,
+    "pq": PQCodec,
+}
+
+
+def create_codec(kind: str, dim: int, pq_subvectors: int = 48) -> VectorCodec:
+    """
+    Build a codec
+
+    Args:
+        kind: "float32", "float16", "int8" or "pq"
+        dim: Vector dimensions
+        pq_subvectors: Bytes per vector for pq
+
+    Raises:
+        ValueError: For an unknown kind
+    """
+    if kind not in CODECS:
+        raise ValueError(f"Unknown vector quantization {kind!r} (expected one of {', '.join(CODECS)})")
+    if kind == "pq":
+        return PQCodec(dim, pq_subvectors)
+    return CODECS[kind](dim)
@@ -0,0 +1,413 @@
+"""
+Quantized on-disk vector index
+
+A 768-dimensional float32 HNSW index over a full wiki crawl doesn't fit
+comfortably next to an Ollama model on a 16 GB box. QuantizedIndex keeps
+only compact codes in memory (see quantization.py: float16, int8 or
+product quantization) and scores them exhaustively. The full float32
+vectors stay on disk behind np.memmap and are read for the best
+VECTOR_RESCORE_CANDIDATES rows only, to re-score them exactly.
+
+Directory layout (all append-only except codec.npz/codes.bin, which are
+rewritten atomically when the codec is retrained):
+- meta.json: embedding model id, dimensions, codec kind, rows trained on;
+- records.jsonl: one {"id", "document", "metadata"} line per row ("deleted"
+  marks a tombstone row);
+- vectors.f32: full float32 rows (re-scoring, retraining);
+- codec.npz / codes.bin: codec parameters and one code row per vector.
+
+Re-adding an id appends a new row and retires the old one; deleting an id
+appends a tombstone row (a zero vector that is never live). int8 and pq are
+trained once enough rows exist (exact search over the full vectors is used
+until then) and retrained whenever the index has doubled since.
+
+A read-only index (an immutable snapshot, see snapshots.py) memory-maps its
+codes as well and never writes to its directory.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .quantization import SCORE_BLOCK_ROWS, VectorCodec, create_codec
+
+logger = logging.getLogger(__name__)
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class QuantizedIndex:
+    """Exhaustive search over quantized codes with exact re-scoring of the top candidates"""
+
+    def __init__(
+        self,
+        directory: str,
+        model_id: str,
+        kind: str = "int8",
+        pq_subvectors: int = 48,
+        rescore_candidates: int = 50,
+        read_only: bool = False,
+    ):
+        """
+        Args:
+            directory: Index directory
+            model_id: EmbeddingBackend.model_id of the stored vectors
+            kind: Codec: "float32", "float16", "int8" or "pq"
+            pq_subvectors: Bytes per vector for pq
+            rescore_candidates: Best approximate hits re-scored on full vectors (0 = off)
+            read_only: Memory-map a finished index without modifying it; upsert is refused
+
+        Raises:
+            ValueError: If the index holds vectors of another embedding model
+        """
+        self.path = Path(directory)
+        self.read_only = read_only
+        if not read_only:
+            self.path.mkdir(parents=True, exist_ok=True)
+        self.model_id = model_id
+        self.kind = kind
+        self.pq_subvectors = pq_subvectors
+        self.rescore_candidates = rescore_candidates
+        self.meta_path = self.path / "meta.json"
+        self.records_path = self.path / "records.jsonl"
+        self.vectors_path = self.path / "vectors.f32"
+        self.codec_path = self.path / "codec.npz"
+        self.codes_path = self.path / "codes.bin"
+
+        self._lock = threading.Lock()
+        self.dim: Optional[int] = None
+        self.codec: Optional[VectorCodec] = None
+        self.trained_rows = 0
+        self._ids: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._offsets: List[int] = []
+        self._row_of_id: Dict[str, int] = {}
+        self._live = np.zeros(0, dtype=bool)
+        self._codes: Optional[np.ndarray] = None
+        self._code_buffer: Optional[np.ndarray] = None
+        self._vectors: Optional[np.memmap] = None
+        self._open()
+
+    def _open(self) -> None:
+        """Load records and codes, dropping a partially written tail"""
+        if not self.meta_path.exists():
+            return
+        meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+        if meta["model_id"] != self.model_id:
+            raise ValueError(
+                f"Vector index {self.path} holds {meta['model_id']} vectors, not {self.model_id}; "
+                f"re-ingest into a new directory to switch embedding backends"
+            )
+        self.dim = int(meta["dim"])
+
+        offset = 0
+        deleted = set()
+        if not self.read_only:
+            self.records_path.touch()
+            self.vectors_path.touch()
+        with open(self.records_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                record = json.loads(line)
+                if record.get("deleted"):
+                    deleted.add(len(self._ids))
+                self._offsets.append(offset)
+                self._ids.append(record["id"])
+                self._metadatas.append(record.get("metadata") or {})
+                offset += len(line)
+        # Drop a partially written tail: records without a complete vector, vectors without a record
+        rows = min(len(self._ids), self.vectors_path.stat().st_size // (self.dim * 4))
+        if rows < len(self._ids):
+            offset = self._offsets[rows]
+        del self._ids[rows:], self._metadatas[rows:], self._offsets[rows:]
+        if not self.read_only:
+            os.truncate(self.records_path, offset)
+            os.truncate(self.vectors_path, rows * self.dim * 4)
+
+        self._live = np.zeros(rows, dtype=bool)
+        for row, chunk_id in enumerate(self._ids):
+            self._retire(chunk_id)
+            self._row_of_id[chunk_id] = row
+            self._live[row] = row not in deleted
+
+        if meta.get("kind") == self.kind and self.codec_path.exists():
+            codec = create_codec(self.kind, self.dim, self.pq_subvectors)
+            with np.load(self.codec_path) as state:
+                codec.load_state(dict(state))
+            width = codec.code_width
+            codes = None
+            if self.read_only and self.codes_path.exists() and self.codes_path.stat().st_size:
+                codes = np.memmap(self.codes_path, dtype=codec.code_dtype, mode="r")
+            elif self.codes_path.exists():
+                codes = np.fromfile(self.codes_path, dtype=codec.code_dtype)
+            if codes is not None and codes.size % width == 0 and codes.size // width <= rows:
+                self.codec = codec
+                self.trained_rows = int(meta.get("trained_rows", 0))
+                codes = codes.reshape(-1, width)
+                if len(codes) < rows:
+                    # Rows appended after the last code write (e.g. a crash): encode them now
+                    tail = codec.encode(self._full()[len(codes) : rows])
+                    if not self.read_only:
+                        with open(self.codes_path, "ab") as f:
+                            tail.tofile(f)
+                    codes = np.concatenate([codes, tail])
+                self._set_codes(codes)
+        if self.codec is None and rows and not self.read_only:
+            self._maybe_train()
+        logger.info(f"📦 Vector index {self.path} ({self.kind}): {self.count()} chunks, {rows} rows")
+
+    def _retire(self, chunk_id: str) -> None:
+        previous = self._row_of_id.get(chunk_id)
+        if previous is not None:
+            self._live[previous] = False
+
+    def _set_codes(self, codes: np.ndarray) -> None:
+        self._code_buffer = codes
+        self._codes = codes
+
+    def _append_codes(self, codes: np.ndarray) -> None:
+        """Append code rows, growing the buffer geometrically instead of copying all codes per batch"""
+        # Only called once the codec is trained, which sets the codes
+        assert self._codes is not None and self._code_buffer is not None
+        buffer, used = self._code_buffer, len(self._codes)
+        if used + len(codes) > len(buffer):
+            grown = np.empty((max(2 * len(buffer), used + len(codes)), codes.shape[1]), dtype=codes.dtype)
+            grown[:used] = self._codes
+            buffer = self._code_buffer = grown
+        buffer[used : used + len(codes)] = codes
+        self._codes = buffer[: used + len(codes)]
+
+    def _full(self) -> np.memmap:
+        """Memory map of all full vectors, remapped after appends"""
+        rows = len(self._ids)
+        if self._vectors is None or self._vectors.shape[0] != rows:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._vectors
+
+    def _maybe_train(self) -> None:
+        """Train the codec once enough rows exist, and again whenever the index doubled"""
+        rows = len(self._ids)
+        codec = self.codec or create_codec(self.kind, self.dim, self.pq_subvectors)
+        if rows < codec.min_train_rows or (self.codec is not None and rows < 2 * self.trained_rows):
+            return
+        vectors = np.asarray(self._full())
+        codec.train(vectors[self._live])
+        codes = codec.encode(vectors)
+        tmp = self.codes_path.with_suffix(".tmp")
+        codes.tofile(tmp)
+        os.replace(tmp, self.codes_path)
+        with open(self.codec_path.with_suffix(".tmp.npz"), "wb") as f:
+            np.savez(f, **codec.state())
+        os.replace(self.codec_path.with_suffix(".tmp.npz"), self.codec_path)
+        self.codec, self.trained_rows = codec, rows
+        self._set_codes(codes)
+        self._write_meta()
+        logger.info(f"📦 Trained {self.kind} codec on {int(self._live.sum())} vectors")
+
+    def _write_meta(self) -> None:
+        meta = {"model_id": self.model_id, "dim": self.dim, "kind": self.kind, "trained_rows": self.trained_rows}
+        _write_json(self.meta_path, meta)
+
+    def upsert(
+        self,
+        ids: List[str],
+        vectors: Any,
+        documents: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        deleted: bool = False,
+    ) -> List[int]:
+        """
+        Add or replace chunks
+
+        Args:
+            ids: Chunk ids
+            vectors: Unit-length embeddings, one row per chunk
+            documents: Chunk texts
+            metadatas: Optional metadata per chunk
+            deleted: Write tombstones retiring the ids instead of live chunks (see delete())
+
+        Returns:
+            Row of each chunk
+
+        Raises:
+            RuntimeError: If the index is read-only
+        """
+        if self.read_only:
+            raise RuntimeError(f"Vector index {self.path} is a read-only snapshot")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        metadatas = metadatas or [{} for _ in ids]
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._write_meta()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+            offset = self.records_path.stat().st_size if self.records_path.exists() else 0
+            lines = []
+            for chunk_id, document, metadata in zip(ids, documents, metadatas):
+                record = {"id": chunk_id, "document": document, "metadata": metadata or {}}
+                if deleted:
+                    record["deleted"] = True
+                line = (json.dumps(record) + "\n").encode("utf-8")
+                lines.append(line)
+                self._offsets.append(offset)
+                offset += len(line)
+            # Vectors before records: a record without its vector is dropped on open
+            with open(self.vectors_path, "ab") as f:
+                vectors.tofile(f)
+            with open(self.records_path, "ab") as f:
+                f.write(b"".join(lines))
+
+            start = len(self._ids)
+            self._live = np.concatenate([self._live, np.zeros(len(ids), dtype=bool)])
+            for row, (chunk_id, metadata) in enumerate(zip(ids, metadatas), start=start):
+                self._retire(chunk_id)
+                self._ids.append(chunk_id)
+                self._metadatas.append(metadata or {})
+                self._row_of_id[chunk_id] = row
+                self._live[row] = not deleted
+
+            if self.codec is not None:
+                codes = self.codec.encode(vectors)
+                with open(self.codes_path, "ab") as f:
+                    codes.tofile(f)
+                self._append_codes(codes)
+            self._maybe_train()
+            return list(range(start, start + len(ids)))
+
+    def delete(self, ids: List[str]) -> int:
+        """
+        Retire chunks (e.g. of a page that was re-ingested with fewer chunks)
+
+        Args:
+            ids: Chunk ids; unknown or already retired ids are skipped
+
+        Returns:
+            Number of chunks retired
+
+        Raises:
+            RuntimeError: If the index is read-only
+        """
+        with self._lock:
+            live = [
+                chunk_id for chunk_id in ids if chunk_id in self._row_of_id and self._live[self._row_of_id[chunk_id]]
+            ]
+            dim = self.dim
+        if not live:
+            return 0
+        self.upsert(live, np.zeros((len(live), dim), dtype=np.float32), [""] * len(live), deleted=True)
+        return len(live)
+
+    def document(self, row: int) -> str:
+        """Text of the chunk stored in a row"""
+        with open(self.records_path, "rb") as f:
+            f.seek(self._offsets[row])
+            return json.loads(f.readline())["document"]
+
+    def top(self, query: Any, n_results: int = 3, rows: Optional[np.ndarray] = None) -> List[Tuple[float, int]]:
+        """
+        Rows closest to a query vector, without reading their documents
+
+        Args:
+            query: Unit-length query embedding
+            n_results: Number of rows to return
+            rows: Only score these rows (e.g. the chunks of the best pages); all rows when None
+
+        Returns:
+            List of (cosine distance, row), closest first
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        with self._lock:
+            total = len(self._ids)
+            codec, codes, live = self.codec, self._codes, self._live
+            if total == 0:
+                return []
+            full = self._full()
+
+        # Approximate scores from the codes (exact ones from the full vectors before training)
+        candidate_rows = np.arange(total) if rows is None else rows[rows < total]
+        scores = np.empty(len(candidate_rows), dtype=np.float32)
+        for start in range(0, len(candidate_rows), SCORE_BLOCK_ROWS):
+            end = min(len(candidate_rows), start + SCORE_BLOCK_ROWS)
+            # Contiguous slices for a full scan, gathered rows for a subset
+            block = slice(start, end) if rows is None else candidate_rows[start:end]
+            if codec is not None and codes is not None:
+                scores[start:end] = codec.scores(codes[block], query)
+            else:
+                scores[start:end] = full[block] @ query
+        alive = live[candidate_rows]
+        scores[~alive] = -np.inf
+
+        exact = codec is None or codec.kind == "float32"
+        candidates = min(max(n_results, 0 if exact else self.rescore_candidates), int(alive.sum()))
+        if candidates == 0:
+            return []
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        if not exact and self.rescore_candidates:
+            # Exact re-scoring of the shortlist on the full vectors (only these rows are read from disk)
+            top = top[np.argsort(candidate_rows[top])]
+            scores[top] = full[candidate_rows[top]] @ query
+        top = top[np.argsort(-scores[top], kind="stable")][:n_results]
+        return [(float(1 - scores[i]), int(candidate_rows[i])) for i in top]
+
+    def result(self, row: int, distance: float) -> Dict[str, Any]:
+        """Search result for a row"""
+        return {"content": self.document(row), "metadata": self._metadatas[row], "distance": distance}
+
+    def search(self, query: Any, n_results: int = 3, rows: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """
+        Find the chunks closest to a query vector
+
+        Args:
+            query: Unit-length query embedding
+            n_results: Number of chunks to return
+            rows: Only score these rows (e.g. the chunks of the best pages); all rows when None
+
+        Returns:
+            List of {"content", "metadata", "distance"} dicts (cosine distance), closest first
+        """
+        return [self.result(row, distance) for distance, row in self.top(query, n_results, rows)]
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Row, id and metadata of every live chunk"""
+        with self._lock:
+            return [
+                {"row": row, "id": self._ids[row], "metadata": metadata}
+                for row, metadata in enumerate(self._metadatas)
+                if row < len(self._live) and self._live[row]
+            ]
+
+    def __len__(self) -> int:
+        """Number of rows, including retired ones"""
+        return len(self._ids)
+
+    def count(self) -> int:
+        """Number of live chunks"""
+        return int(self._live.sum())
+
+    def describe(self) -> Dict[str, Any]:
+        """Codec, size and memory use"""
+        codec = self.codec or (create_codec(self.kind, self.dim, self.pq_subvectors) if self.dim else None)
+        bytes_per_vector = codec.bytes_per_vector if codec else 0
+        return {
+            "kind": self.kind,
+            "trained": self.codec is not None,
+            "chunks": self.count(),
+            "rows": len(self._ids),
+            "dim": self.dim,
+            "bytes_per_vector": bytes_per_vector,
+            "code_bytes": 0 if self._codes is None else int(self._codes.nbytes),
+            "full_vector_bytes": len(self._ids) * (self.dim or 0) * 4,
+            "rescore_candidates": self.rescore_candidates,
+        }
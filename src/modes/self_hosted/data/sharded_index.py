@@ -0,0 +1,240 @@
+"""
+Sharded quantized vector index
+
+One QuantizedIndex is scored by one thread, which leaves most cores of an
+ingest/search box idle. ShardedIndex splits the chunks over VECTOR_SHARDS
+QuantizedIndex directories by a hash of their page (the `source` metadata,
+else the chunk id), so every page and its re-ingested chunks live in one
+shard. A search scores all shards at once in a thread pool (NumPy releases
+the GIL while scoring), and their closest-first rows are merged with a heap;
+only the winning chunks' documents are read from disk.
+
+Rows are global across shards (shard row * shards + shard), so callers such
+as PageIndex see one index. With one shard the QuantizedIndex is stored
+directly in the directory, as before sharding existed.
+"""
+
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .quantized_index import QuantizedIndex
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(key: str, shards: int) -> int:
+    """Stable shard of a page or chunk key (the same in every process)"""
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big") % shards
+
+
+class ShardedIndex:
+    """QuantizedIndex shards searched in parallel, with results merged closest first"""
+
+    def __init__(
+        self,
+        directory: str,
+        model_id: str,
+        shards: int = 1,
+        kind: str = "int8",
+        pq_subvectors: int = 48,
+        rescore_candidates: int = 50,
+        read_only: bool = False,
+    ):
+        """
+        Args:
+            directory: Index directory (shards in shard-<n> subdirectories)
+            model_id: EmbeddingBackend.model_id of the stored vectors
+            shards: Number of shards, and of search threads
+            kind: Codec: "float32", "float16", "int8" or "pq"
+            pq_subvectors: Bytes per vector for pq
+            rescore_candidates: Best approximate hits re-scored on full vectors (0 = off)
+            read_only: Memory-map finished shards without modifying them (a snapshot)
+
+        Raises:
+            ValueError: If the directory holds another shard count or vectors of another embedding model
+        """
+        if shards < 1:
+            raise ValueError(f"Shard count must be at least 1, got {shards}")
+        self.path = Path(directory)
+        self.layout_path = self.path / "shards.json"
+        self.shards = shards
+        stored = self._stored_shards()
+        if stored is not None and stored != shards:
+            raise ValueError(
+                f"Vector index {self.path} holds {stored} shards, not {shards}; "
+                f"set VECTOR_SHARDS={stored} or re-ingest into a new directory"
+            )
+
+        options = {
+            "kind": kind,
+            "pq_subvectors": pq_subvectors,
+            "rescore_candidates": rescore_candidates,
+            "read_only": read_only,
+        }
+        if shards == 1:
+            self.indexes = [QuantizedIndex(str(self.path), model_id, **options)]
+            self._pool: Optional[ThreadPoolExecutor] = None
+        else:
+            if stored is None and not read_only:
+                self.path.mkdir(parents=True, exist_ok=True)
+                self.layout_path.write_text(json.dumps({"shards": shards}), encoding="utf-8")
+            self.indexes = [
+                QuantizedIndex(str(self.path / f"shard-{shard}"), model_id, **options) for shard in range(shards)
+            ]
+            self._pool = ThreadPoolExecutor(max_workers=shards, thread_name_prefix="vector-shard")
+            logger.info(f"🧩 Vector index {self.path}: {self.count()} chunks in {shards} shards")
+
+    def _stored_shards(self) -> Optional[int]:
+        """Shard count the directory was written with (None if empty)"""
+        if self.layout_path.exists():
+            return int(json.loads(self.layout_path.read_text(encoding="utf-8"))["shards"])
+        if (self.path / "meta.json").exists():
+            return 1
+        return None
+
+    def _map(self, fn: Callable[[int], Any], shards: List[int]) -> List[Any]:
+        """fn(shard) for each shard, in parallel when there are several"""
+        if self._pool is None or len(shards) < 2:
+            return [fn(shard) for shard in shards]
+        return list(self._pool.map(fn, shards))
+
+    def _global(self, shard: int, row: int) -> int:
+        return row * self.shards + shard
+
+    def upsert(
+        self,
+        ids: List[str],
+        vectors: Any,
+        documents: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ) -> List[int]:
+        """
+        Add or replace chunks, each in the shard of its page
+
+        Args:
+            ids: Chunk ids
+            vectors: Unit-length embeddings, one row per chunk
+            documents: Chunk texts
+            metadatas: Optional metadata per chunk
+
+        Returns:
+            Global row of each chunk
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        metadatas = metadatas or [{} for _ in ids]
+        positions: Dict[int, List[int]] = {}
+        for position, (chunk_id, metadata) in enumerate(zip(ids, metadatas)):
+            key = (metadata or {}).get("source") or chunk_id
+            positions.setdefault(shard_of(str(key), self.shards), []).append(position)
+
+        def upsert_shard(shard: int) -> List[int]:
+            selected = positions[shard]
+            return self.indexes[shard].upsert(
+                [ids[i] for i in selected],
+                vectors[selected],
+                [documents[i] for i in selected],
+                [metadatas[i] for i in selected],
+            )
+
+        shards = list(positions)
+        rows = [0] * len(ids)
+        for shard, shard_rows in zip(shards, self._map(upsert_shard, shards)):
+            for position, row in zip(positions[shard], shard_rows):
+                rows[position] = self._global(shard, row)
+        return rows
+
+    def delete(self, ids: List[str]) -> int:
+        """
+        Retire chunks in whichever shard holds them
+
+        Args:
+            ids: Chunk ids; unknown or already retired ids are skipped
+
+        Returns:
+            Number of chunks retired
+        """
+        return sum(self._map(lambda shard: self.indexes[shard].delete(ids), list(range(self.shards))))
+
+    def search(self, query: Any, n_results: int = 3, rows: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """
+        Find the chunks closest to a query vector across all shards
+
+        Args:
+            query: Unit-length query embedding
+            n_results: Number of chunks to return
+            rows: Only score these global rows (e.g. the chunks of the best pages); all rows when None
+
+        Returns:
+            List of {"content", "metadata", "distance"} dicts (cosine distance), closest first
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        if rows is None:
+            selected: Dict[int, Optional[np.ndarray]] = {shard: None for shard in range(self.shards)}
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+            selected = {
+                int(shard): rows[rows % self.shards == shard] // self.shards for shard in np.unique(rows % self.shards)
+            }
+        shards = list(selected)
+
+        def top(shard: int) -> List[Any]:
+            # (distance, shard, row): ties break deterministically in the merge
+            return [
+                (distance, shard, row) for distance, row in self.indexes[shard].top(query, n_results, selected[shard])
+            ]
+
+        merged = heapq.merge(*self._map(top, shards))
+        return [
+            self.indexes[shard].result(row, distance) for distance, shard, row in itertools.islice(merged, n_results)
+        ]
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Global row, id and metadata of every live chunk"""
+        return [
+            {**record, "row": self._global(shard, record["row"])}
+            for shard, index in enumerate(self.indexes)
+            for record in index.records()
+        ]
+
+    def document(self, row: int) -> str:
+        """Text of the chunk stored in a global row"""
+        return self.indexes[row % self.shards].document(row // self.shards)
+
+    def __len__(self) -> int:
+        """Number of rows in all shards, including retired ones"""
+        return sum(len(index) for index in self.indexes)
+
+    def count(self) -> int:
+        """Number of live chunks"""
+        return sum(index.count() for index in self.indexes)
+
+    def describe(self) -> Dict[str, Any]:
+        """Codec, size and memory use, summed over the shards"""
+        reports = [index.describe() for index in self.indexes]
+        if self.shards == 1:
+            return {**reports[0], "shards": 1}
+        # Codec settings from a shard that has vectors
+        base = next((report for report in reports if report["dim"]), reports[0])
+        return {
+            **base,
+            "shards": self.shards,
+            "trained": all(report["trained"] for report in reports),
+            "chunks": sum(report["chunks"] for report in reports),
+            "rows": sum(report["rows"] for report in reports),
+            "code_bytes": sum(report["code_bytes"] for report in reports),
+            "full_vector_bytes": sum(report["full_vector_bytes"] for report in reports),
+            "shard_chunks": [report["chunks"] for report in reports],
+        }
+
+    def close(self) -> None:
+        """Stop the search threads"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
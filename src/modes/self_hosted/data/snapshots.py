@@ -0,0 +1,478 @@
+"""
+Versioned, immutable index snapshots with atomic hot-swap
+
+Rebuilding the knowledge base in place disturbs live questions. With
+VECTOR_SNAPSHOTS, the server instead reads immutable snapshot directories
+that are built offline:
+
+    <CHROMA_DB_PATH>/snapshots/
+        CURRENT                    name of the published version
+        versions/<version>/        manifest.json, quantized/ (chunks), pages/ (page level)
+        leases/<version>/<pid>     processes still reading a version
+
+A build writes a new version into a temporary directory, renames it into
+versions/ (its files made read-only) and publishes it by atomically
+replacing CURRENT. Each server process polls CURRENT
+(VECTOR_SNAPSHOT_POLL_SECONDS), memory-maps the new version and swaps it in
+behind a reference-counted SnapshotHandle: questions already running finish
+on the version they started with. When the last reader of a retired version
+is done, its lease is dropped and versions older than the published one
+that no live process leases are deleted (newer ones may await publishing).
+
+Build and publish from the command line:
+    python -m src.modes.self_hosted.data.snapshots build --pages data/wiki_pages.json
+    python -m src.modes.self_hosted.data.snapshots list
+    python -m src.modes.self_hosted.data.snapshots publish <version>    # roll back
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import stat
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .page_index import PageIndex
+from .sharded_index import ShardedIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SnapshotStore:
+    """Snapshot versions on disk, the published one and the processes reading each"""
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Snapshot directory
+        """
+        self.root = Path(root)
+        self.versions_dir = self.root / "versions"
+        self.leases_dir = self.root / "leases"
+        self.current_path = self.root / "CURRENT"
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+        self.leases_dir.mkdir(parents=True, exist_ok=True)
+
+    def path(self, version: str) -> Path:
+        return self.versions_dir / version
+
+    def current(self) -> Optional[str]:
+        """Published version, if any"""
+        try:
+            return self.current_path.read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+
+    def versions(self) -> List[str]:
+        """Complete versions on disk, oldest first"""
+        return sorted(path.name for path in self.versions_dir.iterdir() if not path.name.startswith("."))
+
+    @contextmanager
+    def build(self) -> Iterator[Tuple[str, Path]]:
+        """
+        Directory to write a new version into
+
+        The version appears in versions/ (read-only) only if the block succeeds;
+        publish() it to make servers load it.
+
+        Yields:
+            (version, temporary build directory)
+        """
+        # Versions sort by build time
+        version = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:6]}"
+        tmp = self.versions_dir / f".build-{os.getpid()}-{version}"
+        tmp.mkdir()
+        try:
+            yield version, tmp
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        for directory, _, files in os.walk(tmp):
+            for name in files:
+                file = Path(directory) / name
+                file.chmod(file.stat().st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+        os.rename(tmp, self.path(version))
+
+    def publish(self, version: str) -> None:
+        """
+        Make a version the one servers load (atomic)
+
+        Raises:
+            ValueError: If the version doesn't exist
+        """
+        if not self.path(version).is_dir():
+            raise ValueError(f"Unknown snapshot version {version}")
+        tmp = self.current_path.with_suffix(".tmp")
+        tmp.write_text(version, encoding="utf-8")
+        os.replace(tmp, self.current_path)
+        logger.info(f"📸 Published snapshot {version}")
+
+    def lease(self, version: str) -> None:
+        """Mark a version as read by this process"""
+        directory = self.leases_dir / version
+        directory.mkdir(exist_ok=True)
+        (directory / str(os.getpid())).touch()
+
+    def release(self, version: str) -> None:
+        """Drop this process's lease on a version"""
+        (self.leases_dir / version / str(os.getpid())).unlink(missing_ok=True)
+
+    def readers(self, version: str) -> List[int]:
+        """Live processes holding a lease on a version"""
+        directory = self.leases_dir / version
+        if not directory.is_dir():
+            return []
+        return [
+            int(lease.name) for lease in directory.iterdir() if lease.name.isdigit() and _pid_alive(int(lease.name))
+        ]
+
+    def gc(self) -> List[str]:
+        """
+        Delete versions older than the published one that no live process reads
+
+        Versions sort by build time; newer ones are kept for publishing (or
+        after a roll back). Also removes leftovers of builds whose process died.
+
+        Returns:
+            Deleted versions
+        """
+        current = self.current()
+        deleted = []
+        for version in self.versions():
+            if current is None or version >= current or self.readers(version):
+                continue
+            shutil.rmtree(self.path(version), ignore_errors=True)
+            shutil.rmtree(self.leases_dir / version, ignore_errors=True)
+            deleted.append(version)
+        for path in self.versions_dir.glob(".build-*"):
+            pid = path.name.split("-")[1]
+            if pid.isdigit() and not _pid_alive(int(pid)):
+                shutil.rmtree(path, ignore_errors=True)
+        if deleted:
+            logger.info(f"🧹 Removed snapshots {', '.join(deleted)}")
+        return deleted
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "current": self.current(),
+            "versions": {version: self.readers(version) for version in self.versions()},
+        }
+
+
+class IndexSnapshot:
+    """Read-only chunk and page indexes of one snapshot version, memory-mapped"""
+
+    def __init__(
+        self,
+        directory: str,
+        model_id: str,
+        encode: Callable[[List[str]], Any],
+        rescore_candidates: int = 50,
+    ):
+        """
+        Args:
+            directory: Version directory
+            model_id: EmbeddingBackend.model_id queries are embedded with
+            encode: Embeds page summaries (only for pages added after loading)
+            rescore_candidates: Best approximate hits re-scored on full vectors
+
+        Raises:
+            ValueError: If the snapshot holds vectors of another embedding model
+        """
+        self.path = Path(directory)
+        self.version = self.path.name
+        self.manifest = json.loads((self.path / "manifest.json").read_text(encoding="utf-8"))
+        self.index = ShardedIndex(
+            str(self.path / "quantized"),
+            model_id,
+            shards=self.manifest["shards"],
+            kind=self.manifest["kind"],
+            pq_subvectors=self.manifest["pq_subvectors"],
+            rescore_candidates=rescore_candidates,
+            read_only=True,
+        )
+        pages_dir = self.path / "pages"
+        self.pages = PageIndex.load(str(pages_dir), encode) if (pages_dir / "pages.json").exists() else None
+
+    def close(self) -> None:
+        self.index.close()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "built": self.manifest.get("built"),
+            "vector_index": self.index.describe(),
+            "page_index": self.pages.describe() if self.pages is not None else None,
+        }
+
+
+class _Loaded:
+    """A loaded snapshot and its in-flight readers"""
+
+    def __init__(self, snapshot: Any):
+        self.snapshot = snapshot
+        self.readers = 0
+        self.retired = False
+
+
+class SnapshotHandle:
+    """The current snapshot, hot-swapped when a new version is published"""
+
+    def __init__(self, store: SnapshotStore, open_snapshot: Callable[[str], Any], poll_seconds: float = 30.0):
+        """
+        Args:
+            store: Snapshot versions
+            open_snapshot: Loads a version directory (e.g. IndexSnapshot)
+            poll_seconds: How often the background thread checks for a new version
+        """
+        self.store = store
+        self.open_snapshot = open_snapshot
+        self.poll_seconds = poll_seconds
+        self.swaps = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._loaded: Optional[_Loaded] = None
+        self._draining: List[_Loaded] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def version(self) -> Optional[str]:
+        loaded = self._loaded
+        return loaded.snapshot.version if loaded is not None else None
+
+    @contextmanager
+    def acquire(self) -> Iterator[Any]:
+        """
+        Hold the current snapshot for one read; a swap meanwhile doesn't close it
+
+        Yields:
+            The snapshot, or None before a version was published
+        """
+        with self._lock:
+            loaded = self._loaded
+            if loaded is not None:
+                loaded.readers += 1
+        if loaded is None:
+            yield None
+            return
+        try:
+            yield loaded.snapshot
+        finally:
+            with self._lock:
+                loaded.readers -= 1
+                done = loaded.retired and loaded.readers == 0
+                if done:
+                    self._draining.remove(loaded)
+            if done:
+                self._dispose(loaded)
+
+    def refresh(self) -> bool:
+        """
+        Load and swap in the published version if it changed
+
+        Returns:
+            True if a new version was swapped in
+        """
+        with self._refresh_lock:
+            version = self.store.current()
+            if version is None or version == self.version:
+                return False
+            # Lease before loading, so a concurrent gc() keeps the version
+            self.store.lease(version)
+            try:
+                snapshot = self.open_snapshot(str(self.store.path(version)))
+            except Exception:
+                self.store.release(version)
+                raise
+            with self._lock:
+                previous, self._loaded = self._loaded, _Loaded(snapshot)
+                self.swaps += 1
+                idle = previous is not None and previous.readers == 0
+                if previous is not None and not idle:
+                    previous.retired = True
+                    self._draining.append(previous)
+        logger.info(f"📸 Serving snapshot {version}")
+        if idle:
+            self._dispose(previous)
+        return True
+
+    def _dispose(self, loaded: _Loaded) -> None:
+        """Close a retired snapshot after its last reader and collect unused versions"""
+        loaded.snapshot.close()
+        self.store.release(loaded.snapshot.version)
+        try:
+            self.store.gc()
+        except OSError as e:
+            logger.warning(f"Snapshot cleanup failed: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Loading snapshot {self.store.current()} failed, keeping {self.version}: {e}")
+
+    def start(self) -> None:
+        """Poll for new versions in a background thread"""
+        if self._thread is None and self.poll_seconds > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="snapshot-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling and drop this process's lease on the current version"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            loaded, self._loaded = self._loaded, None
+        if loaded is not None:
+            loaded.snapshot.close()
+            self.store.release(loaded.snapshot.version)
+
+    def describe(self) -> Dict[str, Any]:
+        """Served version and in-flight readers for /stats"""
+        with self.acquire() as snapshot:
+            with self._lock:
+                draining = {loaded.snapshot.version: loaded.readers for loaded in self._draining}
+            return {
+                **(snapshot.describe() if snapshot is not None else {"version": None}),
+                "swaps": self.swaps,
+                "draining": draining,
+                "store": self.store.describe(),
+            }
+
+
+def build_snapshot(
+    store: SnapshotStore,
+    chunks: List[Dict[str, Any]],
+    embedder: Any,
+    kind: str = "int8",
+    shards: int = 1,
+    pq_subvectors: int = 48,
+    embedding_cache_dir: Optional[str] = None,
+    batch_size: int = 256,
+    publish: bool = True,
+) -> str:
+    """
+    Embed chunks into a new snapshot version
+
+    Args:
+        store: Snapshot versions
+        chunks: {"content", "metadata"} dicts (ContentProcessor output)
+        embedder: EmbeddingBackend the server embeds queries with
+        kind: Vector codec
+        shards: Vector index shards
+        pq_subvectors: Bytes per vector for pq
+        embedding_cache_dir: Persistent embedding cache, so unchanged chunks aren't re-embedded
+        batch_size: Chunks per add
+        publish: Publish the version when done
+
+    Returns:
+        The new version
+    """
+    # Imported here: vector_db serves snapshots through this module
+    from .vector_db import MinecraftVectorDB
+
+    started = time.perf_counter()
+    with store.build() as (version, path):
+        db = MinecraftVectorDB(
+            str(path),
+            embedder=embedder,
+            embedding_cache_dir=embedding_cache_dir,
+            quantization=kind,
+            pq_subvectors=pq_subvectors,
+            shards=shards,
+            page_candidates=1,
+        )
+        try:
+            for start in range(0, len(chunks), batch_size):
+                batch = chunks[start : start + batch_size]
+                db.add_texts([chunk["content"] for chunk in batch], [chunk["metadata"] for chunk in batch])
+            db.pages.save(str(path / "pages"))
+            manifest = {
+                "built": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "model_id": embedder.model_id,
+                "kind": kind,
+                "shards": shards,
+                "pq_subvectors": pq_subvectors,
+                "chunks": db.count(),
+                "pages": len(db.pages),
+            }
+            (path / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        finally:
+            db.close()
+    logger.info(
+        f"📸 Built snapshot {version}: {manifest['chunks']} chunks, {manifest['pages']} pages "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    if publish:
+        store.publish(version)
+    return version
+
+
+def main() -> None:
+    """Build, list, publish and collect snapshots"""
+    from ....core.config import get_config
+    from .embeddings import get_embedding_backend
+
+    parser = argparse.ArgumentParser(description="Versioned vector index snapshots")
+    parser.add_argument("--root", help="Snapshot directory (default <CHROMA_DB_PATH>/snapshots)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build a snapshot from a scraper dump and publish it")
+    build.add_argument("--pages", required=True, help="Scraper dump (JSON list of pages)")
+    build.add_argument("--no-publish", action="store_true", help="Only build; publish later")
+    commands.add_parser("list", help="Show versions, the published one and their readers")
+    publish = commands.add_parser("publish", help="Publish an existing version (e.g. roll back)")
+    publish.add_argument("version")
+    commands.add_parser("gc", help="Delete versions older than the published one that nobody reads")
+    args = parser.parse_args()
+
+    config = get_config()
+    store = SnapshotStore(args.root or str(Path(config.chroma_db_path) / "snapshots"))
+    if args.command == "build":
+        from ..scraping.wiki_scraper import ContentProcessor
+
+        with open(args.pages, encoding="utf-8") as f:
+            chunks = ContentProcessor().process_scraped_pages(json.load(f))
+        version = build_snapshot(
+            store,
+            chunks,
+            get_embedding_backend(),
+            kind=config.vector_quantization or "float32",
+            shards=config.vector_shards,
+            pq_subvectors=config.vector_pq_subvectors,
+            embedding_cache_dir=config.embedding_cache_path or None,
+            publish=not args.no_publish,
+        )
+        print(version)
+    elif args.command == "publish":
+        store.publish(args.version)
+    elif args.command == "gc":
+        print("\n".join(store.gc()))
+    else:
+        print(json.dumps(store.describe(), indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
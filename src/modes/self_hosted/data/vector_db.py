@@ -0,0 +1,324 @@
+"""
+Vector Database for Self-Hosted Mode
+
+Stores wiki chunks in ChromaDB (embedded or a ChromaDB server) and searches
+them by embedding similarity. Chunks and queries are embedded by a pluggable
+EmbeddingBackend (see embeddings.py); query embeddings go through a shared
+EmbeddingService, so concurrent questions are encoded in one batch. Chunk
+embeddings are looked up in a persistent EmbeddingCache before encoding, so
+re-ingesting unchanged pages costs no model time. With VECTOR_QUANTIZATION
+set, chunks are stored in a QuantizedIndex (quantized_index.py), split into
+VECTOR_SHARDS shards searched in parallel (sharded_index.py), instead of
+ChromaDB, optionally behind a PageIndex for two-stage page -> chunk search.
+With VECTOR_SNAPSHOTS, the same indexes are served read-only from immutable
+snapshots built offline and hot-swapped when a new one is published
+(snapshots.py).
+
+Chunks of a wiki page are identified by their page and position (`source`
+and `chunk_id` metadata), so re-ingesting a page replaces its chunks. A
+chunk_id that a page already holds starts a re-ingest of that page: all of
+its earlier chunks are retired first, also those past the end of a page
+that got shorter.
+"""
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ....shared.metrics import get_metrics
+from .embedding_cache import EmbeddingCache
+from .embedding_service import EmbeddingService
+from .embeddings import EmbeddingBackend, SentenceTransformerBackend
+from .page_index import PageIndex
+from .sharded_index import ShardedIndex
+from .snapshots import IndexSnapshot, SnapshotHandle, SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+
+class MinecraftVectorDB:
+    """Minecraft knowledge chunks in a ChromaDB collection or a (sharded) QuantizedIndex"""
+
+    def __init__(
+        self,
+        persist_directory: str = "./data/chroma_db",
+        chroma_host: Optional[str] = None,
+        chroma_port: int = 8000,
+        collection_name: str = "minecraft_knowledge",
+        embedding_model: str = "all-MiniLM-L6-v2",
+        embedding_batch_size: int = 32,
+        embedding_batch_wait_ms: float = 5.0,
+        embedder: Optional[EmbeddingBackend] = None,
+        embedding_cache_dir: Optional[str] = None,
+        quantization: str = "",
+        pq_subvectors: int = 48,
+        rescore_candidates: int = 50,
+        page_candidates: int = 0,
+        shards: int = 1,
+        snapshots: bool = False,
+        snapshot_poll_seconds: float = 30.0,
+        watch: bool = True,
+    ):
+        """
+        Args:
+            persist_directory: Directory of the embedded database
+            chroma_host: ChromaDB server host; the embedded database is used when empty
+            chroma_port: ChromaDB server port
+            collection_name: Collection holding the chunks
+            embedding_model: sentence-transformers model, used when no embedder is given
+            embedding_batch_size: Texts per batched query encode
+            embedding_batch_wait_ms: How long a query waits for others to share its encode
+            embedder: Backend embedding chunks and queries
+            embedding_cache_dir: Directory of the persistent chunk embedding cache; None disables it
+            quantization: "float32", "float16", "int8" or "pq" to store chunks in a QuantizedIndex
+                under persist_directory instead of ChromaDB; empty uses ChromaDB
+            pq_subvectors: Bytes per vector with pq
+            rescore_candidates: Quantized hits re-scored on the full vectors
+            page_candidates: With a quantized index, search chunks only within this many best-matching
+                pages (see page_index.py); 0 searches all chunks
+            shards: With a quantized index, split chunks over this many shards searched in parallel
+            snapshots: Serve the published snapshot under persist_directory/snapshots (read-only; its
+                manifest sets quantization and shards) and swap in newer ones as they are published
+            snapshot_poll_seconds: How often to check for a newly published snapshot (0 = only at start)
+            watch: Start watching for snapshots now; False to open the index without starting threads
+                (in the server master before fork), then call start() in the process that serves it
+
+        Raises:
+            ValueError: If the collection was built with a different embedding model (or shard count)
+        """
+        self.metrics = get_metrics()
+        self.embedder = embedder or SentenceTransformerBackend(embedding_model)
+        self.embedding_service = EmbeddingService(
+            self.embedder.encode, max_batch_size=embedding_batch_size, max_wait_ms=embedding_batch_wait_ms
+        )
+        self.embedding_cache = (
+            EmbeddingCache(embedding_cache_dir, self.embedder.model_id) if embedding_cache_dir else None
+        )
+        self.index: Optional[ShardedIndex] = None
+        self.pages: Optional[PageIndex] = None
+        self.snapshots: Optional[SnapshotHandle] = None
+        self.page_candidates = page_candidates
+        # Chunk ids per chunk_id of each page's latest ingest, loaded when a page is first re-ingested
+        self._page_chunks: Dict[str, Dict[Any, str]] = {}
+        self._indexed_pages: Optional[Dict[str, Dict[Any, str]]] = None
+        self.client: Any = None
+        self.collection: Any = None
+        if snapshots:
+            self.snapshots = SnapshotHandle(
+                SnapshotStore(str(Path(persist_directory) / "snapshots")),
+                lambda path: IndexSnapshot(
+                    path, self.embedder.model_id, self._encode_documents, rescore_candidates=rescore_candidates
+                ),
+                poll_seconds=snapshot_poll_seconds,
+            )
+            if not self.snapshots.refresh():
+                logger.warning(f"No snapshot published under {self.snapshots.store.root} yet; searches return nothing")
+            if watch:
+                self.snapshots.start()
+            return
+        if quantization:
+            self.index = ShardedIndex(
+                str(Path(persist_directory) / "quantized"),
+                self.embedder.model_id,
+                shards=shards,
+                kind=quantization,
+                pq_subvectors=pq_subvectors,
+                rescore_candidates=rescore_candidates,
+            )
+            if page_candidates:
+                self.pages = PageIndex(self._encode_documents)
+                records = self.index.records()
+                self.pages.add([r["row"] for r in records], [r["metadata"] for r in records], self.index.document)
+                logger.info(f"📚 Page index: {len(self.pages)} pages over {len(records)} chunks")
+            return
+        if page_candidates:
+            logger.warning("VECTOR_PAGE_CANDIDATES needs VECTOR_QUANTIZATION; searching all chunks in ChromaDB")
+
+        # Heavy import: only paid when the self-hosted RAG pipeline is created
+        import chromadb
+
+        if chroma_host:
+            self.client = chromadb.HttpClient(host=chroma_host, port=chroma_port)
+            logger.info(f"Connected to ChromaDB at {chroma_host}:{chroma_port}")
+        else:
+            self.client = chromadb.PersistentClient(path=persist_directory)
+            logger.info(f"Opened ChromaDB at {persist_directory}")
+
+        # Vectors are always computed by the embedder and passed in, never by ChromaDB
+        self.collection = self.client.get_or_create_collection(
+            name=collection_name,
+            embedding_function=None,
+            metadata={"hnsw:space": "cosine", "embedding_model": self.embedder.model_id},
+        )
+        stored_model = (self.collection.metadata or {}).get("embedding_model")
+        if stored_model and stored_model != self.embedder.model_id:
+            raise ValueError(
+                f"Collection {collection_name} holds {stored_model} vectors, not {self.embedder.model_id}; "
+                f"re-ingest into a new CHROMA_DB_PATH to switch embedding backends"
+            )
+
+    @staticmethod
+    def _chunk_id(text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """Id of a page's chunk from its source and position, else from its content"""
+        metadata = metadata or {}
+        if metadata.get("source") and metadata.get("chunk_id") is not None:
+            key = f"{metadata['source']}#{metadata['chunk_id']}"
+        else:
+            key = text
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+    def _stored_page_chunks(self, source: str) -> Dict[Any, str]:
+        """Chunk id per chunk_id of a page as stored before this process ingested it"""
+        if self.index is not None:
+            if self._indexed_pages is None:
+                self._indexed_pages = {}
+                for record in self.index.records():
+                    metadata = record["metadata"] or {}
+                    if metadata.get("source") and metadata.get("chunk_id") is not None:
+                        self._indexed_pages.setdefault(metadata["source"], {})[metadata["chunk_id"]] = record["id"]
+            return dict(self._indexed_pages.get(source, {}))
+        stored = self.collection.get(where={"source": source}, include=["metadatas"])
+        return {
+            (metadata or {}).get("chunk_id"): chunk_id
+            for chunk_id, metadata in zip(stored.get("ids") or [], stored.get("metadatas") or [])
+            if (metadata or {}).get("chunk_id") is not None
+        }
+
+    def _stale_chunks(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
+        """Ids of earlier chunks of the pages this batch re-ingests"""
+        stale: List[str] = []
+        for chunk_id, metadata in zip(ids, metadatas):
+            source, position = (metadata or {}).get("source"), (metadata or {}).get("chunk_id")
+            if not source or position is None:
+                continue
+            if source not in self._page_chunks:
+                self._page_chunks[source] = self._stored_page_chunks(source)
+            chunks = self._page_chunks[source]
+            if position in chunks:
+                stale.extend(chunks.values())
+                chunks.clear()
+            chunks[position] = chunk_id
+        batch = set(ids)
+        return [chunk_id for chunk_id in dict.fromkeys(stale) if chunk_id not in batch]
+
+    def _encode_documents(self, texts: List[str]) -> np.ndarray:
+        """Embed chunk or page texts, through the persistent cache when enabled"""
+        if self.embedding_cache is not None:
+            return self.embedding_cache.encode(texts, self.embedder.encode)
+        return self.embedder.encode(texts)
+
+    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Add (or update) chunks
+
+        Args:
+            texts: Chunk texts
+            metadatas: Optional metadata per chunk (source, title, chunk_id, ...)
+
+        Raises:
+            RuntimeError: When serving read-only snapshots
+        """
+        if not texts:
+            return
+        if self.snapshots is not None:
+            raise RuntimeError("Snapshots are read-only; build and publish a new one with snapshots.py")
+        metadatas = metadatas or [{} for _ in texts]
+        ids = [self._chunk_id(text, metadata) for text, metadata in zip(texts, metadatas)]
+        stale = self._stale_chunks(ids, metadatas)
+        vectors = self._encode_documents(texts)
+        if self.index is not None:
+            if stale:
+                self.index.delete(stale)
+            rows = self.index.upsert(ids, vectors, texts, metadatas)
+            if self.pages is not None:
+                text_of_row = dict(zip(rows, texts))
+                self.pages.add(rows, metadatas, text_of_row.__getitem__)
+            return
+        if stale:
+            self.collection.delete(ids=stale)
+        self.collection.upsert(
+            ids=ids,
+            embeddings=vectors.tolist(),
+            documents=texts,
+            metadatas=metadatas,
+        )
+
+    def search(self, query: str, n_results: int = 3, page_candidates: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Find the chunks closest to a query
+
+        Args:
+            query: Search text
+            n_results: Number of chunks to return
+            page_candidates: Pages searched with the page index (default: as configured, 0 = all chunks)
+
+        Returns:
+            List of {"content", "metadata", "distance"} dicts, closest first
+        """
+        vector = self.embedding_service.embed([query])[0]
+        page_candidates = self.page_candidates if page_candidates is None else page_candidates
+        if self.snapshots is not None:
+            # The snapshot stays open until this search is done, even if a newer one is swapped in
+            with self.snapshots.acquire() as snapshot:
+                if snapshot is None:
+                    return []
+                return self._search_index(snapshot.index, snapshot.pages, vector, n_results, page_candidates)
+        if self.index is not None:
+            return self._search_index(self.index, self.pages, vector, n_results, page_candidates)
+        results = self.collection.query(query_embeddings=[vector.tolist()], n_results=n_results)
+        documents = (results.get("documents") or [[]])[0]
+        metadatas = (results.get("metadatas") or [[]])[0] or [{}] * len(documents)
+        distances = (results.get("distances") or [[]])[0] or [None] * len(documents)
+        return [
+            {"content": document, "metadata": metadata or {}, "distance": distance}
+            for document, metadata, distance in zip(documents, metadatas, distances)
+        ]
+
+    def _search_index(
+        self,
+        index: ShardedIndex,
+        pages: Optional[PageIndex],
+        vector: np.ndarray,
+        n_results: int,
+        page_candidates: int,
+    ) -> List[Dict[str, Any]]:
+        if page_candidates and pages is not None and len(pages):
+            # Two stages: best pages first, then only their chunks
+            rows = pages.rows(pages.search(vector, page_candidates))
+            self.metrics.increment("vector_db.chunks_scored", len(rows))
+            return index.search(vector, n_results, rows=rows)
+        self.metrics.increment("vector_db.chunks_scored", len(index))
+        return index.search(vector, n_results)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts with the collection's backend (one float32 row per text), batched with concurrent callers"""
+        return self.embedding_service.embed(texts)
+
+    def count(self) -> int:
+        """Number of stored chunks"""
+        if self.snapshots is not None:
+            with self.snapshots.acquire() as snapshot:
+                return snapshot.index.count() if snapshot is not None else 0
+        if self.index is not None:
+            return self.index.count()
+        return self.collection.count()
+
+    def start(self) -> None:
+        """Serve from this process an instance opened with watch=False, e.g. inherited from the server master"""
+        if self.snapshots is not None:
+            # The master's lease doesn't outlive the master; this process leases its snapshot itself
+            version = self.snapshots.version
+            if version is not None:
+                self.snapshots.store.lease(version)
+            self.snapshots.start()
+
+    def close(self) -> None:
+        """Stop the embedding batcher, snapshot watcher and shard threads"""
+        self.embedding_service.stop()
+        if self.snapshots is not None:
+            self.snapshots.stop()
+        if self.index is not None:
+            self.index.close()
@@ -4,30 +4,91 @@ NextCraftTalk Self-Hosted Mode
 Handles Nextcloud Talk integration with self-hosted AI stack (Ollama + ChromaDB + RAG).
 """
 
+import asyncio
+import importlib
 import logging
+from typing import TYPE_CHECKING
 
-import uvicorn
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
 
 from src.core.config import get_config
-from src.modes.self_hosted.rag.pipeline import get_rag_pipeline
+from src.shared import safety_filter
+from src.shared.deadline import Deadline, DeadlineExceeded
+from src.shared.metrics import get_metrics
+from src.shared.readiness import get_readiness
+from src.shared.server import serve
+
+if TYPE_CHECKING:
+    from src.modes.self_hosted.rag.pipeline import SelfHostedRAGPipeline
 
 logger = logging.getLogger(__name__)
 app = FastAPI(title="NextCraftTalk Self-Hosted")
 
 
+def get_rag_pipeline() -> "SelfHostedRAGPipeline":
+    """Get the RAG pipeline, importing it (ChromaDB, embedding model) on first use"""
+    from src.modes.self_hosted.rag.pipeline import get_rag_pipeline as _get_rag_pipeline
+
+    return _get_rag_pipeline()
+
+
+def _warm_ollama() -> bool:
+    """Make sure the model exists, then load it and keep it resident per the keep-alive schedule"""
+    from src.modes.self_hosted.ollama import get_model_keeper, get_ollama_client
+
+    if not get_ollama_client(check_model=False).ensure_model_available():
+        return False
+    keeper = get_model_keeper()
+    loaded = keeper.preload() if get_config().ollama_preload else True
+    keeper.start()
+    return loaded
+
+
+def _warm_reranker() -> bool:
+    """Load the cross-encoder so the first reranked question stays within its latency budget"""
+    from src.modes.self_hosted.rag.rerank import get_reranker
+
+    return get_reranker().warm_up()
+
+
 @app.on_event("startup")
 async def startup_event() -> None:
-    """Initialize the self-hosted mode"""
+    """Initialize the self-hosted mode
+
+    With FAST_START (default) the server answers /health immediately while the
+    Ollama model check/pull and the RAG pipeline (vector DB, embedding model)
+    warm up in the background; /ready reports their progress.
+    """
     logger.info("🚀 Initializing NextCraftTalk Self-Hosted mode")
+    readiness = get_readiness()
+
+    # The Ollama model check may pull the model, which can take minutes
+    readiness.start("ollama_model", _warm_ollama, required=False)
+    readiness.start("rag_pipeline", get_rag_pipeline)
+    readiness.start("safety_filter", safety_filter.warm_up, required=False)
+    if get_config().rag_rerank:
+        readiness.start("reranker", _warm_reranker, required=False)
+
+    if not get_config().fast_start:
+        if await readiness.wait():
+            logger.info("✅ RAG pipeline initialized successfully")
+        else:
+            logger.warning("Self-hosted mode may not function properly")
 
-    try:
-        # Initialize RAG pipeline (this will set up Ollama and ChromaDB)
-        get_rag_pipeline()
-        logger.info("✅ RAG pipeline initialized successfully")
-    except Exception as e:
-        logger.error(f"❌ Failed to initialize RAG pipeline: {e}")
-        logger.warning("Self-hosted mode may not function properly")
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    """Stop background keep-alive pings, endpoint health checks, the embedding batcher and snapshot watcher"""
+    if get_readiness().is_ready("ollama_model"):
+        from src.modes.self_hosted.ollama import OllamaPool, get_model_keeper, get_ollama_client
+
+        get_model_keeper().stop()
+        client = get_ollama_client(check_model=False)
+        if isinstance(client, OllamaPool):
+            client.stop()
+    if get_readiness().is_ready("rag_pipeline"):
+        get_rag_pipeline().vector_db.close()
 
 
 @app.post("/webhook")
@@ -35,18 +96,33 @@ async def nextcloud_webhook(request: Request) -> dict:
     """
     Handle Nextcloud Talk webhooks with self-hosted AI
     """
+    # The end-to-end budget starts as soon as the webhook arrives
+    deadline = Deadline(get_config().request_deadline_seconds)
+
     try:
         data = await request.json()
         logger.info(f"Received webhook: {data}")
 
-        # Extract message
+        # Extract message and the room it was posted in
         message = data.get("message", "")
+        room = data.get("token") or data.get("target", {}).get("id")
         if not message:
             return {"status": "ignored", "reason": "no message content"}
 
-        # Get AI response using RAG pipeline
+        # Don't block on a pipeline that is still loading
+        if not get_readiness().is_ready("rag_pipeline"):
+            raise HTTPException(status_code=503, detail="RAG pipeline is still starting")
+
+        # Get AI response using RAG pipeline, cancelled when the deadline runs out
         rag_pipeline = get_rag_pipeline()
-        ai_response = rag_pipeline.query(message)
+        try:
+            ai_response = await deadline.run_stage(
+                "generation",
+                lambda timeout: asyncio.to_thread(rag_pipeline.query, message, deadline=deadline, room=room),
+            )
+        except DeadlineExceeded as e:
+            logger.warning(f"Deadline exceeded during {e.stage}")
+            ai_response = "I'm thinking a bit slowly right now! Please ask me again in a moment."
 
         # TODO: Send response back to Nextcloud Talk
         # This will be implemented when we integrate the Nextcloud API
@@ -58,6 +134,8 @@ async def nextcloud_webhook(request: Request) -> dict:
             "mode": "self_hosted",
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Webhook processing error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -65,22 +143,43 @@ async def nextcloud_webhook(request: Request) -> dict:
 
 @app.get("/health")
 async def health_check() -> dict:
-    """Health check endpoint"""
-    try:
-        # Test RAG pipeline
-        get_rag_pipeline()
-        return {
-            "status": "healthy",
-            "mode": "self_hosted",
-            "components": {
-                "ollama": "available",
-                "chromadb": "available",
-                "rag_pipeline": "ready",
-            },
-        }
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return {"status": "degraded", "mode": "self_hosted", "error": "Component check failed"}
+    """Liveness check: answers as soon as the server runs (see /ready for warm-up)"""
+    readiness = get_readiness().describe()
+    return {
+        "status": "healthy" if readiness["status"] != "failed" else "degraded",
+        "mode": "self_hosted",
+        "components": {name: component["state"] for name, component in readiness["components"].items()},
+    }
+
+
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    """Readiness check: 200 once every required component has warmed up, 503 before"""
+    readiness = get_readiness().describe()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+
+@app.get("/stats")
+async def get_stats() -> dict:
+    """Metrics (cold vs warm Ollama latency, routing, breakers) and keep-alive state"""
+    stats = {"metrics": get_metrics().snapshot(), "readiness": get_readiness().describe()}
+    if get_readiness().is_ready("ollama_model"):
+        from src.modes.self_hosted.ollama import OllamaPool, get_model_keeper, get_ollama_client
+
+        stats["ollama_keep_alive"] = get_model_keeper().describe()
+        client = get_ollama_client(check_model=False)
+        if isinstance(client, OllamaPool):
+            stats["ollama_pool"] = client.describe()
+    if get_readiness().is_ready("rag_pipeline"):
+        vector_db = get_rag_pipeline().vector_db
+        stats["embedding"] = vector_db.embedding_service.describe()
+        if vector_db.index is not None:
+            stats["vector_index"] = vector_db.index.describe()
+        if vector_db.pages is not None:
+            stats["page_index"] = vector_db.pages.describe()
+        if vector_db.snapshots is not None:
+            stats["snapshot"] = vector_db.snapshots.describe()
+    return stats
 
 
 @app.post("/knowledge/add")
@@ -94,16 +193,54 @@ async def add_knowledge(request: Request) -> dict:
         if not text:
             raise HTTPException(status_code=400, detail="Text content required")
 
+        if not get_readiness().is_ready("rag_pipeline"):
+            raise HTTPException(status_code=503, detail="RAG pipeline is still starting")
+
         rag_pipeline = get_rag_pipeline()
         rag_pipeline.add_knowledge(text, metadata)
 
         return {"status": "added", "message": "Knowledge added to vector database"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error adding knowledge: {e}")
         raise HTTPException(status_code=500, detail="Failed to add knowledge")
 
 
+@app.post("/knowledge/reload")
+async def reload_knowledge() -> dict:
+    """Swap in the latest published index snapshot now instead of at the next poll"""
+    if not get_readiness().is_ready("rag_pipeline"):
+        raise HTTPException(status_code=503, detail="RAG pipeline is still starting")
+    snapshots = get_rag_pipeline().vector_db.snapshots
+    if snapshots is None:
+        raise HTTPException(status_code=400, detail="VECTOR_SNAPSHOTS is not enabled")
+    try:
+        swapped = await asyncio.to_thread(snapshots.refresh)
+    except Exception as e:
+        logger.error(f"Error loading snapshot: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load the published snapshot")
+    return {"status": "swapped" if swapped else "unchanged", "version": snapshots.version}
+
+
+def preload() -> None:
+    """Load heavy read-only state once in the server master before workers are forked
+
+    Imports the RAG pipeline, loads the embedding model and opens the vector
+    index (or the published snapshot) so the workers share them copy-on-write;
+    each worker then only creates its connections (Ollama session, ChromaDB)
+    on startup. A failure is reported by the workers' /ready instead of
+    stopping the master.
+    """
+    try:
+        pipeline = importlib.import_module("src.modes.self_hosted.rag.pipeline")
+        pipeline.preload_vector_db()
+    except Exception as e:
+        logger.warning(f"Could not preload the RAG pipeline: {e}")
+    safety_filter.warm_up()
+
+
 def run_self_hosted() -> None:
     """Run the self-hosted mode application"""
     config = get_config()
@@ -117,17 +254,19 @@ def run_self_hosted() -> None:
         return
 
     logger.info("📚 Self-hosted AI stack components:")
-    logger.info(f"   - Ollama URL: {config.self_hosted.ollama_base_url}")
-    logger.info(f"   - Ollama Model: {config.self_hosted.ollama_model}")
-    logger.info(f"   - ChromaDB Path: {config.self_hosted.chroma_db_path}")
-    logger.info(f"   - Wiki Base URL: {config.self_hosted.wiki_base_url}")
+    logger.info(f"   - Ollama URL: {config.ollama_base_url}")
+    logger.info(f"   - Ollama Model: {config.ollama_model}")
+    logger.info(f"   - ChromaDB Path: {config.chroma_db_path}")
+    logger.info(f"   - Wiki Base URL: {config.wiki_base_url}")
 
     logger.info("🤖 Starting self-hosted FastAPI server")
-    uvicorn.run(
+    serve(
         "src.modes.self_hosted.main:app",
-        host=config.webhook.host,
-        port=8080,  # Fixed internal port for container
-        reload=True,
+        host=config.webhook_host,
+        port=config.server_port,
+        workers=config.server_workers,
+        preload=preload,
+        reload=config.server_reload,
     )
 
 
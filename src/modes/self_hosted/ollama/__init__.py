@@ -3,5 +3,15 @@ Ollama LLM Integration Module
 """
 
 from .client import OllamaClient, get_ollama_client
+from .pool import OllamaPool, create_ollama_client
+from .warmup import KeepAlivePolicy, ModelKeeper, get_model_keeper
 
-__all__ = ["OllamaClient", "get_ollama_client"]
+__all__ = [
+    "OllamaClient",
+    "get_ollama_client",
+    "OllamaPool",
+    "create_ollama_client",
+    "KeepAlivePolicy",
+    "ModelKeeper",
+    "get_model_keeper",
+]
@@ -4,26 +4,91 @@ Ollama LLM Client for Self-Hosted Mode
 Handles communication with local Ollama instance for text generation.
 """
 
+import json
 import logging
-from typing import Any, Optional
+import time
+from typing import Any, Callable, Optional
+from urllib.parse import urlparse
 
 import requests
 
 from ....core.config import get_config
+from ....shared.inflight import CancelToken, GenerationCancelled
+from ....shared.metrics import get_metrics
+from ....shared.resilience import CircuitOpenError, get_circuit_breaker, get_retry_policy, raise_for_transient_status
+from .tuning import load_profile
+from .warmup import KeepAlivePolicy
 
 logger = logging.getLogger(__name__)
 
+# A response whose model load took longer than this paid for a cold start
+COLD_LOAD_SECONDS = 0.5
+
+# Model/runtime parameters Ollama only honours inside "options" (top-level keys are ignored)
+RUNTIME_OPTIONS = frozenset(
+    {
+        "num_ctx",
+        "num_thread",
+        "num_batch",
+        "num_gpu",
+        "num_keep",
+        "num_predict",
+        "use_mmap",
+        "use_mlock",
+        "temperature",
+        "top_k",
+        "top_p",
+        "min_p",
+        "repeat_penalty",
+        "repeat_last_n",
+        "presence_penalty",
+        "frequency_penalty",
+        "seed",
+        "stop",
+    }
+)
+
 
 class OllamaClient:
     """Client for interacting with Ollama API"""
 
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama2"):
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        model: str = "llama2",
+        check_model: bool = True,
+        keep_alive_policy: Optional[KeepAlivePolicy] = None,
+        tuned_options: Optional[dict[str, dict[str, Any]]] = None,
+    ):
+        """
+        Args:
+            base_url: Ollama server URL
+            model: Default model
+            check_model: Check (and pull) the model now
+            keep_alive_policy: Optional KeepAlivePolicy deciding how long Ollama keeps
+                models loaded after each request (see ollama/warmup.py)
+            tuned_options: Runtime options per model from a calibration profile
+                (see ollama/tuning.py); explicit options passed to a call win
+        """
         self.base_url = base_url.rstrip("/")
         self.model = model
-        self._ensure_model_available()
+        self.keep_alive_policy = keep_alive_policy
+        self.tuned_options = tuned_options or {}
+        self.last_request_at: Optional[float] = None
+        self.breaker = get_circuit_breaker(f"ollama@{urlparse(self.base_url).netloc or self.base_url}")
+        self.retry_policy = get_retry_policy()
+        if check_model:
+            self.ensure_model_available()
+
+    def ensure_model_available(self) -> bool:
+        """Ensure the specified model is available in Ollama, pulling it if missing
+
+        Pulling can take minutes, so servers run this as a background warm-up
+        (see get_ollama_client) rather than in the constructor.
 
-    def _ensure_model_available(self) -> None:
-        """Ensure the specified model is available in Ollama"""
+        Returns:
+            True if the model is available
+        """
         try:
             response = requests.get(f"{self.base_url}/api/tags", timeout=30)
             if response.status_code == 200:
@@ -32,13 +97,13 @@ class OllamaClient:
                 if self.model not in model_names:
                     logger.warning(f"Model '{self.model}' not found in Ollama. Available: {model_names}")
                     logger.info(f"Pulling model '{self.model}'...")
-                    self.pull_model(self.model)
-                else:
-                    logger.info(f"Model '{self.model}' is available")
-            else:
-                logger.error(f"Failed to connect to Ollama at {self.base_url}")
+                    return self.pull_model(self.model)
+                logger.info(f"Model '{self.model}' is available")
+                return True
+            logger.error(f"Failed to connect to Ollama at {self.base_url}")
         except Exception as e:
             logger.error(f"Error checking Ollama models: {e}")
+        return False
 
     def pull_model(self, model_name: str) -> bool:
         """Pull a model from the Ollama library"""
@@ -49,61 +114,296 @@ class OllamaClient:
             logger.error(f"Error pulling model {model_name}: {e}")
             return False
 
-    def generate(self, prompt: str, **kwargs: Any) -> Optional[str]:
-        """Generate text using the Ollama model"""
+    def _post(
+        self, path: str, payload: dict[str, Any], timeout: float = 60.0, stream: bool = False
+    ) -> requests.Response:
+        """POST to Ollama through the endpoint's circuit breaker and retry policy"""
+
+        if self.keep_alive_policy is not None and "keep_alive" not in payload:
+            payload = {**payload, "keep_alive": self.keep_alive_policy.current()}
+        self.last_request_at = time.time()
+
+        def _send(attempt_timeout: float) -> requests.Response:
+            response = requests.post(f"{self.base_url}{path}", json=payload, timeout=attempt_timeout, stream=stream)
+            raise_for_transient_status(response)
+            return response
+
+        return self.retry_policy.call(_send, breaker=self.breaker, budget=timeout, attempt_timeout=timeout)
+
+    def _payload(self, model: Optional[str], body: dict[str, Any], kwargs: dict[str, Any]) -> dict[str, Any]:
+        """Build a request body, moving runtime parameters into "options" on top of the tuned profile"""
+        model = model or self.model
+        extra = dict(kwargs)
+        options = {**self.tuned_options.get(model, {}), **extra.pop("options", {})}
+        for key in RUNTIME_OPTIONS.intersection(extra):
+            options[key] = extra.pop(key)
+        payload = {"model": model, **body, **extra}
+        if options:
+            payload["options"] = options
+        return payload
+
+    @staticmethod
+    def _record_timings(result: dict[str, Any]) -> None:
+        """Record cold vs warm latency and prefill from the durations Ollama reports with a finished response
+
+        prompt_eval_count only covers tokens Ollama actually evaluated; a prompt
+        prefix still in the KV cache (the stable system prompt) is skipped, so
+        ollama.prompt_tokens and ollama.prefill.latency drop when prefixes are reused.
+        """
+        metrics = get_metrics()
+        if "prompt_eval_count" in result:
+            metrics.increment("ollama.prompt_tokens", result["prompt_eval_count"])
+            metrics.observe("ollama.prefill.latency", result.get("prompt_eval_duration", 0) / 1e9)
+        if "load_duration" not in result or "total_duration" not in result:
+            return
+        load, total = result["load_duration"] / 1e9, result["total_duration"] / 1e9
+        metrics.observe("ollama.load.latency", load)
+        if load >= COLD_LOAD_SECONDS:
+            metrics.increment("ollama.cold_loads")
+            metrics.observe("ollama.cold.latency", total)
+        else:
+            metrics.observe("ollama.warm.latency", total)
+
+    def load_model(
+        self, model: Optional[str] = None, keep_alive: Optional[str] = None, timeout: float = 300.0
+    ) -> Optional[dict[str, float]]:
+        """Load a model into memory without generating anything (an empty prompt)
+
+        Args:
+            model: Model to load (defaults to the client's model)
+            keep_alive: How long Ollama keeps it loaded afterwards ("10m", "2h", "-1" = forever)
+            timeout: Seconds allowed for the load
+
+        Returns:
+            {"load_seconds", "total_seconds"} or None if the load failed
+        """
+        payload: dict[str, Any] = {"model": model or self.model, "prompt": "", "stream": False}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        try:
+            response = self._post("/api/generate", payload, timeout=timeout)
+            if response.status_code != 200:
+                logger.error(f"Ollama failed to load {payload['model']}: {response.status_code} - {response.text}")
+                return None
+            result = response.json()
+        except Exception as e:
+            logger.error(f"Error loading Ollama model {payload['model']}: {e}")
+            return None
+        return {
+            "load_seconds": result.get("load_duration", 0) / 1e9,
+            "total_seconds": result.get("total_duration", 0) / 1e9,
+        }
+
+    def measure_generation(
+        self, prompt: str, model: Optional[str] = None, options: Optional[dict[str, Any]] = None, timeout: float = 300.0
+    ) -> Optional[dict[str, float]]:
+        """Stream one generation with exactly the given options and report its speed
+
+        Used by the calibration command; tuned options are not applied.
+
+        Returns:
+            ttft_seconds, prompt/eval token counts and tokens per second,
+            load_seconds and total_seconds; None if the request failed
+        """
+        payload = {"model": model or self.model, "prompt": prompt, "stream": True, "options": options or {}}
+        started = time.perf_counter()
+        ttft = None
+        final: dict[str, Any] = {}
+        try:
+            response = self._post("/api/generate", payload, timeout=timeout, stream=True)
+            if response.status_code != 200:
+                logger.error(f"Ollama API error: {response.status_code} - {response.text}")
+                return None
+            try:
+                for line in response.iter_lines(chunk_size=None):
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if ttft is None and chunk.get("response"):
+                        ttft = time.perf_counter() - started
+                    if chunk.get("done"):
+                        final = chunk
+                        break
+            finally:
+                response.close()
+        except Exception as e:
+            logger.error(f"Error measuring Ollama generation: {e}")
+            return None
+
+        def per_second(count_key: str, duration_key: str) -> float:
+            duration = final.get(duration_key, 0) / 1e9
+            return final.get(count_key, 0) / duration if duration > 0 else 0.0
+
+        return {
+            "ttft_seconds": ttft if ttft is not None else time.perf_counter() - started,
+            "prompt_tokens": final.get("prompt_eval_count", 0),
+            "prompt_tokens_per_second": per_second("prompt_eval_count", "prompt_eval_duration"),
+            "eval_tokens": final.get("eval_count", 0),
+            "eval_tokens_per_second": per_second("eval_count", "eval_duration"),
+            "load_seconds": final.get("load_duration", 0) / 1e9,
+            "total_seconds": final.get("total_duration", 0) / 1e9,
+        }
+
+    def _read_stream(
+        self, response: requests.Response, cancel: CancelToken, extract: Callable[[dict[str, Any]], str]
+    ) -> str:
+        """Collect a streamed response; closing the connection on cancel makes Ollama stop generating"""
+        parts = []
         try:
-            payload = {"model": self.model, "prompt": prompt, "stream": False, **kwargs}
+            for line in response.iter_lines(chunk_size=None):
+                cancel.raise_if_cancelled()
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                parts.append(extract(chunk) or "")
+                if chunk.get("done"):
+                    self._record_timings(chunk)
+                    break
+        finally:
+            response.close()
+        return "".join(parts)
+
+    def generate(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        timeout: float = 60.0,
+        cancel: Optional[CancelToken] = None,
+        affinity: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Optional[str]:
+        """Generate text using the Ollama model (or an explicitly routed one) within ``timeout`` seconds
 
-            response = requests.post(f"{self.base_url}/api/generate", json=payload, timeout=60)
+        With a cancel token the response is streamed and abandoned as soon as the
+        token fires, so superseded questions stop burning CPU. ``affinity`` (the
+        Talk room) only matters to OllamaPool's sticky routing. Pass a constant
+        ``system`` prompt (it replaces the Modelfile SYSTEM) to keep the start of
+        every prompt identical, so Ollama reuses that prefix from its KV cache.
+
+        Raises:
+            GenerationCancelled: If the cancel token fires mid-generation
+        """
+        streaming = cancel is not None
+        try:
+            payload = self._payload(model, {"prompt": prompt, "stream": streaming}, kwargs)
+
+            response = self._post("/api/generate", payload, timeout=timeout, stream=streaming)
 
             if response.status_code == 200:
+                if cancel is not None:
+                    return self._read_stream(response, cancel, lambda chunk: chunk.get("response", ""))
                 result = response.json()
+                self._record_timings(result)
                 return result.get("response", "")
             else:
                 logger.error(f"Ollama API error: {response.status_code} - {response.text}")
                 return None
 
+        except GenerationCancelled:
+            logger.info("✂️ Ollama generation cancelled, stream closed")
+            raise
+        except CircuitOpenError:
+            logger.warning(f"Ollama circuit breaker for {self.base_url} is open - failing fast")
+            return None
         except Exception as e:
             logger.error(f"Error generating text with Ollama: {e}")
             return None
 
-    def chat(self, messages: list[dict[str, Any]], **kwargs: Any) -> Optional[str]:
-        """Chat with the Ollama model using chat format"""
+    def chat(
+        self,
+        messages: list[dict[str, Any]],
+        model: Optional[str] = None,
+        timeout: float = 60.0,
+        cancel: Optional[CancelToken] = None,
+        affinity: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Optional[str]:
+        """Chat with the Ollama model using chat format within ``timeout`` seconds
+
+        ``affinity`` only matters to OllamaPool's sticky routing.
+
+        Raises:
+            GenerationCancelled: If the cancel token fires mid-generation
+        """
+        streaming = cancel is not None
         try:
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "stream": False,
-                **kwargs,
-            }
+            payload = self._payload(model, {"messages": messages, "stream": streaming}, kwargs)
 
-            response = requests.post(f"{self.base_url}/api/chat", json=payload, timeout=60)
+            response = self._post("/api/chat", payload, timeout=timeout, stream=streaming)
 
             if response.status_code == 200:
+                if cancel is not None:
+                    return self._read_stream(
+                        response, cancel, lambda chunk: chunk.get("message", {}).get("content", "")
+                    )
                 result = response.json()
+                self._record_timings(result)
                 return result.get("message", {}).get("content", "")
             else:
                 logger.error(f"Ollama chat API error: {response.status_code} - {response.text}")
                 return None
 
+        except GenerationCancelled:
+            logger.info("✂️ Ollama chat cancelled, stream closed")
+            raise
+        except CircuitOpenError:
+            logger.warning(f"Ollama circuit breaker for {self.base_url} is open - failing fast")
+            return None
         except Exception as e:
             logger.error(f"Error chatting with Ollama: {e}")
             return None
 
+    def embed(
+        self, texts: list[str], model: Optional[str] = None, timeout: float = 60.0
+    ) -> Optional[list[list[float]]]:
+        """Embed a batch of texts in one /api/embed call
+
+        Returns:
+            One vector per text, or None on error
+        """
+        try:
+            response = self._post("/api/embed", {"model": model or self.model, "input": texts}, timeout=timeout)
+            if response.status_code == 200:
+                return response.json().get("embeddings")
+            logger.error(f"Ollama embed API error: {response.status_code} - {response.text}")
+            return None
+
+        except CircuitOpenError:
+            logger.warning(f"Ollama circuit breaker for {self.base_url} is open - failing fast")
+            return None
+        except Exception as e:
+            logger.error(f"Error embedding with Ollama: {e}")
+            return None
+
 
 # Global instance
-_ollama_client: Optional[OllamaClient] = None
+_ollama_client: Any = None
 
 
-def get_ollama_client() -> OllamaClient:
-    """Get the global Ollama client instance"""
+def get_ollama_client(check_model: bool = True) -> Any:
+    """Get the global Ollama client instance
+
+    An OllamaPool when OLLAMA_BASE_URLS lists several endpoints, otherwise an
+    OllamaClient.
+
+    Args:
+        check_model: Check (and pull) the model when the client is created;
+            fast-start servers pass False and warm it up in the background
+    """
     global _ollama_client
     if _ollama_client is None:
+        from .pool import create_ollama_client
+
         config = get_config()
         if config.self_hosted:
-            _ollama_client = OllamaClient(
-                base_url=config.self_hosted.ollama_base_url,
-                model=config.self_hosted.ollama_model,
+            _ollama_client = create_ollama_client(
+                config.ollama_base_urls.split(",") if config.ollama_base_urls else [config.ollama_base_url],
+                model=config.ollama_model,
+                check_model=check_model,
+                tuned_options=load_profile(config.ollama_profile_path).get("options", {}),
+                keep_alive_policy=KeepAlivePolicy.parse(config.ollama_keep_alive, config.ollama_keep_alive_schedule),
+                sticky=config.ollama_sticky_routing,
+                health_interval=config.ollama_health_check_interval,
             )
         else:
             raise ValueError("Self-hosted mode not configured")
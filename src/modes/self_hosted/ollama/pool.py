@@ -0,0 +1,353 @@
+"""
+Client-side load balancing across several Ollama endpoints
+
+OllamaPool spreads requests over multiple Ollama servers (e.g. several CPU
+boxes) behind the same interface as OllamaClient, so the RAG pipeline, the
+keep-alive manager and the hedger work with either.
+
+- Routing: least outstanding requests among healthy backends, ties broken by
+  recent median latency.
+- Health: a background thread polls every backend (GET /api/version); a
+  backend is skipped while its last check failed or its circuit breaker is open.
+- Sticky rooms (optional): requests carrying an affinity key (the Talk room)
+  go back to the backend that served the room last, so follow-up prompts
+  reuse the model and KV cache already warm there. Stickiness is dropped when
+  that backend is unhealthy or has clearly more requests in flight than the
+  least loaded one.
+- Failover: a request that fails on one backend is retried on the next best
+  one within the remaining timeout.
+
+Per-backend in-flight counts, health and latency are exported as
+ollama.pool.<host>.* metrics and by describe().
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Union
+from urllib.parse import urlparse
+
+import requests
+
+from ....shared.inflight import CancelToken
+from ....shared.metrics import get_metrics
+from ....shared.resilience import OPEN
+from .client import OllamaClient
+from .warmup import KeepAlivePolicy
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaBackend:
+    """One Ollama endpoint of a pool with its load and health"""
+
+    def __init__(self, client: OllamaClient):
+        self.client = client
+        self.name = urlparse(client.base_url).netloc or client.base_url
+        self.outstanding = 0
+        self.healthy = True
+        self.last_check: Optional[float] = None
+        self.last_error = ""
+
+    @property
+    def available(self) -> bool:
+        """Healthy and not rejected by the endpoint's circuit breaker"""
+        return self.healthy and self.client.breaker.state != OPEN
+
+    def latency_p50(self) -> float:
+        """Recent median request latency (0 before the first request)"""
+        return get_metrics().latency(f"ollama.pool.{self.name}.latency").percentile(50) or 0.0
+
+    def describe(self) -> Dict[str, Any]:
+        """Backend state for /stats"""
+        return {
+            "healthy": self.healthy,
+            "available": self.available,
+            "outstanding": self.outstanding,
+            "latency": get_metrics().latency(f"ollama.pool.{self.name}.latency").summary(),
+            "last_error": self.last_error,
+        }
+
+
+class OllamaPool:
+    """OllamaClient-compatible client routing across several Ollama endpoints"""
+
+    def __init__(
+        self,
+        base_urls: List[str],
+        model: str = "llama2",
+        check_model: bool = True,
+        keep_alive_policy: Optional[KeepAlivePolicy] = None,
+        tuned_options: Optional[Dict[str, Dict[str, Any]]] = None,
+        sticky: bool = True,
+        sticky_slack: int = 1,
+        sticky_ttl: float = 900.0,
+        health_interval: float = 10.0,
+        health_timeout: float = 2.0,
+    ):
+        """
+        Args:
+            base_urls: Ollama server URLs
+            model: Default model
+            check_model: Check (and pull) the model on every backend now
+            keep_alive_policy: Optional keep-alive schedule applied by every backend
+            tuned_options: Runtime options per model from a calibration profile
+            sticky: Route requests with the same affinity key to the same backend
+            sticky_slack: Extra in-flight requests tolerated on a sticky backend
+                before routing to a less loaded one
+            sticky_ttl: Seconds a room stays pinned after its last request
+            health_interval: Seconds between health checks (0 disables the checker thread)
+            health_timeout: Timeout of a single health check
+        """
+        if not base_urls:
+            raise ValueError("OllamaPool needs at least one base URL")
+        self.model = model
+        self.backends = [
+            OllamaBackend(
+                OllamaClient(
+                    url,
+                    model=model,
+                    check_model=False,
+                    keep_alive_policy=keep_alive_policy,
+                    tuned_options=tuned_options,
+                )
+            )
+            for url in dict.fromkeys(url.rstrip("/") for url in base_urls)
+        ]
+        self.base_url = self.backends[0].client.base_url
+        self.sticky = sticky
+        self.sticky_slack = sticky_slack
+        self.sticky_ttl = sticky_ttl
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._affinity: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.metrics = get_metrics()
+
+        if check_model:
+            self.ensure_model_available()
+        if health_interval > 0:
+            self.start_health_checks()
+
+    # --- OllamaClient compatibility -------------------------------------
+
+    @property
+    def keep_alive_policy(self) -> Optional[KeepAlivePolicy]:
+        return self.backends[0].client.keep_alive_policy
+
+    @property
+    def tuned_options(self) -> Dict[str, Dict[str, Any]]:
+        return self.backends[0].client.tuned_options
+
+    @property
+    def last_request_at(self) -> Optional[float]:
+        """Most recent request to any backend"""
+        times = [b.client.last_request_at for b in self.backends if b.client.last_request_at]
+        return max(times) if times else None
+
+    def ensure_model_available(self) -> bool:
+        """Check (and pull) the model on every backend; True if at least one has it"""
+        results = [backend.client.ensure_model_available() for backend in self.backends]
+        return any(results)
+
+    def load_model(
+        self, model: Optional[str] = None, keep_alive: Optional[str] = None, timeout: float = 300.0
+    ) -> Optional[Dict[str, float]]:
+        """Load a model on every available backend so any of them can answer warm
+
+        Returns:
+            The slowest backend's timings, or None if no backend loaded it
+        """
+        results = [
+            backend.client.load_model(model, keep_alive=keep_alive, timeout=timeout)
+            for backend in self.backends
+            if backend.available
+        ]
+        loaded = [result for result in results if result is not None]
+        return max(loaded, key=lambda r: r["total_seconds"]) if loaded else None
+
+    def generate(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        timeout: float = 60.0,
+        cancel: Optional[CancelToken] = None,
+        affinity: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Optional[str]:
+        """Generate text on the best backend (see OllamaClient.generate)
+
+        Args:
+            affinity: Routing key (e.g. the Talk room) for sticky routing
+        """
+        return self._call(
+            lambda client, remaining: client.generate(prompt, model=model, timeout=remaining, cancel=cancel, **kwargs),
+            timeout,
+            affinity,
+        )
+
+    def chat(
+        self,
+        messages: List[Dict[str, Any]],
+        model: Optional[str] = None,
+        timeout: float = 60.0,
+        cancel: Optional[CancelToken] = None,
+        affinity: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Optional[str]:
+        """Chat on the best backend (see OllamaClient.chat)
+
+        Args:
+            affinity: Routing key (e.g. the Talk room) for sticky routing
+        """
+        return self._call(
+            lambda client, remaining: client.chat(messages, model=model, timeout=remaining, cancel=cancel, **kwargs),
+            timeout,
+            affinity,
+        )
+
+    # --- Routing ----------------------------------------------------------
+
+    def choose(self, affinity: Optional[str] = None, exclude: Optional[set] = None) -> Optional[OllamaBackend]:
+        """
+        Pick the backend for a request
+
+        Args:
+            affinity: Optional sticky routing key
+            exclude: Backends already tried for this request
+
+        Returns:
+            The backend, or None if every backend is excluded
+        """
+        exclude = exclude or set()
+        candidates = [b for b in self.backends if b.name not in exclude]
+        if not candidates:
+            return None
+        # Prefer available backends; with none available try the others rather than fail outright
+        candidates = [b for b in candidates if b.available] or candidates
+        with self._lock:
+            best = min(candidates, key=lambda b: (b.outstanding, b.latency_p50()))
+            if affinity and self.sticky:
+                pinned = self._affinity.get(affinity)
+                if pinned and time.time() - pinned[1] < self.sticky_ttl:
+                    backend = next((b for b in candidates if b.name == pinned[0]), None)
+                    if backend is not None and backend.outstanding <= best.outstanding + self.sticky_slack:
+                        self.metrics.increment("ollama.pool.sticky_hits")
+                        best = backend
+                    else:
+                        self.metrics.increment("ollama.pool.sticky_moves")
+                self._affinity[affinity] = (best.name, time.time())
+                self._affinity.move_to_end(affinity)
+                while len(self._affinity) > 10000:
+                    self._affinity.popitem(last=False)
+            best.outstanding += 1
+            self.metrics.set_gauge(f"ollama.pool.{best.name}.inflight", best.outstanding)
+        return best
+
+    def _release(self, backend: OllamaBackend) -> None:
+        with self._lock:
+            backend.outstanding -= 1
+            self.metrics.set_gauge(f"ollama.pool.{backend.name}.inflight", backend.outstanding)
+
+    def _call(
+        self, request: Callable[[OllamaClient, float], Optional[str]], timeout: float, affinity: Optional[str]
+    ) -> Optional[str]:
+        """Run a request on the best backend, failing over to the next one on errors"""
+        started = time.monotonic()
+        tried: set = set()
+        while True:
+            remaining = timeout - (time.monotonic() - started)
+            backend = self.choose(affinity, exclude=tried) if remaining > 0 else None
+            if backend is None:
+                return None
+            tried.add(backend.name)
+            request_started = time.monotonic()
+            try:
+                result = request(backend.client, remaining)
+            finally:
+                self._release(backend)
+            self.metrics.increment(f"ollama.pool.{backend.name}.requests")
+            if result is not None:
+                self.metrics.observe(f"ollama.pool.{backend.name}.latency", time.monotonic() - request_started)
+                return result
+            self.metrics.increment(f"ollama.pool.{backend.name}.errors")
+            logger.warning(f"Ollama backend {backend.name} failed, trying another one")
+
+    # --- Health checks ----------------------------------------------------
+
+    def check_health(self) -> None:
+        """Probe every backend once"""
+        for backend in self.backends:
+            try:
+                response = requests.get(f"{backend.client.base_url}/api/version", timeout=self.health_timeout)
+                healthy, error = response.status_code == 200, f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                healthy, error = False, str(e)
+            if healthy != backend.healthy:
+                logger.warning(f"Ollama backend {backend.name} is now {'healthy' if healthy else 'unhealthy'}")
+            backend.healthy = healthy
+            backend.last_error = "" if healthy else error
+            backend.last_check = time.time()
+            self.metrics.set_gauge(f"ollama.pool.{backend.name}.healthy", 1 if healthy else 0)
+
+    def _run_health_checks(self) -> None:
+        while True:
+            try:
+                self.check_health()
+            except Exception as e:
+                logger.warning(f"Ollama health check failed: {e}")
+            if self._stop.wait(self.health_interval):
+                return
+
+    def start_health_checks(self) -> None:
+        """Probe backends in a background thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run_health_checks, name="ollama-health", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the health check thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def describe(self) -> Dict[str, Any]:
+        """Per-backend state for /stats"""
+        return {
+            "sticky": self.sticky,
+            "pinned_rooms": len(self._affinity),
+            "backends": {backend.name: backend.describe() for backend in self.backends},
+        }
+
+
+def create_ollama_client(
+    base_urls: List[str], model: str, check_model: bool = True, **kwargs: Any
+) -> Union[OllamaClient, OllamaPool]:
+    """
+    Build a single client for one URL or a pool for several
+
+    Args:
+        base_urls: Ollama server URLs
+        model: Default model
+        check_model: Check (and pull) the model now
+        **kwargs: keep_alive_policy and tuned_options for both; pool options (sticky, ...) for pools
+
+    Returns:
+        OllamaClient or OllamaPool
+    """
+    urls = [url for url in dict.fromkeys(u.strip().rstrip("/") for u in base_urls) if url]
+    if len(urls) == 1:
+        return OllamaClient(
+            urls[0],
+            model=model,
+            check_model=check_model,
+            keep_alive_policy=kwargs.get("keep_alive_policy"),
+            tuned_options=kwargs.get("tuned_options"),
+        )
+    logger.info(f"⚖️ Balancing Ollama requests across {len(urls)} endpoints")
+    return OllamaPool(urls, model=model, check_model=check_model, **kwargs)
@@ -0,0 +1,243 @@
+"""
+Calibration of Ollama runtime options for the local CPU
+
+Runs a fixed set of representative prompts (RAG context plus a kid's
+question) through OllamaClient with candidate option sets - num_thread,
+num_batch, num_ctx - and optionally several quantizations of a model, and
+measures prompt-eval and generation tokens/second and time to first token.
+The fastest option set per model is written to a profile file
+(OLLAMA_PROFILE_PATH), which get_ollama_client() loads so generate() and
+chat() apply it automatically. Options passed explicitly to a call still win.
+
+    python -m src.modes.self_hosted.ollama.tuning
+    python -m src.modes.self_hosted.ollama.tuning --models llama3.2:1b-instruct-q4_K_M llama3.2:1b-instruct-q8_0
+    python -m src.modes.self_hosted.ollama.tuning --threads 4 8 --batch 256 512 --ctx 2048 --dry-run
+
+Candidates are scored by the latency of a typical answer:
+time to first token + expected answer tokens / generation tokens per second.
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+PROFILE_VERSION = 1
+
+# Minecraft answers are short; this is the answer length the score optimises for
+EXPECTED_ANSWER_TOKENS = 160
+
+_CONTEXT = (
+    "Bed: A bed is a block that allows a player to sleep through the night and reset their spawn point. "
+    "Crafting: 3 wool of the same color placed in the top row and 3 planks of any wood in the middle row. "
+    "Wool can be obtained by shearing sheep or killing them. Planks are crafted from logs. "
+    "Beds explode when used in the Nether or the End. "
+) * 4
+
+PROMPTS = [
+    f"Context:\n{_CONTEXT}\nQuestion: How do I craft a bed?\n\nAnswer:",
+    f"Context:\n{_CONTEXT}\nQuestion: Where do I find wool for my bed?\n\nAnswer:",
+    f"Context:\n{_CONTEXT}\nQuestion: Why did my bed blow up in the Nether?\n\nAnswer:",
+]
+WARMUP_PROMPT = "Say hello to a Minecraft player in one sentence."
+
+
+def load_profile(path: str) -> Dict[str, Any]:
+    """
+    Load a calibration profile
+
+    Args:
+        path: Profile JSON file
+
+    Returns:
+        The profile ({} when the file is missing or unreadable)
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable Ollama profile {path}: {e}")
+        return {}
+    if profile.get("version") != PROFILE_VERSION:
+        logger.warning(f"Ignoring Ollama profile {path} with unsupported version {profile.get('version')}")
+        return {}
+    return profile
+
+
+def save_profile(path: str, profile: Dict[str, Any]) -> None:
+    """Write a profile atomically (readers never see a half-written file)"""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(target.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp, target)
+
+
+def candidate_options(
+    threads: Optional[Sequence[int]] = None,
+    batches: Sequence[int] = (128, 256, 512),
+    contexts: Sequence[int] = (2048, 4096),
+) -> List[Dict[str, int]]:
+    """
+    Grid of runtime option sets to try
+
+    Args:
+        threads: num_thread values (default: half, all but one and all logical cores)
+        batches: num_batch values
+        contexts: num_ctx values
+
+    Returns:
+        Option dicts
+    """
+    if threads is None:
+        cores = os.cpu_count() or 1
+        threads = sorted({max(1, cores // 2), max(1, cores - 1), cores})
+    return [
+        {"num_thread": t, "num_batch": b, "num_ctx": c} for t, b, c in itertools.product(threads, batches, contexts)
+    ]
+
+
+def score(summary: Dict[str, float], expected_tokens: int = EXPECTED_ANSWER_TOKENS) -> float:
+    """Estimated seconds for a typical answer (lower is better)"""
+    if summary["eval_tokens_per_second"] <= 0:
+        return float("inf")
+    return summary["ttft_seconds"] + expected_tokens / summary["eval_tokens_per_second"]
+
+
+def measure(
+    client: Any, model: str, options: Dict[str, Any], prompts: Sequence[str], num_predict: int = 64
+) -> Optional[Dict[str, float]]:
+    """
+    Median speed of one model/option set over the prompt set
+
+    A warm-up request first loads the model with these options (changing
+    runtime options makes Ollama reload the model) so load time isn't measured.
+
+    Returns:
+        Median ttft_seconds, prompt_tokens_per_second and eval_tokens_per_second, or None if a request failed
+    """
+    run_options = {**options, "num_predict": num_predict, "temperature": 0, "seed": 42}
+    if client.measure_generation(WARMUP_PROMPT, model=model, options=run_options) is None:
+        return None
+    runs = []
+    for prompt in prompts:
+        result = client.measure_generation(prompt, model=model, options=run_options)
+        if result is None:
+            return None
+        runs.append(result)
+    return {
+        key: statistics.median(run[key] for run in runs)
+        for key in ("ttft_seconds", "prompt_tokens_per_second", "eval_tokens_per_second")
+    }
+
+
+def calibrate(
+    client: Any,
+    models: Sequence[str],
+    candidates: Sequence[Dict[str, Any]],
+    prompts: Sequence[str] = PROMPTS,
+    num_predict: int = 64,
+    expected_tokens: int = EXPECTED_ANSWER_TOKENS,
+) -> Dict[str, Any]:
+    """
+    Measure every model/option combination and build a profile
+
+    Args:
+        client: OllamaClient (anything with measure_generation)
+        models: Models (e.g. quantizations of one model) to compare
+        candidates: Option sets from candidate_options()
+        prompts: Prompts measured per candidate
+        num_predict: Tokens generated per measured request
+        expected_tokens: Answer length used for scoring
+
+    Returns:
+        Profile with the best options per model, the recommended model and all measurements
+    """
+    measurements = []
+    best: Dict[str, Dict[str, Any]] = {}
+    for model in models:
+        for options in candidates:
+            summary = measure(client, model, options, prompts, num_predict)
+            if summary is None:
+                logger.warning(f"{model} {options}: request failed, skipping")
+                continue
+            entry = {"model": model, "options": options, **summary, "score": score(summary, expected_tokens)}
+            measurements.append(entry)
+            logger.info(
+                f"{model} {options}: ttft {summary['ttft_seconds']:.2f}s, "
+                f"prompt {summary['prompt_tokens_per_second']:.1f} tok/s, "
+                f"gen {summary['eval_tokens_per_second']:.1f} tok/s"
+            )
+            if model not in best or entry["score"] < best[model]["score"]:
+                best[model] = entry
+
+    recommended = min(best.values(), key=lambda e: e["score"])["model"] if best else None
+    return {
+        "version": PROFILE_VERSION,
+        "host": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "recommended_model": recommended,
+        "options": {model: entry["options"] for model, entry in best.items()},
+        "measurements": measurements,
+    }
+
+
+def main() -> None:
+    from ....core.config import get_config
+    from .client import OllamaClient
+
+    config = get_config()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=config.ollama_base_url, help="Ollama server to calibrate")
+    parser.add_argument("--models", nargs="+", default=[config.ollama_model], help="Models/quantizations to compare")
+    parser.add_argument("--threads", type=int, nargs="+", help="num_thread candidates")
+    parser.add_argument("--batch", type=int, nargs="+", default=[128, 256, 512], help="num_batch candidates")
+    parser.add_argument("--ctx", type=int, nargs="+", default=[2048, 4096], help="num_ctx candidates")
+    parser.add_argument("--num-predict", type=int, default=64, help="Tokens generated per measurement")
+    parser.add_argument("--output", default=config.ollama_profile_path, help="Profile file to write")
+    parser.add_argument("--dry-run", action="store_true", help="Print the results without writing the profile")
+    args = parser.parse_args()
+
+    client = OllamaClient(args.url, model=args.models[0], check_model=False)
+    candidates = candidate_options(args.threads, args.batch, args.ctx)
+    print(f"Calibrating {len(args.models)} model(s) x {len(candidates)} option sets against {args.url}")
+    profile = calibrate(client, args.models, candidates, num_predict=args.num_predict)
+
+    print(
+        f"\n{'model':<36} {'threads':>7} {'batch':>5} {'ctx':>5} {'ttft':>7} {'prompt/s':>9} {'gen/s':>7} {'score':>7}"
+    )
+    for entry in sorted(profile["measurements"], key=lambda e: e["score"]):
+        options = entry["options"]
+        print(
+            f"{entry['model']:<36} {options['num_thread']:>7} {options['num_batch']:>5} {options['num_ctx']:>5} "
+            f"{entry['ttft_seconds']:>6.2f}s {entry['prompt_tokens_per_second']:>9.1f} "
+            f"{entry['eval_tokens_per_second']:>7.1f} {entry['score']:>6.2f}s"
+        )
+
+    if not profile["options"]:
+        print("\nNo candidate succeeded; profile not written")
+        raise SystemExit(1)
+    print(f"\nBest options: {json.dumps(profile['options'])}")
+    if len(args.models) > 1 and profile["recommended_model"] != config.ollama_model:
+        print(f"Fastest model: {profile['recommended_model']} (set OLLAMA_MODEL to use it)")
+    if args.dry_run:
+        return
+    save_profile(args.output, profile)
+    print(f"Wrote {args.output}; restart the bot to apply it")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
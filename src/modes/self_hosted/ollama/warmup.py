@@ -0,0 +1,258 @@
+"""
+Ollama model warm-up and keep-alive management
+
+On CPU hosts loading a model takes seconds (tens of seconds for larger ones),
+and Ollama unloads idle models after its keep_alive (5 minutes by default).
+The first question after idle then pays the whole load. This module:
+
+- preloads the configured models at startup (an empty-prompt request);
+- sends a keep_alive with every request, chosen by a schedule so models stay
+  resident longer when kids are likely to ask (school hours, afternoons) and
+  are released at night;
+- re-pings models during active windows before they would expire, and loads
+  them shortly before a window opens so the first morning question is warm.
+
+Cold vs warm latency is recorded by OllamaClient from the load_duration Ollama
+reports (ollama.cold.latency / ollama.warm.latency metrics).
+
+Schedule format (local time, entries separated by ";"):
+    mon-fri 07:30-16:00=2h; sat-sun 09:00-19:00=30m
+Days are mon..sun, ranges (mon-fri), lists (mon,wed) or "*" for every day.
+Keep-alive values are Ollama durations: "30s", "10m", "2h", "0" (unload right
+away) or "-1" (keep loaded until told otherwise).
+"""
+
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from ....core.config import get_config
+from ....shared.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+_WINDOW = re.compile(r"^\s*(\S+)\s+(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*=\s*(\S+)\s*$")
+_DURATION = re.compile(r"^(-?\d+(?:\.\d+)?)(ms|s|m|h)?$")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}
+
+
+def duration_seconds(value: str) -> float:
+    """
+    Convert an Ollama keep_alive duration to seconds
+
+    Args:
+        value: "30s", "10m", "2h", "600", "0" or a negative value (forever)
+
+    Returns:
+        Seconds (float("inf") for negative durations)
+
+    Raises:
+        ValueError: If the duration can't be parsed
+    """
+    match = _DURATION.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid keep_alive duration: {value!r}")
+    seconds = float(match.group(1)) * _UNITS[match.group(2)]
+    return float("inf") if seconds < 0 else seconds
+
+
+def _parse_days(spec: str) -> frozenset:
+    if spec == "*":
+        return frozenset(range(7))
+    days = set()
+    for part in spec.lower().split(","):
+        first, _, last = part.partition("-")
+        if first not in DAYS or (last and last not in DAYS):
+            raise ValueError(f"Invalid day in keep_alive schedule: {part!r}")
+        start, end = DAYS.index(first), DAYS.index(last or first)
+        days.update(range(start, end + 1) if start <= end else [*range(start, 7), *range(0, end + 1)])
+    return frozenset(days)
+
+
+class KeepAlivePolicy:
+    """Time-of-day schedule deciding the keep_alive sent to Ollama"""
+
+    def __init__(self, default: str = "5m", windows: Optional[List[Tuple[frozenset, int, int, str]]] = None):
+        """
+        Args:
+            default: keep_alive outside every window
+            windows: (weekdays, start minute, end minute, keep_alive) tuples; first match wins
+        """
+        duration_seconds(default)
+        self.default = default
+        self.windows = windows or []
+
+    @classmethod
+    def parse(cls, default: str, schedule: str = "") -> "KeepAlivePolicy":
+        """
+        Build a policy from configuration strings (see module docstring)
+
+        Raises:
+            ValueError: If the schedule is malformed
+        """
+        windows = []
+        for entry in filter(None, (part.strip() for part in schedule.split(";"))):
+            match = _WINDOW.match(entry)
+            if not match:
+                raise ValueError(f"Invalid keep_alive schedule entry: {entry!r}")
+            days, start_h, start_m, end_h, end_m, keep_alive = match.groups()
+            start, end = int(start_h) * 60 + int(start_m), int(end_h) * 60 + int(end_m)
+            if not start < end <= 24 * 60:
+                raise ValueError(f"Window must start before it ends on the same day: {entry!r}")
+            duration_seconds(keep_alive)
+            windows.append((_parse_days(days), start, end, keep_alive))
+        return cls(default, windows)
+
+    def window_at(self, when: float) -> Optional[str]:
+        """keep_alive of the window active at a timestamp, None outside every window"""
+        local = datetime.fromtimestamp(when)
+        minute = local.hour * 60 + local.minute
+        for days, start, end, keep_alive in self.windows:
+            if local.weekday() in days and start <= minute < end:
+                return keep_alive
+        return None
+
+    def keep_alive_at(self, when: float) -> str:
+        """keep_alive to send at a timestamp"""
+        window = self.window_at(when)
+        return self.default if window is None else window
+
+    def current(self) -> str:
+        """keep_alive to send now"""
+        return self.keep_alive_at(time.time())
+
+
+class ModelKeeper:
+    """Preloads Ollama models and keeps them resident according to a KeepAlivePolicy"""
+
+    def __init__(
+        self,
+        client: Any,
+        policy: KeepAlivePolicy,
+        models: Optional[List[str]] = None,
+        check_interval: float = 60.0,
+        preload_lead: float = 600.0,
+    ):
+        """
+        Args:
+            client: OllamaClient used for loading
+            policy: Keep-alive schedule
+            models: Models to keep warm (defaults to the client's model)
+            check_interval: Seconds between schedule checks
+            preload_lead: Seconds before a window opens that models are loaded
+        """
+        self.client = client
+        self.policy = policy
+        self.models = list(dict.fromkeys(models or [client.model]))
+        self.check_interval = check_interval
+        self.preload_lead = preload_lead
+        self.applied: Optional[str] = None
+        self.last_ping: float = 0.0
+        self.loads: Dict[str, Dict[str, float]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def target(self, now: float) -> Tuple[str, bool]:
+        """keep_alive to apply at `now` and whether a window is active (or about to open)"""
+        window = self.policy.window_at(now)
+        if window is None:
+            window = self.policy.window_at(now + self.preload_lead)
+        return (window, True) if window is not None else (self.policy.default, False)
+
+    def preload(self, keep_alive: Optional[str] = None) -> bool:
+        """
+        Load every model now
+
+        Args:
+            keep_alive: keep_alive to apply (defaults to the schedule's current target)
+
+        Returns:
+            True if every model loaded
+        """
+        keep_alive = keep_alive or self.target(time.time())[0]
+        ok = True
+        for model in self.models:
+            result = self.client.load_model(model, keep_alive=keep_alive)
+            if result is None:
+                ok = False
+                continue
+            self.loads[model] = {**result, "at": time.time()}
+            get_metrics().observe("ollama.preload.latency", result["total_seconds"])
+            logger.info(f"🔥 {model} loaded in {result['load_seconds']:.1f}s, keep_alive {keep_alive}")
+        self.applied = keep_alive
+        self.last_ping = time.time()
+        return ok
+
+    def tick(self, now: Optional[float] = None) -> bool:
+        """
+        Apply the schedule once
+
+        Models are pinged when the target keep_alive changes (window opening or
+        closing) and, during windows, before an idle model would expire.
+
+        Returns:
+            True if the models were pinged
+        """
+        now = time.time() if now is None else now
+        keep_alive, active = self.target(now)
+        idle = now - max(self.client.last_request_at or 0.0, self.last_ping)
+        expiring = active and idle >= duration_seconds(keep_alive) - 2 * self.check_interval
+        if keep_alive == self.applied and not expiring:
+            return False
+        self.preload(keep_alive)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.tick()
+            except Exception as e:
+                logger.warning(f"Ollama keep-alive check failed: {e}")
+
+    def start(self) -> None:
+        """Apply the schedule in a background thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ollama-keepalive", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def describe(self) -> Dict[str, Any]:
+        """Current keep-alive state for /stats"""
+        return {
+            "models": self.models,
+            "keep_alive": self.applied,
+            "schedule_active": self.target(time.time())[1],
+            "loads": self.loads,
+        }
+
+
+# Global instance
+_model_keeper: Optional[ModelKeeper] = None
+
+
+def get_model_keeper() -> ModelKeeper:
+    """Get the global model keeper for the configured Ollama models"""
+    global _model_keeper
+    if _model_keeper is None:
+        from .client import get_ollama_client
+
+        config = get_config()
+        client = get_ollama_client(check_model=False)
+        models = [client.model, config.ollama_fast_model, config.ollama_strong_model]
+        _model_keeper = ModelKeeper(
+            client,
+            client.keep_alive_policy or KeepAlivePolicy.parse(config.ollama_keep_alive),
+            models=[model for model in models if model],
+        )
+    return _model_keeper
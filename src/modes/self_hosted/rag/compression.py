@@ -0,0 +1,149 @@
+"""
+Extractive context compression
+
+Even well-retrieved wiki chunks are mostly text the question doesn't need:
+version history, trivia, data-value tables. On CPU Ollama, prefill time grows
+with prompt length, so ContextCompressor keeps only the sentences closest to
+the question before the prompt is built:
+
+1. split the retrieved chunks into sentences (short fragments such as table
+   cells are merged with their neighbour; sentences repeated by overlapping
+   chunks are kept once);
+2. embed the query and every sentence in one batch (sentence vectors are
+   cached, wiki chunks come back for many questions) and score them all with
+   one matrix-vector product;
+3. take sentences by descending score until the token budget is used, then
+   restore their original order so each chunk still reads naturally.
+
+Chunks left without sentences are dropped; the relevance (distance) and
+metadata of the others are kept for ContextBuilder.
+"""
+
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .context import TokenCounter, doc_text
+
+logger = logging.getLogger(__name__)
+
+# Fragments shorter than this (table cells, headings) are merged with the next one
+MIN_SENTENCE_CHARS = 30
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split chunk text into sentences, merging short fragments into the following text"""
+    sentences: List[str] = []
+    pending = ""
+    for fragment in _SENTENCE_SPLIT.split(text):
+        fragment = fragment.strip()
+        if not fragment:
+            continue
+        pending = f"{pending} {fragment}" if pending else fragment
+        if len(pending) >= MIN_SENTENCE_CHARS:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+class ContextCompressor:
+    """Keeps the retrieved sentences most similar to the query within a token budget"""
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], Any],
+        counter: TokenCounter,
+        cache_size: int = 20000,
+    ):
+        """
+        Args:
+            embed: Embeds a list of texts, returning one vector per text
+            counter: Token counter for the generating model
+            cache_size: Sentence vectors kept between requests
+        """
+        self.embed = embed
+        self.counter = counter
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def _vectors(self, query: str, sentences: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Unit-length query vector and sentence matrix, embedding only uncached sentences"""
+        missing = [s for s in dict.fromkeys(sentences) if s not in self._cache]
+        vectors = np.asarray(self.embed([query, *missing]), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        for sentence, vector in zip(missing, vectors[1:]):
+            self._cache[sentence] = vector
+        for sentence in sentences:
+            self._cache.move_to_end(sentence)
+        matrix = np.stack([self._cache[s] for s in sentences])
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return vectors[0], matrix
+
+    def compress(self, query: str, docs: Sequence[Any], budget: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Reduce retrieved chunks to their most query-relevant sentences
+
+        Args:
+            query: User question
+            docs: Retrieved chunks (strings or dicts with content/document/text)
+            budget: Maximum tokens of kept sentences
+
+        Returns:
+            (compressed docs as dicts with 'content', report with 'sentences_total',
+            'sentences_kept', 'tokens_before' and 'tokens_after')
+        """
+        owners: List[int] = []
+        sentences: List[str] = []
+        seen = set()
+        for index, doc in enumerate(docs):
+            for sentence in split_sentences(doc_text(doc)):
+                key = " ".join(sentence.lower().split())
+                if key in seen:
+                    continue
+                seen.add(key)
+                owners.append(index)
+                sentences.append(sentence)
+
+        report = {"sentences_total": len(sentences), "sentences_kept": 0, "tokens_before": 0, "tokens_after": 0}
+        if not sentences:
+            return [], report
+
+        query_vector, matrix = self._vectors(query, sentences)
+        scores = matrix @ query_vector
+        tokens = np.array([self.counter.count(sentence) for sentence in sentences])
+        report["tokens_before"] = int(tokens.sum())
+
+        # Best first while it fits; smaller sentences further down may still fill the gap
+        order = np.argsort(-scores, kind="stable")
+        fits = np.cumsum(tokens[order]) <= budget
+        keep = np.zeros(len(sentences), dtype=bool)
+        keep[order[fits]] = True
+        remaining = budget - int(tokens[order[fits]].sum())
+        for index in order[~fits]:
+            if tokens[index] <= remaining:
+                keep[index] = True
+                remaining -= int(tokens[index])
+
+        kept: Dict[int, List[str]] = {}
+        for index in np.flatnonzero(keep):
+            kept.setdefault(owners[index], []).append(sentences[index])
+        compressed = []
+        for index, parts in kept.items():
+            doc = docs[index]
+            base = dict(doc) if isinstance(doc, dict) else {}
+            compressed.append({**base, "content": " ".join(parts)})
+
+        report["sentences_kept"] = int(keep.sum())
+        report["tokens_after"] = int(tokens[keep].sum())
+        return compressed, report
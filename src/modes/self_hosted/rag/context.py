@@ -0,0 +1,268 @@
+"""
+Token-budgeted context assembly for RAG prompts
+
+Retrieved chunks used to be joined blindly, so long chunks could overflow the
+model's num_ctx (Ollama then silently truncates the start of the prompt, which
+is the system prefix) or inflate CPU prefill time. ContextBuilder:
+
+- counts tokens with the model's tokenizer (a Hugging Face tokenizer named by
+  RAG_TOKENIZER, loaded once; a character-based estimate without it), with
+  counts memoised per text;
+- orders chunks by relevance (reranker score, else vector distance) and adds
+  them until the token budget is used, cutting the last one at a sentence or
+  word boundary;
+- removes text repeated between chunks: exact duplicates and the 200-character
+  overlap ContentProcessor.chunk_text leaves between neighbouring chunks.
+
+The budget is min(RAG_CONTEXT_TOKENS, num_ctx - prompt without context -
+RAG_ANSWER_TOKENS), so the answer always has room.
+"""
+
+import importlib.util
+import logging
+import math
+import re
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+TRANSFORMERS_AVAILABLE = importlib.util.find_spec("transformers") is not None
+
+# Ollama's num_ctx when neither the request nor the calibration profile sets one
+DEFAULT_NUM_CTX = 2048
+
+# Average characters per token of Llama-style tokenizers on English wiki text
+CHARS_PER_TOKEN = 3.6
+
+# Overlap shorter than this between two chunks is treated as coincidence
+MIN_OVERLAP_CHARS = 40
+
+# Don't bother adding a cut-down chunk with less room than this
+MIN_PARTIAL_TOKENS = 48
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count when no tokenizer is available (errs on the high side)"""
+    if not text:
+        return 0
+    words = len(text.split())
+    return max(math.ceil(len(text) / CHARS_PER_TOKEN), math.ceil(words * 1.3))
+
+
+class TokenCounter:
+    """Counts tokens with a model tokenizer, caching the tokenizer and recent counts"""
+
+    def __init__(self, tokenizer_name: str = "", cache_size: int = 4096):
+        """
+        Args:
+            tokenizer_name: Hugging Face tokenizer id (e.g. the model's base repo); empty = estimate
+            cache_size: Number of texts whose counts are memoised
+        """
+        self.tokenizer_name = tokenizer_name
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._encode: Optional[Callable[[str], int]] = None
+
+    def _load(self) -> Callable[[str], int]:
+        """Load the tokenizer once; fall back to the estimate if that isn't possible"""
+        if self._encode is None:
+            self._encode = estimate_tokens
+            if self.tokenizer_name and TRANSFORMERS_AVAILABLE:
+                try:
+                    from transformers import AutoTokenizer
+
+                    tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+                    self._encode = lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+                    logger.info(f"🧮 Counting prompt tokens with the {self.tokenizer_name} tokenizer")
+                except Exception as e:
+                    logger.warning(f"Could not load tokenizer {self.tokenizer_name}, estimating tokens: {e}")
+            elif self.tokenizer_name:
+                logger.warning("transformers not installed, estimating prompt tokens")
+        return self._encode
+
+    @property
+    def exact(self) -> bool:
+        """Whether counts come from a real tokenizer"""
+        return self._load() is not estimate_tokens
+
+    def count(self, text: str) -> int:
+        """Number of tokens in a text"""
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            return cached
+        tokens = self._load()(text)
+        self._cache[text] = tokens
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return tokens
+
+
+def overlap_length(previous: str, text: str, max_overlap: int = 400) -> int:
+    """
+    Length of the longest end of `previous` that starts `text`
+
+    Args:
+        previous: Earlier chunk
+        text: Later chunk
+        max_overlap: Longest overlap looked for
+
+    Returns:
+        Number of leading characters of `text` already present at the end of `previous`
+    """
+    tail = previous[-max_overlap:]
+    probe = text[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    start = tail.find(probe)
+    while start != -1:
+        length = len(tail) - start
+        if text.startswith(tail[start:]):
+            return length
+        start = tail.find(probe, start + 1)
+    return 0
+
+
+def doc_text(doc: Any) -> str:
+    """Text of a retrieved chunk (a string or a search result dict)"""
+    if isinstance(doc, dict):
+        return str(doc.get("content") or doc.get("document") or doc.get("text") or "")
+    return str(doc)
+
+
+def _doc_rank(doc: Any) -> float:
+    """Sort key: reranker score when present, else vector distance (lower is more relevant)"""
+    if not isinstance(doc, dict):
+        return math.inf
+    if doc.get("rerank_score") is not None:
+        return -doc["rerank_score"]
+    return math.inf if doc.get("distance") is None else doc["distance"]
+
+
+class ContextBuilder:
+    """Fills a token budget with the most relevant, de-duplicated retrieved chunks"""
+
+    def __init__(self, counter: TokenCounter, separator: str = "\n\n"):
+        """
+        Args:
+            counter: Token counter for the generating model
+            separator: Text placed between chunks
+        """
+        self.counter = counter
+        self.separator = separator
+
+    def budget(self, num_ctx: int, base_tokens: int, answer_tokens: int, max_context_tokens: int) -> int:
+        """
+        Context tokens that fit next to the rest of the prompt and the answer
+
+        Args:
+            num_ctx: Model context window
+            base_tokens: Tokens of the prompt without context (system prefix, question)
+            answer_tokens: Tokens reserved for the answer
+            max_context_tokens: Configured upper bound
+
+        Returns:
+            Token budget for the context (0 if nothing fits)
+        """
+        return max(0, min(max_context_tokens, num_ctx - base_tokens - answer_tokens))
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        """Longest prefix of `text` ending at a sentence (or word) boundary within `tokens`"""
+        sentences = _SENTENCE_END.split(text)
+        kept = ""
+        for sentence in sentences:
+            candidate = f"{kept} {sentence}" if kept else sentence
+            if self.counter.count(candidate) > tokens:
+                break
+            kept = candidate
+        if kept:
+            return kept
+        words = text.split()
+        low, high = 0, len(words)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.counter.count(" ".join(words[:middle])) <= tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return " ".join(words[:low])
+
+    def build(self, docs: Sequence[Any], budget: int) -> Dict[str, Any]:
+        """
+        Assemble the context for one prompt
+
+        Args:
+            docs: Retrieved chunks (strings, or dicts with content/document/text and optional distance)
+            budget: Maximum context tokens
+
+        Returns:
+            dict with 'context', 'tokens', 'budget', 'chunks_used', 'chunks_total',
+            'duplicate_chars' and 'truncated'
+        """
+        # Most relevant first; retrieval order breaks ties and orders chunks without a distance
+        ranked = sorted(enumerate(docs), key=lambda item: (_doc_rank(item[1]), item[0]))
+        selected: List[str] = []
+        used = 0
+        duplicate_chars = 0
+        truncated = False
+        separator_tokens = self.counter.count(self.separator)
+
+        for _, doc in ranked:
+            text = doc_text(doc).strip()
+            if not text:
+                continue
+            if any(text in previous for previous in selected):
+                duplicate_chars += len(text)
+                continue
+            # Neighbouring chunks share ~200 characters: drop the part already in the prompt
+            for previous in selected:
+                head = overlap_length(previous, text)
+                text = text[head:].lstrip()
+                tail = overlap_length(text, previous) if text else 0
+                text = text[: len(text) - tail].rstrip()
+                duplicate_chars += head + tail
+            if not text:
+                continue
+
+            remaining = budget - used - (separator_tokens if selected else 0)
+            tokens = self.counter.count(text)
+            if tokens > remaining:
+                if remaining < MIN_PARTIAL_TOKENS:
+                    break
+                text = self._truncate(text, remaining)
+                if not text:
+                    break
+                tokens = self.counter.count(text)
+                truncated = True
+            selected.append(text)
+            used += tokens + (separator_tokens if len(selected) > 1 else 0)
+            if truncated:
+                break
+
+        context = self.separator.join(selected)
+        return {
+            "context": context,
+            "tokens": self.counter.count(context) if context else 0,
+            "budget": budget,
+            "chunks_used": len(selected),
+            "chunks_total": len(docs),
+            "duplicate_chars": duplicate_chars,
+            "truncated": truncated,
+        }
+
+
+# Global instance
+_token_counter: Optional[TokenCounter] = None
+
+
+def get_token_counter() -> TokenCounter:
+    """Get the global token counter for the configured tokenizer"""
+    global _token_counter
+    if _token_counter is None:
+        from ....core.config import get_config
+
+        _token_counter = TokenCounter(get_config().rag_tokenizer)
+    return _token_counter
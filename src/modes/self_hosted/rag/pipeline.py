@@ -5,10 +5,18 @@ Combines vector database retrieval with Ollama generation for enhanced responses
 """
 
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+from ....shared.deadline import Deadline
+from ....shared.metrics import get_metrics
+from ....shared.model_router import ModelRouter
+from ....shared.prompting import PromptTemplate
+from ..data.embeddings import get_embedding_backend
 from ..data.vector_db import MinecraftVectorDB
 from ..ollama.client import get_ollama_client
+from .compression import ContextCompressor
+from .context import DEFAULT_NUM_CTX, ContextBuilder, get_token_counter
+from .rerank import get_reranker
 
 logger = logging.getLogger(__name__)
 
@@ -28,17 +36,26 @@ class SelfHostedRAGPipeline:
 
         # Use config values if not provided
         if chroma_host is None and config.self_hosted:
-            chroma_host = config.self_hosted.chroma_db_host or None
-            chroma_port = config.self_hosted.chroma_db_port
+            chroma_host = config.chroma_db_host or None
+            chroma_port = config.chroma_db_port
 
-        self.vector_db = MinecraftVectorDB(
-            persist_directory=vector_db_path,
-            chroma_host=chroma_host,
-            chroma_port=chroma_port,
+        # Workers serve the index the server master preloaded before forking them
+        self.vector_db = take_preloaded_vector_db(vector_db_path) or open_vector_db(
+            vector_db_path, chroma_host, chroma_port
         )
-        self.ollama_client = get_ollama_client()
+        # The model check/pull is the ollama warm-up's job; don't repeat it on this warm-up path
+        self.ollama_client = get_ollama_client(check_model=False)
 
-        # RAG prompt template
+        # Complexity-based routing between a fast and a strong Ollama model
+        self.router = ModelRouter(
+            fast_model=config.ollama_fast_model or self.ollama_client.model,
+            strong_model=config.ollama_strong_model or self.ollama_client.model,
+            max_fast_words=config.routing_max_fast_words,
+            min_confidence=config.routing_min_confidence,
+        )
+
+        # RAG prompt template; the instructions become a stable system prefix that
+        # Ollama keeps in its KV cache, context and question follow per request
         self.rag_prompt_template = """
 You are a helpful AI assistant with access to relevant knowledge from a knowledge base.
 Use the following context information to help answer the user's question.
@@ -50,27 +67,140 @@ Context:
 Question: {question}
 
 Answer:"""
+        self.prompt = PromptTemplate(self.rag_prompt_template)
+
+        # Optional cross-encoder reranking of over-fetched vector search candidates
+        self.reranker = get_reranker() if config.rag_rerank else None
+        self.rerank_candidates = config.rag_rerank_candidates
+
+        # Retrieved chunks are packed into a token budget that leaves room for the answer
+        self.context_builder = ContextBuilder(get_token_counter())
+        self.top_k = config.rag_top_k
+        self.max_context_tokens = config.rag_context_tokens
+        self.answer_tokens = config.rag_answer_tokens
+
+        # Extractive compression: only the sentences closest to the question reach the prompt
+        self.compress_tokens = config.rag_compress_tokens
+        self.compressor = ContextCompressor(self.vector_db.embed, self.context_builder.counter)
 
-    def retrieve_context(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
-        """Retrieve relevant context from vector database"""
+    def retrieve_context(self, query: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Retrieve relevant context from vector database (RAG_TOP_K chunks by default)
+
+        With reranking enabled, RAG_RERANK_CANDIDATES chunks are fetched and the
+        cross-encoder picks the top_k (vector order if it runs out of time).
+        """
+        top_k = top_k or self.top_k
         try:
-            results = self.vector_db.search(query, n_results=top_k)
+            if self.reranker is None:
+                return self.vector_db.search(query, n_results=top_k)
+            candidates = self.vector_db.search(query, n_results=max(top_k, self.rerank_candidates))
+            results, report = self.reranker.rerank(query, candidates, top_k)
+            logger.debug(
+                f"🎯 Reranked {len(candidates)} candidates in {report['ms']:.0f}ms "
+                f"({report['cached']} cached, {report['scored']} scored)"
+            )
             return results
         except Exception as e:
             logger.error(f"Error retrieving context: {e}")
             return []
 
-    def generate_rag_response(self, query: str, context_docs: List[str]) -> Optional[str]:
-        """Generate response using retrieved context"""
-        try:
-            # Combine context documents
-            context = "\n\n".join(context_docs) if context_docs else "No relevant context found."
+    def retrieval_confidence(self, context_docs: List[Any]) -> Optional[float]:
+        """Estimate 0-1 confidence from the best result's vector distance"""
+        distances = [
+            doc["distance"] for doc in context_docs if isinstance(doc, dict) and doc.get("distance") is not None
+        ]
+        if not distances:
+            return None
+        return max(0.0, min(1.0, 1.0 - min(distances)))
+
+    def build_prompt(self, query: str, context_docs: List[Any], model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Assemble the user prompt within the model's context window
 
-            # Format prompt
-            prompt = self.rag_prompt_template.format(context=context, question=query)
+        The context budget is what remains of num_ctx (from the calibration
+        profile, else Ollama's default) after the system prefix, the question
+        and RAG_ANSWER_TOKENS for the answer, capped at RAG_CONTEXT_TOKENS.
+        With RAG_COMPRESS_TOKENS set, the chunks are first cut down to their
+        sentences most similar to the question within that many tokens.
+
+        Args:
+            query: User question
+            context_docs: Retrieved chunks, most relevant first or with distances
+            model: Model the prompt is for (defaults to the client's model)
+
+        Returns:
+            dict with 'prompt', 'prompt_tokens' and the ContextBuilder report
+        """
+        counter = self.context_builder.counter
+        tuned = getattr(self.ollama_client, "tuned_options", {}).get(model or self.ollama_client.model, {})
+        num_ctx = tuned.get("num_ctx", DEFAULT_NUM_CTX)
+        base_tokens = counter.count(self.prompt.system) + counter.count(self.prompt.render(question=query))
+        budget = self.context_builder.budget(num_ctx, base_tokens, self.answer_tokens, self.max_context_tokens)
+        compression: Dict[str, Any] = {}
+        if self.compress_tokens > 0 and context_docs:
+            try:
+                context_docs, compression = self.compressor.compress(
+                    query, context_docs, min(self.compress_tokens, budget)
+                )
+            except Exception as e:
+                logger.warning(f"Context compression failed, using whole chunks: {e}")
+        report = self.context_builder.build(context_docs, budget)
+        prompt = self.prompt.render(context=report["context"] or "No relevant context found.", question=query)
+        prompt_tokens = counter.count(self.prompt.system) + counter.count(prompt)
+
+        metrics = get_metrics()
+        metrics.increment("rag.prompt_tokens", prompt_tokens)
+        metrics.increment("rag.context_tokens", report["tokens"])
+        metrics.set_gauge("rag.last_prompt_tokens", prompt_tokens)
+        if report["truncated"]:
+            metrics.increment("rag.context_truncated")
+        if compression:
+            metrics.increment("rag.compression.tokens_before", compression["tokens_before"])
+            metrics.increment("rag.compression.tokens_after", compression["tokens_after"])
+            logger.info(
+                f"🗜️ Compressed context {compression['tokens_before']} -> {compression['tokens_after']} tokens "
+                f"({compression['sentences_kept']}/{compression['sentences_total']} sentences)"
+            )
+        logger.info(
+            f"🧮 Prompt {prompt_tokens} tokens (num_ctx {num_ctx}): context {report['tokens']}/{budget} "
+            f"from {report['chunks_used']}/{report['chunks_total']} chunks, "
+            f"{report['duplicate_chars']} duplicate chars removed"
+        )
+        return {
+            **report,
+            "prompt": prompt,
+            "prompt_tokens": prompt_tokens,
+            "num_ctx": num_ctx,
+            "compression": compression,
+        }
+
+    def generate_rag_response(
+        self,
+        query: str,
+        context_docs: List[Any],
+        model: Optional[str] = None,
+        timeout: float = 60.0,
+        affinity: Optional[str] = None,
+    ) -> Optional[str]:
+        """Generate response using retrieved context
+
+        Args:
+            affinity: Talk room, keeping a room on one Ollama endpoint when balancing
+        """
+        try:
+            # Stable system prefix, then the most relevant context that fits and the question
+            prompt = self.build_prompt(query, context_docs, model=model)["prompt"]
 
             # Generate response with Ollama
-            response = self.ollama_client.generate(prompt=prompt, temperature=0.7, top_p=0.9)
+            response = self.ollama_client.generate(
+                prompt=prompt,
+                system=self.prompt.system,
+                model=model,
+                timeout=timeout,
+                affinity=affinity,
+                temperature=0.7,
+                top_p=0.9,
+            )
 
             return response
 
@@ -78,19 +208,54 @@ Answer:"""
             logger.error(f"Error generating RAG response: {e}")
             return None
 
-    def query(self, question: str, use_rag: bool = True) -> str:
-        """Main query method with optional RAG"""
+    def query(
+        self, question: str, use_rag: bool = True, deadline: Optional[Deadline] = None, room: Optional[str] = None
+    ) -> str:
+        """Main query method with optional RAG
+
+        Args:
+            question: User question
+            use_rag: Retrieve context before generating
+            deadline: Optional request deadline; retrieval must leave budget for generation
+            room: Talk room token, used for sticky routing across Ollama endpoints
+
+        Raises:
+            DeadlineExceeded: If retrieval used up the whole budget
+        """
+        deadline = deadline or Deadline(60.0)
         if use_rag:
             # Retrieve context and generate RAG response
             context_docs = self.retrieve_context(question)
+            deadline.check("retrieval")
             if context_docs:
-                response = self.generate_rag_response(question, context_docs)
+                if self.router.enabled:
+                    routed = self.router.run(
+                        question,
+                        lambda model: self.generate_rag_response(
+                            question, context_docs, model=model, timeout=deadline.timeout(), affinity=room
+                        ),
+                        retrieval_confidence=self.retrieval_confidence(context_docs),
+                    )
+                    response = routed["answer"]
+                else:
+                    response = self.generate_rag_response(
+                        question, context_docs, timeout=deadline.timeout(), affinity=room
+                    )
                 if response:
                     return response
 
-        # Fallback to direct generation
+        # Fallback to direct generation (no retrieval, so always the strong tier when routing)
+        deadline.check("generation")
         logger.info("Using direct LLM generation (no RAG context)")
-        response = self.ollama_client.generate(prompt=question, temperature=0.7)
+        model = self.router.strong_model if self.router.enabled else None
+        response = self.ollama_client.generate(
+            prompt=self.prompt.render(question=question),
+            system=self.prompt.system,
+            model=model,
+            timeout=deadline.timeout(),
+            affinity=room,
+            temperature=0.7,
+        )
 
         return response or "I apologize, but I couldn't generate a response at this time."
 
@@ -103,6 +268,89 @@ Answer:"""
             logger.error(f"Error adding knowledge: {e}")
 
 
+def open_vector_db(
+    vector_db_path: str, chroma_host: Optional[str] = None, chroma_port: int = 8000, watch: bool = True
+) -> MinecraftVectorDB:
+    """Open the vector database configured by the VECTOR_* and EMBEDDING_* settings"""
+    from ....core.config import get_config
+
+    config = get_config()
+    return MinecraftVectorDB(
+        persist_directory=vector_db_path,
+        chroma_host=chroma_host,
+        chroma_port=chroma_port,
+        embedding_batch_size=config.embedding_batch_size,
+        embedding_batch_wait_ms=config.embedding_batch_wait_ms,
+        embedder=get_embedding_backend(),
+        embedding_cache_dir=config.embedding_cache_path or None,
+        quantization=config.vector_quantization,
+        pq_subvectors=config.vector_pq_subvectors,
+        rescore_candidates=config.vector_rescore_candidates,
+        page_candidates=config.vector_page_candidates,
+        shards=config.vector_shards,
+        snapshots=config.vector_snapshots,
+        snapshot_poll_seconds=config.vector_snapshot_poll_seconds,
+        watch=watch,
+    )
+
+
+# Vector database opened by preload_vector_db() in the server master, as (path, db)
+_preloaded_vector_db: Optional[Tuple[str, MinecraftVectorDB]] = None
+
+
+def preload_vector_db() -> Optional[MinecraftVectorDB]:
+    """
+    Load the embedding model and open the vector index before the server forks its workers
+
+    The workers then share the model weights and the index (codes, full
+    vectors, page summaries) copy-on-write instead of each loading a copy.
+    Only the quantized index and snapshots are opened here: a ChromaDB client
+    holds connections that don't survive fork. Called again (SIGHUP), the
+    previous copy is closed and the current data is loaded.
+
+    Returns:
+        The preloaded vector database, or None when it is opened per worker
+    """
+    global _preloaded_vector_db
+    from ....core.config import get_config
+
+    config = get_config()
+    if _preloaded_vector_db is not None:
+        _preloaded_vector_db[1].close()
+        _preloaded_vector_db = None
+
+    embedder = get_embedding_backend()
+    if not embedder.fork_safe:
+        logger.info(f"Embedding backend {embedder.name} is loaded per worker")
+        return None
+    embedder.load()
+    if not (config.vector_quantization or config.vector_snapshots):
+        return None
+    vector_db = open_vector_db(config.chroma_db_path, watch=False)
+    _preloaded_vector_db = (config.chroma_db_path, vector_db)
+    logger.info(f"📦 Preloaded vector index {config.chroma_db_path} ({vector_db.count()} chunks)")
+    return vector_db
+
+
+def take_preloaded_vector_db(vector_db_path: str) -> Optional[MinecraftVectorDB]:
+    """
+    Serve the preloaded vector database from this process
+
+    Args:
+        vector_db_path: Directory the pipeline was configured with
+
+    Returns:
+        The preloaded database for this directory (started), or None
+    """
+    global _preloaded_vector_db
+    if _preloaded_vector_db is None or _preloaded_vector_db[0] != vector_db_path:
+        return None
+    vector_db = _preloaded_vector_db[1]
+    _preloaded_vector_db = None
+    vector_db.start()
+    return vector_db
+
+
 # Global instance
 _rag_pipeline: Optional[SelfHostedRAGPipeline] = None
 
@@ -116,9 +364,9 @@ def get_rag_pipeline() -> SelfHostedRAGPipeline:
         config = get_config()
         if config.self_hosted:
             _rag_pipeline = SelfHostedRAGPipeline(
-                vector_db_path=config.self_hosted.chroma_db_path,
-                chroma_host=config.self_hosted.chroma_db_host or None,
-                chroma_port=config.self_hosted.chroma_db_port,
+                vector_db_path=config.chroma_db_path,
+                chroma_host=config.chroma_db_host or None,
+                chroma_port=config.chroma_db_port,
             )
         else:
             raise ValueError("Self-hosted mode not configured")
@@ -0,0 +1,173 @@
+"""
+Optional cross-encoder reranking of retrieved chunks
+
+Vector search ranks chunks by embedding distance, which misses a lot of
+question/answer relevance. CrossEncoderReranker over-fetches candidates
+(RAG_RERANK_CANDIDATES) and rescores each (query, chunk) pair with a small
+cross-encoder (ms-marco MiniLM by default) on the CPU, in batches.
+
+- Scores are cached per (query, chunk) pair, so repeated and debounced
+  questions don't pay for inference again.
+- The stage has a latency budget (RAG_RERANK_BUDGET_MS). Once it is used up
+  no further batch is started and the original vector order is used for this
+  request; the pairs scored so far stay cached for the next one.
+
+Enable with RAG_RERANK=true (needs sentence-transformers). Quality and added
+milliseconds are measured by scripts/benchmark_retrieval.py.
+"""
+
+import hashlib
+import importlib.util
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ....shared.metrics import get_metrics
+from .context import doc_text
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_TRANSFORMERS_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """Reorders retrieved chunks by cross-encoder relevance within a latency budget"""
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_RERANK_MODEL,
+        batch_size: int = 16,
+        budget_ms: float = 250.0,
+        max_length: int = 256,
+        cache_size: int = 10000,
+        scorer: Optional[Callable[[List[Tuple[str, str]]], Sequence[float]]] = None,
+    ):
+        """
+        Args:
+            model_name: sentence-transformers CrossEncoder model
+            batch_size: Pairs per inference batch
+            budget_ms: Time allowed for scoring before falling back to the vector order
+            max_length: Token limit per (query, chunk) pair; longer chunks are cut
+            cache_size: Cached pair scores
+            scorer: Scores a batch of (query, text) pairs; defaults to the cross-encoder
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self._scorer = scorer
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self.metrics = get_metrics()
+
+    def _load(self) -> Callable[[List[Tuple[str, str]]], Sequence[float]]:
+        """Load the cross-encoder on first use"""
+        if self._scorer is None:
+            if not SENTENCE_TRANSFORMERS_AVAILABLE:
+                raise RuntimeError("sentence-transformers is required for RAG_RERANK")
+            from sentence_transformers import CrossEncoder
+
+            started = time.perf_counter()
+            model = CrossEncoder(self.model_name, device="cpu", max_length=self.max_length)
+            self._scorer = lambda pairs: model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+            logger.info(f"🎯 Loaded reranker {self.model_name} in {time.perf_counter() - started:.1f}s")
+        return self._scorer
+
+    def warm_up(self) -> bool:
+        """Load the model and run one pair so the first question doesn't pay for it"""
+        try:
+            self._load()([("warm up", "warm up")])
+            return True
+        except Exception as e:
+            logger.warning(f"Reranker warm-up failed: {e}")
+            return False
+
+    @staticmethod
+    def _key(query: str, text: str) -> Tuple[str, str]:
+        normalized = " ".join(query.lower().split())
+        return normalized, hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def rerank(self, query: str, docs: Sequence[Any], top_k: int) -> Tuple[List[Any], Dict[str, Any]]:
+        """
+        Rerank retrieved chunks
+
+        Args:
+            query: User question
+            docs: Candidates from vector search, closest first
+            top_k: Chunks to return
+
+        Returns:
+            (top_k docs, best first, with a 'rerank_score' on dict docs, report with
+            'reranked', 'cached', 'scored' and 'ms'); on fallback the first top_k
+            candidates in their original order
+        """
+        texts = [doc_text(doc) for doc in docs]
+        keys = [self._key(query, text) for text in texts]
+        scores = np.full(len(docs), np.nan, dtype=np.float32)
+        for index, key in enumerate(keys):
+            cached = self._cache.get(key)
+            if cached is not None:
+                scores[index] = cached
+                self._cache.move_to_end(key)
+        cached_count = int(np.count_nonzero(~np.isnan(scores)))
+
+        missing = [int(index) for index in np.flatnonzero(np.isnan(scores))]
+        fallback = False
+        started = time.perf_counter()
+        try:
+            # Loading the model doesn't count against the budget (warm_up() loads it at startup)
+            scorer = self._load() if missing else None
+            started = time.perf_counter()
+            for start in range(0, len(missing), self.batch_size):
+                if (time.perf_counter() - started) * 1000 > self.budget_ms:
+                    fallback = True
+                    break
+                batch = missing[start : start + self.batch_size]
+                batch_scores = scorer([(query, texts[index]) for index in batch])
+                for index, score in zip(batch, batch_scores):
+                    scores[index] = float(score)
+                    self._cache[keys[index]] = float(score)
+        except Exception as e:
+            logger.warning(f"Reranking failed, keeping vector order: {e}")
+            fallback = True
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.metrics.observe("rag.rerank.latency", elapsed_ms / 1000)
+        scored = int(np.count_nonzero(~np.isnan(scores))) - cached_count
+        report = {"reranked": not fallback, "cached": cached_count, "scored": scored, "ms": elapsed_ms}
+        if fallback:
+            self.metrics.increment("rag.rerank.fallbacks")
+            logger.info(f"⏱️ Reranking incomplete after {elapsed_ms:.0f}ms, using vector order")
+            return list(docs[:top_k]), report
+
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        reranked = []
+        for index in order:
+            doc = docs[index]
+            reranked.append({**doc, "rerank_score": float(scores[index])} if isinstance(doc, dict) else doc)
+        return reranked, report
+
+
+# Global instance
+_reranker: Optional[CrossEncoderReranker] = None
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """Get the global reranker for the configured model"""
+    global _reranker
+    if _reranker is None:
+        from ....core.config import get_config
+
+        config = get_config()
+        _reranker = CrossEncoderReranker(
+            model_name=config.rag_rerank_model,
+            budget_ms=config.rag_rerank_budget_ms,
+        )
+    return _reranker
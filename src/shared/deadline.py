@@ -0,0 +1,107 @@
+"""
+End-to-end request deadlines
+
+A Deadline is created when a webhook arrives and travels with the request.
+Every stage (retrieval, generation, safety check, delivery) runs with whatever
+budget is left, optionally capped and leaving a reserve for later stages, and
+is cancelled when that budget runs out so the caller can fall back to a
+stage-specific degraded response.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage runs out of budget"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """Absolute time budget for one request"""
+
+    def __init__(self, budget: float, started_at: Optional[float] = None):
+        """
+        Args:
+            budget: Total seconds available for the request
+            started_at: Start timestamp (defaults to now)
+        """
+        self.budget = budget
+        self.started_at = started_at if started_at is not None else time.time()
+        self.expires_at = self.started_at + budget
+
+    def remaining(self) -> float:
+        """Seconds left (never negative)"""
+        return max(0.0, self.expires_at - time.time())
+
+    def elapsed(self) -> float:
+        """Seconds since the request started"""
+        return time.time() - self.started_at
+
+    @property
+    def expired(self) -> bool:
+        """Whether the budget is used up"""
+        return self.remaining() <= 0
+
+    def timeout(self, cap: Optional[float] = None, reserve: float = 0.0) -> float:
+        """
+        Budget for the next stage
+
+        Args:
+            cap: Upper bound for this stage
+            reserve: Seconds to keep back for later stages
+        """
+        available = max(0.0, self.remaining() - reserve)
+        return min(cap, available) if cap is not None else available
+
+    def check(self, stage: str) -> None:
+        """Raise DeadlineExceeded if the budget is gone"""
+        if self.expired:
+            get_metrics().increment(f"stage.{stage}.deadline_exceeded")
+            raise DeadlineExceeded(stage)
+
+    async def run_stage(
+        self,
+        stage: str,
+        factory: Callable[[float], Awaitable[T]],
+        cap: Optional[float] = None,
+        reserve: float = 0.0,
+    ) -> T:
+        """
+        Run one stage within the remaining budget
+
+        Args:
+            stage: Stage name for logs and metrics
+            factory: Callable receiving the stage timeout and returning an awaitable
+            cap: Upper bound for this stage
+            reserve: Seconds to keep back for later stages
+
+        Raises:
+            DeadlineExceeded: If no budget is left or the stage does not finish in time
+        """
+        metrics = get_metrics()
+        timeout = self.timeout(cap=cap, reserve=reserve)
+        if timeout <= 0:
+            metrics.increment(f"stage.{stage}.deadline_exceeded")
+            raise DeadlineExceeded(stage)
+
+        start = time.time()
+        try:
+            return await asyncio.wait_for(factory(timeout), timeout=timeout)
+        except asyncio.TimeoutError as e:
+            metrics.increment(f"stage.{stage}.deadline_exceeded")
+            logger.warning(f"⏰ {stage} stage cancelled after {timeout:.1f}s ({self.elapsed():.1f}s into request)")
+            raise DeadlineExceeded(stage) from e
+        finally:
+            metrics.observe(f"stage.{stage}.latency", time.time() - start)
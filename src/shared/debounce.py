@@ -0,0 +1,168 @@
+"""
+Per-room message debouncing
+
+Kids often split one question across several quick messages ("how do i",
+"make a", "bed"). Messages from the same actor in the same room that arrive
+within the debounce window are buffered and merged into a single query, which
+is handed to the flush callback once the actor pauses (or the maximum wait is
+reached), so the burst costs one thinking message and one LLM call.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBatch:
+    """Messages buffered for one (room, actor) pair"""
+
+    def __init__(self, room: str, actor: str):
+        self.room = room
+        self.actor = actor
+        self.parts: List[str] = []
+        # Talk message ID of each part (None when unknown)
+        self.message_ids: List[Optional[str]] = []
+        self.first_at = time.time()
+        self.timer: Optional[asyncio.Task] = None
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.room, self.actor)
+
+    @property
+    def last_message_id(self) -> Optional[str]:
+        return next((message_id for message_id in reversed(self.message_ids) if message_id), None)
+
+    @property
+    def query(self) -> str:
+        return merge_messages(self.parts)
+
+    @property
+    def dedupe_key(self) -> Optional[str]:
+        """Job dedupe key: a redelivered webhook repeats it, an edited message doesn't"""
+        if not self.last_message_id:
+            return None
+        digest = hashlib.sha1(self.query.encode("utf-8")).hexdigest()[:12]
+        return f"{self.room}:{self.last_message_id}:{digest}"
+
+
+FlushCallback = Callable[[MessageBatch], Awaitable[None]]
+
+
+def merge_messages(parts: List[str]) -> str:
+    """
+    Merge buffered messages into one query
+
+    Empty parts and immediate repeats are dropped and whitespace is collapsed.
+
+    Args:
+        parts: Cleaned messages in arrival order
+
+    Returns:
+        str: Single query string
+    """
+    merged: List[str] = []
+    for part in parts:
+        part = re.sub(r"\s+", " ", part).strip()
+        if part and (not merged or merged[-1].lower() != part.lower()):
+            merged.append(part)
+    return " ".join(merged)
+
+
+class MessageDebouncer:
+    """Buffers rapid-fire messages per (room, actor) and flushes them as one query"""
+
+    def __init__(self, on_flush: FlushCallback, window: float = 1.5, max_wait: float = 6.0):
+        """
+        Args:
+            on_flush: Coroutine called with the merged batch once the actor pauses
+            window: Seconds of silence that end a burst (0 disables debouncing)
+            max_wait: Upper bound on how long the first message may be held back
+        """
+        self.on_flush = on_flush
+        self.window = window
+        self.max_wait = max(window, max_wait)
+        self.metrics = get_metrics()
+        self._batches: Dict[Tuple[str, str], MessageBatch] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def submit(self, room: str, actor: str, message: str, message_id: Optional[str] = None) -> bool:
+        """
+        Add a message to its (room, actor) batch
+
+        A message ID that is already buffered is an edit (Talk update event):
+        its text replaces the buffered one in place.
+
+        Args:
+            room: Conversation token
+            actor: Sender ID
+            message: Cleaned message text
+            message_id: Talk message ID, if known
+
+        Returns:
+            bool: True if the message was buffered, False if it was flushed immediately
+        """
+        key = (room, actor)
+        message_id = str(message_id) if message_id else None
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = MessageBatch(room, actor)
+        if message_id and message_id in batch.message_ids:
+            batch.parts[batch.message_ids.index(message_id)] = message
+            self.metrics.increment("debounce.edited")
+        else:
+            if batch.parts:
+                self.metrics.increment("debounce.merged")
+            batch.parts.append(message)
+            batch.message_ids.append(message_id)
+
+        if batch.timer is not None:
+            batch.timer.cancel()
+
+        delay = min(self.window, self.max_wait - (time.time() - batch.first_at))
+        if not self.enabled or delay <= 0:
+            await self._flush(key)
+            return False
+
+        batch.timer = asyncio.create_task(self._flush_later(key, delay))
+        return True
+
+    def discard(self, room: str, message_id: str) -> bool:
+        """Drop a buffered message (Talk delete events); returns True if it was buffered"""
+        for batch in self._batches.values():
+            if batch.room == room and message_id and str(message_id) in batch.message_ids:
+                index = batch.message_ids.index(str(message_id))
+                del batch.parts[index]
+                del batch.message_ids[index]
+                return True
+        return False
+
+    async def _flush_later(self, key: Tuple[str, str], delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self._flush(key)
+
+    async def _flush(self, key: Tuple[str, str]) -> None:
+        batch = self._batches.pop(key, None)
+        if batch is None or not batch.query:
+            return
+        if len(batch.parts) > 1:
+            logger.info(f"🧩 Merged {len(batch.parts)} messages from {batch.actor} in {batch.room}")
+        self.metrics.increment("debounce.flushed")
+        try:
+            await self.on_flush(batch)
+        except Exception as e:
+            logger.error(f"Error handling debounced messages: {e}")
+
+    def pending(self) -> int:
+        """Number of batches still waiting for their window to close"""
+        return len(self._batches)
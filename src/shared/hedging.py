@@ -0,0 +1,161 @@
+"""
+Hedged requests across two LLM providers
+
+The primary provider gets a head start equal to a percentile of its own recent
+latency. If it hasn't answered by then (or fails early), the same prompt is sent
+to the secondary provider. The first valid answer wins and the loser is told to
+stop through its cancel token, so average cost stays close to a single request
+while tail latency is bounded by the faster of the two.
+"""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from .inflight import CancelToken, GenerationCancelled
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# A provider call receives a cancel token it should honour where it can
+ProviderCall = Callable[[CancelToken], Optional[str]]
+
+
+class ProviderHedger:
+    """Race a secondary provider against a slow primary"""
+
+    def __init__(
+        self,
+        primary_name: str,
+        secondary_name: str,
+        percentile: float = 95.0,
+        min_delay: float = 2.0,
+        max_delay: float = 30.0,
+        default_delay: float = 8.0,
+        min_samples: int = 5,
+        max_workers: int = 8,
+    ):
+        """
+        Args:
+            primary_name: Name of the provider tried first (e.g. "xai")
+            secondary_name: Name of the hedge provider (e.g. "ollama")
+            percentile: Percentile of the primary's recent latency used as its budget
+            min_delay: Lower bound for the hedge delay in seconds
+            max_delay: Upper bound for the hedge delay in seconds
+            default_delay: Delay used until enough latency samples exist
+            min_samples: Samples required before the percentile is trusted
+            max_workers: Threads available for in-flight provider calls
+        """
+        self.primary_name = primary_name
+        self.secondary_name = secondary_name
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.metrics = get_metrics()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def hedge_delay(self) -> float:
+        """Latency budget for the primary before the hedge is fired"""
+        tracker = self.metrics.latency(f"hedge.{self.primary_name}.latency")
+        delay = self.default_delay
+        if tracker.count >= self.min_samples:
+            delay = tracker.percentile(self.percentile) or self.default_delay
+        return max(self.min_delay, min(self.max_delay, delay))
+
+    def _call(self, name: str, provider: ProviderCall, cancel: CancelToken) -> Optional[str]:
+        """Run one provider call, recording its latency unless it was cancelled (see run())"""
+        start = time.time()
+        try:
+            answer = provider(cancel)
+        except Exception as e:
+            logger.error(f"Hedged call to {name} failed: {e}")
+            return None
+        if not cancel.is_set():
+            self.metrics.observe(f"hedge.{name}.latency", time.time() - start)
+        return answer
+
+    def run(
+        self,
+        primary: ProviderCall,
+        secondary: ProviderCall,
+        is_valid: Optional[Callable[[Optional[str]], bool]] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run the primary, hedging to the secondary when it is slow or fails
+
+        Args:
+            primary: Call for the primary provider
+            secondary: Call for the secondary provider
+            is_valid: Predicate deciding whether an answer can win (default: non-empty)
+            cancel: Optional request-level token; cancelling it stops both providers
+
+        Returns:
+            dict with 'answer', 'provider', 'hedged' and 'latency'
+
+        Raises:
+            GenerationCancelled: If the request-level token was cancelled
+        """
+        is_valid = is_valid or (lambda answer: bool(answer))
+        start = time.time()
+        cancels = {self.primary_name: CancelToken(parent=cancel), self.secondary_name: CancelToken(parent=cancel)}
+        futures: Dict[Future, str] = {}
+
+        def submit(name: str, provider: ProviderCall) -> None:
+            futures[self._executor.submit(self._call, name, provider, cancels[name])] = name
+
+        submit(self.primary_name, primary)
+        delay = self.hedge_delay()
+        hedged = False
+        done, pending = wait(set(futures), timeout=delay)
+        if not done:
+            logger.info(f"⏳ {self.primary_name} exceeded {delay:.1f}s budget, hedging to {self.secondary_name}")
+            self.metrics.increment("hedge.fired")
+            submit(self.secondary_name, secondary)
+            hedged = True
+            pending = set(futures)
+
+        fallback: Optional[str] = None
+        fallback_provider = self.primary_name
+        while done or pending:
+            if cancel is not None and cancel.is_set():
+                raise GenerationCancelled(cancel.reason or "cancelled")
+            for future in done:
+                name = futures[future]
+                answer = future.result()
+                if is_valid(answer):
+                    if name != self.primary_name and any(futures[f] == self.primary_name for f in pending):
+                        # The primary lost while still running: its latency is at least this long.
+                        # Recording the lower bound keeps slow primaries in the budget's percentile.
+                        self.metrics.observe(f"hedge.{self.primary_name}.latency", time.time() - start)
+                    for other, event in cancels.items():
+                        if other != name:
+                            event.set()
+                    for other_future in pending:
+                        other_future.cancel()
+                    self.metrics.increment(f"hedge.wins.{name}")
+                    return {"answer": answer, "provider": name, "hedged": hedged, "latency": time.time() - start}
+
+                if fallback is None:
+                    fallback, fallback_provider = answer, name
+                if not hedged:
+                    logger.info(f"⚠️ {self.primary_name} failed early, hedging to {self.secondary_name}")
+                    self.metrics.increment("hedge.failover")
+                    submit(self.secondary_name, secondary)
+                    hedged = True
+                    pending = pending | {f for f, n in futures.items() if n == self.secondary_name}
+
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        return {"answer": fallback, "provider": fallback_provider, "hedged": hedged, "latency": time.time() - start}
+
+    def shutdown(self) -> None:
+        """Stop accepting hedged calls"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,156 @@
+"""
+In-flight generation tracking and cancellation
+
+Each answer being generated is registered under its (room, actor) pair. A newer
+question from the same person in the same room, or a Talk edit/delete event for
+the original message, cancels the older generation: its CancelToken makes the
+streaming LLM call close its HTTP connection and its asyncio task is cancelled
+so the thinking message can be cleaned up.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationCancelled(Exception):
+    """Raised inside a generation once its CancelToken is cancelled"""
+
+
+class CancelToken:
+    """Thread-safe cancellation flag, optionally linked to a parent token
+
+    Mirrors the threading.Event API (set/is_set/wait) so it can be handed to
+    code that expects an event.
+    """
+
+    def __init__(self, parent: Optional["CancelToken"] = None):
+        self.parent = parent
+        self.reason = ""
+        self._event = threading.Event()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Cancel this token (children see it too)"""
+        self.reason = reason
+        self._event.set()
+
+    def set(self) -> None:
+        """Event-compatible alias for cancel()"""
+        self.cancel()
+
+    def is_set(self) -> bool:
+        """Whether this token or any parent was cancelled"""
+        return self._event.is_set() or (self.parent is not None and self.parent.is_set())
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until this token is cancelled or the timeout passes"""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self) -> None:
+        """Raise GenerationCancelled if cancelled"""
+        if self.is_set():
+            reason = self.reason or (self.parent.reason if self.parent else "")
+            raise GenerationCancelled(reason or "cancelled")
+
+
+class InFlightGeneration:
+    """One answer being generated for a user message"""
+
+    def __init__(self, room: str, actor: str, message_id: Optional[str] = None, parent: Optional[CancelToken] = None):
+        self.room = room
+        self.actor = actor
+        self.message_id = message_id
+        self.cancel_token = CancelToken(parent=parent)
+        self.task: Optional[asyncio.Task] = None
+        self.thinking_message_id: Optional[int] = None
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.room, self.actor)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token.is_set()
+
+    def cancel(self, reason: str) -> None:
+        """Stop the LLM call and the surrounding task"""
+        self.cancel_token.cancel(reason)
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+
+class InFlightRegistry:
+    """Tracks the current generation per (room, actor)"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._by_key: Dict[Tuple[str, str], InFlightGeneration] = {}
+        self.metrics = get_metrics()
+
+    def start(
+        self, room: str, actor: str, message_id: Optional[str] = None, parent: Optional[CancelToken] = None
+    ) -> InFlightGeneration:
+        """Register a new generation, cancelling any older one for the same room and actor
+
+        Args:
+            room: Conversation token
+            actor: Sender ID
+            message_id: Talk message being answered
+            parent: Optional token whose cancellation also cancels this generation (e.g. a queued job's)
+        """
+        generation = InFlightGeneration(room, actor, message_id, parent=parent)
+        with self._lock:
+            previous = self._by_key.get(generation.key)
+            self._by_key[generation.key] = generation
+            self.metrics.set_gauge("inflight.generations", len(self._by_key))
+        if previous is not None:
+            logger.info(f"✂️ Superseding in-flight answer for {actor} in {room}")
+            self.metrics.increment("inflight.superseded")
+            previous.cancel("superseded by a newer question")
+        return generation
+
+    def cancel_message(self, room: str, message_id: str, reason: str = "original message changed") -> bool:
+        """Cancel the generation answering a specific message (Talk edit/delete events)"""
+        with self._lock:
+            match = next(
+                (g for g in self._by_key.values() if g.room == room and g.message_id == str(message_id)),
+                None,
+            )
+            if match is not None:
+                del self._by_key[match.key]
+                self.metrics.set_gauge("inflight.generations", len(self._by_key))
+        if match is None:
+            return False
+        logger.info(f"✂️ Cancelling answer to message {message_id} in {room}: {reason}")
+        self.metrics.increment("inflight.cancelled")
+        match.cancel(reason)
+        return True
+
+    def finish(self, generation: InFlightGeneration) -> None:
+        """Forget a generation once it is done (if it is still the current one)"""
+        with self._lock:
+            if self._by_key.get(generation.key) is generation:
+                del self._by_key[generation.key]
+            self.metrics.set_gauge("inflight.generations", len(self._by_key))
+
+    def describe(self) -> Dict[str, Any]:
+        """Summary for stats endpoints"""
+        with self._lock:
+            return {"in_flight": len(self._by_key)}
+
+
+# Global instance
+_registry: Optional[InFlightRegistry] = None
+
+
+def get_inflight_registry() -> InFlightRegistry:
+    """Get the global in-flight generation registry"""
+    global _registry
+    if _registry is None:
+        _registry = InFlightRegistry()
+    return _registry
@@ -0,0 +1,400 @@
+"""
+Durable on-disk job queue
+
+A small SQLite (WAL mode) queue between webhook ingress and the workers that
+answer questions, so queued and in-flight jobs survive restarts and workers
+can run in separate processes from the HTTP server.
+
+Delivery is at-least-once: a claimed job is invisible to other workers for a
+visibility timeout that its worker keeps extending while it runs. If the
+worker dies, the lease expires and the job is handed out again. Handlers
+should therefore be safe to run twice; they can store progress (e.g. the ID of
+a message already posted) in the job's state for the next attempt.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .inflight import CancelToken
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+DONE = "done"
+DEAD = "dead"
+CANCELLED = "cancelled"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_id TEXT,
+    group_key TEXT,
+    message_key TEXT,
+    dedupe_key TEXT UNIQUE,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (queue, status, available_at);
+CREATE INDEX IF NOT EXISTS jobs_group ON jobs (group_key, status);
+CREATE INDEX IF NOT EXISTS jobs_message ON jobs (message_key, status);
+"""
+
+
+class Job:
+    """A claimed job"""
+
+    def __init__(self, row: sqlite3.Row):
+        self.id: int = row["id"]
+        self.queue: str = row["queue"]
+        self.payload: Dict[str, Any] = json.loads(row["payload"])
+        self.state: Dict[str, Any] = json.loads(row["state"])
+        self.attempts: int = row["attempts"]
+        self.lease_id: str = row["lease_id"]
+        self.created_at: float = row["created_at"]
+        # Set by the worker pool when the job is cancelled while it runs
+        self.cancel_token = CancelToken()
+
+
+class JobQueue:
+    """SQLite-backed queue with visibility timeouts"""
+
+    def __init__(self, path: str, visibility_timeout: float = 120.0, max_attempts: int = 3, retry_delay: float = 2.0):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            visibility_timeout: Seconds a claimed job stays invisible without a heartbeat
+            max_attempts: Attempts before a job is moved to the dead letter status
+            retry_delay: Base delay before a failed job is retried (doubles per attempt)
+        """
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.metrics = get_metrics()
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _write(self, sql: str, params: tuple = ()) -> int:
+        """Run one write statement, returning the number of affected rows"""
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def enqueue(
+        self,
+        queue: str,
+        payload: Dict[str, Any],
+        group_key: Optional[str] = None,
+        message_key: Optional[str] = None,
+        dedupe_key: Optional[str] = None,
+        supersede: bool = False,
+    ) -> Optional[int]:
+        """
+        Add a job
+
+        Args:
+            queue: Queue name
+            payload: JSON-serialisable job data
+            group_key: Optional group (e.g. room and actor) used for superseding
+            message_key: Optional key of the message the job answers (for cancel_message)
+            dedupe_key: Optional key; a second job with the same key is ignored
+            supersede: Cancel older unfinished jobs of the same group
+
+        Returns:
+            Optional[int]: Job ID, None if the job was a duplicate
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if supersede and group_key:
+                    superseded = self._conn.execute(
+                        "UPDATE jobs SET cancelled = 1, updated_at = ? WHERE group_key = ? AND status = ?",
+                        (now, group_key, PENDING),
+                    ).rowcount
+                    if superseded:
+                        self.metrics.increment(f"jobs.{queue}.superseded", superseded)
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO jobs (queue, payload, available_at, group_key, message_key, dedupe_key,"
+                    " created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (queue, json.dumps(payload), now, group_key, message_key, dedupe_key, now, now),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if not cursor.rowcount:
+            logger.info(f"Ignoring duplicate job {dedupe_key}")
+            return None
+        self.metrics.increment(f"jobs.{queue}.enqueued")
+        return cursor.lastrowid
+
+    def claim(self, queue: str) -> Optional[Job]:
+        """
+        Lease the oldest available job
+
+        Returns:
+            Optional[Job]: The claimed job, None if the queue is empty
+        """
+        now = time.time()
+        lease_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._conn.execute(
+                        "SELECT id, cancelled, attempts FROM jobs WHERE queue = ? AND status = ? AND available_at <= ?"
+                        " ORDER BY id LIMIT 1",
+                        (queue, PENDING, now),
+                    ).fetchone()
+                    if row is None:
+                        self._conn.execute("COMMIT")
+                        return None
+                    if row["cancelled"]:
+                        self._conn.execute(
+                            "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (CANCELLED, now, row["id"])
+                        )
+                        continue
+                    if row["attempts"] >= self.max_attempts:
+                        # Its last lease expired without an ack: the handler keeps crashing the worker
+                        self._conn.execute(
+                            "UPDATE jobs SET status = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                            (DEAD, "lease expired on final attempt", now, row["id"]),
+                        )
+                        self.metrics.increment(f"jobs.{queue}.dead")
+                        continue
+                    self._conn.execute(
+                        "UPDATE jobs SET attempts = attempts + 1, available_at = ?, lease_id = ?, updated_at = ?"
+                        " WHERE id = ?",
+                        (now + self.visibility_timeout, lease_id, now, row["id"]),
+                    )
+                    job = Job(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+                    self._conn.execute("COMMIT")
+                    break
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        self.metrics.increment(f"jobs.{queue}.claimed")
+        if job.attempts == 1:
+            self.metrics.observe(f"jobs.{queue}.wait", now - job.created_at)
+        else:
+            self.metrics.increment(f"jobs.{queue}.redelivered")
+        return job
+
+    def extend(self, job: Job, seconds: Optional[float] = None) -> bool:
+        """Push a job's visibility timeout out again (heartbeat); False if the lease was lost"""
+        until = time.time() + (seconds or self.visibility_timeout)
+        return bool(
+            self._write(
+                "UPDATE jobs SET available_at = ? WHERE id = ? AND lease_id = ? AND status = ?",
+                (until, job.id, job.lease_id, PENDING),
+            )
+        )
+
+    def save_state(self, job: Job, **updates: Any) -> None:
+        """Persist progress so a redelivered job can pick up where this attempt stopped"""
+        job.state.update(updates)
+        self._write(
+            "UPDATE jobs SET state = ?, updated_at = ? WHERE id = ? AND lease_id = ?",
+            (json.dumps(job.state), time.time(), job.id, job.lease_id),
+        )
+
+    def ack(self, job: Job) -> bool:
+        """Mark a job as done"""
+        done = self._write(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND lease_id = ?",
+            (DONE, time.time(), job.id, job.lease_id),
+        )
+        if done:
+            self.metrics.increment(f"jobs.{job.queue}.done")
+        return bool(done)
+
+    def nack(self, job: Job, error: str) -> None:
+        """Record a failed attempt, retrying with back-off or dead-lettering the job"""
+        now = time.time()
+        if job.attempts >= self.max_attempts:
+            self._write(
+                "UPDATE jobs SET status = ?, last_error = ?, updated_at = ? WHERE id = ? AND lease_id = ?",
+                (DEAD, error, now, job.id, job.lease_id),
+            )
+            self.metrics.increment(f"jobs.{job.queue}.dead")
+            logger.error(f"💀 Job {job.id} failed {job.attempts} times, giving up: {error}")
+            return
+        delay = self.retry_delay * 2 ** (job.attempts - 1)
+        self._write(
+            "UPDATE jobs SET available_at = ?, last_error = ?, lease_id = NULL, updated_at = ?"
+            " WHERE id = ? AND lease_id = ?",
+            (now + delay, error, now, job.id, job.lease_id),
+        )
+        self.metrics.increment(f"jobs.{job.queue}.retried")
+
+    def release(self, job: Job) -> None:
+        """Hand a job back without counting the attempt (worker shutting down)"""
+        self._write(
+            "UPDATE jobs SET available_at = ?, attempts = attempts - 1, lease_id = NULL, updated_at = ?"
+            " WHERE id = ? AND lease_id = ? AND status = ?",
+            (time.time(), time.time(), job.id, job.lease_id, PENDING),
+        )
+
+    def cancel_group(self, group_key: str) -> int:
+        """Cancel unfinished jobs of a group"""
+        return self._write(
+            "UPDATE jobs SET cancelled = 1, updated_at = ? WHERE group_key = ? AND status = ?",
+            (time.time(), group_key, PENDING),
+        )
+
+    def cancel_message(self, message_key: str) -> int:
+        """Cancel unfinished jobs answering a message"""
+        return self._write(
+            "UPDATE jobs SET cancelled = 1, updated_at = ? WHERE message_key = ? AND status = ?",
+            (time.time(), message_key, PENDING),
+        )
+
+    def is_cancelled(self, job: Job) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT cancelled FROM jobs WHERE id = ?", (job.id,)).fetchone()
+        return bool(row and row["cancelled"])
+
+    def purge(self, older_than: float = 86400.0) -> int:
+        """Delete finished jobs older than `older_than` seconds"""
+        return self._write("DELETE FROM jobs WHERE status != ? AND updated_at < ?", (PENDING, time.time() - older_than))
+
+    def stats(self) -> Dict[str, Any]:
+        """Job counts per status and age of the oldest ready job"""
+        now = time.time()
+        with self._lock:
+            counts = {
+                row["status"]: row["count"]
+                for row in self._conn.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")
+            }
+            oldest = self._conn.execute(
+                "SELECT MIN(created_at) AS oldest FROM jobs WHERE status = ? AND available_at <= ?", (PENDING, now)
+            ).fetchone()["oldest"]
+        return {"counts": counts, "oldest_ready_age": round(now - oldest, 3) if oldest else 0.0}
+
+
+JobHandler = Callable[[Job], Awaitable[None]]
+
+
+class JobWorkerPool:
+    """Async workers claiming jobs from one queue
+
+    While a job runs its lease is extended periodically and its row is
+    checked for cancellation, which is forwarded to the job's cancel token.
+    """
+
+    def __init__(
+        self,
+        job_queue: JobQueue,
+        queue: str,
+        handler: JobHandler,
+        concurrency: int = 4,
+        poll_interval: float = 0.5,
+    ):
+        """
+        Args:
+            job_queue: Queue to claim from
+            queue: Queue name
+            handler: Coroutine processing one job; raising marks the attempt as failed
+            concurrency: Jobs processed at the same time
+            poll_interval: Seconds between polls of an empty queue
+        """
+        self.job_queue = job_queue
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = max(0.05, min(1.0, job_queue.visibility_timeout / 3))
+        self._stopping = False
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[int, asyncio.Task] = {}
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop"""
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._loop(n)) for n in range(self.concurrency)]
+        logger.info(f"👷 Started {self.concurrency} workers for queue '{self.queue}'")
+
+    async def stop(self, grace: float = 30.0) -> None:
+        """
+        Stop claiming jobs and wait for running ones
+
+        Jobs still running after `grace` seconds are cancelled and handed back
+        to the queue for another worker.
+        """
+        self._stopping = True
+        running = list(self._running.values())
+        if running:
+            logger.info(f"Waiting up to {grace:.0f}s for {len(running)} running jobs")
+            await asyncio.wait(running, timeout=grace)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _loop(self, worker_no: int) -> None:
+        while not self._stopping:
+            try:
+                job = await asyncio.to_thread(self.job_queue.claim, self.queue)
+            except Exception as e:
+                logger.error(f"Worker {worker_no} failed to claim a job: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self.process(job)
+
+    async def process(self, job: Job) -> None:
+        """Run the handler for one claimed job, then ack, retry or hand it back"""
+        task = asyncio.create_task(self.handler(job))
+        self._running[job.id] = task
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=self.heartbeat_interval)
+                if task.done():
+                    break
+                await asyncio.to_thread(self.job_queue.extend, job)
+                if not job.cancel_token.is_set() and await asyncio.to_thread(self.job_queue.is_cancelled, job):
+                    job.cancel_token.cancel("job cancelled")
+        except asyncio.CancelledError:
+            # Shutting down: hand the job to another worker
+            task.cancel()
+            await asyncio.to_thread(self.job_queue.release, job)
+            raise
+        finally:
+            self._running.pop(job.id, None)
+
+        if task.cancelled():
+            await asyncio.to_thread(self.job_queue.release, job)
+        elif task.exception() is not None:
+            logger.error(f"Job {job.id} failed: {task.exception()}")
+            await asyncio.to_thread(self.job_queue.nack, job, str(task.exception()))
+        else:
+            await asyncio.to_thread(self.job_queue.ack, job)
@@ -0,0 +1,102 @@
+"""
+Lightweight in-process metrics for NextCraftTalk
+
+Keeps counters, gauges and rolling latency samples so components can report
+their behaviour through the /stats endpoints without an external metrics stack.
+"""
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+class LatencyTracker:
+    """Rolling window of latency samples (seconds) with percentile helpers"""
+
+    def __init__(self, window: int = 500):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Record a single latency sample"""
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Return the given percentile (0-100) of the recent samples, or None if empty"""
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def summary(self) -> Dict[str, Any]:
+        """Summarise the tracker for reporting"""
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 4) if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe registry of named counters, gauges and latency trackers"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._latencies: Dict[str, LatencyTracker] = {}
+
+    def increment(self, name: str, value: float = 1.0) -> None:
+        """Increment a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0.0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to an absolute value"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def latency(self, name: str) -> LatencyTracker:
+        """Get (or create) the latency tracker for a name"""
+        with self._lock:
+            tracker = self._latencies.get(name)
+            if tracker is None:
+                tracker = self._latencies[name] = LatencyTracker()
+            return tracker
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a latency sample for a name"""
+        self.latency(name).record(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a JSON-serialisable view of every metric"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            latencies = dict(self._latencies)
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "latency": {name: tracker.summary() for name, tracker in latencies.items()},
+        }
+
+
+# Global instance
+_metrics: Optional[MetricsRegistry] = None
+
+
+def get_metrics() -> MetricsRegistry:
+    """Get the global metrics registry"""
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry()
+    return _metrics
@@ -0,0 +1,179 @@
+"""
+Complexity-based model routing
+
+Sends short factual questions to a small, fast model and longer multi-step
+questions to a larger model. When the fast model's answer looks weak the
+question is escalated to the strong model automatically. Every decision and
+the latency of each tier is logged and recorded so thresholds can be tuned.
+"""
+
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+FAST_TIER = "fast"
+STRONG_TIER = "strong"
+
+# Phrases that usually mean the kid wants several steps or a comparison
+MULTI_STEP_MARKERS = [
+    "and then",
+    "after that",
+    "step by step",
+    "steps",
+    "compare",
+    "difference between",
+    "better than",
+    "best way",
+    "why",
+    "explain",
+    "strategy",
+    "automatic",
+    "redstone",
+    "farm",
+]
+
+# Answers that signal the fast model could not help
+WEAK_ANSWER_MARKERS = [
+    "i don't know",
+    "i do not know",
+    "i'm not sure",
+    "couldn't generate",
+    "try rephrasing",
+    "error generating response",
+    "error: no response",
+]
+
+
+class ModelRouter:
+    """Route queries between a fast and a strong model"""
+
+    def __init__(
+        self,
+        fast_model: str,
+        strong_model: str,
+        max_fast_words: int = 18,
+        min_confidence: float = 0.35,
+        min_answer_chars: int = 40,
+        escalate: bool = True,
+    ):
+        """
+        Args:
+            fast_model: Model used for short factual questions
+            strong_model: Model used for long or multi-step questions
+            max_fast_words: Longest question (in words) still sent to the fast model
+            min_confidence: Retrieval confidence below which the strong model is used
+            min_answer_chars: Shorter fast answers are treated as weak
+            escalate: Retry weak fast answers on the strong model
+        """
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.max_fast_words = max_fast_words
+        self.min_confidence = min_confidence
+        self.min_answer_chars = min_answer_chars
+        self.escalate = escalate
+        self.metrics = get_metrics()
+
+    @property
+    def enabled(self) -> bool:
+        """Routing only makes sense when the two tiers use different models"""
+        return bool(self.fast_model and self.strong_model and self.fast_model != self.strong_model)
+
+    def extract_features(self, query: str) -> Dict[str, Any]:
+        """Extract the query features used for routing"""
+        query_lower = query.lower()
+        words = query_lower.split()
+        return {
+            "words": len(words),
+            "questions": max(1, query.count("?")),
+            "sentences": max(1, len([s for s in re.split(r"[.!?]+", query) if s.strip()])),
+            "multi_step": [marker for marker in MULTI_STEP_MARKERS if marker in query_lower],
+            "conjunctions": query_lower.count(" and ") + query_lower.count(" then "),
+        }
+
+    def route(self, query: str, retrieval_confidence: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Pick a tier for a query
+
+        Args:
+            query: User question
+            retrieval_confidence: Optional 0-1 score of the best retrieved context
+
+        Returns:
+            dict with 'tier', 'model', 'reasons' and 'features'
+        """
+        features = self.extract_features(query)
+        reasons: List[str] = []
+
+        if features["words"] > self.max_fast_words:
+            reasons.append(f"{features['words']} words > {self.max_fast_words}")
+        if features["questions"] > 1 or features["sentences"] > 2:
+            reasons.append("several questions")
+        if features["multi_step"]:
+            reasons.append(f"multi-step markers: {', '.join(features['multi_step'])}")
+        if features["conjunctions"] >= 2:
+            reasons.append("chained clauses")
+        if retrieval_confidence is not None and retrieval_confidence < self.min_confidence:
+            reasons.append(f"low retrieval confidence {retrieval_confidence:.2f}")
+
+        tier = STRONG_TIER if reasons else FAST_TIER
+        return {
+            "tier": tier,
+            "model": self.strong_model if tier == STRONG_TIER else self.fast_model,
+            "reasons": reasons or ["short factual question"],
+            "features": features,
+        }
+
+    def is_weak_answer(self, answer: Optional[str]) -> bool:
+        """Check whether an answer looks too weak to send"""
+        if not answer or len(answer.strip()) < self.min_answer_chars:
+            return True
+        answer_lower = answer.lower()
+        return any(marker in answer_lower for marker in WEAK_ANSWER_MARKERS)
+
+    def _timed(self, tier: str, model: str, generate: Callable[[str], Optional[str]]) -> Optional[str]:
+        """Call the generator for one tier and record its latency"""
+        start = time.time()
+        answer = generate(model)
+        elapsed = time.time() - start
+        self.metrics.observe(f"router.{tier}.latency", elapsed)
+        self.metrics.increment(f"router.{tier}.requests")
+        logger.info(f"🧭 {tier} tier ({model}) answered in {elapsed:.2f}s")
+        return answer
+
+    def run(
+        self,
+        query: str,
+        generate: Callable[[str], Optional[str]],
+        retrieval_confidence: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Route a query, generate an answer and escalate weak fast answers
+
+        Args:
+            query: User question
+            generate: Callable taking a model name and returning the answer
+            retrieval_confidence: Optional 0-1 score of the best retrieved context
+
+        Returns:
+            dict with 'answer', 'model', 'tier' and 'escalated'
+        """
+        decision = self.route(query, retrieval_confidence)
+        logger.info(f"🧭 Routing to {decision['tier']} tier ({decision['model']}): {'; '.join(decision['reasons'])}")
+
+        answer = self._timed(decision["tier"], decision["model"], generate)
+        result = {"answer": answer, "model": decision["model"], "tier": decision["tier"], "escalated": False}
+
+        if decision["tier"] == FAST_TIER and self.escalate and self.is_weak_answer(answer):
+            logger.info(f"🧭 Weak answer from {self.fast_model}, escalating to {self.strong_model}")
+            self.metrics.increment("router.escalations")
+            strong_answer = self._timed(STRONG_TIER, self.strong_model, generate)
+            if strong_answer:
+                result.update({"answer": strong_answer, "model": self.strong_model, "tier": STRONG_TIER})
+            result["escalated"] = True
+
+        return result
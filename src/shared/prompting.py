@@ -0,0 +1,73 @@
+"""
+Prompt templates split into a stable prefix and a variable part
+
+Providers cache the longest common prefix of consecutive prompts: x.ai bills
+cached input tokens at a discount and skips their prefill, and Ollama
+(llama.cpp) reuses the KV cache of a matching prefix. A template that mixes
+instructions with the question defeats that, because the first differing
+token comes early.
+
+PromptTemplate splits a template such as prompt_template.txt into blocks
+(separated by blank lines). Blocks that contain a placeholder ({context},
+{query}) become the per-request user message, in their original order. All
+other blocks become the system prefix, which is byte-identical on every request.
+"""
+
+import re
+from typing import Dict, List
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+class PromptTemplate:
+    """Template separated into a cacheable system prefix and a per-request user message"""
+
+    def __init__(self, template: str):
+        """
+        Args:
+            template: Prompt text with {placeholders}; lines starting with "#" are comments
+        """
+        lines = [line for line in template.splitlines() if not line.lstrip().startswith("#")]
+        blocks = [block.strip() for block in re.split(r"\n\s*\n", "\n".join(lines)) if block.strip()]
+
+        # A final one-line cue such as "ANSWER:" belongs after the question, not in the system prompt
+        self.cue = ""
+        if blocks and "\n" not in blocks[-1] and blocks[-1].endswith(":") and not _PLACEHOLDER.search(blocks[-1]):
+            self.cue = blocks.pop()
+
+        self.system = "\n\n".join(block for block in blocks if not _PLACEHOLDER.search(block))
+        self.variable_blocks: List[str] = [block for block in blocks if _PLACEHOLDER.search(block)]
+        self.placeholders = [name for block in self.variable_blocks for name in _PLACEHOLDER.findall(block)]
+
+    def render(self, **values: str) -> str:
+        """
+        Build the user message
+
+        Blocks whose placeholders are all empty or missing are left out (e.g. the
+        context block when answering without retrieval).
+
+        Args:
+            **values: Placeholder values
+
+        Returns:
+            The variable part of the prompt
+        """
+        parts = []
+        for block in self.variable_blocks:
+            names = _PLACEHOLDER.findall(block)
+            if not any(values.get(name) for name in names):
+                continue
+            parts.append(_PLACEHOLDER.sub(lambda m: str(values.get(m.group(1), "")), block))
+        if self.cue:
+            parts.append(self.cue)
+        return "\n\n".join(parts)
+
+    def messages(self, **values: str) -> List[Dict[str, str]]:
+        """Chat messages: the stable system prefix first, then the variable user message"""
+        messages = [{"role": "system", "content": self.system}] if self.system else []
+        messages.append({"role": "user", "content": self.render(**values)})
+        return messages
+
+    def full(self, **values: str) -> str:
+        """Single prompt for providers without a system role, prefix first"""
+        return f"{self.system}\n\n{self.render(**values)}" if self.system else self.render(**values)
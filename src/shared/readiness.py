@@ -0,0 +1,199 @@
+"""
+Startup readiness tracking
+
+The HTTP server starts accepting requests (liveness: /health) immediately,
+while slow initialisation - connection tests, model pulls, heavy imports,
+index loading - runs in the background. Each piece registers as a named
+component whose progress /ready reports; /ready answers 200 only once every
+required component is ready, so orchestrators route traffic to a worker
+after it has warmed up.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Set
+
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Component states
+PENDING = "pending"
+STARTING = "starting"
+READY = "ready"
+FAILED = "failed"
+
+
+class ComponentStatus:
+    """Progress of one startup component"""
+
+    def __init__(self, name: str, required: bool = True):
+        self.name = name
+        self.required = required
+        self.state = PENDING
+        self.detail = ""
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def describe(self) -> Dict[str, Any]:
+        """JSON-serialisable view of the component"""
+        seconds = None
+        if self.started_at is not None:
+            seconds = round((self.finished_at or time.time()) - self.started_at, 3)
+        result: Dict[str, Any] = {"state": self.state, "required": self.required, "seconds": seconds}
+        if self.detail:
+            result["detail"] = self.detail
+        return result
+
+
+class Readiness:
+    """Registry of startup components and their readiness"""
+
+    def __init__(self) -> None:
+        self.created_at = time.time()
+        self._components: Dict[str, ComponentStatus] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+
+    def register(self, name: str, required: bool = True) -> ComponentStatus:
+        """
+        Register a component (idempotent; re-registering resets it to pending)
+
+        Args:
+            name: Component name shown by /ready
+            required: Whether /ready waits for this component
+
+        Returns:
+            The component's status
+        """
+        with self._lock:
+            component = self._components[name] = ComponentStatus(name, required)
+            return component
+
+    def _get(self, name: str) -> ComponentStatus:
+        with self._lock:
+            component = self._components.get(name)
+            if component is None:
+                component = self._components[name] = ComponentStatus(name)
+            return component
+
+    def mark_starting(self, name: str) -> None:
+        """Record that a component started initialising"""
+        component = self._get(name)
+        component.state = STARTING
+        component.started_at = time.time()
+
+    def mark_ready(self, name: str, detail: str = "") -> None:
+        """Record that a component finished initialising"""
+        component = self._get(name)
+        component.finished_at = time.time()
+        component.started_at = component.started_at or component.finished_at
+        component.state = READY
+        component.detail = detail
+        get_metrics().observe(f"startup.{name}", component.finished_at - component.started_at)
+
+    def mark_failed(self, name: str, detail: str) -> None:
+        """Record that a component could not be initialised"""
+        component = self._get(name)
+        component.finished_at = time.time()
+        component.started_at = component.started_at or component.finished_at
+        component.state = FAILED
+        component.detail = detail
+        get_metrics().increment(f"startup.{name}.failed")
+
+    async def warm(self, name: str, init: Callable[[], Any], required: bool = True) -> bool:
+        """
+        Run a blocking initialiser in a thread and record the outcome
+
+        Args:
+            name: Component name
+            init: Blocking callable; raising or returning False marks the component failed
+            required: Whether /ready waits for this component
+
+        Returns:
+            True if the component became ready
+        """
+        self.register(name, required)
+        self.mark_starting(name)
+        try:
+            result = await asyncio.to_thread(init)
+        except Exception as e:
+            logger.error(f"❌ {name} failed to start: {e}")
+            self.mark_failed(name, str(e))
+            return False
+        if result is False:
+            logger.warning(f"⚠️ {name} check failed")
+            self.mark_failed(name, "check failed")
+            return False
+        self.mark_ready(name)
+        logger.info(f"✓ {name} ready in {self._get(name).describe()['seconds']}s")
+        return True
+
+    def start(self, name: str, init: Callable[[], Any], required: bool = True) -> asyncio.Task:
+        """
+        Warm a component in the background without blocking startup
+
+        Must be called from a running event loop.
+
+        Args:
+            name: Component name
+            init: Blocking initialiser (see warm())
+            required: Whether /ready waits for this component
+
+        Returns:
+            The background task
+        """
+        # Register now so /ready reports the component before the task first runs
+        self.register(name, required)
+        task = asyncio.create_task(self.warm(name, init, required))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for background warm-ups to finish; returns whether everything required is ready"""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+        return self.is_ready()
+
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        """Whether a component (or every required component) is ready"""
+        with self._lock:
+            if name is not None:
+                component = self._components.get(name)
+                return component is not None and component.state == READY
+            return all(c.state == READY for c in self._components.values() if c.required)
+
+    def describe(self) -> Dict[str, Any]:
+        """Overall status and per-component detail for /ready"""
+        with self._lock:
+            components = list(self._components.values())
+        required = [c for c in components if c.required]
+        if any(c.state == FAILED for c in required):
+            status = FAILED
+        elif any(c.state != READY for c in required):
+            status = STARTING
+        elif any(c.state == FAILED for c in components):
+            status = "degraded"
+        else:
+            status = READY
+        return {
+            "status": status,
+            "ready": status in (READY, "degraded"),
+            "uptime": round(time.time() - self.created_at, 3),
+            "components": {c.name: c.describe() for c in components},
+        }
+
+
+# Global instance
+_readiness: Optional[Readiness] = None
+
+
+def get_readiness() -> Readiness:
+    """Get the global readiness registry"""
+    global _readiness
+    if _readiness is None:
+        _readiness = Readiness()
+    return _readiness
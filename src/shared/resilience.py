@@ -0,0 +1,285 @@
+"""
+Shared resilience layer for outbound HTTP calls
+
+Per-endpoint circuit breakers (closed / open / half-open) and bounded retries
+with decorrelated jitter. Retries respect an overall time budget, so a failing
+x.ai, Ollama or Nextcloud endpoint makes callers fail fast to their fallback
+instead of piling up behind long timeouts.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+import requests
+
+from .inflight import GenerationCancelled
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+STATE_GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Status codes worth retrying: throttling and server-side failures
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _get_config() -> dict:
+    return {
+        "failure_threshold": int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5")),
+        "recovery_timeout": float(os.getenv("CIRCUIT_BREAKER_RECOVERY_SECONDS", "30")),
+        "max_attempts": int(os.getenv("RETRY_MAX_ATTEMPTS", "3")),
+        "base_delay": float(os.getenv("RETRY_BASE_DELAY_SECONDS", "0.2")),
+        "max_delay": float(os.getenv("RETRY_MAX_DELAY_SECONDS", "5.0")),
+    }
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the endpoint's breaker is open"""
+
+
+class TransientError(Exception):
+    """Raised by call sites for failures worth retrying (throttling, 5xx, dropped connections)"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, throttled: bool = False):
+        """
+        Args:
+            message: Error message
+            retry_after: Seconds the server asked us to wait, if it said
+            throttled: The server is up but rate limiting us (not counted against breakers)
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.throttled = throttled
+
+
+# Exceptions counted against a breaker and retried
+TRANSIENT_EXCEPTIONS: Tuple[Type[BaseException], ...] = (
+    TransientError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+
+def raise_for_transient_status(response: requests.Response) -> None:
+    """Raise TransientError for retryable status codes, honouring Retry-After"""
+    if response.status_code not in RETRYABLE_STATUS_CODES:
+        return
+    retry_after = None
+    header = response.headers.get("Retry-After") if response.headers else None
+    if header:
+        try:
+            retry_after = float(header)
+        except ValueError:
+            retry_after = None
+    raise TransientError(f"HTTP {response.status_code}", retry_after=retry_after, throttled=response.status_code == 429)
+
+
+class CircuitBreaker:
+    """Per-endpoint circuit breaker"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        """
+        Args:
+            name: Endpoint name used in logs and metrics
+            failure_threshold: Consecutive failures that open the circuit
+            recovery_timeout: Seconds before an open circuit lets a trial call through
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_count = 0
+        self._state = CLOSED
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.metrics = get_metrics()
+        self._publish()
+
+    def _publish(self) -> None:
+        self.metrics.set_gauge(f"breaker.{self.name}.state", STATE_GAUGE[self._state])
+
+    def _transition(self, state: str) -> None:
+        if state != self._state:
+            logger.warning(f"🔌 Circuit '{self.name}' {self._state} -> {state}")
+            self._state = state
+            self._publish()
+
+    @property
+    def state(self) -> str:
+        """Current state, moving open circuits to half-open once the recovery timeout passed"""
+        with self._lock:
+            if self._state == OPEN and time.time() - self.opened_at >= self.recovery_timeout:
+                self._transition(HALF_OPEN)
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Check whether a call may proceed (half-open allows a single trial call)"""
+        state = self.state
+        with self._lock:
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful call"""
+        with self._lock:
+            self.failures = 0
+            self._trial_in_flight = False
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the circuit at the threshold or after a failed trial"""
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            self.metrics.increment(f"breaker.{self.name}.failures")
+            if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+                if self._state != OPEN:
+                    self.open_count += 1
+                self._transition(OPEN)
+
+    def release_trial(self, failed: bool) -> None:
+        """
+        End a half-open trial that raised a non-transient error
+
+        Args:
+            failed: Count the trial as failed (reopening the circuit); False for
+                cancellations, which say nothing about the endpoint
+        """
+        with self._lock:
+            trial = self._trial_in_flight
+            self._trial_in_flight = False
+        if trial and failed:
+            self.record_failure()
+
+    def describe(self) -> Dict[str, Any]:
+        """Breaker state for metrics endpoints"""
+        return {"state": self.state, "failures": self.failures, "open_count": self.open_count}
+
+
+class RetryPolicy:
+    """Bounded retries with decorrelated jitter and an overall time budget"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 5.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def next_delay(self, previous: float) -> float:
+        """Decorrelated jitter: uniform between the base delay and three times the previous delay"""
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous * 3)))
+
+    def call(
+        self,
+        func: Callable[[float], Any],
+        breaker: Optional[CircuitBreaker] = None,
+        budget: Optional[float] = None,
+        attempt_timeout: float = 10.0,
+    ) -> Any:
+        """
+        Call func(timeout) with retries
+
+        Args:
+            func: Callable receiving the timeout for this attempt; raises on failure
+            breaker: Optional circuit breaker guarding the endpoint
+            budget: Overall seconds available for all attempts and back-off sleeps
+            attempt_timeout: Upper bound for a single attempt's timeout
+
+        Raises:
+            CircuitOpenError: If the breaker rejects the call
+            The last transient exception once retries or budget run out
+        """
+        deadline = time.time() + budget if budget is not None else None
+        delay = self.base_delay
+        metrics = get_metrics()
+        name = breaker.name if breaker else "call"
+
+        for attempt in range(1, self.max_attempts + 1):
+            if breaker and not breaker.allow_request():
+                metrics.increment(f"breaker.{name}.rejected")
+                raise CircuitOpenError(f"Circuit '{name}' is open")
+
+            timeout = attempt_timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.time())
+                if timeout <= 0:
+                    raise TransientError(f"Retry budget for '{name}' exhausted")
+
+            try:
+                result = func(timeout)
+            except TRANSIENT_EXCEPTIONS as e:
+                if breaker:
+                    if isinstance(e, TransientError) and e.throttled:
+                        # A throttled caller says nothing about the endpoint's health
+                        breaker.release_trial(failed=False)
+                    else:
+                        breaker.record_failure()
+                if attempt == self.max_attempts:
+                    raise
+                delay = self.next_delay(delay)
+                if isinstance(e, TransientError) and e.retry_after:
+                    delay = max(delay, e.retry_after)
+                if deadline is not None and time.time() + delay >= deadline:
+                    raise
+                metrics.increment(f"retry.{name}.attempts")
+                logger.info(f"↻ Retrying '{name}' in {delay:.2f}s after attempt {attempt} failed: {e}")
+                time.sleep(delay)
+                continue
+            except BaseException as e:
+                # Not retried, but a half-open trial must not stay in flight forever
+                if breaker:
+                    breaker.release_trial(failed=not isinstance(e, GenerationCancelled))
+                raise
+
+            if breaker:
+                breaker.record_success()
+            return result
+
+
+# Global registry of breakers, one per endpoint name
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Get or create the circuit breaker for an endpoint"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            config = _get_config()
+            breaker = _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=config["failure_threshold"],
+                recovery_timeout=config["recovery_timeout"],
+            )
+        return breaker
+
+
+def get_retry_policy(max_attempts: Optional[int] = None) -> RetryPolicy:
+    """Build a retry policy from the environment defaults"""
+    config = _get_config()
+    return RetryPolicy(
+        max_attempts=max_attempts if max_attempts is not None else config["max_attempts"],
+        base_delay=config["base_delay"],
+        max_delay=config["max_delay"],
+    )
+
+
+def circuit_breaker_states() -> Dict[str, Dict[str, Any]]:
+    """State of every registered breaker, for metrics endpoints"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.describe() for breaker in breakers}
@@ -1,18 +1,15 @@
 # src/shared/safety_filter.py
+import importlib.util
 import os
 import re
-from typing import Tuple
+from typing import Callable, Optional, Tuple
 
 import requests
 
-# Try to import profanity-check (optional, graceful fallback)
-try:
-    from profanity_check import predict  # type: ignore
-
-    PROFANITY_CHECK_AVAILABLE = True
-except ImportError:
-    PROFANITY_CHECK_AVAILABLE = False
-    predict = None  # Will be checked in _censor_profanity
+# profanity-check is optional (graceful fallback) and pulls in scikit-learn and
+# its model, so it is imported on first use or by warm_up(), not at import time
+PROFANITY_CHECK_AVAILABLE = importlib.util.find_spec("profanity_check") is not None
+_predict: Optional[Callable] = None
 
 
 PERSPECTIVE_URL = "https://commentanalyzer.googleapis.com/v1alpha1/comments:analyze"
@@ -28,8 +25,32 @@ def _get_config() -> dict:
     }
 
 
+def _load_predict() -> Optional[Callable]:
+    global _predict, PROFANITY_CHECK_AVAILABLE
+    if _predict is None and PROFANITY_CHECK_AVAILABLE:
+        try:
+            from profanity_check import predict  # type: ignore
+
+            _predict = predict
+        except ImportError:
+            PROFANITY_CHECK_AVAILABLE = False
+    return _predict
+
+
+def warm_up() -> bool:
+    """Load the profanity model ahead of the first answer
+
+    Returns:
+        False if profanity-check is installed but could not be loaded
+    """
+    if not PROFANITY_CHECK_AVAILABLE:
+        return True
+    return _load_predict() is not None
+
+
 def _censor_profanity(text: str, config: dict) -> str:
-    if not PROFANITY_CHECK_AVAILABLE or predict is None:
+    predict = _load_predict()
+    if predict is None:
         return text
     words = text.split()
     return " ".join(
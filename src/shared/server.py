@@ -0,0 +1,262 @@
+"""
+HTTP server launcher for development and production
+
+Development keeps uvicorn's auto-reload. Production runs N worker processes
+with a preload-then-fork model: the master imports the application and runs
+the mode's preload hook (heavy imports, models, indexes, memory-mapped
+vectors) once, binds the listening socket and forks the workers, which share
+those pages copy-on-write instead of each loading their own copy. Workers use
+uvloop and httptools when installed (uvicorn[standard]).
+
+Signals sent to the master:
+    SIGHUP           re-run the preload hook and replace workers one at a time
+    SIGTERM/SIGINT   stop workers gracefully and exit
+
+SIGHUP refreshes preloaded data (e.g. a re-ingested index), not code: the
+application modules stay imported in the master, so code changes need a
+restart.
+
+Preload hooks must not start threads or open connections (database files,
+HTTP sessions with pools): those don't survive fork. Anything per-process
+belongs in the application's startup event, which runs in each worker.
+"""
+
+import importlib.util
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Any, Callable, Dict, Optional, Set
+
+import uvicorn
+from uvicorn.importer import import_from_string
+
+logger = logging.getLogger(__name__)
+
+PreloadHook = Callable[[], None]
+
+
+def event_loop_impl() -> str:
+    """uvloop when installed, plain asyncio otherwise"""
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_impl() -> str:
+    """httptools when installed, h11 otherwise"""
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def resolve_workers(workers: int) -> int:
+    """Number of worker processes (0 or less means one per CPU core)"""
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def serve(
+    app: str,
+    host: str,
+    port: int,
+    workers: int = 1,
+    preload: Optional[PreloadHook] = None,
+    reload: bool = False,
+    log_level: str = "info",
+) -> None:
+    """
+    Run an ASGI application
+
+    Args:
+        app: Import string of the application ("package.module:app")
+        host: Interface to bind
+        port: Port to bind
+        workers: Worker processes (0 = one per CPU core)
+        preload: Hook loading shared heavy state before workers are forked
+        reload: Development mode: single process restarted on code changes
+        log_level: uvicorn log level
+    """
+    if reload:
+        logger.info("🔁 Development server with auto-reload")
+        uvicorn.run(app, host=host, port=port, reload=True, log_level=log_level)
+        return
+
+    workers = resolve_workers(workers)
+    if workers == 1 or not hasattr(os, "fork"):
+        if preload:
+            preload()
+        uvicorn.run(app, host=host, port=port, loop=event_loop_impl(), http=http_impl(), log_level=log_level)
+        return
+
+    PreforkServer(app, host, port, workers, preload=preload, log_level=log_level).run()
+
+
+class PreforkServer:
+    """Master process forking uvicorn workers that share one listening socket"""
+
+    def __init__(
+        self,
+        app: str,
+        host: str,
+        port: int,
+        workers: int,
+        preload: Optional[PreloadHook] = None,
+        log_level: str = "info",
+        graceful_timeout: float = 30.0,
+    ):
+        """
+        Args:
+            app: Import string of the application
+            host: Interface to bind
+            port: Port to bind
+            workers: Worker processes to keep running
+            preload: Hook loading shared heavy state before forking
+            log_level: uvicorn log level
+            graceful_timeout: Seconds a worker gets to finish in-flight requests when stopped
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.preload = preload
+        self.log_level = log_level
+        self.graceful_timeout = graceful_timeout
+        self.children: Dict[int, float] = {}
+        self._retiring: Set[int] = set()
+        self._stopping = False
+        self._reload_requested = False
+        self._app: Any = None
+        self._socket: Optional[socket.socket] = None
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def run(self) -> None:
+        """Preload, fork the workers and supervise them until stopped"""
+        self._app = import_from_string(self.app)
+        if self.preload:
+            self.preload()
+        self._socket = self._bind()
+
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "_reload_requested", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "_stopping", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "_stopping", True))
+
+        logger.info(
+            f"🚀 Master {os.getpid()} serving {self.app} on {self.host}:{self.port} with {self.workers} workers"
+        )
+        for _ in range(self.workers):
+            self._spawn()
+
+        while not self._stopping:
+            if self._reload_requested:
+                self._reload()
+            self._reap()
+            time.sleep(0.2)
+
+        self._stop_all()
+        self._socket.close()
+        logger.info("Master shutdown complete")
+
+    def _spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            # Worker: uvicorn installs its own SIGINT/SIGTERM handling
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                self._run_worker()
+            except BaseException as e:
+                logger.error(f"Worker {os.getpid()} crashed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = time.time()
+        logger.info(f"👷 Started worker {pid}")
+        return pid
+
+    def _run_worker(self) -> None:
+        assert self._socket is not None, "workers are forked after binding"
+        config = uvicorn.Config(
+            self._app,
+            loop=event_loop_impl(),
+            http=http_impl(),
+            log_level=self.log_level,
+            timeout_graceful_shutdown=int(self.graceful_timeout),
+        )
+        uvicorn.Server(config).run(sockets=[self._socket])
+
+    def _wait(self, pid: int, timeout: float) -> bool:
+        """Wait for a worker to exit, returning False if it is still running after `timeout`"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done = pid
+            if done:
+                self.children.pop(pid, None)
+                self._retiring.discard(pid)
+                return True
+            time.sleep(0.05)
+        return False
+
+    def _stop_worker(self, pid: int) -> None:
+        self._retiring.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        if not self._wait(pid, self.graceful_timeout):
+            logger.warning(f"Worker {pid} did not stop in {self.graceful_timeout:.0f}s, killing it")
+            os.kill(pid, signal.SIGKILL)
+            self._wait(pid, 5)
+
+    def _reap(self) -> None:
+        """Replace workers that exited unexpectedly"""
+        for pid in list(self.children):
+            try:
+                done, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = pid, 0
+            if not done:
+                continue
+            self.children.pop(pid, None)
+            if pid in self._retiring or self._stopping:
+                self._retiring.discard(pid)
+                continue
+            logger.warning(f"Worker {pid} exited with status {status}, restarting it")
+            self._spawn()
+
+    def _reload(self) -> None:
+        """Re-run the preload hook and replace workers one at a time (the application code is not re-imported)"""
+        self._reload_requested = False
+        logger.info("🔄 SIGHUP received, re-running preload and replacing workers")
+        if self.preload:
+            try:
+                self.preload()
+            except Exception as e:
+                logger.error(f"Preload failed, keeping current workers: {e}")
+                return
+        for pid in list(self.children):
+            self._spawn()
+            self._stop_worker(pid)
+
+    def _stop_all(self) -> None:
+        logger.info(f"Stopping {len(self.children)} workers")
+        for pid in list(self.children):
+            self._retiring.add(pid)
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.time() + self.graceful_timeout
+        for pid in list(self.children):
+            if not self._wait(pid, max(0.1, deadline - time.time())):
+                os.kill(pid, signal.SIGKILL)
+                self._wait(pid, 5)
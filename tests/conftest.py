@@ -1,16 +1,75 @@
 """
 NextCraftTalk Test Configuration and Fixtures
 
-Shared test fixtures and configuration for pytest.
+Shared test fixtures, helpers and configuration for pytest.
 """
 
 import os
+import sys
 import tempfile
 from pathlib import Path
 from typing import Generator
 
+import numpy as np
 import pytest
 
+# Mirror src/main.py so modules importing `core.*` resolve when tests run in isolation
+SRC_PATH = str(Path(__file__).parent.parent / "src")
+if SRC_PATH not in sys.path:
+    sys.path.insert(0, SRC_PATH)
+
+from src.modes.self_hosted.data.embeddings import EmbeddingBackend, normalize  # noqa: E402
+
+# Small wiki used by the retrieval tests
+PAGES = {
+    "Bed": ["a bed is crafted from wool and planks", "sleeping in a bed skips the night", "beds explode in the nether"],
+    "Diamond": ["diamond ore is mined with an iron pickaxe", "diamonds are found deep underground near lava"],
+    "Nether portal": ["a nether portal is built from obsidian", "light the portal with flint and steel"],
+}
+
+
+def clustered_vectors(rows, dim=64, clusters=40, seed=0):
+    """Unit vectors around a few centres, like embeddings of related wiki chunks."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim))
+    return normalize(centres[rng.integers(0, clusters, rows)] + 0.3 * rng.normal(size=(rows, dim)))
+
+
+class HashingEmbedder(EmbeddingBackend):
+    """Bag-of-words embedder: texts sharing words are close."""
+
+    name = "hashing"
+
+    def __init__(self):
+        super().__init__("words-64")
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, sum(map(ord, word)) % 64] += 1.0
+        return normalize(vectors)
+
+
+def page_chunks():
+    """Texts and metadata of the PAGES chunks, as ContentProcessor tags them."""
+    texts, metadatas = [], []
+    for title, chunks in PAGES.items():
+        for chunk_id, text in enumerate(chunks):
+            texts.append(text)
+            metadatas.append({"source": f"https://minecraft.wiki/w/{title}", "title": title, "chunk_id": chunk_id})
+    return texts, metadatas
+
+
+def chunks(only=None):
+    """PAGES chunks in ContentProcessor format, optionally only the given texts."""
+    texts, metadatas = page_chunks()
+    return [
+        {"content": text, "metadata": metadata}
+        for text, metadata in zip(texts, metadatas)
+        if only is None or text in only
+    ]
+
 
 @pytest.fixture
 def temp_dir() -> Generator[Path, None, None]:
@@ -0,0 +1,101 @@
+"""
+Tests for NextCraftTalk adaptive acknowledgements.
+"""
+
+import asyncio
+
+from src.modes.external_ai.bot.acknowledgement import ACK_EDIT, ACK_POST, ACK_REACTION, Acknowledgement
+
+
+class FakeSender:
+    """Records Talk calls instead of queueing them."""
+
+    def __init__(self, edit_ok=True):
+        self.calls = []
+        self.edit_ok = edit_ok
+
+    async def post(self, token, message, timeout=None, droppable=False):
+        self.calls.append("think" if droppable else "post")
+        return 7
+
+    async def edit(self, token, message_id, message, timeout=None):
+        self.calls.append("edit")
+        return self.edit_ok
+
+    async def delete(self, token, message_id, timeout=None):
+        self.calls.append("delete")
+        return True
+
+    async def react(self, token, message_id, reaction, timeout=None, droppable=False):
+        self.calls.append("react")
+        return True
+
+    async def unreact(self, token, message_id, reaction, timeout=None):
+        self.calls.append("unreact")
+        return True
+
+
+def _answer(ack, delay):
+    """Run a fake generation taking `delay` seconds through the acknowledgement."""
+
+    async def generate():
+        await asyncio.sleep(delay)
+        return "Use three wool and three planks."
+
+    async def main():
+        work = asyncio.create_task(generate())
+        await ack.wait_or_acknowledge(work)
+        return await ack.deliver(await work)
+
+    return asyncio.run(main())
+
+
+class TestAcknowledgement:
+    """Test the number of Talk calls per answer."""
+
+    def test_fast_answer_skips_acknowledgement(self):
+        """Test that answers ready within the grace period are posted directly."""
+        sender = FakeSender()
+        assert _answer(Acknowledgement("room", "1", mode=ACK_EDIT, grace=0.2, sender=sender), delay=0.01) is True
+        assert sender.calls == ["post"]
+
+    def test_slow_answer_edits_thinking_message(self):
+        """Test that edit mode turns the thinking message into the answer."""
+        sender = FakeSender()
+        ack = Acknowledgement("room", "1", mode=ACK_EDIT, grace=0.01, sender=sender)
+        assert _answer(ack, delay=0.05) is True
+        assert sender.calls == ["think", "edit"]
+        assert ack.thinking_message_id is None
+
+    def test_slow_answer_with_reaction(self):
+        """Test that reaction mode reacts to the question and posts the answer in two calls, keeping the reaction."""
+        sender = FakeSender()
+        ack = Acknowledgement("room", "1", mode=ACK_REACTION, grace=0.01, sender=sender)
+        _answer(ack, delay=0.05)
+        assert sender.calls == ["react", "post"]
+        assert ack.api_calls == 2
+
+    def test_dropped_answer_removes_reaction(self):
+        """Test that a cancelled or failed question doesn't keep its thinking reaction."""
+        sender = FakeSender()
+        ack = Acknowledgement("room", "1", mode=ACK_REACTION, grace=0, sender=sender)
+
+        async def main():
+            await ack.acknowledge()
+            await ack.withdraw()
+            await ack.withdraw()
+
+        asyncio.run(main())
+        assert sender.calls == ["react", "unreact"]
+
+    def test_post_mode_keeps_legacy_round_trip(self):
+        """Test that post mode still posts, then deletes the thinking message."""
+        sender = FakeSender()
+        _answer(Acknowledgement("room", "1", mode=ACK_POST, grace=0, sender=sender), delay=0.01)
+        assert sender.calls == ["think", "post", "delete"]
+
+    def test_failed_edit_falls_back_to_post(self):
+        """Test that a failed edit posts the answer and removes the thinking message."""
+        sender = FakeSender(edit_ok=False)
+        _answer(Acknowledgement("room", "1", mode=ACK_EDIT, grace=0.01, sender=sender), delay=0.05)
+        assert sender.calls == ["think", "edit", "post", "delete"]
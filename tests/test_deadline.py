@@ -0,0 +1,53 @@
+"""
+Tests for NextCraftTalk request deadlines.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.shared.deadline import Deadline, DeadlineExceeded
+
+
+class TestDeadline:
+    """Test deadline budgeting."""
+
+    def test_timeout_respects_cap_and_reserve(self):
+        """Test that stage timeouts are capped and keep the reserve."""
+        deadline = Deadline(10.0)
+        assert deadline.timeout(cap=3.0) == 3.0
+        assert 4.9 < deadline.timeout(reserve=5.0) <= 5.0
+
+    def test_expired_deadline_raises(self):
+        """Test that an expired deadline raises on check."""
+        deadline = Deadline(1.0, started_at=time.time() - 2.0)
+        assert deadline.expired
+        assert deadline.remaining() == 0.0
+        with pytest.raises(DeadlineExceeded) as excinfo:
+            deadline.check("retrieval")
+        assert excinfo.value.stage == "retrieval"
+
+    def test_stage_receives_remaining_budget(self):
+        """Test that a stage gets the remaining budget and returns its result."""
+        seen = []
+
+        async def stage(timeout):
+            seen.append(timeout)
+            return "answer"
+
+        result = asyncio.run(Deadline(2.0).run_stage("generation", stage, reserve=1.0))
+        assert result == "answer"
+        assert 0.9 < seen[0] <= 1.0
+
+    def test_slow_stage_is_cancelled(self):
+        """Test that a stage exceeding its budget is cancelled."""
+
+        async def slow(timeout):
+            await asyncio.sleep(1.0)
+
+        start = time.time()
+        with pytest.raises(DeadlineExceeded) as excinfo:
+            asyncio.run(Deadline(0.05).run_stage("delivery", slow))
+        assert excinfo.value.stage == "delivery"
+        assert time.time() - start < 0.5
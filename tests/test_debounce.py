@@ -0,0 +1,96 @@
+"""
+Tests for NextCraftTalk per-room message debouncing.
+"""
+
+import asyncio
+
+from src.shared.debounce import MessageDebouncer, merge_messages
+
+
+class TestMergeMessages:
+    """Test merging buffered messages."""
+
+    def test_joins_parts_in_order(self):
+        """Test that parts are joined into one query."""
+        assert merge_messages(["how do i", "make a", "bed"]) == "how do i make a bed"
+
+    def test_drops_empty_and_repeated_parts(self):
+        """Test that blanks and immediate repeats are removed."""
+        assert merge_messages(["  craft  a  bed ", "", "Craft a bed", "?"]) == "craft a bed ?"
+
+
+class TestMessageDebouncer:
+    """Test debounce windows per (room, actor)."""
+
+    def _run(self, scenario):
+        flushed = []
+
+        async def on_flush(batch):
+            flushed.append((batch.room, batch.actor, batch.query, batch.last_message_id))
+
+        async def main():
+            await scenario(MessageDebouncer(on_flush, window=0.05, max_wait=0.5))
+            await asyncio.sleep(0.15)
+
+        asyncio.run(main())
+        return flushed
+
+    def test_burst_is_merged_once(self):
+        """Test that messages inside the window become a single query."""
+
+        async def scenario(debouncer):
+            for i, part in enumerate(["how do i", "make a", "bed"]):
+                assert await debouncer.submit("room", "alice", part, str(i)) is True
+                await asyncio.sleep(0.01)
+
+        assert self._run(scenario) == [("room", "alice", "how do i make a bed", "2")]
+
+    def test_actors_and_rooms_are_separate(self):
+        """Test that batches are keyed by room and actor."""
+
+        async def scenario(debouncer):
+            await debouncer.submit("room", "alice", "craft a bed")
+            await debouncer.submit("room", "bob", "brew a potion")
+            await debouncer.submit("other", "alice", "find diamonds")
+
+        assert sorted(query for _, _, query, _ in self._run(scenario)) == [
+            "brew a potion",
+            "craft a bed",
+            "find diamonds",
+        ]
+
+    def test_discard_removes_buffered_message(self):
+        """Test that a deleted message is dropped from its batch."""
+
+        async def scenario(debouncer):
+            await debouncer.submit("room", "alice", "oops wrong chat", "1")
+            await debouncer.submit("room", "alice", "how to smelt iron", "2")
+            assert debouncer.discard("room", "1") is True
+
+        assert self._run(scenario) == [("room", "alice", "how to smelt iron", "2")]
+
+    def test_edit_replaces_buffered_message(self):
+        """Test that an edited message replaces its buffered text in place instead of adding to it."""
+
+        async def scenario(debouncer):
+            await debouncer.submit("room", "alice", "how do i make", "1")
+            await debouncer.submit("room", "alice", "a bd", "2")
+            await debouncer.submit("room", "alice", "a bed", "2")
+            await debouncer.submit("room", "alice", "how can i make", "1")
+
+        assert self._run(scenario) == [("room", "alice", "how can i make a bed", "2")]
+
+    def test_disabled_window_flushes_immediately(self):
+        """Test that a zero window answers every message on its own."""
+        flushed = []
+
+        async def on_flush(batch):
+            flushed.append(batch.query)
+
+        async def main():
+            debouncer = MessageDebouncer(on_flush, window=0)
+            assert await debouncer.submit("room", "alice", "craft a bed") is False
+            assert await debouncer.submit("room", "alice", "craft a boat") is False
+
+        asyncio.run(main())
+        assert flushed == ["craft a bed", "craft a boat"]
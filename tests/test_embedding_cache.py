@@ -0,0 +1,76 @@
+"""
+Tests for NextCraftTalk persistent embedding cache.
+"""
+
+import numpy as np
+import pytest
+
+from src.modes.self_hosted.data.embedding_cache import KEY_BYTES, EmbeddingCache
+
+
+class CountingEncoder:
+    """Embeds a text as [length, word count, 1] and records what it encoded."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, texts):
+        self.encoded.extend(texts)
+        return [[len(text), len(text.split()), 1.0] for text in texts]
+
+
+class TestEmbeddingCache:
+    """Test content-addressed caching of chunk embeddings."""
+
+    def test_only_misses_are_encoded(self, tmp_path):
+        """Test that cached texts are served from disk and duplicates are encoded once."""
+        cache = EmbeddingCache(str(tmp_path), "sentence-transformers:all-MiniLM-L6-v2")
+        encoder = CountingEncoder()
+
+        first = cache.encode(["craft a bed", "mine diamonds", "craft a bed"], encoder)
+        second = cache.encode(["mine diamonds", "craft  a\nbed", "build a portal"], encoder)
+
+        assert encoder.encoded == ["craft a bed", "mine diamonds", "build a portal"]
+        assert len(cache) == 3
+        np.testing.assert_array_equal(first[1], second[0])
+        np.testing.assert_array_equal(first[0], second[1])
+        assert second.dtype == np.float32 and second.shape == (3, 3)
+
+    def test_vectors_survive_a_restart(self, tmp_path):
+        """Test that a new process rebuilding the index encodes nothing."""
+        texts = [f"chunk {i} about redstone" for i in range(50)]
+        expected = EmbeddingCache(str(tmp_path), "ollama:nomic-embed-text").encode(texts, CountingEncoder())
+
+        encoder = CountingEncoder()
+        reopened = EmbeddingCache(str(tmp_path), "ollama:nomic-embed-text")
+        np.testing.assert_array_equal(reopened.encode(texts, encoder), expected)
+        assert encoder.encoded == []
+        assert reopened.describe()["vectors"] == 50
+
+    def test_models_do_not_share_vectors(self, tmp_path):
+        """Test that another embedding model gets its own cache."""
+        EmbeddingCache(str(tmp_path), "onnx:/models/a").encode(["craft a bed"], CountingEncoder())
+        encoder = CountingEncoder()
+        EmbeddingCache(str(tmp_path), "onnx:/models/b").encode(["craft a bed"], encoder)
+        assert encoder.encoded == ["craft a bed"]
+
+    def test_incomplete_append_is_dropped(self, tmp_path):
+        """Test that a crash between writing vectors and keys leaves a consistent cache."""
+        cache = EmbeddingCache(str(tmp_path), "model")
+        cache.encode(["craft a bed", "mine diamonds"], CountingEncoder())
+        with open(cache.vectors_path, "ab") as f:
+            f.write(b"\x00" * 7)
+
+        reopened = EmbeddingCache(str(tmp_path), "model")
+        assert len(reopened) == 2
+        assert reopened.vectors_path.stat().st_size == 2 * 3 * 4
+        assert reopened.keys_path.stat().st_size == 2 * KEY_BYTES
+        reopened.encode(["build a portal"], CountingEncoder())
+        assert reopened.get(["build a portal"])[0].tolist() == [14.0, 3.0, 1.0]
+
+    def test_dimension_mismatch(self, tmp_path):
+        """Test that vectors of another size are refused."""
+        cache = EmbeddingCache(str(tmp_path), "model")
+        cache.put(["craft a bed"], [[1.0, 0.0]])
+        with pytest.raises(ValueError, match="2-dimensional"):
+            cache.put(["mine diamonds"], [[1.0, 0.0, 0.0]])
@@ -0,0 +1,74 @@
+"""
+Tests for NextCraftTalk micro-batched embeddings.
+"""
+
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from src.modes.self_hosted.data.embedding_service import EmbeddingService
+
+
+class RecordingEncoder:
+    """Embeds a text as [length, batch size] and records batch sizes."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(len(texts))
+        return [[len(text), len(texts)] for text in texts]
+
+
+class TestEmbeddingService:
+    """Test batching of concurrent embedding requests."""
+
+    def test_concurrent_requests_share_a_batch(self):
+        """Test that simultaneous callers are encoded together and get their own rows."""
+        encoder = RecordingEncoder()
+        service = EmbeddingService(encoder, max_batch_size=64, max_wait_ms=200)
+        results = {}
+        start = threading.Barrier(8)
+
+        def ask(i):
+            start.wait()
+            results[i] = service.embed(["x" * (i + 1)])
+
+        threads = [threading.Thread(target=ask, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        service.stop()
+
+        assert sum(encoder.batches) == 8
+        assert len(encoder.batches) < 8
+        for i, vectors in results.items():
+            assert vectors.shape == (1, 2) and vectors[0, 0] == i + 1
+        assert service.describe()["batches"] >= 1
+
+    def test_batch_closes_at_max_size(self):
+        """Test that a full batch is encoded without waiting out the window."""
+        encoder = RecordingEncoder()
+        service = EmbeddingService(encoder, max_batch_size=2, max_wait_ms=5000)
+        futures = [service.submit([f"text {i}"]) for i in range(4)]
+        vectors = [future.result(timeout=2) for future in futures]
+        service.stop()
+
+        assert max(encoder.batches) <= 2
+        assert np.concatenate(vectors).shape == (4, 2)
+
+    def test_errors_reach_every_caller(self):
+        """Test that an encode failure is raised to each waiting caller."""
+
+        def broken(texts):
+            raise RuntimeError("model crashed")
+
+        service = EmbeddingService(broken, max_wait_ms=1)
+        with pytest.raises(RuntimeError):
+            service.embed(["a"], timeout=2)
+        with pytest.raises(RuntimeError):
+            asyncio.run(service.embed_async(["b"]))
+        service.stop()
@@ -0,0 +1,131 @@
+"""
+Tests for NextCraftTalk pluggable embedding backends.
+"""
+
+import numpy as np
+import pytest
+
+from src.modes.self_hosted.data.embeddings import (
+    OllamaEmbeddingBackend,
+    OnnxEmbeddingBackend,
+    SentenceTransformerBackend,
+    create_embedding_backend,
+)
+from src.modes.self_hosted.ollama.client import OllamaClient
+
+
+class FakeEmbedResponse:
+    """Ollama /api/embed response with one vector per input."""
+
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return {"model": self.payload["model"], "embeddings": [[3.0, 4.0] for _ in self.payload["input"]]}
+
+
+class FakeEncoding:
+    """Tokenizer output for one padded text."""
+
+    def __init__(self, length, padded):
+        self.ids = list(range(1, length + 1)) + [0] * (padded - length)
+        self.attention_mask = [1] * length + [0] * (padded - length)
+        self.type_ids = [0] * padded
+
+
+class FakeTokenizer:
+    """Pads every text to the longest, one token per word."""
+
+    def encode_batch(self, texts):
+        lengths = [len(text.split()) for text in texts]
+        return [FakeEncoding(length, max(lengths)) for length in lengths]
+
+
+class FakeInput:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeSession:
+    """Token embeddings: real tokens are [1, 0], padding is [0, 100]."""
+
+    def __init__(self):
+        self.feeds = None
+
+    def get_inputs(self):
+        return [FakeInput("input_ids"), FakeInput("attention_mask")]
+
+    def run(self, outputs, feeds):
+        self.feeds = feeds
+        mask = feeds["attention_mask"][:, :, None]
+        return [np.where(mask == 1, np.array([1.0, 0.0]), np.array([0.0, 100.0])).astype(np.float32)]
+
+
+class TestBackendFactory:
+    """Test choosing a backend by name."""
+
+    def test_backends_and_model_ids(self):
+        """Test that each name builds its backend with a distinct vector-space id."""
+        assert isinstance(create_embedding_backend("sentence-transformers"), SentenceTransformerBackend)
+        ollama = create_embedding_backend("ollama", base_url="http://ollama:11434")
+        assert isinstance(ollama, OllamaEmbeddingBackend)
+        assert ollama.model_id == "ollama:nomic-embed-text"
+        assert create_embedding_backend("onnx", "/models/minilm").model_id == "onnx:/models/minilm"
+
+    def test_unknown_backend(self):
+        """Test that a typo in EMBEDDING_BACKEND fails loudly."""
+        with pytest.raises(ValueError, match="Unknown embedding backend"):
+            create_embedding_backend("openai")
+
+
+class TestOllamaBackend:
+    """Test embedding through Ollama's batch endpoint."""
+
+    def test_one_request_per_batch(self, monkeypatch):
+        """Test that a batch is sent in one /api/embed call and rows come back normalised."""
+        client = OllamaClient("http://ollama:11434", model="nomic-embed-text", check_model=False)
+        sent = []
+        monkeypatch.setattr(
+            client, "_post", lambda path, payload, **kwargs: sent.append((path, payload)) or FakeEmbedResponse(payload)
+        )
+        backend = OllamaEmbeddingBackend(base_url="http://ollama:11434")
+        backend._client = client
+
+        vectors = backend.encode(["bed", "diamond", "torch"])
+        assert sent == [("/api/embed", {"model": "nomic-embed-text", "input": ["bed", "diamond", "torch"]})]
+        assert vectors.dtype == np.float32
+        np.testing.assert_allclose(vectors, [[0.6, 0.8]] * 3, rtol=1e-5)
+
+    def test_failure_raises(self, monkeypatch):
+        """Test that a failed call raises instead of returning an empty embedding."""
+        client = OllamaClient("http://ollama:11434", check_model=False)
+        monkeypatch.setattr(client, "embed", lambda texts, **kwargs: None)
+        backend = OllamaEmbeddingBackend()
+        backend._client = client
+        with pytest.raises(RuntimeError, match="Ollama embedding"):
+            backend.encode(["bed"])
+
+
+class TestOnnxBackend:
+    """Test the ONNX Runtime backend without a real model."""
+
+    def test_quantized_model_is_preferred(self, tmp_path):
+        """Test that a directory resolves to its int8 model."""
+        for name in ("model.onnx", "model_qint8_avx512.onnx"):
+            (tmp_path / name).write_bytes(b"")
+        assert OnnxEmbeddingBackend.find_model_file(tmp_path).name == "model_qint8_avx512.onnx"
+        assert OnnxEmbeddingBackend.find_model_file(tmp_path / "model.onnx").name == "model.onnx"
+        with pytest.raises(FileNotFoundError):
+            OnnxEmbeddingBackend.find_model_file(tmp_path / "missing")
+
+    def test_mean_pooling_ignores_padding(self):
+        """Test that padding tokens don't leak into the pooled vector and unused inputs aren't fed."""
+        backend = OnnxEmbeddingBackend("/models/minilm")
+        backend._session = FakeSession()
+        backend._tokenizer = FakeTokenizer()
+
+        vectors = backend.encode(["craft a bed", "bed"])
+        np.testing.assert_allclose(vectors, [[1.0, 0.0], [1.0, 0.0]], atol=1e-6)
+        assert set(backend._session.feeds) == {"input_ids", "attention_mask"}
@@ -0,0 +1,93 @@
+"""
+Tests for NextCraftTalk provider hedging.
+"""
+
+import time
+
+from src.shared.hedging import ProviderHedger
+
+
+def make_hedger(**kwargs):
+    """Create a hedger with a short fixed delay."""
+    options = {"min_delay": 0.05, "max_delay": 0.05, "default_delay": 0.05}
+    options.update(kwargs)
+    return ProviderHedger(primary_name="primary", secondary_name="secondary", **options)
+
+
+class TestProviderHedger:
+    """Test hedged request behaviour."""
+
+    def test_fast_primary_is_not_hedged(self):
+        """Test that a primary answering within budget wins alone."""
+        calls = []
+
+        def secondary(cancel):
+            calls.append("secondary")
+            return "secondary answer"
+
+        result = make_hedger().run(lambda cancel: "primary answer", secondary)
+        assert result["answer"] == "primary answer"
+        assert result["provider"] == "primary"
+        assert result["hedged"] is False
+        assert calls == []
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        """Test that the secondary wins when the primary is slow and the loser is cancelled."""
+        cancelled = {}
+
+        def primary(cancel):
+            cancel.wait(1.0)
+            cancelled["primary"] = cancel.is_set()
+            return "primary answer"
+
+        hedger = make_hedger()
+        result = hedger.run(primary, lambda cancel: "secondary answer")
+        assert result["answer"] == "secondary answer"
+        assert result["provider"] == "secondary"
+        assert result["hedged"] is True
+
+        # The primary notices its cancel event long before its own timeout
+        time.sleep(0.1)
+        assert cancelled == {"primary": True}
+
+    def test_failing_primary_fails_over(self):
+        """Test that an early primary failure fires the secondary immediately."""
+        hedger = make_hedger(min_delay=5.0, max_delay=5.0, default_delay=5.0)
+        start = time.time()
+        result = hedger.run(lambda cancel: None, lambda cancel: "secondary answer")
+        assert result["answer"] == "secondary answer"
+        assert time.time() - start < 1.0
+
+    def test_both_failing_returns_fallback(self):
+        """Test that the first invalid answer is returned when nobody succeeds."""
+        result = make_hedger().run(
+            lambda cancel: "Error: boom", lambda cancel: "", is_valid=lambda a: bool(a) and not a.startswith("Error")
+        )
+        assert result["answer"] == "Error: boom"
+        assert result["provider"] == "primary"
+
+    def test_delay_uses_recent_latency(self):
+        """Test that the hedge delay tracks the primary's latency percentile."""
+        hedger = ProviderHedger(primary_name="p99", secondary_name="s", min_delay=0.0, max_delay=10.0, min_samples=3)
+        for seconds in (1.0, 2.0, 3.0):
+            hedger.metrics.observe("hedge.p99.latency", seconds)
+        assert hedger.hedge_delay() == 3.0
+
+    def test_delay_keeps_up_with_slow_primary(self):
+        """Test that primaries losing the race are sampled, so sustained hedging doesn't shrink the delay."""
+        hedger = ProviderHedger(
+            primary_name="censored", secondary_name="s", percentile=50.0, min_delay=0.01, max_delay=1.0, min_samples=3
+        )
+        for _ in range(3):
+            hedger.metrics.observe("hedge.censored.latency", 0.05)
+        assert hedger.hedge_delay() == 0.05
+
+        def secondary(cancel):
+            time.sleep(0.1)
+            return "secondary answer"
+
+        for _ in range(5):
+            result = hedger.run(lambda cancel: cancel.wait(2.0) and None, secondary)
+            assert result["provider"] == "s"
+        # Every losing primary ran at least as long as the hedge delay plus the secondary's answer
+        assert hedger.hedge_delay() >= 0.15
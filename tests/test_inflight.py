@@ -0,0 +1,67 @@
+"""
+Tests for NextCraftTalk in-flight generation cancellation.
+"""
+
+import pytest
+
+from src.shared.inflight import CancelToken, GenerationCancelled, InFlightRegistry
+
+
+class TestCancelToken:
+    """Test cancellation tokens."""
+
+    def test_child_sees_parent_cancel(self):
+        """Test that cancelling a parent token cancels its children."""
+        parent = CancelToken()
+        child = CancelToken(parent=parent)
+        assert child.is_set() is False
+
+        parent.cancel("superseded")
+        assert child.is_set() is True
+        with pytest.raises(GenerationCancelled, match="superseded"):
+            child.raise_if_cancelled()
+
+    def test_child_cancel_does_not_affect_parent(self):
+        """Test that cancelling a child leaves the parent running."""
+        parent = CancelToken()
+        child = CancelToken(parent=parent)
+        child.set()
+        assert child.is_set() is True
+        assert parent.is_set() is False
+
+
+class TestInFlightRegistry:
+    """Test superseding and cancelling generations."""
+
+    def test_newer_question_supersedes_older(self):
+        """Test that a new question from the same actor cancels the previous one."""
+        registry = InFlightRegistry()
+        first = registry.start("room", "kid", "1")
+        second = registry.start("room", "kid", "2")
+        assert first.cancelled is True
+        assert second.cancelled is False
+
+    def test_other_actors_are_independent(self):
+        """Test that questions from different actors or rooms don't interfere."""
+        registry = InFlightRegistry()
+        first = registry.start("room", "kid-a", "1")
+        registry.start("room", "kid-b", "2")
+        registry.start("other-room", "kid-a", "3")
+        assert first.cancelled is False
+
+    def test_cancel_message_by_id(self):
+        """Test that an edit/delete event cancels the matching generation."""
+        registry = InFlightRegistry()
+        generation = registry.start("room", "kid", "42")
+        assert registry.cancel_message("room", "7") is False
+        assert registry.cancel_message("room", "42") is True
+        assert generation.cancelled is True
+        assert registry.describe()["in_flight"] == 0
+
+    def test_finish_keeps_newer_generation(self):
+        """Test that finishing a superseded generation doesn't drop its replacement."""
+        registry = InFlightRegistry()
+        first = registry.start("room", "kid", "1")
+        registry.start("room", "kid", "2")
+        registry.finish(first)
+        assert registry.describe()["in_flight"] == 1
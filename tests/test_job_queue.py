@@ -0,0 +1,142 @@
+"""
+Tests for NextCraftTalk durable job queue.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.shared.debounce import MessageBatch
+from src.shared.job_queue import DEAD, DONE, JobQueue, JobWorkerPool
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    """Queue in a temporary SQLite file."""
+    queue = JobQueue(str(tmp_path / "jobs.db"), visibility_timeout=0.2, max_attempts=2, retry_delay=0.01)
+    yield queue
+    queue.close()
+
+
+class TestJobQueue:
+    """Test leasing, acknowledgement and durability."""
+
+    def test_claim_and_ack(self, job_queue):
+        """Test that a claimed job is invisible until acked."""
+        job_id = job_queue.enqueue("answers", {"query": "craft a bed"})
+        job = job_queue.claim("answers")
+        assert job.id == job_id
+        assert job.payload == {"query": "craft a bed"}
+        assert job_queue.claim("answers") is None
+        assert job_queue.ack(job) is True
+        assert job_queue.stats()["counts"] == {DONE: 1}
+
+    def test_expired_lease_is_redelivered(self, job_queue):
+        """Test at-least-once delivery when a worker dies mid-job."""
+        job_queue.enqueue("answers", {"query": "craft a bed"})
+        first = job_queue.claim("answers")
+        job_queue.save_state(first, thinking_message_id=42)
+        time.sleep(0.25)
+        second = job_queue.claim("answers")
+        assert second.id == first.id
+        assert second.attempts == 2
+        assert second.state == {"thinking_message_id": 42}
+        # The stale lease can no longer ack the job
+        assert job_queue.ack(first) is False
+
+    def test_jobs_survive_reopening(self, job_queue, tmp_path):
+        """Test that queued jobs are still there after a restart."""
+        job_queue.enqueue("answers", {"query": "brew a potion"})
+        reopened = JobQueue(str(tmp_path / "jobs.db"))
+        assert reopened.claim("answers").payload == {"query": "brew a potion"}
+        reopened.close()
+
+    def test_duplicates_are_ignored(self, job_queue):
+        """Test that redelivered webhooks don't create a second job."""
+        assert job_queue.enqueue("answers", {}, dedupe_key="room:1") is not None
+        assert job_queue.enqueue("answers", {}, dedupe_key="room:1") is None
+
+    def test_edited_message_is_queued_again(self, job_queue):
+        """Test that an edited question gets a new job after the original is cancelled."""
+
+        def batch(text):
+            batch = MessageBatch("room", "alice")
+            batch.parts.append(text)
+            batch.message_ids.append("7")
+            return batch
+
+        original, edited = batch("how do i make a bd"), batch("how do i make a bed")
+        assert job_queue.enqueue(
+            "answers", {"query": original.query}, message_key="room:7", dedupe_key=original.dedupe_key
+        )
+        assert (
+            job_queue.enqueue("answers", {}, message_key="room:7", dedupe_key=batch(original.query).dedupe_key) is None
+        )
+
+        assert job_queue.cancel_message("room:7")
+        assert job_queue.enqueue("answers", {"query": edited.query}, message_key="room:7", dedupe_key=edited.dedupe_key)
+        assert job_queue.claim("answers").payload == {"query": "how do i make a bed"}
+        assert job_queue.claim("answers") is None
+
+    def test_supersede_cancels_older_jobs(self, job_queue):
+        """Test that a newer job in the same group cancels queued ones."""
+        job_queue.enqueue("answers", {"query": "how do i"}, group_key="room:alice")
+        job_queue.enqueue("answers", {"query": "how do i make a bed"}, group_key="room:alice", supersede=True)
+        assert job_queue.claim("answers").payload == {"query": "how do i make a bed"}
+        assert job_queue.claim("answers") is None
+
+    def test_failed_jobs_retry_then_dead_letter(self, job_queue):
+        """Test that nacked jobs are retried until max_attempts."""
+        job_queue.enqueue("answers", {})
+        job_queue.nack(job_queue.claim("answers"), "boom")
+        time.sleep(0.02)
+        job_queue.nack(job_queue.claim("answers"), "boom again")
+        assert job_queue.claim("answers") is None
+        assert job_queue.stats()["counts"] == {DEAD: 1}
+
+
+class TestJobWorkerPool:
+    """Test the async worker pool."""
+
+    def test_processes_and_acks_jobs(self, job_queue):
+        """Test that workers run the handler for every job."""
+        handled = []
+
+        async def handler(job):
+            handled.append(job.payload["n"])
+
+        async def main():
+            for n in range(3):
+                job_queue.enqueue("answers", {"n": n})
+            pool = JobWorkerPool(job_queue, "answers", handler, concurrency=2, poll_interval=0.01)
+            pool.start()
+            await asyncio.sleep(0.2)
+            await pool.stop(grace=1)
+
+        asyncio.run(main())
+        assert sorted(handled) == [0, 1, 2]
+        assert job_queue.stats()["counts"] == {DONE: 3}
+
+    def test_cancellation_reaches_running_job(self, job_queue):
+        """Test that cancelling a running job sets its cancel token."""
+        seen = []
+
+        async def handler(job):
+            for _ in range(50):
+                if job.cancel_token.is_set():
+                    seen.append(job.cancel_token.reason)
+                    return
+                await asyncio.sleep(0.01)
+
+        async def main():
+            job_queue.enqueue("answers", {}, message_key="room:7")
+            pool = JobWorkerPool(job_queue, "answers", handler, concurrency=1, poll_interval=0.01)
+            pool.start()
+            await asyncio.sleep(0.02)
+            job_queue.cancel_message("room:7")
+            await asyncio.sleep(0.3)
+            await pool.stop(grace=1)
+
+        asyncio.run(main())
+        assert seen == ["job cancelled"]
@@ -0,0 +1,59 @@
+"""
+Tests for NextCraftTalk complexity-based model routing.
+"""
+
+from src.shared.model_router import FAST_TIER, STRONG_TIER, ModelRouter
+
+
+class TestModelRouter:
+    """Test routing decisions and escalation."""
+
+    def setup_method(self):
+        """Create a router with distinct tiers."""
+        self.router = ModelRouter(fast_model="small", strong_model="large", max_fast_words=12)
+
+    def test_disabled_when_tiers_match(self):
+        """Test that routing is disabled when both tiers use the same model."""
+        assert ModelRouter(fast_model="same", strong_model="same").enabled is False
+        assert self.router.enabled is True
+
+    def test_short_question_goes_fast(self):
+        """Test that a short factual question uses the fast model."""
+        decision = self.router.route("How do I craft a bed?")
+        assert decision["tier"] == FAST_TIER
+        assert decision["model"] == "small"
+
+    def test_multi_step_question_goes_strong(self):
+        """Test that multi-step questions use the strong model."""
+        decision = self.router.route("Explain how to build an automatic sugar cane farm and then connect it to a chest")
+        assert decision["tier"] == STRONG_TIER
+        assert decision["model"] == "large"
+
+    def test_low_retrieval_confidence_goes_strong(self):
+        """Test that weak retrieval pushes the query to the strong model."""
+        decision = self.router.route("How do I craft a bed?", retrieval_confidence=0.1)
+        assert decision["tier"] == STRONG_TIER
+
+    def test_weak_fast_answer_escalates(self):
+        """Test that a weak fast answer is retried on the strong model."""
+        calls = []
+
+        def generate(model):
+            calls.append(model)
+            if model == "small":
+                return "I don't know that yet!"
+            return "Place three wool on top of three planks in the crafting table to make a bed."
+
+        result = self.router.run("How do I craft a bed?", generate)
+        assert calls == ["small", "large"]
+        assert result["escalated"] is True
+        assert result["model"] == "large"
+        assert result["answer"].startswith("Place three wool")
+
+    def test_good_fast_answer_is_kept(self):
+        """Test that a good fast answer is not escalated."""
+        result = self.router.run(
+            "How do I craft a bed?", lambda model: "Put three wool above three planks in a crafting table!"
+        )
+        assert result["tier"] == FAST_TIER
+        assert result["escalated"] is False
@@ -0,0 +1,137 @@
+"""
+Tests for NextCraftTalk multi-endpoint Ollama load balancing.
+"""
+
+import pytest
+import requests
+
+from src.modes.self_hosted.ollama.client import OllamaClient
+from src.modes.self_hosted.ollama.pool import OllamaPool, create_ollama_client
+
+
+@pytest.fixture
+def pool():
+    """Pool over two fake endpoints without the health check thread."""
+    return OllamaPool(
+        ["http://ollama-a:11434", "http://ollama-b:11434"], model="llama3", check_model=False, health_interval=0
+    )
+
+
+def backend(pool, name):
+    """Backend of a pool by host name."""
+    return next(b for b in pool.backends if b.name.startswith(name))
+
+
+class TestOllamaPool:
+    """Test routing, stickiness, failover and health checks."""
+
+    def test_least_outstanding_requests(self, pool):
+        """Test that the backend with fewer requests in flight is chosen."""
+        backend(pool, "ollama-a").outstanding = 2
+        assert pool.choose().name == "ollama-b:11434"
+
+    def test_sticky_room_until_overloaded(self, pool):
+        """Test that a room returns to its backend unless it is clearly busier."""
+        first = pool.choose("room1")
+        pool._release(first)
+        again = pool.choose("room1")
+        assert again is first
+        pool._release(again)
+
+        first.outstanding = 3
+        moved = pool.choose("room1")
+        assert moved is not first
+        assert pool.choose("room1") is not first
+
+    def test_failover_to_next_backend(self, pool, monkeypatch):
+        """Test that a failed request is retried on the other backend."""
+        calls = []
+
+        def fake_generate(name, answer):
+            def generate(prompt, **kwargs):
+                calls.append(name)
+                return answer
+
+            return generate
+
+        monkeypatch.setattr(backend(pool, "ollama-a").client, "generate", fake_generate("a", None))
+        monkeypatch.setattr(backend(pool, "ollama-b").client, "generate", fake_generate("b", "Use a crafting table"))
+        backend(pool, "ollama-b").outstanding = 1  # make ollama-a the first choice
+
+        assert pool.generate("how do I craft a bed?", affinity="room1") == "Use a crafting table"
+        assert calls == ["a", "b"]
+        assert all(b.outstanding == (1 if b.name.startswith("ollama-b") else 0) for b in pool.backends)
+
+    def test_unhealthy_backend_is_skipped(self, pool, monkeypatch):
+        """Test that a backend failing its health check receives no requests."""
+
+        def fake_get(url, timeout):
+            if "ollama-a" in url:
+                raise requests.ConnectionError("connection refused")
+
+            class Response:
+                status_code = 200
+
+            return Response()
+
+        monkeypatch.setattr(requests, "get", fake_get)
+        pool.check_health()
+        assert backend(pool, "ollama-a").available is False
+        assert pool.describe()["backends"]["ollama-a:11434"]["last_error"] == "connection refused"
+        for _ in range(3):
+            assert pool.choose().name == "ollama-b:11434"
+
+    def test_single_url_builds_plain_client(self):
+        """Test that one URL doesn't create a pool."""
+        client = create_ollama_client(["http://ollama-a:11434/"], model="llama3", check_model=False)
+        assert isinstance(client, OllamaClient)
+        assert client.base_url == "http://ollama-a:11434"
+
+
+class TestConfiguredClient:
+    """Test building the Ollama client from the real configuration."""
+
+    @pytest.fixture
+    def configured(self, monkeypatch):
+        """Self-hosted Config with the given OLLAMA_BASE_URLS, and a fresh client singleton."""
+        from src.core import config as config_module
+        from src.modes.self_hosted.ollama import client as client_module
+
+        def configure(urls):
+            monkeypatch.setenv("DEPLOYMENT_MODE", "self_hosted")
+            monkeypatch.setenv("OLLAMA_BASE_URLS", urls)
+            monkeypatch.setenv("OLLAMA_HEALTH_CHECK_INTERVAL", "0")
+            config = config_module.Config()
+            monkeypatch.setattr(client_module, "get_config", lambda: config)
+            monkeypatch.setattr(client_module, "_ollama_client", None)
+            return config
+
+        return configure
+
+    def test_one_url(self, configured):
+        """Test that a single endpoint builds a plain client."""
+        from src.modes.self_hosted.ollama.client import get_ollama_client
+
+        configured("")
+        client = get_ollama_client(check_model=False)
+        assert isinstance(client, OllamaClient)
+        assert client.base_url == "http://localhost:11434"
+
+    def test_several_urls(self, configured):
+        """Test that OLLAMA_BASE_URLS builds a pool with the configured routing."""
+        from src.modes.self_hosted.ollama.client import get_ollama_client
+
+        config = configured("http://ollama-a:11434,http://ollama-b:11434")
+        assert config.ollama_sticky_routing and config.ollama_health_check_interval == 0
+        client = get_ollama_client(check_model=False)
+        assert isinstance(client, OllamaPool)
+        assert [b.name for b in client.backends] == ["ollama-a:11434", "ollama-b:11434"]
+        client.stop()
+
+    def test_external_settings(self, configured, monkeypatch):
+        """Test that the hedge provider URLs are read from the main Config."""
+        from src.modes.external_ai.core import config as settings_module
+
+        config = configured("http://ollama-a:11434,http://ollama-b:11434")
+        monkeypatch.setattr(settings_module, "get_config", lambda: config)
+        assert settings_module.Settings().ollama_base_urls == ["http://ollama-a:11434", "http://ollama-b:11434"]
@@ -0,0 +1,75 @@
+"""
+Tests for NextCraftTalk Ollama runtime option calibration.
+"""
+
+from src.modes.self_hosted.ollama.client import OllamaClient
+from src.modes.self_hosted.ollama.tuning import calibrate, candidate_options, load_profile, save_profile
+
+
+class FakeResponse:
+    """Minimal non-streaming Ollama response."""
+
+    status_code = 200
+
+    def json(self):
+        return {"response": "Use 3 wool and 3 planks!", "done": True}
+
+
+class FakeMeasuringClient:
+    """Generation speed grows with threads up to 4, then drops."""
+
+    def __init__(self):
+        self.requests = []
+
+    def measure_generation(self, prompt, model=None, options=None):
+        self.requests.append((model, options))
+        threads = options["num_thread"]
+        speed = (threads if threads <= 4 else 8 - threads) * (2 if model.endswith("q4") else 1)
+        return {"ttft_seconds": 1.0, "prompt_tokens_per_second": 50.0, "eval_tokens_per_second": float(speed)}
+
+
+class TestCalibration:
+    """Test candidate generation, scoring and the written profile."""
+
+    def test_picks_fastest_options_per_model(self):
+        """Test that the best option set and model are chosen."""
+        client = FakeMeasuringClient()
+        candidates = candidate_options(threads=[2, 4, 6], batches=[256], contexts=[2048])
+        profile = calibrate(client, ["llama3:q8", "llama3:q4"], candidates, prompts=["a", "b"])
+        assert profile["options"]["llama3:q4"] == {"num_thread": 4, "num_batch": 256, "num_ctx": 2048}
+        assert profile["recommended_model"] == "llama3:q4"
+        assert len(profile["measurements"]) == 6
+        # Each candidate gets a warm-up request and deterministic sampling
+        assert len(client.requests) == 6 * 3
+        assert client.requests[0][1]["temperature"] == 0
+
+    def test_profile_round_trip(self, tmp_path):
+        """Test that saved profiles load back and bad files are ignored."""
+        path = str(tmp_path / "profile.json")
+        assert load_profile(path) == {}
+        save_profile(path, {"version": 1, "options": {"llama3": {"num_thread": 4}}})
+        assert load_profile(path)["options"] == {"llama3": {"num_thread": 4}}
+        (tmp_path / "old.json").write_text('{"version": 0}')
+        assert load_profile(str(tmp_path / "old.json")) == {}
+
+
+class TestOptionsPayload:
+    """Test how generate() builds Ollama options."""
+
+    def test_tuned_and_explicit_options(self, monkeypatch):
+        """Test that runtime parameters go into options, explicit ones overriding the profile."""
+        client = OllamaClient(
+            "http://ollama:11434",
+            model="llama3",
+            check_model=False,
+            tuned_options={"llama3": {"num_thread": 4, "num_ctx": 2048, "temperature": 0.2}},
+        )
+        sent = []
+        monkeypatch.setattr(client, "_post", lambda path, payload, **kwargs: sent.append(payload) or FakeResponse())
+
+        client.generate("How do I craft a bed?", temperature=0.7, top_p=0.9)
+        client.generate("How do I craft a bed?", model="llama3:8b")
+
+        assert sent[0]["options"] == {"num_thread": 4, "num_ctx": 2048, "temperature": 0.7, "top_p": 0.9}
+        assert "temperature" not in sent[0]
+        assert "options" not in sent[1]
@@ -0,0 +1,106 @@
+"""
+Tests for NextCraftTalk Ollama warm-up and keep-alive scheduling.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from src.modes.self_hosted.ollama.client import OllamaClient
+from src.modes.self_hosted.ollama.warmup import KeepAlivePolicy, ModelKeeper, duration_seconds
+from src.shared.metrics import get_metrics
+
+SCHEDULE = "mon-fri 07:30-16:00=2h; sat,sun 09:00-12:00=30m"
+
+
+def at(day: int, hour: int, minute: int = 0) -> float:
+    """Local timestamp in the week of Monday 2026-10-19."""
+    return datetime(2026, 10, 19 + day, hour, minute).timestamp()
+
+
+class FakeClient:
+    """Records model loads instead of calling Ollama."""
+
+    model = "llama3.2:1b"
+
+    def __init__(self):
+        self.last_request_at = None
+        self.loads = []
+
+    def load_model(self, model, keep_alive=None):
+        self.loads.append((model, keep_alive))
+        return {"load_seconds": 4.0, "total_seconds": 4.2}
+
+
+class TestKeepAlivePolicy:
+    """Test schedule parsing and lookup."""
+
+    def test_windows_and_default(self):
+        """Test that the first matching window wins and the default applies elsewhere."""
+        policy = KeepAlivePolicy.parse("5m", SCHEDULE)
+        assert policy.keep_alive_at(at(0, 8)) == "2h"
+        assert policy.keep_alive_at(at(0, 16)) == "5m"
+        assert policy.keep_alive_at(at(5, 10)) == "30m"
+        assert policy.keep_alive_at(at(5, 8)) == "5m"
+
+    def test_invalid_schedule_is_rejected(self):
+        """Test that malformed entries raise ValueError."""
+        with pytest.raises(ValueError):
+            KeepAlivePolicy.parse("5m", "weekdays 07:00-16:00=2h")
+        with pytest.raises(ValueError):
+            KeepAlivePolicy.parse("5m", "mon 16:00-07:00=2h")
+        with pytest.raises(ValueError):
+            KeepAlivePolicy.parse("forever")
+
+    def test_durations(self):
+        """Test Ollama duration parsing."""
+        assert duration_seconds("10m") == 600
+        assert duration_seconds("90") == 90
+        assert duration_seconds("-1") == float("inf")
+
+
+class TestModelKeeper:
+    """Test preloading and keep-alive pings."""
+
+    def make_keeper(self):
+        client = FakeClient()
+        keeper = ModelKeeper(client, KeepAlivePolicy.parse("5m", SCHEDULE), check_interval=60, preload_lead=600)
+        return client, keeper
+
+    def test_loads_before_window_opens(self):
+        """Test that models are loaded ahead of the morning window."""
+        client, keeper = self.make_keeper()
+        keeper.applied = "5m"
+        assert keeper.tick(at(0, 6)) is False
+        assert keeper.tick(at(0, 7, 25)) is True
+        assert client.loads == [("llama3.2:1b", "2h")]
+
+    def test_refreshes_idle_model_during_window(self):
+        """Test that an idle model is pinged before its keep_alive runs out."""
+        client, keeper = self.make_keeper()
+        keeper.applied, keeper.last_ping = "2h", at(0, 8)
+        assert keeper.tick(at(0, 9)) is False
+        client.last_request_at = at(0, 9, 30)
+        assert keeper.tick(at(0, 10)) is False
+        assert keeper.tick(at(0, 11, 29)) is True
+
+    def test_window_close_shortens_keep_alive(self):
+        """Test that the default keep_alive is applied when the window ends."""
+        client, keeper = self.make_keeper()
+        keeper.applied, keeper.last_ping = "2h", at(0, 15, 30)
+        assert keeper.tick(at(0, 16, 1)) is True
+        assert client.loads[-1] == ("llama3.2:1b", "5m")
+        assert keeper.tick(at(0, 18)) is False
+
+
+class TestColdWarmLatency:
+    """Test classification of Ollama timings."""
+
+    def test_cold_and_warm_latency(self):
+        """Test that a slow model load is counted as a cold start."""
+        metrics = get_metrics()
+        before = metrics.snapshot()["counters"].get("ollama.cold_loads", 0)
+        OllamaClient._record_timings({"load_duration": 12e9, "total_duration": 15e9})
+        OllamaClient._record_timings({"load_duration": 3e6, "total_duration": 2e9})
+        assert metrics.snapshot()["counters"]["ollama.cold_loads"] == before + 1
+        assert metrics.latency("ollama.warm.latency").percentile(100) >= 2.0
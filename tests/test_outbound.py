@@ -0,0 +1,174 @@
+"""
+Tests for NextCraftTalk outbound Talk delivery queue.
+"""
+
+import asyncio
+import time
+
+import requests
+
+from src.modes.external_ai.bot.outbound import OutboundSender, TokenBucket
+from src.shared.resilience import TransientError
+
+
+class FakeResponse:
+    """Minimal stand-in for requests.Response."""
+
+    def __init__(self, status_code, message_id=None):
+        self.status_code = status_code
+        self._message_id = message_id
+
+    def json(self):
+        return {"ocs": {"data": {"id": self._message_id}}}
+
+
+class FakeTalk:
+    """Records Talk requests, optionally throttling the first few."""
+
+    def __init__(self, throttle=0, retry_after=0.05, timeouts=0):
+        self.requests = []
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.timeouts = timeouts
+
+    def __call__(self, method, path, payload=None, timeout=None, attempts=None):
+        if self.throttle:
+            self.throttle -= 1
+            raise TransientError("HTTP 429", retry_after=self.retry_after, throttled=True)
+        if self.timeouts:
+            self.timeouts -= 1
+            raise requests.exceptions.Timeout("read timed out")
+        self.requests.append((method, path, payload, time.monotonic()))
+        if method == "POST" and path.startswith("chat/"):
+            return FakeResponse(201, message_id=len(self.requests))
+        return FakeResponse(200)
+
+
+class TestTokenBucket:
+    """Test the per-room rate limit."""
+
+    def test_burst_then_wait(self):
+        """Test that a full bucket allows a burst and then asks callers to wait."""
+        bucket = TokenBucket(rate=10, capacity=2)
+        bucket.take()
+        bucket.take()
+        assert 0 < bucket.delay() <= 0.1
+
+
+class TestOutboundSender:
+    """Test ordering, throttling and coalescing."""
+
+    def test_messages_keep_their_order(self):
+        """Test that posts to one room are sent in submission order."""
+        talk = FakeTalk()
+
+        async def main():
+            sender = OutboundSender(rate=100, burst=10, request=talk)
+            return await asyncio.gather(*(sender.post("room", f"part {i}") for i in range(3)))
+
+        assert asyncio.run(main()) == [1, 2, 3]
+        assert [payload["message"] for _, _, payload, _ in talk.requests] == ["part 0", "part 1", "part 2"]
+
+    def test_rate_limit_spaces_requests(self):
+        """Test that the token bucket spaces out requests once the burst is used."""
+        talk = FakeTalk()
+
+        async def main():
+            sender = OutboundSender(rate=20, burst=1, request=talk)
+            await asyncio.gather(*(sender.post("room", "hi") for _ in range(3)))
+
+        asyncio.run(main())
+        times = [sent for *_, sent in talk.requests]
+        assert times[2] - times[0] >= 0.09
+
+    def test_retry_after_is_honoured(self):
+        """Test that a 429 pauses the room and the request is retried, not dropped."""
+        talk = FakeTalk(throttle=1, retry_after=0.05)
+
+        async def main():
+            sender = OutboundSender(rate=100, burst=10, request=talk)
+            start = time.monotonic()
+            message_id = await sender.post("room", "answer")
+            return message_id, time.monotonic() - start
+
+        message_id, elapsed = asyncio.run(main())
+        assert message_id == 1
+        assert elapsed >= 0.05
+
+    def test_timed_out_edit_is_retried(self):
+        """Test that a timed-out idempotent request is retried instead of dropped."""
+        talk = FakeTalk(timeouts=1)
+
+        async def main():
+            sender = OutboundSender(rate=100, burst=10, request=talk)
+            sender.backoff.base_delay = 0.001
+            return await sender.edit("room", 1, "answer")
+
+        assert asyncio.run(main()) is True
+        assert [method for method, *_ in talk.requests] == ["PUT"]
+
+    def test_idle_rooms_are_forgotten(self):
+        """Test that a room's queue is dropped once it is empty and its bucket has refilled."""
+        talk = FakeTalk()
+
+        async def main():
+            sender = OutboundSender(rate=50, burst=2, request=talk)
+            await sender.post("room", "answer")
+            assert "room" in sender._rooms
+            await sender._rooms["room"].worker
+            return sender._rooms
+
+        assert asyncio.run(main()) == {}
+
+    def test_pending_edits_are_coalesced(self):
+        """Test that queued edits of the same message collapse into the latest text."""
+        talk = FakeTalk()
+
+        async def main():
+            sender = OutboundSender(rate=20, burst=1, request=talk)
+            first = asyncio.create_task(sender.post("room", "Thinking..."))
+            await asyncio.sleep(0)
+            edits = [asyncio.create_task(sender.edit("room", 1, text)) for text in ("draft", "final")]
+            await asyncio.gather(first, *edits)
+
+        asyncio.run(main())
+        assert [payload["message"] for method, _, payload, _ in talk.requests if method == "PUT"] == ["final"]
+
+    def test_unsent_reaction_is_dropped_instead_of_removed(self):
+        """Test that removing a reaction still queued sends neither request."""
+        talk = FakeTalk()
+
+        async def main():
+            sender = OutboundSender(rate=5, burst=1, request=talk)
+            answer = asyncio.create_task(sender.post("room", "answer"))
+            await asyncio.sleep(0)
+            reaction = asyncio.create_task(sender.react("room", "7", "🤔", droppable=True))
+            await asyncio.sleep(0)
+            assert await sender.unreact("room", "7", "🤔") is True
+            assert await reaction is False
+            await answer
+            assert await sender.unreact("room", "8", "🤔") is True
+
+        asyncio.run(main())
+        assert [(method, path) for method, path, *_ in talk.requests] == [
+            ("POST", "chat/room"),
+            ("DELETE", "reaction/room/8"),
+        ]
+
+    def test_droppable_request_is_dropped_on_timeout(self):
+        """Test that an acknowledgement nobody waits for is never sent."""
+        talk = FakeTalk()
+
+        async def main():
+            sender = OutboundSender(rate=5, burst=1, request=talk)
+            answer = asyncio.create_task(sender.post("room", "answer"))
+            await asyncio.sleep(0)
+            try:
+                await sender.post("room", "Thinking...", timeout=0.01, droppable=True)
+            except asyncio.TimeoutError:
+                pass
+            await answer
+            await asyncio.sleep(0.3)
+
+        asyncio.run(main())
+        assert [payload["message"] for _, _, payload, _ in talk.requests] == ["answer"]
@@ -0,0 +1,137 @@
+"""
+Tests for NextCraftTalk two-stage page -> chunk retrieval.
+"""
+
+import numpy as np
+
+from src.modes.self_hosted.data.page_index import PageIndex
+from src.modes.self_hosted.data.vector_db import MinecraftVectorDB
+from src.shared.metrics import get_metrics
+from tests.conftest import HashingEmbedder, page_chunks
+
+
+class TestPageIndex:
+    """Test grouping chunks into pages."""
+
+    def test_rows_grouped_by_page(self):
+        """Test that chunks of a page are found together and unpaged chunks always are."""
+        embedder = HashingEmbedder()
+        texts, metadatas = page_chunks()
+        pages = PageIndex(embedder.encode)
+        pages.add(range(len(texts)), metadatas, texts.__getitem__)
+        pages.add([len(texts)], [{}], lambda row: "manual note")
+
+        assert len(pages) == 3
+        assert pages.describe()["unpaged_chunks"] == 1
+        best = pages.search(embedder.encode(["where are diamonds found"])[0], 1)
+        assert [pages.sources[page] for page in best] == ["https://minecraft.wiki/w/Diamond"]
+        assert pages.rows(best).tolist() == [3, 4, len(texts)]
+
+    def test_summary_comes_from_first_chunk(self):
+        """Test that the page vector follows the lowest chunk_id, whatever the ingestion order."""
+        summaries = []
+        pages = PageIndex(lambda texts: summaries.extend(texts) or np.ones((len(texts), 4), dtype=np.float32))
+        source = {"source": "Bed", "title": "Bed"}
+        pages.add([0], [{**source, "chunk_id": 2}], lambda row: "third chunk")
+        pages.add([1, 2], [{**source, "chunk_id": 0}, {**source, "chunk_id": 1}], lambda row: ["", "first", "x"][row])
+
+        assert summaries == ["Bed\nthird chunk", "Bed\nfirst"]
+        assert pages.rows([0]).tolist() == [0, 1, 2]
+
+    def test_reingest_replaces_page(self, tmp_path):
+        """Test that re-ingesting a page drops its old rows and re-embeds a changed summary."""
+        summaries = []
+        pages = PageIndex(lambda texts: summaries.extend(texts) or np.ones((len(texts), 4), dtype=np.float32))
+        source = {"source": "Bed", "title": "Bed"}
+        documents = ["a bed needs wool", "beds skip the night", "a bed needs three wool", "beds explode"]
+        pages.add([0, 1], [{**source, "chunk_id": 0}, {**source, "chunk_id": 1}], documents.__getitem__)
+        pages.add([2], [{**source, "chunk_id": 0}], documents.__getitem__)
+        pages.add([3], [{**source, "chunk_id": 1}], documents.__getitem__)
+
+        assert summaries == ["Bed\na bed needs wool", "Bed\na bed needs three wool"]
+        assert pages.rows([0]).tolist() == [2, 3]
+        pages.save(str(tmp_path))
+        loaded = PageIndex.load(str(tmp_path), pages.encode)
+        loaded.add([4], [{**source, "chunk_id": 0}], lambda row: "a bed")
+        assert loaded.rows([0]).tolist() == [4] and summaries[-1] == "Bed\na bed"
+
+
+class TestTwoStageSearch:
+    """Test MinecraftVectorDB searching within the best pages."""
+
+    def test_search_scores_only_candidate_pages(self, tmp_path):
+        """Test that page search returns the best page's chunks and scores fewer chunks."""
+        texts, metadatas = page_chunks()
+        db = MinecraftVectorDB(str(tmp_path), embedder=HashingEmbedder(), quantization="float32", page_candidates=1)
+        db.add_texts(texts, metadatas)
+        metrics = get_metrics()
+
+        def scored(**kwargs):
+            before = metrics.snapshot()["counters"].get("vector_db.chunks_scored", 0)
+            results = db.search("how is a nether portal built", n_results=3, **kwargs)
+            return results, metrics.snapshot()["counters"]["vector_db.chunks_scored"] - before
+
+        results, chunks = scored()
+        assert {doc["metadata"]["title"] for doc in results} == {"Nether portal"}
+        assert chunks == 2
+        results, chunks = scored(page_candidates=0)
+        assert len(results) == 3 and chunks == len(texts)
+        db.embedding_service.stop()
+
+    def test_pages_rebuilt_on_reopen(self, tmp_path):
+        """Test that the page level is rebuilt from the stored chunks after a restart."""
+        texts, metadatas = page_chunks()
+        db = MinecraftVectorDB(str(tmp_path), embedder=HashingEmbedder(), quantization="float32", page_candidates=1)
+        db.add_texts(texts, metadatas)
+        db.embedding_service.stop()
+
+        reopened = MinecraftVectorDB(
+            str(tmp_path), embedder=HashingEmbedder(), quantization="float32", page_candidates=1
+        )
+        assert len(reopened.pages) == 3
+        assert reopened.search("diamond ore pickaxe", n_results=1)[0]["metadata"]["title"] == "Diamond"
+        reopened.embedding_service.stop()
+
+    def test_reingested_page_serves_new_content(self, tmp_path):
+        """Test that only the new content of a re-ingested page is searched, also after a restart."""
+        texts, metadatas = page_chunks()
+        db = MinecraftVectorDB(str(tmp_path), embedder=HashingEmbedder(), quantization="float32", page_candidates=1)
+        db.add_texts(texts, metadatas)
+        bed = {"source": "https://minecraft.wiki/w/Bed", "title": "Bed"}
+        db.add_texts(["a bed is crafted from three wool and three planks"], [{**bed, "chunk_id": 0}])
+        db.embedding_service.stop()
+
+        reopened = MinecraftVectorDB(
+            str(tmp_path), embedder=HashingEmbedder(), quantization="float32", page_candidates=1
+        )
+        for vector_db in (db, reopened):
+            results = vector_db.search("how is a bed crafted", n_results=5)
+            assert [doc["content"] for doc in results] == ["a bed is crafted from three wool and three planks"]
+        reopened.embedding_service.stop()
+
+    def test_reingest_retires_old_chunks(self, tmp_path):
+        """Test that flat search and count only see a re-ingested page's new chunks, also when it got shorter."""
+        creeper = {"source": "https://minecraft.wiki/w/Creeper", "title": "Creeper"}
+        old = ["creepers explode near players", "creepers drop gunpowder when killed", "creepers fear cats"]
+        db = MinecraftVectorDB(str(tmp_path), embedder=HashingEmbedder(), quantization="float32")
+        db.add_texts(old, [{**creeper, "chunk_id": i} for i in range(3)])
+        db.add_texts(["creepers explode and drop gunpowder"], [{**creeper, "chunk_id": 0}])
+        assert db.count() == 1
+        db.embedding_service.stop()
+
+        reopened = MinecraftVectorDB(str(tmp_path), embedder=HashingEmbedder(), quantization="float32")
+        assert reopened.count() == 1
+        results = reopened.search("what do creepers drop", n_results=5)
+        assert [doc["content"] for doc in results] == ["creepers explode and drop gunpowder"]
+
+        # A re-ingest after a restart retires the chunks stored by the previous process
+        reopened.add_texts(
+            ["creepers hiss before exploding", "cats scare creepers"],
+            [
+                {**creeper, "chunk_id": 0},
+                {**creeper, "chunk_id": 1},
+            ],
+        )
+        results = reopened.search("creepers", n_results=5, page_candidates=0)
+        assert sorted(doc["content"] for doc in results) == ["cats scare creepers", "creepers hiss before exploding"]
+        reopened.embedding_service.stop()
@@ -0,0 +1,113 @@
+"""
+Tests for NextCraftTalk prompt prefix caching.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from src.modes.external_ai.xai import pipeline as xai_pipeline
+from src.shared.metrics import get_metrics
+from src.shared.prompting import PromptTemplate
+
+TEMPLATE_PATH = str(Path(__file__).resolve().parent.parent / "prompt_template.txt")
+
+
+class FakeResponse:
+    """Minimal requests.Response for a chat completion."""
+
+    status_code = 200
+
+    def __init__(self, body=None, lines=None):
+        self.body = body
+        self.lines = lines or []
+
+    def json(self):
+        return self.body
+
+    def iter_lines(self, chunk_size=None, decode_unicode=False):
+        return iter(self.lines)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pipeline():
+    """Direct x.ai pipeline on the repository's prompt template, without network access."""
+    rag = xai_pipeline.DirectXAIPipeline(
+        xai_api_key="test-key", prompt_template_path=TEMPLATE_PATH, test_connection=False
+    )
+    yield rag
+    rag.stop_file_watcher()
+
+
+class TestPromptTemplate:
+    """Test splitting templates into a stable prefix and a variable part."""
+
+    def test_repository_template_split(self):
+        """Test that instructions form the prefix and placeholders stay in the user part."""
+        template = PromptTemplate(Path(TEMPLATE_PATH).read_text(encoding="utf-8"))
+        assert template.system.startswith("You are a fun Minecraft buddy for kids!")
+        assert "HELPFUL RESPONSE:" in template.system
+        assert "{" not in template.system and "#" not in template.system
+        assert template.placeholders == ["context", "query"]
+
+        user = template.render(context="Beds need wool.", query="How do I make a bed?")
+        assert user == "MINECRAFT INFO:\nBeds need wool.\n\nQUESTION:\nHow do I make a bed?\n\nANSWER:"
+
+    def test_empty_blocks_are_dropped(self):
+        """Test that a block whose placeholders are empty is left out."""
+        template = PromptTemplate("Be nice.\n\nContext:\n{context}\n\nQuestion: {question}\n\nAnswer:")
+        assert template.render(question="Hi?") == "Question: Hi?\n\nAnswer:"
+        assert template.full(question="Hi?") == "Be nice.\n\nQuestion: Hi?\n\nAnswer:"
+        assert template.messages(question="Hi?")[0] == {"role": "system", "content": "Be nice."}
+
+
+class TestXAIPrefixCaching:
+    """Test the x.ai request layout and cached-token accounting."""
+
+    def test_system_prefix_is_identical_across_questions(self, pipeline, monkeypatch):
+        """Test that every question starts with the same system message."""
+        payloads = []
+
+        def fake_post(url, json=None, **kwargs):
+            payloads.append(json)
+            return FakeResponse({"choices": [{"message": {"content": "Use wool!"}}]})
+
+        monkeypatch.setattr(xai_pipeline.requests, "post", fake_post)
+        pipeline.answer_question("How do I make a bed?")
+        pipeline.answer_question("Where do I find diamonds?")
+
+        first, second = (payload["messages"] for payload in payloads)
+        assert first[0]["role"] == "system"
+        assert first[0] == second[0]
+        assert first[1]["content"] == "QUESTION:\nHow do I make a bed?\n\nANSWER:"
+
+    def test_cached_tokens_are_recorded(self, pipeline, monkeypatch):
+        """Test that usage from plain and streamed completions is recorded."""
+        metrics = get_metrics()
+        before = dict(metrics.snapshot()["counters"])
+        usage = {"prompt_tokens": 200, "completion_tokens": 30, "prompt_tokens_details": {"cached_tokens": 150}}
+        lines = [
+            "data: " + json.dumps({"choices": [{"delta": {"content": "Hi"}}]}),
+            "data: " + json.dumps({"choices": [], "usage": usage}),
+            "data: [DONE]",
+        ]
+        completion = {"choices": [{"message": {"content": "Hi"}}], "usage": usage}
+        requests_seen = []
+
+        def fake_post(url, json=None, stream=False, **kwargs):
+            requests_seen.append(json)
+            return FakeResponse(lines=lines) if stream else FakeResponse(completion)
+
+        monkeypatch.setattr(xai_pipeline.requests, "post", fake_post)
+        pipeline.generate_response("Question", system="Prefix")
+        pipeline.generate_response("Question", system="Prefix", cancel=xai_pipeline.CancelToken())
+
+        counters = metrics.snapshot()["counters"]
+        assert counters["xai.prompt_tokens"] - before.get("xai.prompt_tokens", 0) == 400
+        assert counters["xai.cached_tokens"] - before.get("xai.cached_tokens", 0) == 300
+        assert requests_seen[1]["stream_options"] == {"include_usage": True}
+        assert "stream_options" not in requests_seen[0]
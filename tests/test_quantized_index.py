@@ -0,0 +1,117 @@
+"""
+Tests for NextCraftTalk quantized vector storage.
+"""
+
+import numpy as np
+import pytest
+
+from src.modes.self_hosted.data.quantization import PQCodec, create_codec
+from src.modes.self_hosted.data.quantized_index import QuantizedIndex
+from src.modes.self_hosted.data.vector_db import MinecraftVectorDB
+from tests.conftest import HashingEmbedder, clustered_vectors
+
+
+class TestCodecs:
+    """Test the compression and scoring of each codec."""
+
+    @pytest.mark.parametrize("kind,bytes_per_vector,tolerance", [("float16", 128, 1e-3), ("int8", 64, 0.03)])
+    def test_scalar_codecs(self, kind, bytes_per_vector, tolerance):
+        """Test that scalar quantization keeps inner products close."""
+        vectors = clustered_vectors(1000)
+        codec = create_codec(kind, 64)
+        codec.train(vectors)
+        codes = codec.encode(vectors)
+        assert codec.bytes_per_vector == bytes_per_vector
+        np.testing.assert_allclose(codec.scores(codes, vectors[0]), vectors @ vectors[0], atol=tolerance)
+
+    def test_pq_subvectors_divide_the_dimensions(self):
+        """Test that the subvector count falls back to a divisor of the dimensions."""
+        assert PQCodec(768, 48).subvectors == 48
+        assert PQCodec(384, 50).subvectors == 48
+        assert PQCodec(64, 48).code_width == 32
+
+    def test_unknown_kind(self):
+        """Test that a typo in VECTOR_QUANTIZATION fails loudly."""
+        with pytest.raises(ValueError, match="Unknown vector quantization"):
+            create_codec("int4", 64)
+
+
+class TestQuantizedIndex:
+    """Test storage, search and recovery of the quantized index."""
+
+    def test_rescoring_recovers_pq_recall(self, tmp_path, monkeypatch):
+        """Test that re-scoring PQ candidates on full vectors finds the exact neighbours."""
+        monkeypatch.setattr(PQCodec, "min_train_rows", 256)
+        vectors = clustered_vectors(2000)
+        queries = clustered_vectors(20, seed=1)
+        exact = [set(np.argsort(-(vectors @ query))[:5].tolist()) for query in queries]
+
+        def recall(rescore):
+            index = QuantizedIndex(str(tmp_path / f"pq{rescore}"), "m", kind="pq", pq_subvectors=8)
+            index.rescore_candidates = rescore
+            index.upsert([str(i) for i in range(2000)], vectors, [str(i) for i in range(2000)])
+            assert index.describe()["trained"] and index.describe()["bytes_per_vector"] == 8
+            found = [{int(doc["content"]) for doc in index.search(query, 5)} for query in queries]
+            return np.mean([len(f & e) / 5 for f, e in zip(found, exact)])
+
+        assert recall(200) >= 0.95
+        assert recall(200) > recall(0)
+
+    def test_upsert_replaces_and_survives_reopen(self, tmp_path):
+        """Test that re-adding an id retires the old row, also after a restart."""
+        vectors = clustered_vectors(300)
+        index = QuantizedIndex(str(tmp_path), "m", kind="int8")
+        index.upsert([f"id{i}" for i in range(300)], vectors, [f"doc {i}" for i in range(300)])
+        index.upsert(["id0"], vectors[1:2], ["doc 0 updated"], [{"source": "Bed"}])
+        assert index.count() == 300
+
+        reopened = QuantizedIndex(str(tmp_path), "m", kind="int8")
+        assert reopened.count() == 300 and reopened.describe()["trained"]
+        top = reopened.search(vectors[1], 2)
+        assert {doc["content"] for doc in top} == {"doc 1", "doc 0 updated"}
+        assert top[0]["distance"] == pytest.approx(0.0, abs=1e-5)
+        assert [doc["content"] for doc in reopened.search(vectors[0], 300)].count("doc 0") == 0
+
+    def test_incomplete_append_is_dropped(self, tmp_path):
+        """Test that a record written without its vector is ignored on open."""
+        index = QuantizedIndex(str(tmp_path), "m", kind="float16")
+        index.upsert(["a", "b"], clustered_vectors(2), ["doc a", "doc b"])
+        with open(index.records_path, "ab") as f:
+            f.write(b'{"id": "c", "document": "doc c", "metadata": {}}\n{"id": "d", "docu')
+
+        reopened = QuantizedIndex(str(tmp_path), "m", kind="float16")
+        assert reopened.count() == 2
+        vector = clustered_vectors(1, seed=3)
+        reopened.upsert(["e"], vector, ["doc e"])
+        results = QuantizedIndex(str(tmp_path), "m", kind="float16").search(vector[0], 1)
+        assert results[0]["content"] == "doc e"
+
+    def test_switching_kinds_retrains_from_full_vectors(self, tmp_path):
+        """Test that a new VECTOR_QUANTIZATION re-encodes the stored vectors without re-embedding."""
+        vectors = clustered_vectors(300)
+        QuantizedIndex(str(tmp_path), "m", kind="int8").upsert([str(i) for i in range(300)], vectors, ["x"] * 300)
+        index = QuantizedIndex(str(tmp_path), "m", kind="float16")
+        assert index.describe()["bytes_per_vector"] == 128
+        assert index.describe()["code_bytes"] == 300 * 128
+
+    def test_other_embedding_model_is_refused(self, tmp_path):
+        """Test that vectors of another embedding model can't be mixed in."""
+        QuantizedIndex(str(tmp_path), "onnx:a").upsert(["a"], clustered_vectors(1), ["doc a"])
+        with pytest.raises(ValueError, match="holds onnx:a vectors"):
+            QuantizedIndex(str(tmp_path), "ollama:b")
+
+
+class TestQuantizedVectorDB:
+    """Test MinecraftVectorDB backed by the quantized index."""
+
+    def test_add_and_search(self, tmp_path):
+        """Test ingestion and search without ChromaDB."""
+        db = MinecraftVectorDB(str(tmp_path), embedder=HashingEmbedder(), quantization="int8")
+        db.add_texts(
+            ["craft a bed from wool and planks", "mine diamonds with an iron pickaxe", "build a nether portal"],
+            metadatas=[{"source": "Bed"}, {"source": "Diamond"}, {"source": "Nether portal"}],
+        )
+        assert db.collection is None and db.count() == 3
+        results = db.search("how do I mine diamonds", n_results=1)
+        assert results[0]["metadata"] == {"source": "Diamond"}
+        db.embedding_service.stop()
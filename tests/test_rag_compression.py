@@ -0,0 +1,67 @@
+"""
+Tests for NextCraftTalk extractive context compression.
+"""
+
+import re
+import zlib
+
+import numpy as np
+
+from src.modes.self_hosted.rag.compression import ContextCompressor, split_sentences
+from src.modes.self_hosted.rag.context import TokenCounter
+
+CHUNK = (
+    "A bed is crafted from three wool and three planks. "
+    "Beds were added in Beta 1.3 and their texture changed in 1.14. "
+    "Sleeping in a bed at night skips to the morning. "
+    "Data values: ID 26, stackable: no, blast resistance 0.2. "
+    "Beds explode when used in the Nether or the End."
+)
+
+
+def bag_of_words(texts):
+    """Deterministic embedding: hashed word counts."""
+    vectors = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in re.findall(r"[a-z]+", text.lower()):
+            vectors[row, zlib.crc32(word.encode()) % 64] += 1
+    return vectors
+
+
+class TestSplitSentences:
+    """Test sentence splitting of wiki text."""
+
+    def test_short_fragments_are_merged(self):
+        """Test that table cells on their own lines join the following text."""
+        sentences = split_sentences("Stackable\nYes (64)\nTool\nPickaxe is the fastest tool for it.")
+        assert sentences == ["Stackable Yes (64) Tool Pickaxe is the fastest tool for it."]
+        assert len(split_sentences(CHUNK)) == 5
+
+
+class TestContextCompressor:
+    """Test query-relevant sentence selection."""
+
+    def test_keeps_relevant_sentences_in_order(self):
+        """Test that the sentences about crafting win and keep their original order."""
+        calls = []
+
+        def embed(texts):
+            calls.append(len(texts))
+            return bag_of_words(texts)
+
+        counter = TokenCounter()
+        compressor = ContextCompressor(embed, counter)
+        docs = [{"content": CHUNK, "distance": 0.3}, CHUNK]
+        budget = counter.count("A bed is crafted from three wool and three planks.") + 20
+        compressed, report = compressor.compress("How do I craft a bed from wool and planks?", docs, budget)
+
+        assert report["sentences_total"] == 5
+        assert 1 <= report["sentences_kept"] < 5
+        assert report["tokens_after"] <= budget < report["tokens_before"]
+        assert compressed[0]["content"].startswith("A bed is crafted from three wool and three planks.")
+        assert compressed[0]["distance"] == 0.3
+        assert len(compressed) == 1
+
+        # Sentence vectors are cached: a second question only embeds the query
+        compressor.compress("Why do beds explode in the Nether?", docs, budget)
+        assert calls == [6, 1]
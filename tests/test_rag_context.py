@@ -0,0 +1,113 @@
+"""
+Tests for NextCraftTalk token-budgeted RAG prompt assembly.
+"""
+
+from src.modes.self_hosted.rag import pipeline as rag_pipeline
+from src.modes.self_hosted.rag.context import ContextBuilder, TokenCounter, estimate_tokens, overlap_length
+
+SENTENCES = [f"Fact {i}: the block number {i} is crafted from {i} planks and some sticks." for i in range(40)]
+PAGE = " ".join(SENTENCES)
+
+
+def overlapping_chunks(text, size=1000, overlap=200):
+    """Chunks with the same overlap as ContentProcessor.chunk_text."""
+    return [text[start : start + size].strip() for start in range(0, len(text), size - overlap)]
+
+
+class FakeVectorDB:
+    """Returns fixed search results."""
+
+    def __init__(self, **kwargs):
+        self.results = []
+
+    def search(self, query, n_results=3):
+        return self.results[:n_results]
+
+    def embed(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class FakeOllama:
+    """Records prompts instead of generating."""
+
+    model = "llama3.2:1b"
+    tuned_options = {"llama3.2:1b": {"num_ctx": 1024}}
+
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, prompt, **kwargs):
+        self.calls.append({"prompt": prompt, **kwargs})
+        return "Use planks!"
+
+
+class TestTokenCounter:
+    """Test token counting without a tokenizer."""
+
+    def test_estimate_and_cache(self):
+        """Test that counts are estimated and memoised."""
+        counter = TokenCounter()
+        assert counter.exact is False
+        assert counter.count(PAGE) == estimate_tokens(PAGE) > len(PAGE) // 5
+        assert PAGE in counter._cache
+        assert counter.count("") == 0
+
+
+class TestContextBuilder:
+    """Test budget filling and de-duplication."""
+
+    def test_overlap_between_neighbouring_chunks_is_removed(self):
+        """Test that the 200-char overlap appears only once in the context."""
+        first, second = overlapping_chunks(PAGE)[:2]
+        assert overlap_length(first, second) >= 190
+
+        report = ContextBuilder(TokenCounter()).build([first, second, first], budget=10000)
+        assert report["chunks_used"] == 2
+        assert report["duplicate_chars"] >= len(first)
+        assert report["context"].count(second[:100]) == 1
+
+    def test_budget_is_filled_by_relevance(self):
+        """Test that the closest chunks go first and the budget is never exceeded."""
+        counter = TokenCounter()
+        chunks = overlapping_chunks(PAGE)
+        docs = [{"content": chunk, "distance": 0.9 - i * 0.1} for i, chunk in enumerate(chunks)]
+        report = ContextBuilder(counter).build(docs, budget=300)
+
+        assert report["tokens"] <= 300
+        assert report["context"].startswith(chunks[-1][:50])
+        assert report["truncated"] is True
+        assert report["context"].endswith(".")
+
+    def test_budget_leaves_room_for_the_answer(self):
+        """Test the context budget derived from num_ctx."""
+        builder = ContextBuilder(TokenCounter())
+        assert builder.budget(2048, base_tokens=200, answer_tokens=512, max_context_tokens=1200) == 1200
+        assert builder.budget(1024, base_tokens=200, answer_tokens=512, max_context_tokens=1200) == 312
+        assert builder.budget(512, base_tokens=200, answer_tokens=512, max_context_tokens=1200) == 0
+
+
+class TestPipelinePrompt:
+    """Test prompt assembly in the self-hosted RAG pipeline."""
+
+    def test_prompt_fits_num_ctx(self, monkeypatch):
+        """Test that the prompt stays within the tuned num_ctx minus the answer reserve."""
+        client = FakeOllama()
+        monkeypatch.setattr(rag_pipeline, "MinecraftVectorDB", FakeVectorDB)
+        monkeypatch.setattr(rag_pipeline, "get_ollama_client", lambda check_model: client)
+        pipeline = rag_pipeline.SelfHostedRAGPipeline()
+        pipeline.vector_db.results = [{"content": chunk, "distance": 0.2} for chunk in overlapping_chunks(PAGE * 3)]
+
+        assert pipeline.query("How do I craft block 7?") == "Use planks!"
+        built = pipeline.build_prompt("How do I craft block 7?", pipeline.retrieve_context("How do I craft block 7?"))
+        assert built["num_ctx"] == 1024
+        assert built["prompt_tokens"] <= 1024 - pipeline.answer_tokens
+        assert client.calls[0]["prompt"] == built["prompt"]
+        assert client.calls[0]["system"] == pipeline.prompt.system
+
+    def test_pipeline_skips_model_check(self, monkeypatch):
+        """Test that creating the pipeline leaves checking and pulling the model to the Ollama warm-up."""
+        calls = []
+        monkeypatch.setattr(rag_pipeline, "MinecraftVectorDB", FakeVectorDB)
+        monkeypatch.setattr(rag_pipeline, "get_ollama_client", lambda **kwargs: calls.append(kwargs) or FakeOllama())
+        rag_pipeline.SelfHostedRAGPipeline()
+        assert calls == [{"check_model": False}]
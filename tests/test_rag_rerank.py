@@ -0,0 +1,62 @@
+"""
+Tests for NextCraftTalk cross-encoder reranking.
+"""
+
+import time
+
+from src.modes.self_hosted.rag.context import ContextBuilder, TokenCounter
+from src.modes.self_hosted.rag.rerank import CrossEncoderReranker
+
+DOCS = [
+    {"content": "Beds were added in Beta 1.3.", "distance": 0.10},
+    {"content": "Diamonds are found deep underground.", "distance": 0.20},
+    {"content": "Craft a bed from three wool and three planks.", "distance": 0.30},
+]
+
+
+class WordOverlapScorer:
+    """Scores pairs by shared words and counts the pairs it was asked about."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.pairs = 0
+
+    def __call__(self, pairs):
+        time.sleep(self.delay)
+        self.pairs += len(pairs)
+        return [len(set(query.lower().split()) & set(text.lower().split())) for query, text in pairs]
+
+
+class TestCrossEncoderReranker:
+    """Test reranking, caching and the latency budget."""
+
+    def test_reorders_by_score_and_caches_pairs(self):
+        """Test that the best scored chunk comes first and pairs are only scored once."""
+        scorer = WordOverlapScorer()
+        reranker = CrossEncoderReranker(scorer=scorer, batch_size=2)
+        query = "how do i craft a bed from wool"
+
+        docs, report = reranker.rerank(query, DOCS, top_k=2)
+        assert docs[0]["content"].startswith("Craft a bed")
+        assert len(docs) == 2 and report["reranked"] is True
+        assert report["scored"] == 3 and scorer.pairs == 3
+
+        _, report = reranker.rerank(query.upper(), DOCS, top_k=2)
+        assert report["cached"] == 3 and scorer.pairs == 3
+
+    def test_budget_falls_back_to_vector_order(self):
+        """Test that a slow scorer leaves the vector order in place."""
+        scorer = WordOverlapScorer(delay=0.05)
+        reranker = CrossEncoderReranker(scorer=scorer, batch_size=1, budget_ms=20)
+        docs, report = reranker.rerank("craft a bed", DOCS, top_k=2)
+
+        assert report["reranked"] is False
+        assert [doc["content"] for doc in docs] == [doc["content"] for doc in DOCS[:2]]
+        assert scorer.pairs == 1
+
+    def test_context_follows_rerank_order(self):
+        """Test that prompt assembly ranks by rerank score over vector distance."""
+        reranker = CrossEncoderReranker(scorer=WordOverlapScorer())
+        docs, _ = reranker.rerank("craft a bed from wool", DOCS, top_k=3)
+        report = ContextBuilder(TokenCounter()).build(docs, budget=1000)
+        assert report["context"].startswith("Craft a bed")
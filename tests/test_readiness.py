@@ -0,0 +1,77 @@
+"""
+Tests for NextCraftTalk startup readiness tracking.
+"""
+
+import asyncio
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from src.shared.readiness import FAILED, READY, STARTING, Readiness
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+class TestReadiness:
+    """Test component warm-up and the /ready summary."""
+
+    def test_background_warm_up(self):
+        """Test that start() doesn't block and reports progress."""
+        readiness = Readiness()
+
+        async def main():
+            readiness.start("xai_connection", lambda: time.sleep(0.1))
+            starting = readiness.describe()
+            await readiness.wait()
+            return starting
+
+        starting = asyncio.run(main())
+        assert starting["status"] == STARTING
+        assert starting["ready"] is False
+        assert readiness.describe()["status"] == READY
+        assert readiness.describe()["components"]["xai_connection"]["seconds"] >= 0.1
+
+    def test_required_failure_is_not_ready(self):
+        """Test that a failing required component fails readiness."""
+        readiness = Readiness()
+
+        def broken():
+            raise RuntimeError("chromadb missing")
+
+        assert asyncio.run(readiness.warm("rag_pipeline", broken)) is False
+        summary = readiness.describe()
+        assert summary["status"] == FAILED
+        assert summary["ready"] is False
+        assert summary["components"]["rag_pipeline"]["detail"] == "chromadb missing"
+
+    def test_optional_failure_degrades(self):
+        """Test that a failed optional check still leaves the service ready."""
+        readiness = Readiness()
+        readiness.mark_ready("xai_pipeline")
+        asyncio.run(readiness.warm("xai_connection", lambda: False, required=False))
+        summary = readiness.describe()
+        assert summary["status"] == "degraded"
+        assert summary["ready"] is True
+        assert readiness.is_ready("xai_connection") is False
+
+
+class TestLazyImports:
+    """Test that heavy optional dependencies stay out of startup imports."""
+
+    def test_app_import_skips_heavy_modules(self):
+        """Test that importing the external app doesn't import watchdog or ML libraries."""
+        probe = (
+            "import sys; import src.modes.external_ai.bot.api; "
+            "print([m for m in ('watchdog', 'profanity_check', 'sklearn', 'chromadb', 'sentence_transformers') "
+            "if m in sys.modules])"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=REPO_ROOT,
+            env={"PYTHONPATH": f"{REPO_ROOT}:{REPO_ROOT / 'src'}", "PATH": ""},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        assert output.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,134 @@
+"""
+Tests for NextCraftTalk circuit breakers and retry policies.
+"""
+
+import time
+
+import pytest
+
+from src.shared.inflight import GenerationCancelled
+from src.shared.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    TransientError,
+)
+
+
+class TestCircuitBreaker:
+    """Test breaker state transitions."""
+
+    def test_opens_after_threshold(self):
+        """Test that consecutive failures open the circuit."""
+        breaker = CircuitBreaker("test-open", failure_threshold=2, recovery_timeout=60)
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.allow_request() is False
+
+    def test_half_open_allows_single_trial(self):
+        """Test that an expired open circuit lets exactly one trial through."""
+        breaker = CircuitBreaker("test-half-open", failure_threshold=1, recovery_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow_request() is True
+        assert breaker.allow_request() is False
+
+        breaker.record_success()
+        assert breaker.state == CLOSED
+
+    def test_failed_trial_reopens(self):
+        """Test that a failed half-open trial opens the circuit again."""
+        breaker = CircuitBreaker("test-reopen", failure_threshold=3, recovery_timeout=0.01)
+        for _ in range(3):
+            breaker.record_failure()
+        time.sleep(0.02)
+        assert breaker.allow_request() is True
+        breaker.record_failure()
+        assert breaker.state == OPEN
+
+    @pytest.mark.parametrize("error,state", [(ValueError("bad JSON"), OPEN), (GenerationCancelled(), HALF_OPEN)])
+    def test_non_transient_error_ends_trial(self, error, state):
+        """Test that a trial raising a non-retried error doesn't block the circuit forever."""
+        breaker = CircuitBreaker(f"test-trial-{state}", failure_threshold=1, recovery_timeout=0.2)
+        breaker.record_failure()
+        time.sleep(0.25)
+
+        def fail(timeout):
+            raise error
+
+        with pytest.raises(type(error)):
+            RetryPolicy(max_attempts=1).call(fail, breaker=breaker)
+        assert breaker.state == state
+        if state == HALF_OPEN:
+            # A cancelled trial frees the slot for the next one
+            assert RetryPolicy(max_attempts=1).call(lambda timeout: "ok", breaker=breaker) == "ok"
+            assert breaker.state == CLOSED
+
+
+class TestRetryPolicy:
+    """Test bounded retries."""
+
+    def test_retries_transient_failures(self):
+        """Test that transient failures are retried until success."""
+        attempts = []
+
+        def flaky(timeout):
+            attempts.append(timeout)
+            if len(attempts) < 3:
+                raise TransientError("HTTP 503")
+            return "ok"
+
+        policy = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.005)
+        assert policy.call(flaky) == "ok"
+        assert len(attempts) == 3
+
+    def test_non_transient_errors_are_not_retried(self):
+        """Test that unexpected exceptions propagate immediately."""
+        attempts = []
+
+        def broken(timeout):
+            attempts.append(timeout)
+            raise ValueError("bad payload")
+
+        with pytest.raises(ValueError):
+            RetryPolicy(max_attempts=3, base_delay=0.001).call(broken)
+        assert len(attempts) == 1
+
+    def test_budget_limits_attempt_timeout(self):
+        """Test that attempt timeouts shrink to the remaining budget."""
+        seen = []
+        RetryPolicy().call(lambda timeout: seen.append(timeout), budget=0.5, attempt_timeout=60)
+        assert 0 < seen[0] <= 0.5
+
+    def test_open_breaker_fails_fast(self):
+        """Test that an open breaker rejects calls without invoking them."""
+        breaker = CircuitBreaker("test-fail-fast", failure_threshold=1, recovery_timeout=60)
+        breaker.record_failure()
+        with pytest.raises(CircuitOpenError):
+            RetryPolicy().call(lambda timeout: pytest.fail("should not be called"), breaker=breaker)
+
+    def test_throttling_does_not_open_breaker(self):
+        """Test that 429 responses are retried without counting against the breaker."""
+        breaker = CircuitBreaker("test-throttled", failure_threshold=1, recovery_timeout=60)
+
+        def throttled(timeout):
+            raise TransientError("HTTP 429", throttled=True)
+
+        with pytest.raises(TransientError):
+            RetryPolicy(max_attempts=2, base_delay=0.001, max_delay=0.002).call(throttled, breaker=breaker)
+        assert breaker.state == CLOSED
+        assert breaker.failures == 0
+
+    def test_jitter_is_bounded(self):
+        """Test that decorrelated jitter stays within its bounds."""
+        policy = RetryPolicy(base_delay=0.1, max_delay=1.0)
+        delay = 0.1
+        for _ in range(50):
+            delay = policy.next_delay(delay)
+            assert 0.1 <= delay <= 1.0
@@ -0,0 +1,100 @@
+"""
+Tests for NextCraftTalk server launcher.
+"""
+
+import os
+
+import pytest
+
+from src.modes.self_hosted.data.snapshots import SnapshotStore, build_snapshot
+from src.shared import server
+from tests.conftest import HashingEmbedder, chunks
+
+
+class TestServe:
+    """Test how the launcher picks its mode."""
+
+    def test_zero_workers_means_one_per_core(self):
+        """Test that 0 workers resolves to the CPU count."""
+        assert server.resolve_workers(0) == (os.cpu_count() or 1)
+        assert server.resolve_workers(3) == 3
+
+    def test_reload_uses_uvicorn_auto_reload(self, monkeypatch):
+        """Test that development mode skips preloading and forking."""
+        calls = []
+        monkeypatch.setattr(server.uvicorn, "run", lambda app, **kwargs: calls.append((app, kwargs)))
+        server.serve(
+            "pkg.module:app", "127.0.0.1", 8080, workers=4, preload=lambda: calls.append("preload"), reload=True
+        )
+        assert calls == [("pkg.module:app", {"host": "127.0.0.1", "port": 8080, "reload": True, "log_level": "info"})]
+
+    def test_single_worker_preloads_and_runs_in_process(self, monkeypatch):
+        """Test that one worker runs without a master process."""
+        calls = []
+        monkeypatch.setattr(server.uvicorn, "run", lambda app, **kwargs: calls.append(kwargs["loop"]))
+        server.serve("pkg.module:app", "127.0.0.1", 8080, workers=1, preload=lambda: calls.append("preload"))
+        assert calls == ["preload", server.event_loop_impl()]
+
+    def test_multiple_workers_use_prefork_master(self, monkeypatch):
+        """Test that several workers go through the preforking master."""
+        started = []
+        monkeypatch.setattr(server.PreforkServer, "run", lambda self: started.append(self.workers))
+        server.serve("pkg.module:app", "127.0.0.1", 8080, workers=3)
+        assert started == [3]
+
+
+class TestPreload:
+    """Test the self-hosted preload hook sharing the vector index with forked workers."""
+
+    @pytest.fixture
+    def configured(self, monkeypatch, tmp_path):
+        """Self-hosted Config serving snapshots from tmp_path, with a word-hashing embedder."""
+        from src.core import config as config_module
+        from src.modes.self_hosted.rag import pipeline as pipeline_module
+
+        def configure(embedder=None):
+            monkeypatch.setenv("DEPLOYMENT_MODE", "self_hosted")
+            monkeypatch.setenv("CHROMA_DB_PATH", str(tmp_path))
+            monkeypatch.setenv("VECTOR_SNAPSHOTS", "true")
+            monkeypatch.setenv("VECTOR_SNAPSHOT_POLL_SECONDS", "0")
+            monkeypatch.setenv("EMBEDDING_CACHE_PATH", "")
+            config = config_module.Config()
+            monkeypatch.setattr(config_module, "get_config", lambda: config)
+            monkeypatch.setattr(pipeline_module, "get_embedding_backend", lambda: embedder or HashingEmbedder())
+            monkeypatch.setattr(pipeline_module, "_preloaded_vector_db", None)
+            return pipeline_module
+
+        return configure
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="Needs fork")
+    def test_worker_serves_preloaded_snapshot(self, configured, tmp_path):
+        """Test that a forked worker adopts the master's snapshot and leases it itself."""
+        pipeline = configured()
+        store = SnapshotStore(str(tmp_path / "snapshots"))
+        version = build_snapshot(store, chunks(), HashingEmbedder(), kind="float32")
+
+        vector_db = pipeline.preload_vector_db()
+        assert vector_db.snapshots.version == version
+        assert store.readers(version) == [os.getpid()]
+        assert pipeline.take_preloaded_vector_db(str(tmp_path / "other")) is None
+
+        pid = os.fork()
+        if pid == 0:
+            adopted = pipeline.take_preloaded_vector_db(str(tmp_path))
+            results = adopted.search("how is a nether portal built", n_results=1)
+            served = adopted is vector_db and os.getpid() in store.readers(version)
+            os._exit(0 if served and results[0]["metadata"]["title"] == "Nether portal" else 1)
+        assert os.waitpid(pid, 0)[1] == 0
+
+        # SIGHUP: the master's copy is closed and its lease dropped before reopening
+        reloaded = pipeline.preload_vector_db()
+        assert reloaded is not vector_db and store.readers(version) == [os.getpid()]
+        reloaded.close()
+        assert store.readers(version) == []
+
+    def test_fork_unsafe_backend_is_loaded_per_worker(self, configured):
+        """Test that an embedding backend with threads is not loaded in the master."""
+        embedder = HashingEmbedder()
+        embedder.fork_safe = False
+        pipeline = configured(embedder)
+        assert pipeline.preload_vector_db() is None
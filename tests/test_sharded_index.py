@@ -0,0 +1,93 @@
+"""
+Tests for NextCraftTalk sharded vector search.
+"""
+
+import numpy as np
+import pytest
+
+from src.modes.self_hosted.data.quantized_index import QuantizedIndex
+from src.modes.self_hosted.data.sharded_index import ShardedIndex, shard_of
+from src.modes.self_hosted.data.vector_db import MinecraftVectorDB
+from tests.conftest import HashingEmbedder, clustered_vectors, page_chunks
+
+
+def fill(index, vectors):
+    """Store the vectors as chunks of pages of 5 rows; the document is the row number."""
+    rows = range(len(vectors))
+    return index.upsert(
+        [f"id{row}" for row in rows],
+        vectors,
+        [str(row) for row in rows],
+        [{"source": f"page{row // 5}"} for row in rows],
+    )
+
+
+class TestShardedIndex:
+    """Test splitting, merging and reopening shards."""
+
+    def test_merged_results_match_one_index(self, tmp_path):
+        """Test that heap-merged shard results equal a single index's, also over a row subset."""
+        vectors = clustered_vectors(500)
+        single = ShardedIndex(str(tmp_path / "one"), "m", shards=1, kind="float32")
+        sharded = ShardedIndex(str(tmp_path / "four"), "m", shards=4, kind="float32")
+        single_rows, sharded_rows = fill(single, vectors), fill(sharded, vectors)
+        assert single_rows == list(range(500))
+        assert all(sharded.document(row) == str(position) for position, row in enumerate(sharded_rows))
+
+        for query in clustered_vectors(10, seed=1):
+            expected = single.search(query, 8)
+            found = sharded.search(query, 8)
+            assert [doc["content"] for doc in found] == [doc["content"] for doc in expected]
+            distances = [doc["distance"] for doc in found]
+            assert distances == sorted(distances)
+
+        subset = np.asarray(sharded_rows[100:200])
+        found = sharded.search(vectors[150], 5, rows=subset)
+        assert found[0]["content"] == "150"
+        assert all(100 <= int(doc["content"]) < 200 for doc in found)
+        sharded.close()
+
+    def test_pages_stay_in_one_shard(self, tmp_path):
+        """Test that re-ingested chunks land in their page's shard and replace the old row."""
+        vectors = clustered_vectors(50)
+        index = ShardedIndex(str(tmp_path), "m", shards=3, kind="float32")
+        rows = fill(index, vectors)
+        assert {row % 3 for row in rows[:5]} == {shard_of("page0", 3)}
+        assert len(set(index.describe()["shard_chunks"])) > 1
+
+        index.upsert(["id0"], vectors[1:2], ["updated"], [{"source": "page0"}])
+        index.close()
+        reopened = ShardedIndex(str(tmp_path), "m", shards=3, kind="float32")
+        assert reopened.count() == 50 and len(reopened) == 51
+        assert [doc["content"] for doc in reopened.search(vectors[0], 50)].count("0") == 0
+        reopened.close()
+
+    def test_shard_count_mismatch(self, tmp_path):
+        """Test that a different VECTOR_SHARDS is refused instead of hiding chunks."""
+        fill(ShardedIndex(str(tmp_path / "sharded"), "m", shards=2), clustered_vectors(10))
+        with pytest.raises(ValueError, match="holds 2 shards"):
+            ShardedIndex(str(tmp_path / "sharded"), "m", shards=4)
+
+        fill(QuantizedIndex(str(tmp_path / "plain"), "m"), clustered_vectors(10))
+        assert ShardedIndex(str(tmp_path / "plain"), "m", shards=1).count() == 10
+        with pytest.raises(ValueError, match="holds 1 shards"):
+            ShardedIndex(str(tmp_path / "plain"), "m", shards=2)
+
+
+class TestShardedVectorDB:
+    """Test MinecraftVectorDB over a sharded index."""
+
+    def test_two_stage_search_over_shards(self, tmp_path):
+        """Test that page search works with global rows across shards."""
+        texts, metadatas = page_chunks()
+        db = MinecraftVectorDB(
+            str(tmp_path), embedder=HashingEmbedder(), quantization="float32", page_candidates=1, shards=3
+        )
+        db.add_texts(texts, metadatas)
+        assert db.count() == len(texts) and db.index.describe()["shards"] == 3
+
+        results = db.search("diamonds found deep underground", n_results=2)
+        assert {doc["metadata"]["title"] for doc in results} == {"Diamond"}
+        assert len(db.search("diamonds found deep underground", n_results=len(texts), page_candidates=0)) == len(texts)
+        db.index.close()
+        db.embedding_service.stop()
@@ -0,0 +1,132 @@
+"""
+Tests for NextCraftTalk versioned index snapshots.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from src.modes.self_hosted.data.quantized_index import QuantizedIndex
+from src.modes.self_hosted.data.snapshots import IndexSnapshot, SnapshotHandle, SnapshotStore, build_snapshot
+from src.modes.self_hosted.data.vector_db import MinecraftVectorDB
+from tests.conftest import HashingEmbedder, chunks, clustered_vectors
+
+
+def open_snapshot(path):
+    """Snapshot loader as MinecraftVectorDB configures it."""
+    return IndexSnapshot(path, HashingEmbedder().model_id, HashingEmbedder().encode)
+
+
+def dead_pid():
+    """Pid of a process that has exited."""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+class TestSnapshotStore:
+    """Test building, publishing and collecting versions."""
+
+    def test_build_is_immutable_and_atomic(self, tmp_path):
+        """Test that a finished version is read-only and a failed build leaves nothing."""
+        store = SnapshotStore(str(tmp_path))
+        version = build_snapshot(store, chunks(), HashingEmbedder(), kind="float32", shards=2, publish=False)
+        assert store.versions() == [version] and store.current() is None
+        files = [os.path.join(d, f) for d, _, names in os.walk(store.path(version)) for f in names]
+        assert files and not any(os.stat(f).st_mode & 0o222 for f in files)
+
+        with pytest.raises(RuntimeError):
+            with store.build():
+                raise RuntimeError("embedding failed")
+        assert [path.name for path in store.versions_dir.iterdir()] == [version]
+
+        store.publish(version)
+        assert store.current() == version
+        with pytest.raises(ValueError, match="Unknown snapshot"):
+            store.publish("19700101T000000-000000")
+
+    def test_gc_keeps_current_newer_and_leased(self, tmp_path):
+        """Test that only older versions without a live reader are deleted."""
+        store = SnapshotStore(str(tmp_path))
+        versions = []
+        for _ in range(4):
+            with store.build() as (version, _path):
+                versions.append(version)
+            time.sleep(0.001)
+        versions.sort()
+        store.publish(versions[2])
+        store.lease(versions[1])
+        (store.leases_dir / versions[0]).mkdir()
+        (store.leases_dir / versions[0] / str(dead_pid())).touch()
+
+        assert store.gc() == [versions[0]]
+        assert store.versions() == versions[1:]
+        store.release(versions[1])
+        assert store.gc() == [versions[1]]
+
+
+class TestReadOnlyIndex:
+    """Test the memory-mapped read-only index."""
+
+    def test_codes_mapped_and_writes_refused(self, tmp_path):
+        """Test that a read-only index maps its codes, searches like the writable one and refuses upserts."""
+        vectors = clustered_vectors(300)
+        writable = QuantizedIndex(str(tmp_path), "m", kind="int8")
+        writable.upsert([str(i) for i in range(300)], vectors, [str(i) for i in range(300)])
+
+        index = QuantizedIndex(str(tmp_path), "m", kind="int8", read_only=True)
+        assert isinstance(index._codes, np.memmap)
+        assert index.search(vectors[7], 3) == writable.search(vectors[7], 3)
+        with pytest.raises(RuntimeError, match="read-only"):
+            index.upsert(["x"], vectors[:1], ["x"])
+
+
+class TestHotSwap:
+    """Test swapping snapshots under running searches."""
+
+    def test_reader_keeps_its_version_until_done(self, tmp_path):
+        """Test that a swap waits for in-flight readers before closing and deleting the old version."""
+        store = SnapshotStore(str(tmp_path))
+        first = build_snapshot(store, chunks(), HashingEmbedder(), kind="float32")
+        handle = SnapshotHandle(store, open_snapshot, poll_seconds=0)
+        assert handle.refresh() and handle.version == first
+        query = HashingEmbedder().encode(["diamond ore pickaxe"])[0]
+
+        with handle.acquire() as snapshot:
+            second = build_snapshot(store, chunks(["a nether portal is built from obsidian"]), HashingEmbedder())
+            assert handle.refresh() and handle.version == second
+            # The old version is still readable and on disk while this search runs
+            assert snapshot.index.search(query, 1)[0]["metadata"]["title"] == "Diamond"
+            assert store.path(first).exists()
+            assert handle.describe()["draining"] == {first: 1}
+
+        assert not store.path(first).exists()
+        with handle.acquire() as snapshot:
+            assert snapshot.index.count() == 1
+        assert not handle.refresh()
+        handle.stop()
+        assert store.readers(second) == []
+
+    def test_server_picks_up_published_snapshot(self, tmp_path):
+        """Test that a running MinecraftVectorDB serves a snapshot published after it started."""
+        db = MinecraftVectorDB(
+            str(tmp_path), embedder=HashingEmbedder(), snapshots=True, snapshot_poll_seconds=0.05, page_candidates=1
+        )
+        assert db.search("how is a nether portal built") == [] and db.count() == 0
+        with pytest.raises(RuntimeError, match="read-only"):
+            db.add_texts(["new chunk"])
+
+        store = SnapshotStore(str(tmp_path / "snapshots"))
+        version = build_snapshot(store, chunks(), HashingEmbedder(), kind="float32", shards=2)
+        deadline = time.time() + 5
+        while db.snapshots.version != version and time.time() < deadline:
+            time.sleep(0.02)
+
+        assert db.count() == len(chunks())
+        results = db.search("how is a nether portal built", n_results=3)
+        assert {doc["metadata"]["title"] for doc in results} == {"Nether portal"}
+        db.close()